@@ -2,6 +2,9 @@ import { BuildOptions, build, type Metafile } from "esbuild"
 import { sassPlugin } from "esbuild-sass-plugin"
 import * as fs from "node:fs/promises"
 import { createRequire } from "node:module"
+import * as path from "node:path"
+import { promisify } from "node:util"
+import * as zlib from "node:zlib"
 
 const require = createRequire(import.meta.url)
 const pkg = require("./package.json") as {
@@ -37,10 +40,15 @@ const args = Object.fromEntries(
 const dev = args.dev === "true"
 const minify = !dev && args.minify !== "false"
 const metafile = args.metafile !== "false"
+// Precompressed siblings only matter for shipped (minified) assets
+const compress = minify && args.compress !== "false"
+const budget = metafile && args.budget !== "false"
 
 if (dev) console.log("Development mode: React DevTools Profiler enabled")
 if (!minify) console.log("Disabling minification")
 if (!metafile) console.log("Disabling metafile generation")
+if (!compress) console.log("Disabling precompressed assets")
+if (!budget) console.log("Disabling bundle-size budget check")
 
 const outDir = "dist"
 
@@ -121,19 +129,28 @@ interface EntryConfig {
   name: string
   jsEntry?: string
   sassEntry?: string
+  // Standalone entry points built alongside `jsEntry`. They share code with it
+  // through common chunks, so a page loading more than one of them still
+  // evaluates each module (and defines each custom element) once.
+  splitEntries?: Record<string, string>
 }
 
 async function bundleEntry({
   name,
   jsEntry,
   sassEntry,
+  splitEntries,
 }: EntryConfig): Promise<void> {
   const tasks = []
 
   if (jsEntry) {
     tasks.push(
       bundle_helper({
-        entryPoints: { [name]: jsEntry },
+        entryPoints: { [name]: jsEntry, ...splitEntries },
+        // Dynamic `import()`s (the chat app, history drawer, ...) and code
+        // shared between entries become separate chunks, fetched on demand.
+        splitting: true,
+        chunkNames: "chunks/[name]-[hash]",
       }),
     )
   }
@@ -155,9 +172,123 @@ const entries: EntryConfig[] = [
     name: "shinychat",
     jsEntry: "src/shinychat-entry.ts",
     sassEntry: "src/shinychat.scss",
+    splitEntries: {
+      chat: "src/chat/chat-entry.ts",
+      "markdown-stream": "src/markdown-stream/markdown-stream-entry.ts",
+    },
   },
 ]
 
+const gzip = promisify(zlib.gzip)
+const brotli = promisify(zlib.brotliCompress)
+
+async function listFiles(dir: string): Promise<string[]> {
+  const entries = await fs.readdir(dir, {
+    recursive: true,
+    withFileTypes: true,
+  })
+  return entries
+    .filter((e) => e.isFile())
+    .map((e) => path.join(e.parentPath, e.name))
+}
+
+// Write `.gz` and `.br` siblings next to every script and stylesheet so a
+// server or proxy that supports precompressed files (nginx `gzip_static`,
+// `brotli_static`, Posit Connect, ...) can skip compressing on each request.
+async function precompress(dir: string): Promise<void> {
+  const files = (await listFiles(dir)).filter((f) => /\.(js|css)$/.test(f))
+  await Promise.all(
+    files.map(async (file) => {
+      const data = await fs.readFile(file)
+      const [gz, br] = await Promise.all([
+        gzip(data, { level: zlib.constants.Z_BEST_COMPRESSION }),
+        brotli(data, {
+          params: {
+            [zlib.constants.BROTLI_PARAM_QUALITY]:
+              zlib.constants.BROTLI_MAX_QUALITY,
+            [zlib.constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+          },
+        }),
+      ])
+      await Promise.all([
+        fs.writeFile(`${file}.gz`, gz),
+        fs.writeFile(`${file}.br`, br),
+      ])
+    }),
+  )
+  console.log(`Precompressed ${files.length} assets (.gz, .br)`)
+}
+
+// Maximum gzipped bytes a page downloads before the entry can run: the entry
+// file plus every chunk it statically imports (transitively). Lazily loaded
+// chunks are only checked against the per-chunk cap. Run with
+// `--budget=false` to skip the check while iterating locally.
+const budgetFile = "bundle-budget.json"
+
+interface BundleBudget {
+  entries: Record<string, number>
+  chunk: number
+}
+
+async function gzipSize(file: string): Promise<number> {
+  return (await gzip(await fs.readFile(file))).length
+}
+
+async function checkBudget(meta: Metafile): Promise<boolean> {
+  const raw = await fs.readFile(budgetFile, "utf8")
+  const limits = JSON.parse(raw) as BundleBudget
+  const sizes = new Map<string, number>()
+  const sizeOf = async (file: string) => {
+    if (!sizes.has(file)) sizes.set(file, await gzipSize(file))
+    return sizes.get(file)!
+  }
+
+  const staticClosure = (file: string, seen = new Set<string>()) => {
+    if (seen.has(file)) return seen
+    seen.add(file)
+    for (const imp of meta.outputs[file]?.imports ?? []) {
+      if (imp.kind === "import-statement") staticClosure(imp.path, seen)
+    }
+    return seen
+  }
+
+  const kb = (n: number) => `${(n / 1024).toFixed(1)} KB`
+  let ok = true
+
+  for (const [name, limit] of Object.entries(limits.entries)) {
+    const entryFile = `${outDir}/${name}.js`
+    if (!meta.outputs[entryFile]) {
+      console.error(`Budget entry ${entryFile} was not built`)
+      ok = false
+      continue
+    }
+    let total = 0
+    for (const file of staticClosure(entryFile)) total += await sizeOf(file)
+    const over = total > limit
+    ok &&= !over
+    console.log(
+      `${over ? "✗" : "✓"} ${name}.js initial load ${kb(total)} gzip` +
+        ` (budget ${kb(limit)})`,
+    )
+  }
+
+  for (const file of Object.keys(meta.outputs)) {
+    if (!file.startsWith(`${outDir}/chunks/`) || !file.endsWith(".js")) {
+      continue
+    }
+    const size = await sizeOf(file)
+    if (size > limits.chunk) {
+      ok = false
+      console.log(
+        `✗ ${path.basename(file)} ${kb(size)} gzip` +
+          ` (chunk budget ${kb(limits.chunk)})`,
+      )
+    }
+  }
+
+  return ok
+}
+
 ;(async () => {
   await fs.rm(outDir, { recursive: true, force: true })
 
@@ -172,5 +303,17 @@ const entries: EntryConfig[] = [
     const mergedMetadata = mergeMetadatas(allEsbuildMetadata)
     await fs.writeFile("esbuild-metadata.json", JSON.stringify(mergedMetadata))
     console.log("Metadata file written to esbuild-metadata.json")
+
+    if (budget && !(await checkBudget(mergedMetadata))) {
+      console.error(
+        `Bundle exceeds the size budget in ${budgetFile}. Shrink it,` +
+          " lazy-load the new code, or raise the budget deliberately.",
+      )
+      process.exit(1)
+    }
+  }
+
+  if (compress) {
+    await precompress(outDir)
   }
 })()
@@ -82,8 +82,13 @@ export function AttachmentLightbox({
   )
 
   // A Blob URL is more robust than a multi-MB base64 data URL as an iframe src.
+  // Uploaded files are already served from a URL.
   useEffect(() => {
     if (!isPdf) return
+    if (!src.startsWith("data:")) {
+      setPdfUrl(src)
+      return
+    }
     const url = URL.createObjectURL(dataUrlToBlob(src, SUPPORTED_PDF_TYPE))
     setPdfUrl(url)
     return () => URL.revokeObjectURL(url)
@@ -132,7 +132,7 @@ const AttachmentPreview = memo(function AttachmentPreview({
         {...containerProps}
       >
         <img
-          src={attachment.dataUrl}
+          src={attachment.thumbnailUrl ?? attachment.dataUrl}
           alt={
             attachment.name
               ? `Attached image: ${attachment.name}`
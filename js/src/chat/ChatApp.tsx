@@ -36,7 +36,7 @@ import type {
   GreetingOptions,
 } from "../transport/types"
 import type { SubmitKey } from "./tiptap/submitShortcut"
-import type { AttachmentPayload } from "./attachments"
+import { shouldUploadAttachment, type AttachmentPayload } from "./attachments"
 
 export interface InitialGreeting {
   content: string
@@ -164,7 +164,7 @@ export function ChatApp({
     reportSnapshot()
   }, [state.messages, reportSnapshot])
 
-  const submitUserInput = useCallback(
+  const sendUserInput = useCallback(
     (content: string, attachments: AttachmentPayload[]) => {
       // Optimistic UI update (adds user message + loading placeholder).
       dispatch({
@@ -198,6 +198,29 @@ export function ChatApp({
     [dispatch, transport, inputId, elementId],
   )
 
+  const submitUserInput = useCallback(
+    (content: string, attachments: AttachmentPayload[]) => {
+      const upload = transport.uploadAttachment?.bind(transport)
+      if (
+        !upload ||
+        !stateRef.current.httpUpload ||
+        !attachments.some(shouldUploadAttachment)
+      ) {
+        sendUserInput(content, attachments)
+        return
+      }
+      // Upload large files before sending, so the message (and every later
+      // messages snapshot) carries references rather than their data URLs. A
+      // failed upload falls back to sending that file inline.
+      void Promise.all(
+        attachments.map((a) =>
+          shouldUploadAttachment(a) ? upload(a).catch(() => a) : a,
+        ),
+      ).then((uploaded) => sendUserInput(content, uploaded))
+    },
+    [transport, sendUserInput],
+  )
+
   const containerRef = useRef<ChatContainerHandle>(null)
   const siblingNavigationPendingRef = useRef(false)
   const [siblingNavigationPending, setSiblingNavigationPending] =
@@ -248,6 +271,8 @@ export function ChatApp({
         containerRef.current?.endSiblingNavigation()
       }
     })
+    // Let the server use the wire features this bundle handles
+    transport.sendClientFeatures(elementId)
     return unsubscribe
   }, [transport, elementId])
 
@@ -360,6 +385,7 @@ export function ChatApp({
                   transport={transport}
                   messages={state.messages}
                   streamingMessage={state.streamingMessage}
+                  concurrentStreams={state.concurrentStreams}
                   inputDisabled={state.inputDisabled}
                   inputPlaceholder={state.inputPlaceholder}
                   iconAssistant={iconAssistant}
@@ -6,6 +6,8 @@ import {
   forwardRef,
   useImperativeHandle,
   useMemo,
+  lazy,
+  Suspense,
 } from "react"
 import { createPortal } from "react-dom"
 import { useStickToBottom } from "use-stick-to-bottom"
@@ -20,7 +22,7 @@ import {
   SlashCommandsContext,
   useChatDispatch,
 } from "./context"
-import { ChatHistoryDrawer, HistoryIcon } from "./ChatHistoryDrawer"
+import { HistoryIcon } from "./HistoryIcon"
 import { useFillPaddingTransfer } from "./useFillPaddingTransfer"
 import { useOverlapNudge } from "./useOverlapNudge"
 import type { ChatMessageData, GreetingData } from "./state"
@@ -32,12 +34,21 @@ import type {
 import type { SubmitKey } from "./tiptap/submitShortcut"
 import type { AttachmentPayload } from "./attachments"
 
+// Only apps with history enabled ever render the drawer, so it loads on demand.
+const ChatHistoryDrawer = lazy(() =>
+  import("./ChatHistoryDrawer").then((m) => ({
+    default: m.ChatHistoryDrawer,
+  })),
+)
+
 declare global {
   interface Window {
     shinychat_always_open_external_links?: boolean
   }
 }
 
+const NO_STREAMS: ChatMessageData[] = []
+
 function openLink(url: string): void {
   window.open(url, "_blank", "noopener,noreferrer")
 }
@@ -46,6 +57,7 @@ export interface ChatContainerProps {
   transport: ChatTransport
   messages: ChatMessageData[]
   streamingMessage: ChatMessageData | null
+  concurrentStreams?: ChatMessageData[]
   inputDisabled: boolean
   inputPlaceholder: string
   iconAssistant?: string
@@ -87,6 +99,7 @@ export const ChatContainer = forwardRef<
     transport,
     messages,
     streamingMessage,
+    concurrentStreams = NO_STREAMS,
     inputDisabled,
     inputPlaceholder,
     iconAssistant,
@@ -116,16 +129,24 @@ export const ChatContainer = forwardRef<
     () => messages.filter((m) => m.role === "user").map((m) => m.content),
     [messages],
   )
-  const displayedMessages = useMemo(
-    () => (streamingMessage ? [...messages, streamingMessage] : messages),
-    [messages, streamingMessage],
-  )
+  const displayedMessages = useMemo(() => {
+    const live = streamingMessage
+      ? [...concurrentStreams, streamingMessage]
+      : concurrentStreams
+    return live.length > 0 ? [...messages, ...live] : messages
+  }, [messages, concurrentStreams, streamingMessage])
 
   const chatInputRef = useRef<ChatInputHandle>(null)
 
   const [historyOpen, setHistoryOpen] = useState(false)
   const historyTriggerRef = useRef<HTMLButtonElement>(null)
 
+  // Lets the server warm its cache with the conversations the user is
+  // about to pick from
+  useEffect(() => {
+    if (historyOpen) transport.sendHistoryOpen(elementId)
+  }, [historyOpen, transport, elementId])
+
   const [pendingUrl, setPendingUrl] = useState<string | null>(null)
   const pendingUrlRef = useRef<string | null>(null)
   pendingUrlRef.current = pendingUrl
@@ -188,7 +209,7 @@ export const ChatContainer = forwardRef<
 
   const dispatch = useChatDispatch()
 
-  const isStreaming = !!streamingMessage
+  const isStreaming = !!streamingMessage || concurrentStreams.length > 0
 
   const cancelStream = useCallback((): void => {
     if (!enableCancel || !cancelId || !isStreaming || cancelRequested) return
@@ -521,7 +542,7 @@ export const ChatContainer = forwardRef<
           <ScrollToBottomButton
             isAtBottom={isAtBottom}
             scrollToBottom={scrollToBottom}
-            streaming={!!streamingMessage || !!greeting?.streaming}
+            streaming={isStreaming || !!greeting?.streaming}
           />
         </div>
 
@@ -557,22 +578,26 @@ export const ChatContainer = forwardRef<
       </div>
 
       {historyEnabled && (
-        <ChatHistoryDrawer
-          isOpen={historyOpen}
-          onClose={() => setHistoryOpen(false)}
-          triggerRef={historyTriggerRef}
-          conversations={historyConversations ?? []}
-          activeId={historyActiveId ?? null}
-          busy={isStreaming}
-          onSelect={(convId) => {
-            transport.sendHistorySelect(elementId, convId)
-          }}
-          onNew={() => transport.sendHistoryNew(elementId)}
-          onRename={(convId, title) =>
-            transport.sendHistoryRename(elementId, convId, title)
-          }
-          onDelete={(convId) => transport.sendHistoryDelete(elementId, convId)}
-        />
+        <Suspense fallback={null}>
+          <ChatHistoryDrawer
+            isOpen={historyOpen}
+            onClose={() => setHistoryOpen(false)}
+            triggerRef={historyTriggerRef}
+            conversations={historyConversations ?? []}
+            activeId={historyActiveId ?? null}
+            busy={isStreaming}
+            onSelect={(convId) => {
+              transport.sendHistorySelect(elementId, convId)
+            }}
+            onNew={() => transport.sendHistoryNew(elementId)}
+            onRename={(convId, title) =>
+              transport.sendHistoryRename(elementId, convId, title)
+            }
+            onDelete={(convId) =>
+              transport.sendHistoryDelete(elementId, convId)
+            }
+          />
+        </Suspense>
       )}
 
       {pendingUrl &&
@@ -2,6 +2,8 @@ import React, { useCallback, useEffect, useMemo, useRef, useState } from "react"
 import type { ConversationMeta } from "../transport/types"
 import { usePrefersReducedMotion } from "./usePrefersReducedMotion"
 
+export { HistoryIcon } from "./HistoryIcon"
+
 // Matches the 0.2s CSS animation in _history.scss, plus a margin of safety.
 const DRAWER_CLOSE_FALLBACK_MS = 300
 
@@ -464,42 +466,6 @@ function relativeTime(iso: string): string {
   })
 }
 
-// Clock-rewind glyph: reads as "past conversations", unlike the hamburger it
-// replaced (which read as a navigation menu).
-export function HistoryIcon() {
-  return (
-    <svg
-      width="16"
-      height="16"
-      viewBox="0 0 16 16"
-      fill="none"
-      aria-hidden="true"
-    >
-      <path
-        d="M2.5 3v3h3"
-        stroke="currentColor"
-        strokeWidth="1.5"
-        strokeLinecap="round"
-        strokeLinejoin="round"
-      />
-      <path
-        d="M2.75 6A5.5 5.5 0 1 1 3 9.6"
-        stroke="currentColor"
-        strokeWidth="1.5"
-        strokeLinecap="round"
-        strokeLinejoin="round"
-      />
-      <path
-        d="M8 5v3.2l2.2 1.3"
-        stroke="currentColor"
-        strokeWidth="1.5"
-        strokeLinecap="round"
-        strokeLinejoin="round"
-      />
-    </svg>
-  )
-}
-
 // Compose / new-conversation glyph (pencil in a square).
 function NewChatIcon() {
   return (
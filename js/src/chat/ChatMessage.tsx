@@ -67,6 +67,8 @@ interface ChatMessageProps {
   uploadAccept?: string[]
   maxUploadSize?: number | null
   enableUpload?: boolean
+  // Attached to the message's root element (see useMessageWindow)
+  windowRef?: (el: HTMLElement | null) => void | (() => void)
 }
 
 export const ChatMessage = memo(function ChatMessage({
@@ -85,6 +87,7 @@ export const ChatMessage = memo(function ChatMessage({
   uploadAccept = [],
   maxUploadSize = null,
   enableUpload,
+  windowRef,
 }: ChatMessageProps) {
   const slashCommands = useSlashCommands()
   const toolGrouping = useToolGrouping()
@@ -162,6 +165,17 @@ export const ChatMessage = memo(function ChatMessage({
   const touchHoldStartRef = useRef<{ x: number; y: number } | null>(null)
   const touchHoldRevealedRef = useRef(false)
   const rootRef = useRef<HTMLDivElement>(null)
+  const setRoot = useCallback(
+    (el: HTMLDivElement | null) => {
+      rootRef.current = el
+      const cleanup = windowRef?.(el)
+      return () => {
+        rootRef.current = null
+        cleanup?.()
+      }
+    },
+    [windowRef],
+  )
 
   const focusEditor = useCallback(() => editRef.current?.focus(), [])
   const staging = useAttachmentStaging({
@@ -332,7 +346,7 @@ export const ChatMessage = memo(function ChatMessage({
               >
                 <img
                   className="shiny-chat-message-image"
-                  src={a.data_url}
+                  src={a.thumbnail_url ?? a.data_url}
                   alt={alt}
                 />
               </button>
@@ -455,8 +469,9 @@ export const ChatMessage = memo(function ChatMessage({
 
   return (
     <div
-      ref={rootRef}
+      ref={setRoot}
       className={roleClass}
+      data-message-id={message.id}
       data-touch-revealed={touchRevealed || undefined}
       onPointerDown={touchHoldEnabled ? handleBubblePointerDown : undefined}
       onPointerMove={touchHoldEnabled ? handleBubblePointerMove : undefined}
@@ -1,9 +1,16 @@
-import { memo, useCallback, useState } from "react"
+import { memo, useCallback, useMemo, useState } from "react"
 import { ChatMessage } from "./ChatMessage"
 import { MessageErrorBoundary } from "./MessageErrorBoundary"
 import type { ChatMessageData } from "./state"
 import type { SubmitKey } from "./tiptap/submitShortcut"
 import type { AttachmentPayload } from "./attachments"
+import {
+  isWindowingSupported,
+  useMessageWindow,
+  WINDOW_LIVE_TAIL,
+  WINDOW_MIN_MESSAGES,
+  type WindowSlot,
+} from "./useMessageWindow"
 
 export interface ChatMessagesProps {
   messages: ChatMessageData[]
@@ -47,29 +54,66 @@ export const ChatMessages = memo(function ChatMessages({
   const handleStartEdit = useCallback((id: string) => setEditingId(id), [])
   const handleCancelEdit = useCallback(() => setEditingId(null), [])
 
+  const windowed =
+    messages.length >= WINDOW_MIN_MESSAGES && isWindowingSupported()
+  const slots = useMemo<WindowSlot[]>(() => {
+    if (!windowed) return []
+    const liveFrom = messages.length - WINDOW_LIVE_TAIL
+    return messages.map((msg, i) => ({
+      id: msg.id,
+      message: msg,
+      freezable: i < liveFrom && !msg.streaming && msg.id !== editingId,
+    }))
+  }, [windowed, messages, editingId])
+  const { frozen, slotRef } = useMessageWindow(windowed, slots)
+
+  // Every message keeps its key, element type and index whether or not the
+  // transcript is windowed, so crossing WINDOW_MIN_MESSAGES (e.g. after a
+  // truncation) remounts nothing, and sibling/edit controls and index-based
+  // callbacks are unaffected by which messages are frozen.
   return (
     <>
-      {messages.map((msg, i) => (
-        <MessageErrorBoundary key={msg.id}>
-          <ChatMessage
-            message={msg}
-            index={i}
-            iconAssistant={iconAssistant}
-            onEdit={onEdit}
-            onNavigate={onNavigate}
-            siblingNavigationPending={siblingNavigationPending}
-            disabled={disabled}
-            inputId={inputId}
-            submitKey={submitKey}
-            uploadAccept={uploadAccept}
-            maxUploadSize={maxUploadSize}
-            enableUpload={enableUpload}
-            isEditing={msg.id === editingId}
-            onStartEdit={handleStartEdit}
-            onCancelEdit={handleCancelEdit}
-          />
-        </MessageErrorBoundary>
-      ))}
+      {messages.map((msg, i) => {
+        const snapshot = windowed ? frozen.get(msg.id) : undefined
+        if (snapshot?.message === msg && slots[i]!.freezable) {
+          // Text only, so find-in-page still matches it; scrolling to a match
+          // brings the message back
+          return (
+            <div
+              key={msg.id}
+              ref={slotRef}
+              className="shiny-chat-message-placeholder"
+              data-message-id={msg.id}
+              data-frozen=""
+              style={{ height: snapshot.height }}
+            >
+              {snapshot.text}
+            </div>
+          )
+        }
+        return (
+          <MessageErrorBoundary key={msg.id}>
+            <ChatMessage
+              message={msg}
+              index={i}
+              iconAssistant={iconAssistant}
+              onEdit={onEdit}
+              onNavigate={onNavigate}
+              siblingNavigationPending={siblingNavigationPending}
+              disabled={disabled}
+              inputId={inputId}
+              submitKey={submitKey}
+              uploadAccept={uploadAccept}
+              maxUploadSize={maxUploadSize}
+              enableUpload={enableUpload}
+              isEditing={msg.id === editingId}
+              onStartEdit={handleStartEdit}
+              onCancelEdit={handleCancelEdit}
+              windowRef={windowed ? slotRef : undefined}
+            />
+          </MessageErrorBoundary>
+        )
+      })}
     </>
   )
 })
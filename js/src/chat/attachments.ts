@@ -68,6 +68,16 @@ export function acceptAttribute(accept: readonly string[]): string {
  */
 export const MAX_IMAGE_EDGE = 1568
 
+/** Quality (0-1) for JPEG/WebP images re-encoded by the downscale step. */
+export const IMAGE_QUALITY = 0.85
+
+/**
+ * Longest-edge pixel limit for the thumbnail shown in the message bubble and
+ * attachment tray in place of a larger image (keep in sync with Python's
+ * DEFAULT_THUMBNAIL_EDGE).
+ */
+export const THUMBNAIL_EDGE = 320
+
 export interface AttachedFile {
   id: string
   /** MIME type, e.g. "image/png" or "application/pdf". */
@@ -79,14 +89,42 @@ export interface AttachedFile {
   name: string
   /** Decoded byte size of the (possibly downscaled) payload. */
   size: number
+  /** Server reference for a file already uploaded over HTTP. */
+  uploadId?: string
+  /** Small image data URL to display in place of a large image. */
+  thumbnailUrl?: string
 }
 
 /** Slim form sent to the server and stored on a sent message. */
 export interface AttachmentPayload {
   mime: string
+  /**
+   * `data:<mime>;base64,<data>`, or for an uploaded file, a session URL the
+   * server serves it from.
+   */
   data_url: string
   name: string
   size: number
+  /** Set when the file was uploaded over HTTP and is sent by reference. */
+  upload_id?: string
+  /** Small image data URL to display in place of a large image. */
+  thumbnail_url?: string
+}
+
+/**
+ * Attachments at least this large are uploaded over HTTP (when the server
+ * supports it) rather than inlined in the input value. Text files stay inline
+ * regardless: their previews read the data URL.
+ */
+export const HTTP_UPLOAD_MIN_BYTES = 256 * 1024
+
+export function shouldUploadAttachment(a: AttachmentPayload): boolean {
+  return (
+    a.upload_id === undefined &&
+    a.data_url.startsWith("data:") &&
+    a.size >= HTTP_UPLOAD_MIN_BYTES &&
+    attachmentFamily(a.mime) !== "text"
+  )
 }
 
 export function attachmentFamily(mime: string): AttachmentFamily | null {
@@ -224,15 +262,37 @@ function fileToDataUrl(file: File): Promise<string> {
   })
 }
 
+/** Draw `img` at `width`x`height` and encode it, or null without a canvas. */
+function encodeImage(
+  img: HTMLImageElement,
+  width: number,
+  height: number,
+  type: string,
+): string | null {
+  const canvas = document.createElement("canvas")
+  canvas.width = width
+  canvas.height = height
+  const ctx = canvas.getContext("2d")
+  if (!ctx) return null
+  ctx.drawImage(img, 0, 0, width, height)
+  return canvas.toDataURL(type, IMAGE_QUALITY)
+}
+
 /**
  * Downscale a data URL so its longest edge is <= MAX_IMAGE_EDGE. Returns the
- * (possibly unchanged) data URL and whether downscaling occurred. Falls back to
- * the original when canvas/image decoding is unavailable.
+ * (possibly unchanged) data URL and whether downscaling occurred, plus a WebP
+ * (or, where the browser can't encode WebP, PNG) thumbnail when the image is
+ * larger than THUMBNAIL_EDGE. Falls back to the original when canvas/image
+ * decoding is unavailable.
  */
 async function downscaleDataUrl(
   dataUrl: string,
   mediaType: SupportedImageType,
-): Promise<{ dataUrl: string; wasDownscaled: boolean }> {
+): Promise<{
+  dataUrl: string
+  wasDownscaled: boolean
+  thumbnailUrl?: string
+}> {
   if (typeof document === "undefined" || typeof Image === "undefined") {
     return { dataUrl, wasDownscaled: false }
   }
@@ -245,21 +305,27 @@ async function downscaleDataUrl(
   if (!img || !img.naturalWidth || !img.naturalHeight) {
     return { dataUrl, wasDownscaled: false }
   }
+  const thumbSize = computeDownscaledSize(
+    img.naturalWidth,
+    img.naturalHeight,
+    THUMBNAIL_EDGE,
+  )
+  const thumbnailUrl = thumbSize
+    ? (encodeImage(img, thumbSize.width, thumbSize.height, "image/webp") ??
+      undefined)
+    : undefined
+
   const size = computeDownscaledSize(
     img.naturalWidth,
     img.naturalHeight,
     MAX_IMAGE_EDGE,
   )
-  if (!size) return { dataUrl, wasDownscaled: false }
+  if (!size) return { dataUrl, wasDownscaled: false, thumbnailUrl }
 
-  const canvas = document.createElement("canvas")
-  canvas.width = size.width
-  canvas.height = size.height
-  const ctx = canvas.getContext("2d")
-  if (!ctx) return { dataUrl, wasDownscaled: false }
-  ctx.drawImage(img, 0, 0, size.width, size.height)
   const outType = mediaType === "image/gif" ? "image/png" : mediaType
-  return { dataUrl: canvas.toDataURL(outType), wasDownscaled: true }
+  const downscaled = encodeImage(img, size.width, size.height, outType)
+  if (!downscaled) return { dataUrl, wasDownscaled: false, thumbnailUrl }
+  return { dataUrl: downscaled, wasDownscaled: true, thumbnailUrl }
 }
 
 function extensionOf(name: string): string {
@@ -334,7 +400,10 @@ export async function processFile(
   const canonical = `data:${type};base64,${original.slice(comma + 1)}`
 
   if (spec?.downscale && isSupportedImageType(type)) {
-    const { dataUrl, wasDownscaled } = await downscaleDataUrl(canonical, type)
+    const { dataUrl, wasDownscaled, thumbnailUrl } = await downscaleDataUrl(
+      canonical,
+      type,
+    )
     const outType = wasDownscaled && type === "image/gif" ? "image/png" : type
     return {
       file: {
@@ -344,6 +413,7 @@ export async function processFile(
         dataUrl,
         name: file.name,
         size: dataUrlByteSize(dataUrl),
+        ...(thumbnailUrl ? { thumbnailUrl } : {}),
       },
       wasDownscaled,
       wasConverted: outType !== type,
@@ -1,6 +1,5 @@
 import { createRoot, type Root } from "react-dom/client"
 import { createElement } from "react"
-import { ChatApp } from "./ChatApp"
 import type { ChatAppProps, InitialGreeting } from "./ChatApp"
 import { getShinyTransport } from "../transport/shiny-transport"
 import type { ChatMessageData, ToolGrouping } from "./state"
@@ -15,6 +14,17 @@ import {
 // Single shared transport instance for all chat instances on the page
 const transport = getShinyTransport()
 
+// The chat UI (Tiptap editor, tool cards, markdown pipeline, ...) lives in its
+// own chunk, fetched the first time a chat element connects. Pages that only
+// use a markdown stream never download it. Messages the server sends before
+// the app mounts are buffered by the transport until ChatApp subscribes.
+let chatAppModule: Promise<typeof import("./ChatApp")> | null = null
+
+function loadChatApp(): Promise<typeof import("./ChatApp")> {
+  chatAppModule ??= import("./ChatApp")
+  return chatAppModule
+}
+
 const BROWSER_TOKEN_KEY = "shinychat-browser-token"
 
 // Cached fallback token for private-browsing mode (localStorage unavailable).
@@ -230,7 +240,20 @@ class ChatContainerElement extends HTMLElement {
       submitKey,
     }
     this.reactRoot = createRoot(this)
-    this.reactRoot.render(createElement(ChatApp, this.appProps))
+    this.renderApp(this.reactRoot)
+  }
+
+  // Renders with the latest props once the ChatApp chunk has loaded. A root
+  // that was unmounted (or replaced) while the chunk was in flight is skipped.
+  private renderApp(root: Root) {
+    loadChatApp()
+      .then(({ ChatApp }) => {
+        if (this.reactRoot !== root || !this.appProps) return
+        root.render(createElement(ChatApp, this.appProps))
+      })
+      .catch((err: unknown) => {
+        console.error("shinychat: failed to load the chat UI", err)
+      })
   }
 
   // Changing the mode re-routes the transcript in place rather than rebuilding
@@ -244,7 +267,7 @@ class ChatContainerElement extends HTMLElement {
   ) {
     if (name !== "tool-grouping" || !this.reactRoot || !this.appProps) return
     this.appProps = { ...this.appProps, toolGrouping: parseToolGrouping(next) }
-    this.reactRoot.render(createElement(ChatApp, this.appProps))
+    this.renderApp(this.reactRoot)
   }
 
   disconnectedCallback() {
@@ -69,6 +69,8 @@ export interface ChatMessageData {
   cancelled?: boolean
   /** Sibling navigation metadata (index within a set of edited variants, total variants). */
   siblings?: { index: number; total: number }
+  /** Server stream id of a concurrent stream this message is receiving. */
+  streamId?: string
 }
 
 export interface GreetingData {
@@ -104,6 +106,12 @@ export interface ChatHistoryState {
 export interface ChatState extends ChatInputState {
   messages: ChatMessageData[]
   streamingMessage: ChatMessageData | null
+  /**
+   * Messages receiving concurrent streams (chunks tagged with a `stream_id`),
+   * in start order. Each is finalized into `messages` on its own `chunk_end`,
+   * independently of `streamingMessage` and of each other.
+   */
+  concurrentStreams: ChatMessageData[]
   greeting: GreetingData | null
   cancelRequested: boolean
   /** Whether the stop/cancel button is available during streaming. */
@@ -123,6 +131,11 @@ export interface ChatState extends ChatInputState {
    * explicit user choice always wins over the `client=` auto-default.
    */
   enableUploadExplicit: boolean
+  /**
+   * Whether the server accepts attachment uploads over HTTP, so large files
+   * can be sent by reference instead of inline in the input value.
+   */
+  httpUpload: boolean
   /** How tool calls are aggregated in the condensed view. Client-reflected. */
   toolGrouping: ToolGrouping
   history: ChatHistoryState
@@ -147,6 +160,7 @@ export type AnyAction = ChatAction | UIAction
 export const initialState: ChatState = {
   messages: [],
   streamingMessage: null,
+  concurrentStreams: [],
   greeting: null,
   inputDisabled: false,
   inputPlaceholder: "Enter a message...",
@@ -155,6 +169,7 @@ export const initialState: ChatState = {
   enableCancelExplicit: false,
   enableUpload: false,
   enableUploadExplicit: false,
+  httpUpload: false,
   toolGrouping: "tool",
   slashCommands: [],
   history: { enabled: false, conversations: [], activeId: null },
@@ -520,7 +535,84 @@ function extractTopics(text: string, buffer: string): TopicResult {
   return { cleaned: combined, topic, buffer: newBuffer }
 }
 
+type StreamAction = Extract<
+  ChatAction,
+  { type: "chunk_start" | "chunk" | "chunk_end" }
+>
+
+function isConcurrentStreamAction(action: AnyAction): action is StreamAction {
+  return (
+    (action.type === "chunk_start" ||
+      action.type === "chunk" ||
+      action.type === "chunk_end") &&
+    !!action.stream_id
+  )
+}
+
+/**
+ * Apply a stream action tagged with a `stream_id` to its concurrent message.
+ *
+ * Chunk handling is exactly the single-stream path's: the concurrent message is
+ * swapped into `streamingMessage` for one reducer step and swapped back out,
+ * so the primary stream (if any) is never touched.
+ */
+function concurrentStreamReducer(
+  state: ChatState,
+  action: StreamAction,
+  streamId: string,
+): ChatState {
+  const idx = state.concurrentStreams.findIndex((m) => m.streamId === streamId)
+  const untagged = { ...action, stream_id: undefined } as StreamAction
+
+  if (action.type === "chunk_start") {
+    const started = chatReducer(
+      { ...state, streamingMessage: null },
+      untagged,
+    ).streamingMessage
+    if (!started) return state
+    const streams = [...state.concurrentStreams]
+    const msg = { ...started, streamId }
+    if (idx === -1) streams.push(msg)
+    else streams[idx] = msg
+    return {
+      ...state,
+      messages: removeLoadingMessage(state.messages),
+      concurrentStreams: streams,
+      inputDisabled: true,
+      greeting: dismissGreeting(state.greeting),
+    }
+  }
+
+  if (idx === -1) return state
+  const current = state.concurrentStreams[idx]!
+
+  if (action.type === "chunk") {
+    const updated = chatReducer(
+      { ...state, streamingMessage: current },
+      untagged,
+    ).streamingMessage
+    if (!updated || updated === current) return state
+    const streams = [...state.concurrentStreams]
+    streams[idx] = updated
+    return { ...state, concurrentStreams: streams }
+  }
+
+  // chunk_end
+  const { streamId: _streamId, ...rest } = current
+  const streams = state.concurrentStreams.filter((_, i) => i !== idx)
+  const idle = streams.length === 0 && !state.streamingMessage
+  return {
+    ...state,
+    messages: [...state.messages, finalizeMessage(rest, state.toolGrouping)],
+    concurrentStreams: streams,
+    inputDisabled: idle ? false : state.inputDisabled,
+  }
+}
+
 export function chatReducer(state: ChatState, action: AnyAction): ChatState {
+  if (isConcurrentStreamAction(action)) {
+    return concurrentStreamReducer(state, action, action.stream_id!)
+  }
   switch (action.type) {
     case "INPUT_SENT": {
       const userMsg: ChatMessageData = {
@@ -881,7 +973,8 @@ export function chatReducer(state: ChatState, action: AnyAction): ChatState {
         ...state,
         messages: [...state.messages, withCancel],
         streamingMessage: null,
-        inputDisabled: false,
+        // Concurrent streams still running keep the input disabled
+        inputDisabled: state.concurrentStreams.length > 0,
         cancelRequested: false,
       }
     }
@@ -896,8 +989,14 @@ export function chatReducer(state: ChatState, action: AnyAction): ChatState {
     }
 
     case "update_upload": {
-      if (state.enableUploadExplicit) return state
-      return { ...state, enableUpload: action.enable_upload }
+      let next = state
+      if (action.http_upload !== undefined) {
+        next = { ...next, httpUpload: action.http_upload }
+      }
+      if (action.enable_upload !== undefined && !state.enableUploadExplicit) {
+        next = { ...next, enableUpload: action.enable_upload }
+      }
+      return next
     }
 
     case "SET_TOOL_GROUPING": {
@@ -937,11 +1036,23 @@ export function chatReducer(state: ChatState, action: AnyAction): ChatState {
         slashCommands: state.slashCommands,
         enableUpload: state.enableUpload,
         enableUploadExplicit: state.enableUploadExplicit,
+        httpUpload: state.httpUpload,
         toolGrouping: state.toolGrouping,
         history: state.history,
       }
     }
 
+    case "truncate_after": {
+      // History re-renders only the part of a conversation that changed
+      // (e.g. after switching branches): keep the shared prefix, then the
+      // server appends the rest as regular messages
+      if (action.index >= state.messages.length) return state
+      return {
+        ...state,
+        messages: state.messages.slice(0, Math.max(0, action.index)),
+      }
+    }
+
     case "update_input":
       return {
         ...state,
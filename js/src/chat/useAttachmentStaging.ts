@@ -17,7 +17,14 @@ import {
 import { uuid } from "../utils/uuid"
 
 function toPayload(a: AttachedFile): AttachmentPayload {
-  return { mime: a.type, data_url: a.dataUrl, name: a.name, size: a.size }
+  return {
+    mime: a.type,
+    data_url: a.dataUrl,
+    name: a.name,
+    size: a.size,
+    ...(a.uploadId !== undefined ? { upload_id: a.uploadId } : {}),
+    ...(a.thumbnailUrl !== undefined ? { thumbnail_url: a.thumbnailUrl } : {}),
+  }
 }
 
 function toAttachedFiles(payloads: AttachmentPayload[]): AttachedFile[] {
@@ -28,6 +35,8 @@ function toAttachedFiles(payloads: AttachmentPayload[]): AttachedFile[] {
     dataUrl: a.data_url,
     name: a.name,
     size: a.size,
+    ...(a.upload_id !== undefined ? { uploadId: a.upload_id } : {}),
+    ...(a.thumbnail_url !== undefined ? { thumbnailUrl: a.thumbnail_url } : {}),
   }))
 }
 
@@ -0,0 +1,160 @@
+import {
+  useCallback,
+  useEffect,
+  useLayoutEffect,
+  useRef,
+  useState,
+} from "react"
+import type { ChatMessageData } from "./state"
+
+// Shorter transcripts render every message live.
+export const WINDOW_MIN_MESSAGES = 50
+
+// The newest messages always stay mounted: streaming, editing and sibling
+// navigation happen at the end of the transcript.
+export const WINDOW_LIVE_TAIL = 10
+
+// How far beyond the visible part of the scroll container a message stays
+// mounted, so scrolling restores messages before they come into view.
+const OVERSCAN_MARGIN = "200% 0px"
+
+// Content whose state would be lost by unmounting: bound Shiny inputs/outputs
+// and widgets, media and canvases, embedded documents, and editors.
+const UNFREEZABLE_SELECTOR = [
+  ".shiny-bound-input",
+  ".shiny-bound-output",
+  ".html-widget",
+  "iframe",
+  "canvas",
+  "video",
+  "audio",
+  "object",
+  "embed",
+  "[contenteditable]",
+].join(", ")
+
+export interface FrozenMessage {
+  // The message that was unmounted; a newer object brings it back
+  message: ChatMessageData
+  height: number
+  // Its text as rendered, kept so find-in-page can still match it
+  text: string
+}
+
+export interface WindowSlot {
+  id: string
+  message: ChatMessageData
+  freezable: boolean
+}
+
+export function isWindowingSupported(): boolean {
+  return typeof IntersectionObserver !== "undefined"
+}
+
+/**
+ * Windowed rendering for long transcripts.
+ *
+ * Each message's root element is observed against the scroll container. When
+ * a freezable message scrolls well out of view it is unmounted, releasing its
+ * components, tool cards and highlighted code. A placeholder of the same
+ * height keeps the page's layout. It holds only the message's text, so
+ * find-in-page still matches it. When the placeholder nears the viewport again
+ * (e.g. the browser scrolls to a match) the message is mounted again, so every
+ * control on screen is live.
+ *
+ * Pass the current `slots` on every render, and attach `slotRef` to each
+ * message's root element and each placeholder, with the message id in
+ * `data-message-id`.
+ */
+export function useMessageWindow(
+  enabled: boolean,
+  slots: readonly WindowSlot[],
+) {
+  const [frozen, setFrozen] = useState<ReadonlyMap<string, FrozenMessage>>(
+    () => new Map(),
+  )
+  // Read by the observer callback, which runs outside of render
+  const frozenRef = useRef(frozen)
+  const slotsRef = useRef(new Map<string, WindowSlot>())
+  const targetIds = useRef(new Map<Element, string>())
+  const observer = useRef<IntersectionObserver | null>(null)
+
+  // Before any observer callback can see the new slots
+  useLayoutEffect(() => {
+    frozenRef.current = frozen
+    slotsRef.current = new Map(slots.map((slot) => [slot.id, slot]))
+  })
+
+  const onIntersect = useCallback((entries: IntersectionObserverEntry[]) => {
+    let next: Map<string, FrozenMessage> | null = null
+    const current = () => (next ??= new Map(frozenRef.current))
+
+    for (const entry of entries) {
+      const id = targetIds.current.get(entry.target)
+      const info = id === undefined ? undefined : slotsRef.current.get(id)
+      if (id === undefined || !info) continue
+      const snapshot = (next ?? frozenRef.current).get(id)
+
+      if (entry.isIntersecting) {
+        if (snapshot) current().delete(id)
+        continue
+      }
+      if (snapshot?.message === info.message || !info.freezable) continue
+      if (entry.target.querySelector(UNFREEZABLE_SELECTOR)) continue
+      current().set(id, {
+        message: info.message,
+        height: entry.boundingClientRect.height,
+        text: entry.target.textContent ?? "",
+      })
+    }
+
+    // Drop messages no longer in the transcript
+    for (const id of (next ?? frozenRef.current).keys()) {
+      if (!slotsRef.current.has(id)) current().delete(id)
+    }
+
+    if (next) {
+      frozenRef.current = next
+      setFrozen(next)
+    }
+  }, [])
+
+  // One stable callback for every element, so re-rendering the list (every
+  // streamed chunk) doesn't detach and re-attach every message's ref.
+  const slotRef = useCallback(
+    (el: HTMLElement | null) => {
+      const id = el?.dataset.messageId
+      if (!el || id === undefined) return
+      observer.current ??= new IntersectionObserver(onIntersect, {
+        root: el.closest(".shiny-chat-messages"),
+        rootMargin: OVERSCAN_MARGIN,
+      })
+      const io = observer.current
+      targetIds.current.set(el, id)
+      io.observe(el)
+      return () => {
+        io.unobserve(el)
+        targetIds.current.delete(el)
+      }
+    },
+    [onIntersect],
+  )
+
+  useEffect(() => {
+    if (enabled) return
+    observer.current?.disconnect()
+    observer.current = null
+    targetIds.current.clear()
+    setFrozen((prev) => (prev.size === 0 ? prev : new Map()))
+  }, [enabled])
+
+  useEffect(
+    () => () => {
+      observer.current?.disconnect()
+      observer.current = null
+    },
+    [],
+  )
+
+  return { frozen, slotRef }
+}
@@ -1,5 +1,7 @@
 import React, {
+  useLayoutEffect,
   useMemo,
+  useRef,
   type ReactElement,
   type ReactNode,
   type ComponentType,
@@ -7,7 +9,11 @@ import React, {
 import { toHtml } from "hast-util-to-html"
 import type { Element } from "hast"
 import type { ContentType } from "../transport/types"
-import { parseMarkdown, parseHtml, hastToReact } from "./markdownToReact"
+import { parseHtml, hastToReact } from "./markdownToReact"
+import {
+  parseMarkdownIncremental,
+  type IncrementalParseCache,
+} from "./incrementalMarkdown"
 import { hideTrailingPartialAsideTag } from "./hideTrailingPartialTag"
 import {
   markdownProcessor,
@@ -71,15 +77,20 @@ export function MarkdownContent({
     streaming && !isText ? hideTrailingPartialAsideTag(content) : content
 
   // Stage 1 (expensive): parse markdown string → HAST. Cached by content+processor.
-  const hast = useMemo(
-    () =>
-      isText
-        ? null
-        : isHtml
-          ? parseHtml(parseSource, processor)
-          : parseMarkdown(parseSource, processor),
-    [parseSource, isText, isHtml, processor],
-  )
+  // Markdown keeps the HAST of finished blocks between renders so a streaming
+  // chunk only re-parses the unfinished tail. The parse is pure; its cache is
+  // only kept once the render commits, so a discarded render can't leave one
+  // behind.
+  const parseCache = useRef<IncrementalParseCache | null>(null)
+  const parsed = useMemo(() => {
+    if (isText) return null
+    if (isHtml) return { hast: parseHtml(parseSource, processor), cache: null }
+    return parseMarkdownIncremental(parseSource, processor, parseCache.current)
+  }, [parseSource, isText, isHtml, processor])
+  useLayoutEffect(() => {
+    parseCache.current = parsed?.cache ?? null
+  }, [parsed])
+  const hast = parsed?.hast ?? null
 
   // Stage 2 (cheap): convert HAST → React elements. Re-runs when streaming toggles.
   const elements = useMemo(
@@ -0,0 +1,170 @@
+import type { Root, RootContent } from "hast"
+import type { Processor } from "unified"
+
+import { parseMarkdown } from "./markdownToReact"
+
+/**
+ * Parse state carried between renders of one streaming message.
+ *
+ * `children` is the HAST for `source` (a prefix of the content that ends on a
+ * block boundary). It is never mutated, so the same nodes can be shared by
+ * every tree built on top of it.
+ */
+export interface IncrementalParseCache {
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  processor: Processor<any, any, any, any, any>
+  source: string
+  children: RootContent[]
+}
+
+// Raw HTML can span blank lines and feeds plugins that look at earlier
+// blocks (an aside attaches to the paragraph before it, citations to the
+// preceding web activity), so everything from the block before it on is
+// parsed in one piece. Link reference and footnote definitions apply to the
+// whole document, so content with one is always parsed in full.
+const RAW_HTML_RE = /<[A-Za-z/!?]/
+const DEFINITION_RE = /^ {0,3}\[[^\]\n]+\]:/m
+
+// A code span: a backtick run, then content, then a run of the same length
+const CODE_SPAN_RE = /(`+)(?:[^`]|(?!\1)`+)*?\1(?!`)/g
+
+// A line that can continue the block before a blank line: indented content
+// (list items, indented code), another list item, or a block quote.
+const CONTINUATION_RE = /^(?:[ \t]|[-*+>]|\d{1,9}[.)])/
+
+const FENCE_RE = /^ {0,3}(`{3,}|~{3,})/
+
+function closesFence(line: string, fence: string): boolean {
+  const close = line.match(FENCE_RE)
+  return (
+    close !== null &&
+    close[1]![0] === fence[0] &&
+    close[1]!.length >= fence.length &&
+    line.slice(close[0].length).trim() === ""
+  )
+}
+
+/**
+ * Offset of the first line at or after `from` (a block boundary) with raw
+ * HTML outside of code, or -1. `List<String>` in a code span or fenced block
+ * is not HTML; an unclosed code span (still streaming) is treated as if it
+ * were, which only costs a larger re-parse.
+ */
+export function findRawHtml(content: string, from = 0): number {
+  let fence: string | null = null
+  let pos = from
+
+  while (pos < content.length) {
+    const nl = content.indexOf("\n", pos)
+    const end = nl === -1 ? content.length : nl
+    const line = content.slice(pos, end)
+
+    if (fence) {
+      if (closesFence(line, fence)) fence = null
+    } else {
+      const open = line.match(FENCE_RE)
+      if (open) {
+        fence = open[1]!
+      } else if (RAW_HTML_RE.test(line.replace(CODE_SPAN_RE, ""))) {
+        return pos
+      }
+    }
+
+    if (nl === -1) break
+    pos = nl + 1
+  }
+
+  return -1
+}
+
+/**
+ * Offset of the last block boundary in `content` at or after `from` (which
+ * must itself be a boundary): the start of a line that follows a blank line,
+ * is outside any fenced code block, and cannot continue the preceding block.
+ * Everything before the boundary parses identically on its own.
+ */
+export function findBlockBoundary(content: string, from = 0): number {
+  let boundary = from
+  let fence: string | null = null
+  let prevBlank = false
+  let pos = from
+
+  while (pos < content.length) {
+    const nl = content.indexOf("\n", pos)
+    const end = nl === -1 ? content.length : nl
+    const line = content.slice(pos, end)
+
+    if (fence) {
+      if (closesFence(line, fence)) fence = null
+      prevBlank = false
+    } else if (line.trim() === "") {
+      prevBlank = true
+    } else {
+      if (prevBlank && !CONTINUATION_RE.test(line)) boundary = pos
+      const open = line.match(FENCE_RE)
+      if (open) fence = open[1]!
+      prevBlank = false
+    }
+
+    if (nl === -1) break
+    pos = nl + 1
+  }
+
+  return boundary
+}
+
+function joinBlocks(a: RootContent[], b: RootContent[]): RootContent[] {
+  if (a.length === 0) return b
+  if (b.length === 0) return a
+  // remark-rehype separates top-level blocks with a newline text node
+  return [...a, { type: "text", value: "\n" }, ...b]
+}
+
+/**
+ * Parse markdown that grows by appending, re-parsing only the live tail.
+ *
+ * Blocks before the last safe boundary are parsed once and reused from
+ * `cache`; only the text after it is parsed on each call, so a streaming
+ * message costs O(chunk + tail) per update instead of O(message). Blocks
+ * stop settling before the one that precedes raw HTML, but the blocks already
+ * settled are kept. Falls back to a full parse (and no cache) when the content
+ * has a definition or no longer extends the cached prefix.
+ */
+export function parseMarkdownIncremental(
+  content: string,
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  processor: Processor<any, any, any, any, any>,
+  cache: IncrementalParseCache | null,
+): { hast: Root; cache: IncrementalParseCache | null } {
+  let stable: IncrementalParseCache =
+    cache && cache.processor === processor && content.startsWith(cache.source)
+      ? cache
+      : { processor, source: "", children: [] }
+
+  // The cached prefix was already checked when it became stable
+  const start = stable.source.length
+  if (DEFINITION_RE.test(content.slice(start))) {
+    return { hast: parseMarkdown(content, processor), cache: null }
+  }
+
+  let boundary = findBlockBoundary(content, start)
+  const html = findRawHtml(content, start)
+  if (html !== -1) {
+    // Settle only the blocks before the one preceding the HTML's block
+    const htmlBlock = findBlockBoundary(content.slice(0, html + 1), start)
+    const before = findBlockBoundary(content.slice(0, htmlBlock), start)
+    boundary = Math.min(boundary, before)
+  }
+  if (boundary > start) {
+    const blocks = parseMarkdown(content.slice(start, boundary), processor)
+    stable = {
+      processor,
+      source: content.slice(0, boundary),
+      children: joinBlocks(stable.children, blocks.children),
+    }
+  }
+
+  const tail = parseMarkdown(content.slice(boundary), processor)
+  const children = joinBlocks(stable.children, tail.children)
+  return { hast: { type: "root", children }, cache: stable }
+}
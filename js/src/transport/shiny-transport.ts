@@ -1,4 +1,5 @@
 import {
+  CLIENT_FEATURES,
   isValidEnvelope,
   type ChatTransport,
   type ShinyLifecycle,
@@ -8,7 +9,7 @@ import {
 } from "./types"
 import type { HtmlDep } from "rstudio-shiny/srcts/types/src/shiny/render"
 import type { SnapshotMessage } from "../chat/state"
-import type { AttachmentPayload } from "../chat/attachments"
+import { dataUrlToBlob, type AttachmentPayload } from "../chat/attachments"
 
 // Window-global singleton to ensure only one shinyChatMessage handler is
 // registered even if the script is loaded more than once
@@ -134,6 +135,18 @@ export class ShinyTransport implements ChatTransport, ShinyLifecycle {
     })
   }
 
+  sendHistoryOpen(id: string): void {
+    if (!window.Shiny?.setInputValue) return
+    window.Shiny.setInputValue(`${id}_history_open`, Date.now(), {
+      priority: "event",
+    })
+  }
+
+  sendClientFeatures(id: string): void {
+    if (!window.Shiny?.setInputValue) return
+    window.Shiny.setInputValue(`${id}_client_features`, [...CLIENT_FEATURES])
+  }
+
   sendHistoryRename(id: string, convId: string, title: string): void {
     if (!window.Shiny?.setInputValue) return
     window.Shiny.setInputValue(
@@ -178,6 +191,52 @@ export class ShinyTransport implements ChatTransport, ShinyLifecycle {
     })
   }
 
+  async uploadAttachment(
+    payload: AttachmentPayload,
+  ): Promise<AttachmentPayload> {
+    const blob = dataUrlToBlob(payload.data_url, payload.mime)
+    const { jobId, uploadUrl } = await this.request<{
+      jobId: string
+      uploadUrl: string
+    }>("shinychat_upload_init", [
+      { name: payload.name, type: payload.mime, size: blob.size },
+    ])
+    // Shiny's session upload endpoint (the one file inputs use), which the
+    // server validates chunk by chunk as it spools to disk
+    const res = await fetch(uploadUrl, {
+      method: "POST",
+      headers: { "Content-Type": "application/octet-stream" },
+      body: blob,
+    })
+    if (!res.ok) throw new Error(`Attachment upload failed: ${res.status}`)
+    const uploaded = await this.request<{
+      id: string
+      url: string
+      size: number
+    }>("shinychat_upload_end", [jobId])
+    return {
+      mime: payload.mime,
+      data_url: uploaded.url,
+      name: payload.name,
+      size: uploaded.size,
+      upload_id: uploaded.id,
+    }
+  }
+
+  private request<T>(method: string, args: unknown[]): Promise<T> {
+    const app = window.Shiny?.shinyapp
+    if (!app) return Promise.reject(new Error("Shiny is not connected"))
+    return new Promise<T>((resolve, reject) => {
+      app.makeRequest(
+        method,
+        args,
+        (value: unknown) => resolve(value as T),
+        (error: string) => reject(new Error(error)),
+        undefined,
+      )
+    })
+  }
+
   onMessage(id: string, callback: (action: ChatAction) => void): () => void {
     if (!this.listeners.has(id)) {
       this.listeners.set(id, new Set())
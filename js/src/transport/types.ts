@@ -61,16 +61,25 @@ export type MessagePayload = {
 
 export type ChatAction =
   | { type: "message"; message: MessagePayload; html_deps?: HtmlDep[] }
-  | { type: "chunk_start"; message: MessagePayload; html_deps?: HtmlDep[] }
+  | {
+      type: "chunk_start"
+      message: MessagePayload
+      html_deps?: HtmlDep[]
+      /** Set only for concurrent streams, which render as separate messages. */
+      stream_id?: string
+    }
   | {
       type: "chunk"
       content: string
       operation: "append" | "replace"
       content_type?: ContentType
       html_deps?: HtmlDep[]
+      stream_id?: string
     }
-  | { type: "chunk_end" }
+  | { type: "chunk_end"; stream_id?: string }
   | { type: "clear"; greeting?: boolean }
+  /** Keep only the first `index` messages (history branch re-renders). */
+  | { type: "truncate_after"; index: number }
   | {
       type: "update_input"
       value?: string
@@ -82,7 +91,7 @@ export type ChatAction =
     }
   | { type: "remove_loading" }
   | { type: "update_cancel"; enable_cancel: boolean }
-  | { type: "update_upload"; enable_upload: boolean }
+  | { type: "update_upload"; enable_upload?: boolean; http_upload?: boolean }
   | {
       type: "greeting"
       content: string
@@ -153,6 +162,14 @@ export type UserInputValue = {
   attachments: AttachmentPayload[]
 }
 
+/**
+ * Wire features this bundle understands beyond the original protocol. The
+ * server only uses a feature once the client has reported it (see
+ * `sendClientFeatures`), so a stale cached bundle keeps working against a
+ * newer server.
+ */
+export const CLIENT_FEATURES = ["stream_id", "truncate_after"] as const
+
 /** Core transport: message passing between client and server. */
 export interface ChatTransport {
   /**
@@ -175,6 +192,10 @@ export interface ChatTransport {
   onMessage(id: string, callback: (action: ChatAction) => void): () => void
   sendHistorySelect(id: string, convId: string): void
   sendHistoryNew(id: string): void
+  /** Tell the server the history drawer opened (it may prefetch). */
+  sendHistoryOpen(id: string): void
+  /** Report `CLIENT_FEATURES` to the server. */
+  sendClientFeatures(id: string): void
   sendHistoryRename(id: string, convId: string, title: string): void
   sendHistoryDelete(id: string, convId: string): void
   sendMessageEdit(
@@ -188,6 +209,12 @@ export interface ChatTransport {
     index: number,
     direction: "prev" | "next",
   ): void
+  /**
+   * Upload an attachment over HTTP, resolving to its payload with the inline
+   * data URL replaced by a server reference (`upload_id`). Only available when
+   * the server advertises `http_upload`.
+   */
+  uploadAttachment?(payload: AttachmentPayload): Promise<AttachmentPayload>
 }
 
 /** Shiny-specific lifecycle: DOM binding, dependency rendering, error display. */
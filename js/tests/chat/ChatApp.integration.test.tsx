@@ -72,6 +72,22 @@ describe("ChatApp integration: full message flow", () => {
     )
   })
 
+  it("reports its wire features to the server on mount", () => {
+    const transport = createMockTransport()
+
+    render(
+      <ChatApp
+        transport={transport}
+        shinyLifecycle={createMockShinyLifecycle()}
+        elementId="test-chat"
+        inputId="test-input"
+        placeholder="Type..."
+      />,
+    )
+
+    expect(transport.sendClientFeatures).toHaveBeenCalledWith("test-chat")
+  })
+
   it("streaming chunks render assistant message", async () => {
     const transport = createMockTransport()
     const shinyLifecycle = createMockShinyLifecycle()
@@ -56,6 +56,8 @@ function createMockTransport(): ChatTransport {
     sendMessagesSnapshot: vi.fn(),
     sendHistorySelect: vi.fn(),
     sendHistoryNew: vi.fn(),
+    sendHistoryOpen: vi.fn(),
+    sendClientFeatures: vi.fn(),
     sendHistoryRename: vi.fn(),
     sendHistoryDelete: vi.fn(),
     sendMessageEdit: vi.fn(),
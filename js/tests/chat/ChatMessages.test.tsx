@@ -1,5 +1,6 @@
-import { describe, it, expect, vi } from "vitest"
-import { render, screen, fireEvent } from "@testing-library/react"
+import { describe, it, expect, vi, beforeEach, afterEach } from "vitest"
+import { act, render, screen, fireEvent } from "@testing-library/react"
+import { StrictMode } from "react"
 
 vi.mock("../../src/chat/TiptapInput", async () => {
   const { FakeTiptapInput } = await import("../helpers/fakeTiptapInput")
@@ -71,3 +72,153 @@ describe("ChatMessages single-edit-at-a-time", () => {
     expect(screen.queryByRole("textbox", { name: "Chat message" })).toBeNull()
   })
 })
+
+describe("ChatMessages windowing", () => {
+  // jsdom has no IntersectionObserver; this stand-in lets tests decide which
+  // messages are "on screen".
+  class FakeIntersectionObserver {
+    static instance: FakeIntersectionObserver | null = null
+    observed = new Set<Element>()
+    constructor(private callback: IntersectionObserverCallback) {
+      FakeIntersectionObserver.instance = this
+    }
+    observe(el: Element) {
+      this.observed.add(el)
+    }
+    unobserve(el: Element) {
+      this.observed.delete(el)
+    }
+    disconnect() {
+      this.observed.clear()
+    }
+    fire(el: Element, isIntersecting: boolean) {
+      act(() => {
+        this.callback(
+          [
+            {
+              target: el,
+              isIntersecting,
+              boundingClientRect: { height: 120 } as DOMRectReadOnly,
+            } as IntersectionObserverEntry,
+          ],
+          this as unknown as IntersectionObserver,
+        )
+      })
+    }
+  }
+
+  function transcript(n: number): ChatMessageData[] {
+    return Array.from({ length: n }, (_, i) =>
+      userMessage({
+        id: `m${i}`,
+        content: `message ${i}`,
+        blocks: [
+          {
+            type: "content",
+            content: `message ${i}`,
+            contentType: "markdown",
+          },
+        ],
+      }),
+    )
+  }
+
+  function rowFor(container: HTMLElement, id: string): HTMLElement {
+    return container.querySelector<HTMLElement>(`[data-message-id="${id}"]`)!
+  }
+
+  beforeEach(() => {
+    vi.stubGlobal("IntersectionObserver", FakeIntersectionObserver)
+  })
+
+  afterEach(() => {
+    vi.unstubAllGlobals()
+    FakeIntersectionObserver.instance = null
+  })
+
+  it("doesn't observe short transcripts", () => {
+    const { container } = render(
+      <ChatMessages messages={transcript(3)} inputId="test-input" />,
+    )
+    expect(FakeIntersectionObserver.instance).toBeNull()
+    // Messages stay direct children of the log
+    expect(rowFor(container, "m0").parentElement).toBe(container)
+  })
+
+  it("keeps messages mounted when the transcript crosses the threshold", () => {
+    const messages = transcript(60)
+    const { container, rerender } = render(
+      <ChatMessages messages={messages} inputId="test-input" />,
+    )
+    const before = rowFor(container, "m0")
+    rerender(
+      <ChatMessages messages={messages.slice(0, 5)} inputId="test-input" />,
+    )
+    expect(rowFor(container, "m0")).toBe(before)
+    rerender(<ChatMessages messages={messages} inputId="test-input" />)
+    expect(rowFor(container, "m0")).toBe(before)
+    expect(before.parentElement).toBe(container)
+  })
+
+  it("unmounts offscreen messages and mounts them again on return", () => {
+    const { container } = render(
+      <ChatMessages messages={transcript(60)} inputId="test-input" />,
+    )
+    const io = FakeIntersectionObserver.instance!
+    const live = rowFor(container, "m0")
+    expect(io.observed.has(live)).toBe(true)
+
+    io.fire(live, false)
+    const placeholder = rowFor(container, "m0")
+    expect(placeholder.hasAttribute("data-frozen")).toBe(true)
+    expect(placeholder.style.height).toBe("120px")
+    // Only the text is kept, for find-in-page; nothing interactive
+    expect(placeholder.textContent).toContain("message 0")
+    expect(placeholder.querySelector("button")).toBeNull()
+    expect(io.observed.has(live)).toBe(false)
+    expect(io.observed.has(placeholder)).toBe(true)
+
+    io.fire(placeholder, true)
+    const restored = rowFor(container, "m0")
+    expect(restored.hasAttribute("data-frozen")).toBe(false)
+    expect(restored.classList.contains("shiny-chat-user-message")).toBe(true)
+    expect(restored.textContent).toContain("message 0")
+  })
+
+  it("keeps the newest messages live", () => {
+    const { container } = render(
+      <ChatMessages messages={transcript(60)} inputId="test-input" />,
+    )
+    const io = FakeIntersectionObserver.instance!
+    io.fire(rowFor(container, "m59"), false)
+    expect(rowFor(container, "m59").hasAttribute("data-frozen")).toBe(false)
+  })
+
+  it("re-renders a frozen message live when it changes", () => {
+    const messages = transcript(60)
+    const { container, rerender } = render(
+      <ChatMessages messages={messages} inputId="test-input" />,
+    )
+    const io = FakeIntersectionObserver.instance!
+    io.fire(rowFor(container, "m1"), false)
+    expect(rowFor(container, "m1").hasAttribute("data-frozen")).toBe(true)
+
+    const updated = [...messages]
+    updated[1] = { ...messages[1]!, content: "edited", blocks: [] }
+    rerender(<ChatMessages messages={updated} inputId="test-input" />)
+    expect(rowFor(container, "m1").hasAttribute("data-frozen")).toBe(false)
+  })
+
+  it("works under StrictMode", () => {
+    const { container } = render(
+      <StrictMode>
+        <ChatMessages messages={transcript(60)} inputId="test-input" />
+      </StrictMode>,
+    )
+    const io = FakeIntersectionObserver.instance!
+    const live = rowFor(container, "m0")
+    expect(io.observed.has(live)).toBe(true)
+    io.fire(live, false)
+    expect(rowFor(container, "m0").hasAttribute("data-frozen")).toBe(true)
+  })
+})
@@ -21,6 +21,8 @@ import {
   pastedTextFile,
   decodeTextDataUrl,
   dataUrlToBlob,
+  HTTP_UPLOAD_MIN_BYTES,
+  shouldUploadAttachment,
 } from "../../src/chat/attachments"
 
 describe("attachmentFamily", () => {
@@ -123,6 +125,25 @@ describe("totalBytes", () => {
   })
 })
 
+describe("shouldUploadAttachment", () => {
+  const big = {
+    mime: "application/pdf",
+    data_url: "data:application/pdf;base64,AAAA",
+    name: "doc.pdf",
+    size: HTTP_UPLOAD_MIN_BYTES,
+  }
+
+  it("uploads large inline images and documents", () => {
+    expect(shouldUploadAttachment(big)).toBe(true)
+    expect(shouldUploadAttachment({ ...big, size: 10 })).toBe(false)
+  })
+
+  it("keeps text inline and skips files already uploaded", () => {
+    expect(shouldUploadAttachment({ ...big, mime: "text/plain" })).toBe(false)
+    expect(shouldUploadAttachment({ ...big, upload_id: "abc" })).toBe(false)
+  })
+})
+
 describe("text types", () => {
   it("registers text types as the text family without downscaling", () => {
     for (const mime of SUPPORTED_TEXT_TYPES) {
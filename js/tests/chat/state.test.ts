@@ -214,6 +214,19 @@ describe("chatReducer", () => {
       expect(next.enableUpload).toBe(true)
       expect(next.enableUploadExplicit).toBe(true)
     })
+
+    it("records http_upload even when enableUpload is explicit", () => {
+      const state = makeState({
+        enableUpload: false,
+        enableUploadExplicit: true,
+      })
+      const next = chatReducer(state, {
+        type: "update_upload",
+        http_upload: true,
+      })
+      expect(next.httpUpload).toBe(true)
+      expect(next.enableUpload).toBe(false)
+    })
   })
 
   describe("message", () => {
@@ -596,6 +609,82 @@ describe("chatReducer", () => {
     })
   })
 
+  describe("concurrent streams", () => {
+    const start = (streamId: string, content = "") =>
+      ({
+        type: "chunk_start",
+        stream_id: streamId,
+        message: {
+          role: "assistant",
+          segments: [{ content, content_type: "markdown" }],
+        },
+      }) as const
+
+    it("routes tagged chunks to their own message, leaving the main stream alone", () => {
+      const main = makeAssistantMsg({ streaming: true, content: "main" })
+      let state = makeState({ streamingMessage: main })
+      state = chatReducer(state, start("a"))
+      state = chatReducer(state, start("b"))
+      state = chatReducer(state, {
+        type: "chunk",
+        content: "from b",
+        operation: "append",
+        stream_id: "b",
+      })
+      state = chatReducer(state, {
+        type: "chunk",
+        content: "from a",
+        operation: "append",
+        stream_id: "a",
+      })
+      expect(state.streamingMessage).toBe(main)
+      expect(state.concurrentStreams.map((m) => [m.streamId, m.content])).toEqual(
+        [
+          ["a", "from a"],
+          ["b", "from b"],
+        ],
+      )
+    })
+
+    it("finalizes each stream on its own chunk_end", () => {
+      let state = makeState({ inputDisabled: true })
+      state = chatReducer(state, start("a", "A"))
+      state = chatReducer(state, start("b", "B"))
+      state = chatReducer(state, { type: "chunk_end", stream_id: "b" })
+      expect(state.messages.map((m) => m.content)).toEqual(["B"])
+      expect(state.messages[0]!.streaming).toBe(false)
+      expect(state.messages[0]!.streamId).toBeUndefined()
+      expect(state.concurrentStreams).toHaveLength(1)
+      expect(state.inputDisabled).toBe(true)
+
+      state = chatReducer(state, { type: "chunk_end", stream_id: "a" })
+      expect(state.messages.map((m) => m.content)).toEqual(["B", "A"])
+      expect(state.concurrentStreams).toEqual([])
+      expect(state.inputDisabled).toBe(false)
+    })
+
+    it("keeps input disabled when the main stream ends before a concurrent one", () => {
+      let state = makeState({
+        streamingMessage: makeAssistantMsg({ streaming: true }),
+      })
+      state = chatReducer(state, start("a"))
+      state = chatReducer(state, { type: "chunk_end" })
+      expect(state.streamingMessage).toBeNull()
+      expect(state.inputDisabled).toBe(true)
+    })
+
+    it("ignores chunks for an unknown stream", () => {
+      const state = makeState()
+      const next = chatReducer(state, {
+        type: "chunk",
+        content: "x",
+        operation: "append",
+        stream_id: "nope",
+      })
+      expect(next).toBe(state)
+    })
+  })
+
   describe("CANCEL_REQUESTED", () => {
     it("sets cancelRequested to true", () => {
       const state = makeState({ cancelRequested: false })
@@ -1639,6 +1728,22 @@ describe("chatReducer", () => {
     })
   })
 
+  describe("truncate_after", () => {
+    it("keeps only the first `index` messages", () => {
+      const msgs = ["m0", "m1", "m2"].map((id) => makeAssistantMsg({ id }))
+      const state = makeState({ messages: msgs })
+      const next = chatReducer(state, { type: "truncate_after", index: 1 })
+      expect(next.messages).toEqual([msgs[0]])
+      expect(next.messages[0]).toBe(msgs[0])
+    })
+
+    it("is a no-op when nothing is past `index`", () => {
+      const state = makeState({ messages: [makeAssistantMsg()] })
+      const next = chatReducer(state, { type: "truncate_after", index: 1 })
+      expect(next).toBe(state)
+    })
+  })
+
   describe("update_siblings", () => {
     it("sets siblings on the targeted message and leaves others untouched", () => {
       const msg0 = makeAssistantMsg({ id: "m0", role: "user", content: "q1" })
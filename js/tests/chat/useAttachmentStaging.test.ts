@@ -101,4 +101,32 @@ describe("useAttachmentStaging", () => {
     // legitimately stays -- only "set" (a full replace) should reset it.
     expect(result.current.downscaleNotice).toBe(true)
   })
+
+  it("round-trips upload references and thumbnails through the tray", () => {
+    const { result } = renderHook(() =>
+      useAttachmentStaging({
+        uploadAccept: ["image/png"],
+        maxUploadSize: null,
+        enableUpload: true,
+        focusEditor: vi.fn(),
+      }),
+    )
+    const payload = {
+      mime: "image/png",
+      data_url: "session/s/dynamic_route/shinychat_upload?nonce=1&id=abc",
+      name: "photo.png",
+      size: 500_000,
+      upload_id: "abc",
+      thumbnail_url: "data:image/webp;base64,T",
+    }
+
+    act(() => {
+      result.current.applyPayloads([payload], "set")
+    })
+
+    expect(result.current.attachments[0]!.thumbnailUrl).toBe(
+      payload.thumbnail_url,
+    )
+    expect(result.current.getPayloads()).toEqual([payload])
+  })
 })
@@ -19,6 +19,8 @@ export function createMockTransport(): ChatTransport & {
     sendMessagesSnapshot: vi.fn(),
     sendHistorySelect: vi.fn(),
     sendHistoryNew: vi.fn(),
+    sendHistoryOpen: vi.fn(),
+    sendClientFeatures: vi.fn(),
     sendHistoryRename: vi.fn(),
     sendHistoryDelete: vi.fn(),
     sendMessageEdit: vi.fn(),
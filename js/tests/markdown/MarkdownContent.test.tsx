@@ -252,6 +252,32 @@ describe("MarkdownContent (pure)", () => {
     spy.mockRestore()
   })
 
+  it("re-parses only the unfinished tail as streamed markdown grows", () => {
+    const { container, rerender } = render(
+      <MarkdownContent
+        content={"First block\n\nSecond"}
+        contentType="markdown"
+        streaming={true}
+      />,
+    )
+    const spy = vi.spyOn(markdownToReactModule, "parseMarkdown")
+
+    rerender(
+      <MarkdownContent
+        content={"First block\n\nSecond block\n\nThird"}
+        contentType="markdown"
+        streaming={true}
+      />,
+    )
+
+    // The committed render's cache covers the first block
+    const parsed = spy.mock.calls.map(([source]) => source)
+    expect(parsed.some((source) => source.includes("First block"))).toBe(false)
+    expect(container.querySelectorAll("p")).toHaveLength(3)
+
+    spy.mockRestore()
+  })
+
   it("does not call parseMarkdown for html content", () => {
     const spy = vi.spyOn(markdownToReactModule, "parseMarkdown")
 
@@ -0,0 +1,149 @@
+import { describe, it, expect, vi } from "vitest"
+import type { Root } from "hast"
+import { toHtml } from "hast-util-to-html"
+
+import * as markdownToReactModule from "../../src/markdown/markdownToReact"
+import { parseMarkdown } from "../../src/markdown/markdownToReact"
+import {
+  findBlockBoundary,
+  findRawHtml,
+  parseMarkdownIncremental,
+  type IncrementalParseCache,
+} from "../../src/markdown/incrementalMarkdown"
+import { markdownProcessor } from "../../src/markdown/processors"
+
+// Feed `content` in `size`-character chunks, as a stream would, and return the
+// final incremental tree.
+function streamIn(content: string, size = 7): Root {
+  let cache: IncrementalParseCache | null = null
+  let hast: Root = { type: "root", children: [] }
+  for (let i = size; i < content.length + size; i += size) {
+    const result = parseMarkdownIncremental(
+      content.slice(0, i),
+      markdownProcessor,
+      cache,
+    )
+    hast = result.hast
+    cache = result.cache
+  }
+  return hast
+}
+
+function fullParse(content: string): string {
+  return toHtml(parseMarkdown(content, markdownProcessor))
+}
+
+describe("findBlockBoundary", () => {
+  it("returns the start of the last block after a blank line", () => {
+    const md = "one\n\ntwo\n\nthree"
+    expect(findBlockBoundary(md)).toBe(md.indexOf("three"))
+  })
+
+  it("does not split inside a fenced code block", () => {
+    const md = "intro\n\n```py\na = 1\n\nb = 2\n"
+    expect(findBlockBoundary(md)).toBe(md.indexOf("```"))
+  })
+
+  it("splits after a closed fence", () => {
+    const md = "```\na\n\nb\n```\n\nafter"
+    expect(findBlockBoundary(md)).toBe(md.indexOf("after"))
+  })
+
+  it("does not split before lines that can continue a list or quote", () => {
+    for (const next of ["- b", "2. b", "  b", "> b"]) {
+      expect(findBlockBoundary(`- a\n\n${next}`)).toBe(0)
+    }
+  })
+
+  it("starts scanning at `from`", () => {
+    const md = "one\n\ntwo\n\nthree"
+    const from = md.indexOf("three")
+    expect(findBlockBoundary(md, from)).toBe(from)
+  })
+})
+
+describe("parseMarkdownIncremental", () => {
+  const samples = {
+    paragraphs: "# Title\n\nFirst paragraph.\n\nSecond *paragraph*.\n\nEnd",
+    lists: "- a\n- b\n\n- c\n\nAfter the list\n\n1. one\n2. two\n\nDone",
+    code: "Intro\n\n```js\nconst a = 1\n\nconst b = 2\n```\n\nOutro",
+    table: "Text\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\nMore text",
+    quote: "> quoted\n\n> still quoted\n\nNot quoted",
+  }
+
+  for (const [name, md] of Object.entries(samples)) {
+    it(`matches a full parse when streamed (${name})`, () => {
+      expect(toHtml(streamIn(md))).toBe(fullParse(md))
+    })
+  }
+
+  it("only re-parses the tail once blocks are finished", () => {
+    const head = "First paragraph.\n\nSecond paragraph.\n\n"
+    const { cache } = parseMarkdownIncremental(
+      head + "Tail",
+      markdownProcessor,
+      null,
+    )
+    expect(cache?.source).toBe(head)
+
+    const spy = vi.spyOn(markdownToReactModule, "parseMarkdown")
+    parseMarkdownIncremental(head + "Tail grows", markdownProcessor, cache)
+    expect(spy).toHaveBeenCalledTimes(1)
+    expect(spy.mock.calls[0]![0]).toBe("Tail grows")
+    spy.mockRestore()
+  })
+
+  it("reuses the cached block nodes", () => {
+    const head = "First paragraph.\n\n"
+    const a = parseMarkdownIncremental(head + "x", markdownProcessor, null)
+    const b = parseMarkdownIncremental(
+      head + "xy",
+      markdownProcessor,
+      a.cache,
+    )
+    expect(b.hast.children[0]).toBe(a.hast.children[0])
+  })
+
+  it("starts over when the content no longer extends the cache", () => {
+    const a = parseMarkdownIncremental("One\n\nTwo", markdownProcessor, null)
+    const b = parseMarkdownIncremental(
+      "Other\n\nTwo",
+      markdownProcessor,
+      a.cache,
+    )
+    expect(toHtml(b.hast)).toBe(fullParse("Other\n\nTwo"))
+  })
+
+  it("parses definitions in one piece", () => {
+    const md = "See [x].\n\nMore\n\n[x]: https://example.com"
+    const result = parseMarkdownIncremental(md, markdownProcessor, null)
+    expect(result.cache).toBeNull()
+    expect(toHtml(result.hast)).toBe(fullParse(md))
+  })
+
+  it("keeps settled blocks before raw HTML and the block it follows", () => {
+    const head = "Intro.\n\n"
+    const md = `${head}Claim.\n\n<shiny-aside>source</shiny-aside>\n\nNext`
+    const result = parseMarkdownIncremental(md, markdownProcessor, null)
+    expect(result.cache?.source).toBe(head)
+    expect(toHtml(result.hast)).toBe(fullParse(md))
+    expect(toHtml(streamIn(md))).toBe(fullParse(md))
+  })
+
+  it("does not treat `<` in code as raw HTML", () => {
+    const head = "Use `List<String>`.\n\n```java\nList<String> xs;\n```\n\n"
+    const md = `${head}Done`
+    const result = parseMarkdownIncremental(md, markdownProcessor, null)
+    expect(result.cache?.source).toBe(head)
+    expect(toHtml(streamIn(md))).toBe(fullParse(md))
+  })
+})
+
+describe("findRawHtml", () => {
+  it("finds the line with raw HTML outside of code", () => {
+    const md = "a `<b>` c\n\n```\n<b>\n```\n\nd <i>e</i>"
+    expect(findRawHtml(md)).toBe(md.indexOf("d <i>"))
+    expect(findRawHtml("List<String> outside code")).toBe(0)
+    expect(findRawHtml("no `<html>` here")).toBe(-1)
+  })
+})
@@ -0,0 +1,542 @@
+"""
+Micro-benchmarks for shinychat hot paths.
+
+Runs fully offline: chats stream into a stub Shiny session and stores write
+to a temporary directory.
+
+    python pkg-py/benchmarks/bench.py run [-k FILTER] [-o results.json]
+    python pkg-py/benchmarks/bench.py compare BASELINE.json CURRENT.json
+
+`compare` exits non-zero when any benchmark's median slowed down by more
+than `--threshold` (default 10%), so it can gate CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Union, cast
+
+from shiny import Session
+from shiny.session import session_context
+from shinychat import Chat
+from shinychat._chat_normalize import normalize_message_chunk
+from shinychat._chat_types import ChatMessage
+from shinychat._history import extend_record_linear
+from shinychat._history_store import (
+    ConversationPartition,
+    ConversationStore,
+    FileConversationStore,
+    InMemoryConversationStore,
+)
+from shinychat._history_types import (
+    ConversationRecord,
+    new_conversation_id,
+    new_conversation_record,
+)
+from shinychat._input_handler import messages_input_value
+
+# Stream into the same stub session the tests use
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+from _session_test_helpers import MockSession  # noqa: E402
+
+Op = Callable[[], Union[Awaitable[Any], Any]]
+
+# Workload sizes. Large enough to expose super-linear behavior, small enough
+# that a full run stays under a minute.
+N_CHUNKS = 500
+N_MESSAGES = 200
+N_NODES = 200
+N_CONVERSATIONS = 200
+N_SAVES = 100
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Op]
+
+
+BENCHMARKS: list[Benchmark] = []
+
+# Temp dirs and other resources that must outlive setup() but not the run
+_resources = contextlib.ExitStack()
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Op]], Callable[[], Op]]:
+    def decorator(setup: Callable[[], Op]) -> Callable[[], Op]:
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+
+    return decorator
+
+
+# -- fixtures ---------------------------------------------------------------
+
+PARTITION = ConversationPartition(chat_id="chat", scope="bench")
+
+
+def _new_chat() -> Chat:
+    session = MockSession()
+    with session_context(cast(Session, session)):
+        return Chat(id="chat")
+
+
+def _ui_message(role: str, text: str) -> dict[str, Any]:
+    return {
+        "role": role,
+        "segments": [{"content": text, "content_type": "markdown"}],
+    }
+
+
+def _turn_groups(n: int) -> list[list[dict[str, Any]]]:
+    roles = ("user", "assistant")
+    return [
+        [{"role": roles[i % 2], "content": f"turn {i} " + "lorem " * 20}]
+        for i in range(n)
+    ]
+
+
+def _ui_messages(n: int) -> list[dict[str, Any]]:
+    roles = ("user", "assistant")
+    return [
+        _ui_message(roles[i % 2], f"message {i} " + "lorem " * 20)
+        for i in range(n)
+    ]
+
+
+def _linear_record(n_nodes: int) -> ConversationRecord:
+    record = new_conversation_record(title="bench")
+    extend_record_linear(
+        record, _turn_groups(n_nodes), _ui_messages(n_nodes), ui_offset=0
+    )
+    return record
+
+
+def _branchy_record(n_nodes: int) -> ConversationRecord:
+    # A linear spine where every other node has an extra (edited) sibling
+    record = _linear_record(n_nodes)
+    path = record.path_node_ids()
+    leaf = record.current_leaf
+    for nid in path[1::2]:
+        record.set_current_leaf(record.nodes[nid].parent)
+        record.append_linear([{"role": "user", "content": "edit"}])
+    record.set_current_leaf(leaf)
+    return record
+
+
+def _tmp_dir() -> Path:
+    return Path(_resources.enter_context(tempfile.TemporaryDirectory()))
+
+
+def _run(coro: Awaitable[Any]) -> Any:
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+# -- streaming --------------------------------------------------------------
+
+
+@benchmark(f"stream.append_message_stream[{N_CHUNKS} chunks]")
+def _() -> Op:
+    chat = _new_chat()
+
+    async def tokens():
+        for i in range(N_CHUNKS):
+            yield f"tok{i} "
+
+    async def op() -> None:
+        await chat._append_message_stream(tokens())
+
+    return op
+
+
+@benchmark(f"stream.message_stream_context[{N_CHUNKS} chunks]")
+def _() -> Op:
+    chat = _new_chat()
+
+    async def op() -> None:
+        async with chat.message_stream_context() as stream:
+            for i in range(N_CHUNKS):
+                await stream.append(f"tok{i} ")
+
+    return op
+
+
+# -- import time ------------------------------------------------------------
+
+
+def _import_in_subprocess(code: str) -> Op:
+    # A fresh interpreter per call; includes interpreter startup, which is
+    # constant across runs and so cancels out in comparisons
+    def op() -> None:
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    return op
+
+
+@benchmark("import.shinychat")
+def _() -> Op:
+    return _import_in_subprocess("import shinychat")
+
+
+@benchmark("import.shinychat+provider_handlers")
+def _() -> Op:
+    # What `import shinychat` cost when every installed provider SDK was
+    # imported up front to register its normalizers
+    return _import_in_subprocess(
+        "import shinychat\n"
+        "from shinychat._chat_normalize import register_provider_handlers\n"
+        "register_provider_handlers()"
+    )
+
+
+# -- normalization ----------------------------------------------------------
+
+
+@benchmark("normalize.str")
+def _() -> Op:
+    return lambda: normalize_message_chunk("Hello ")
+
+
+@benchmark("normalize.dict")
+def _() -> Op:
+    chunk = {"content": "Hello ", "role": "assistant"}
+    return lambda: normalize_message_chunk(chunk)
+
+
+@benchmark("normalize.ChatMessage")
+def _() -> Op:
+    chunk = ChatMessage(content="Hello ", role="assistant")
+    return lambda: normalize_message_chunk(chunk)
+
+
+@benchmark("normalize.langchain")
+def _() -> Op:
+    try:
+        from langchain_core.messages import AIMessageChunk
+    except ImportError:
+        raise SkipBenchmark("langchain_core not installed")
+    chunk = AIMessageChunk(content="Hello ")
+    return lambda: normalize_message_chunk(chunk)
+
+
+@benchmark("normalize.openai")
+def _() -> Op:
+    try:
+        import openai.types.chat.chat_completion_chunk as ccc
+        from openai.types.chat import ChatCompletionChunk
+    except ImportError:
+        raise SkipBenchmark("openai not installed")
+    chunk = ChatCompletionChunk(
+        id="bench",
+        object="chat.completion.chunk",
+        model="gpt-4o",
+        created=0,
+        choices=[
+            ccc.Choice(
+                index=0,
+                delta=ccc.ChoiceDelta(content="Hello ", role="assistant"),
+            )
+        ],
+    )
+    return lambda: normalize_message_chunk(chunk)
+
+
+# -- input parsing ----------------------------------------------------------
+
+
+@benchmark(f"input.messages_input_value[{N_MESSAGES} messages]")
+def _() -> Op:
+    # Shiny decodes JSON arrays as tuples
+    snapshot = tuple(
+        {
+            "role": m["role"],
+            "segments": tuple(m["segments"]),
+            "htmlDeps": None,
+        }
+        for m in _ui_messages(N_MESSAGES)
+    )
+    return lambda: messages_input_value(snapshot)
+
+
+# -- stores -----------------------------------------------------------------
+
+
+def _store_benchmarks(kind: str, make_store: Callable[[], ConversationStore]):
+    @benchmark(f"store.{kind}.put_new[{N_NODES} nodes]")
+    def _() -> Op:
+        store = make_store()
+        record = _linear_record(N_NODES)
+
+        async def op() -> None:
+            conv_id = new_conversation_id()
+            await store.put(
+                PARTITION, record.model_copy(update={"id": conv_id})
+            )
+
+        return op
+
+    @benchmark(f"store.{kind}.put_update[{N_NODES} nodes]")
+    def _() -> Op:
+        store = make_store()
+        record = _linear_record(N_NODES)
+        _run(store.put(PARTITION, record))
+
+        async def op() -> None:
+            record.response_count += 1
+            await store.put(PARTITION, record)
+
+        return op
+
+    @benchmark(f"store.{kind}.get[{N_NODES} nodes]")
+    def _() -> Op:
+        store = make_store()
+        record = _linear_record(N_NODES)
+        _run(store.put(PARTITION, record))
+
+        async def op() -> None:
+            await store.get(PARTITION, record.id)
+
+        return op
+
+    @benchmark(f"store.{kind}.list_cold[{N_CONVERSATIONS} conversations]")
+    def _() -> Op:
+        store = make_store()
+        for _ in range(N_CONVERSATIONS):
+            _run(store.put(PARTITION, _linear_record(10)))
+
+        async def op() -> None:
+            # Drop the metadata cache so every call re-scans the partition
+            getattr(store, "_meta_cache").clear()
+            await store.list(PARTITION)
+
+        return op
+
+    @benchmark(f"store.{kind}.list_warm[{N_CONVERSATIONS} conversations]")
+    def _() -> Op:
+        store = make_store()
+        for _ in range(N_CONVERSATIONS):
+            _run(store.put(PARTITION, _linear_record(10)))
+        _run(store.list(PARTITION))
+
+        async def op() -> None:
+            await store.list(PARTITION)
+
+        return op
+
+
+_store_benchmarks("file", lambda: FileConversationStore(_tmp_dir()))
+_store_benchmarks("memory", InMemoryConversationStore)
+
+
+# -- record tree operations -------------------------------------------------
+
+
+@benchmark(f"record.path_node_ids[{N_NODES} nodes]")
+def _() -> Op:
+    record = _branchy_record(N_NODES)
+    return record.path_node_ids
+
+
+@benchmark(f"record.path_sibling_metadata[{N_NODES} nodes]")
+def _() -> Op:
+    record = _branchy_record(N_NODES)
+    return record.path_sibling_metadata
+
+
+@benchmark(f"record.node_id_for_message_index[{N_NODES} nodes]")
+def _() -> Op:
+    record = _branchy_record(N_NODES)
+    last = N_NODES - 1
+    return lambda: record.node_id_for_message_index(last)
+
+
+@benchmark(f"record.set_current_leaf[{N_NODES} nodes]")
+def _() -> Op:
+    record = _branchy_record(N_NODES)
+    leaf = record.current_leaf
+    return lambda: record.set_current_leaf(leaf)
+
+
+# -- history saves ----------------------------------------------------------
+
+
+@benchmark(f"history.extend_record_linear[{N_SAVES} saves]")
+def _() -> Op:
+    # One conversation saved after every response, as HistoryController does
+    groups = _turn_groups(2 * N_SAVES)
+    messages = _ui_messages(2 * N_SAVES)
+
+    def op() -> None:
+        record = new_conversation_record(title="bench")
+        for i in range(1, N_SAVES + 1):
+            extend_record_linear(
+                record,
+                groups[: 2 * i],
+                messages[: 2 * i],
+                ui_offset=2 * (i - 1),
+            )
+
+    return op
+
+
+# -- runner -----------------------------------------------------------------
+
+
+def _time_op(op: Op, number: int) -> float:
+    start = time.perf_counter()
+    if inspect.iscoroutinefunction(op):
+
+        async def _loop() -> None:
+            for _ in range(number):
+                await op()
+
+        _run(_loop())
+    else:
+        for _ in range(number):
+            op()
+    return time.perf_counter() - start
+
+
+def measure(op: Op, *, rounds: int, min_time: float) -> dict[str, Any]:
+    # Calibrate: enough calls per round that a round takes ~min_time
+    once = _time_op(op, 1)
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+    per_op = [_time_op(op, number) / number for _ in range(rounds)]
+    median = statistics.median(per_op)
+    return {
+        "min": min(per_op),
+        "median": median,
+        "mean": statistics.fmean(per_op),
+        "stdev": statistics.stdev(per_op) if rounds > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+        "ops_per_sec": 1 / median if median > 0 else None,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    import shinychat
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    results: dict[str, Any] = {}
+    skipped: dict[str, str] = {}
+    with _resources:
+        for bench in BENCHMARKS:
+            if args.filter and args.filter not in bench.name:
+                continue
+            try:
+                op = bench.setup()
+            except SkipBenchmark as e:
+                skipped[bench.name] = str(e)
+                print(f"{bench.name:<60} skipped ({e})")
+                continue
+            stats = measure(op, rounds=args.rounds, min_time=args.min_time)
+            results[bench.name] = stats
+            print(f"{bench.name:<60} {_fmt_time(stats['median']):>12}")
+
+    payload = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "shinychat": getattr(shinychat, "__version__", None),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())["results"]
+    current = json.loads(Path(args.current).read_text())["results"]
+
+    regressions = 0
+    print(f"{'benchmark':<60} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(baseline.keys() | current.keys()):
+        if name not in baseline or name not in current:
+            where = "baseline" if name not in current else "current"
+            print(f"{name:<60} only in {where}")
+            continue
+        before = baseline[name]["median"]
+        after = current[name]["median"]
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  improved"
+        print(
+            f"{name:<60} {_fmt_time(before):>12} {_fmt_time(after):>12} "
+            f"{change:>+8.1%}{flag}"
+        )
+    if regressions:
+        print(
+            f"\n{regressions} benchmark(s) regressed by more than "
+            f"{args.threshold:.0%}"
+        )
+        return 1
+    return 0
+
+
+def _fmt_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run benchmarks")
+    p_run.add_argument("-k", "--filter", help="Only run names containing this")
+    p_run.add_argument("-o", "--output", help="Write JSON results here")
+    p_run.add_argument("--rounds", type=int, default=5)
+    p_run.add_argument(
+        "--min-time",
+        type=float,
+        default=0.05,
+        help="Target seconds per round (sets calls per round)",
+    )
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Compare two JSON result files")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown that counts as a regression (default 0.10)",
+    )
+    p_cmp.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
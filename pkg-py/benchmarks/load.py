@@ -0,0 +1,216 @@
+"""
+Multi-session load generator for shinychat streaming.
+
+Creates N `Chat` objects, each on its own stub Shiny session that captures
+`send_custom_message` instead of writing to a websocket, and streams
+synthetic token responses into all of them concurrently on one event loop.
+Reports delivery throughput, event-loop lag percentiles and memory retained
+per session.
+
+    python pkg-py/benchmarks/load.py --sessions 200 --rate 50 --tokens 300
+
+`--rate` is tokens per second per session (0 streams as fast as possible).
+Memory is measured with tracemalloc during a separate warm-up phase so the
+tracing overhead doesn't distort the timed run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, cast
+
+from shiny import Session
+from shiny.session import session_context
+from shinychat import Chat
+
+# Stream into the same stub session the tests use
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+from _session_test_helpers import MockSession  # noqa: E402
+
+
+def _new_chat(i: int) -> tuple[Chat, MockSession]:
+    session = MockSession(f"session-{i}", measure_bytes=True)
+    with session_context(cast(Session, session)):
+        return Chat(id="chat"), session
+
+
+async def _tokens(n: int, rate: float, token: str) -> AsyncIterator[str]:
+    delay = 1 / rate if rate > 0 else 0
+    for _ in range(n):
+        yield token
+        # sleep(0) still yields, so sessions interleave even at full speed
+        await asyncio.sleep(delay)
+
+
+async def _drive(chat: Chat, args: argparse.Namespace) -> None:
+    token = "x" * args.token_size
+    # Stagger starts so sessions don't tick in lockstep
+    if args.rate > 0:
+        await asyncio.sleep(random.uniform(0, 1 / args.rate))
+    for _ in range(args.responses):
+        await chat._append_message_stream(
+            _tokens(args.tokens, args.rate, token)
+        )
+
+
+async def _monitor_lag(
+    interval: float, samples: list[float], stop: asyncio.Event
+) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p90": value, "p99": value, "max": value}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": q[49], "p90": q[89], "p99": q[98], "max": max(samples)}
+
+
+async def _measure_memory(
+    args: argparse.Namespace,
+) -> tuple[list[tuple[Chat, MockSession]], float]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        chats = [_new_chat(i) for i in range(args.sessions)]
+        # One short response each, so per-session state is populated
+        await asyncio.gather(
+            *(
+                chat._append_message_stream(_tokens(10, 0, "warm"))
+                for chat, _ in chats
+            )
+        )
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return chats, (after - before) / args.sessions
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    chats, mem_per_session = await _measure_memory(args)
+    for _, session in chats:
+        session.n_messages = session.n_bytes = 0
+
+    lag: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_lag(args.lag_interval, lag, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(_drive(chat, args) for chat, _ in chats))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    n_messages = sum(s.n_messages for _, s in chats)
+    n_bytes = sum(s.n_bytes for _, s in chats)
+    n_tokens = args.sessions * args.responses * args.tokens
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "sessions": args.sessions,
+            "rate": args.rate,
+            "tokens": args.tokens,
+            "responses": args.responses,
+            "token_size": args.token_size,
+        },
+        "elapsed": elapsed,
+        "throughput": {
+            "tokens_per_sec": n_tokens / elapsed,
+            "messages_per_sec": n_messages / elapsed,
+            "bytes_per_sec": n_bytes / elapsed,
+            # Offered load, for comparison: below this the worker is saturated
+            "target_tokens_per_sec": (
+                args.sessions * args.rate if args.rate > 0 else None
+            ),
+        },
+        "loop_lag": _percentiles(lag),
+        "memory_per_session_bytes": mem_per_session,
+    }
+
+
+def _report(result: dict[str, Any]) -> None:
+    cfg = result["config"]
+    tp = result["throughput"]
+    lag = result["loop_lag"]
+    rate = f"{cfg['rate']:g} tok/s" if cfg["rate"] > 0 else "unthrottled"
+    print(
+        f"{cfg['sessions']} sessions x {cfg['responses']} responses x "
+        f"{cfg['tokens']} tokens ({rate}) in {result['elapsed']:.2f} s"
+    )
+    target = tp["target_tokens_per_sec"]
+    print(
+        f"  throughput   {tp['tokens_per_sec']:,.0f} tok/s"
+        + (f" (offered {target:,.0f})" if target else "")
+        + f", {tp['messages_per_sec']:,.0f} msg/s"
+        + f", {tp['bytes_per_sec'] / 1e6:,.2f} MB/s"
+    )
+    print(
+        "  loop lag     "
+        + ", ".join(f"{k} {v * 1e3:.2f} ms" for k, v in lag.items())
+    )
+    print(
+        f"  memory       {result['memory_per_session_bytes'] / 1024:,.1f} "
+        "KiB per session"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--sessions", type=int, default=100)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=50,
+        help="Tokens per second per session; 0 for unthrottled",
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=200, help="Tokens per response"
+    )
+    parser.add_argument(
+        "--responses", type=int, default=1, help="Responses per session"
+    )
+    parser.add_argument(
+        "--token-size", type=int, default=4, help="Characters per token"
+    )
+    parser.add_argument(
+        "--lag-interval",
+        type=float,
+        default=0.01,
+        help="Event-loop lag sampling interval in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write JSON results here")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    result = asyncio.run(run(args))
+    _report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,9 @@
 from ._attachments import Attachment, attachment_to_content
 from ._chat import Chat, UserInput, chat_greeting, chat_ui
 from ._chat_normalize import message_content, message_content_chunk
+from ._history_export import export_partition, import_partition
 from ._markdown_stream import MarkdownStream, output_markdown_stream
+from ._metrics import set_metrics_sink
 
 __all__ = [
     "Attachment",
@@ -10,10 +12,13 @@ __all__ = [
     "UserInput",
     "chat_greeting",
     "chat_ui",
+    "export_partition",
+    "import_partition",
     "MarkdownStream",
     "output_markdown_stream",
     "message_content",
     "message_content_chunk",
+    "set_metrics_sink",
 ]
 
 # Must come after the public symbols above. _input_handler imports shiny, whose
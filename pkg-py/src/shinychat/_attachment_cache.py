@@ -0,0 +1,178 @@
+"""Worker-wide caches for attachment payloads.
+
+Converting an attachment for the model (:func:`~shinychat.attachment_to_content`)
+base64-decodes its payload and builds a chatlas content object each time, and
+the same attachments come back again and again: every retry, edit and resubmit
+of a turn re-sends them, and several sessions often share one file. Converted
+content -- which embeds the decoded payload -- is therefore cached by a hash of
+the attachment's data URL (or, for uploaded files, their path, size and
+modification time), in an LRU bounded by total payload bytes and shared by all
+sessions in the worker.
+
+``SHINYCHAT_ATTACHMENT_CACHE_SIZE`` sets the memory budget in bytes; ``0``
+disables the cache.
+
+This is a private module: module-level functions are intentionally not
+underscore-prefixed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Generic, Hashable, Optional, TypeVar
+
+from . import _metrics
+from ._attachments import Attachment
+
+if TYPE_CHECKING:
+    from chatlas.types import Content
+
+#: Default memory budget (bytes) for converted attachment content.
+DEFAULT_CONTENT_CACHE_SIZE = 64 * 1024 * 1024
+
+CONTENT_CACHE_SIZE_ENV_VAR = "SHINYCHAT_ATTACHMENT_CACHE_SIZE"
+
+T = TypeVar("T")
+
+
+class ByteLRU(Generic[T]):
+    """LRU mapping bounded by the total size of its values.
+
+    ``sizeof`` gives each value's size in bytes. A value larger than the whole
+    budget is never stored. Safe to share across threads.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[T], int]) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, tuple[T, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> tuple[bool, Optional[T]]:
+        """Return ``(hit, value)``, marking a hit as most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[0]
+
+    def put(self, key: Hashable, value: T) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def pop(self, key: Hashable) -> tuple[bool, Optional[T]]:
+        """Remove and return ``(hit, value)``."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False, None
+            self.nbytes -= entry[1]
+            return True, entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def resolve_content_cache_size() -> int:
+    """Resolve the content cache's memory budget (bytes) from the environment."""
+    env = os.environ.get(CONTENT_CACHE_SIZE_ENV_VAR)
+    if env is None or not env.strip():
+        return DEFAULT_CONTENT_CACHE_SIZE
+    try:
+        val = int(env)
+    except ValueError:
+        raise ValueError(
+            f"{CONTENT_CACHE_SIZE_ENV_VAR}={env!r} is not a valid integer."
+        ) from None
+    if val < 0:
+        raise ValueError(
+            f"{CONTENT_CACHE_SIZE_ENV_VAR} must be non-negative, got {val}."
+        )
+    return val
+
+
+def content_nbytes(content: "Content") -> int:
+    """Approximate memory held by a converted attachment's payload."""
+    size = 0
+    for field in ("data", "text", "url"):
+        value = getattr(content, field, None)
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+    return size
+
+
+def content_cache_key(att: Attachment) -> Optional[tuple[Hashable, ...]]:
+    """Identify ``att``'s converted content, or ``None`` if it isn't cached.
+
+    Remote image URLs aren't worth caching (nothing is decoded), and a missing
+    upload file is left for the conversion to report.
+    """
+    if att.path is not None:
+        try:
+            st = os.stat(att.path)
+        except OSError:
+            return None
+        source: Hashable = ("file", att.path, st.st_size, st.st_mtime_ns)
+    elif att.data_url.startswith("data:"):
+        digest = hashlib.blake2b(att.data_url.encode(), digest_size=16)
+        source = ("data", digest.digest())
+    else:
+        return None
+    key: tuple[Hashable, ...] = (source, att.mime, att.name)
+    if att.mime.startswith("image/"):
+        # The model payload depends on the image pipeline's settings
+        from ._attachment_images import resolve_image_settings
+
+        key += (resolve_image_settings()[:2],)
+    return key
+
+
+_CONTENT_CACHE: Optional[ByteLRU[Content]] = None
+
+
+def content_cache() -> ByteLRU[Content]:
+    """The worker's content cache, (re)created when its budget changes."""
+    global _CONTENT_CACHE  # noqa: PLW0603
+    max_bytes = resolve_content_cache_size()
+    cache = _CONTENT_CACHE
+    if cache is None or cache.max_bytes != max_bytes:
+        cache = _CONTENT_CACHE = ByteLRU(max_bytes, content_nbytes)
+    return cache
+
+
+def cached_content(
+    att: Attachment, convert: Callable[[Attachment], Content]
+) -> Content:
+    """Return ``convert(att)``, reusing an earlier conversion of the same
+    payload when one is cached."""
+    cache = content_cache()
+    key = content_cache_key(att) if cache.max_bytes > 0 else None
+    if key is None:
+        return convert(att)
+    hit, content = cache.get(key)
+    _metrics.counter("shinychat.attachments.content_cache", 1, {"hit": hit})
+    if content is None:
+        content = convert(att)
+        cache.put(key, content)
+    # Callers own the returned object; the (immutable) payload is shared
+    return content.model_copy()
@@ -0,0 +1,223 @@
+"""Image pipeline for chat attachments: model-sized payloads and UI thumbnails.
+
+The browser already downscales images before sending them (see ``processFile``
+in ``js/src/chat/attachments.ts``) and renders its own canvas thumbnail, but
+attachments built on the server (``Attachment.from_path()``, restored history,
+or clients that skip the pre-resize) can still carry full-resolution photos.
+Before an image goes to the model it is downscaled to ``max_edge`` pixels and
+re-encoded at ``quality``. An image without a thumbnail gets one when it
+enters the chat (it is submitted, or appended by the server), rather than on
+every send. Both results are cached by content hash.
+
+Decoding, hashing and resizing a full-resolution photo takes long enough to
+stall every session in the worker, so async code runs them on a worker
+thread (see :func:`with_thumbnails`).
+
+Pillow is optional. Without it images pass through unchanged and no
+server-side thumbnails are made.
+
+This is a private module: module-level functions are intentionally not
+underscore-prefixed.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import importlib.util
+import io
+import os
+from typing import NamedTuple, Optional
+
+from ._attachment_cache import ByteLRU
+from ._attachments import Attachment
+from ._utils import run_in_thread
+
+#: Longest-edge pixel limit for images sent to the model. Keep in sync with js
+#: MAX_IMAGE_EDGE.
+DEFAULT_IMAGE_MAX_EDGE = 1568
+
+#: JPEG/WebP quality (1-95) used when re-encoding a downscaled image.
+DEFAULT_IMAGE_QUALITY = 85
+
+#: Longest-edge pixel limit for UI thumbnails. Keep in sync with js
+#: THUMBNAIL_EDGE.
+DEFAULT_THUMBNAIL_EDGE = 320
+
+IMAGE_MAX_EDGE_ENV_VAR = "SHINYCHAT_IMAGE_MAX_EDGE"
+IMAGE_QUALITY_ENV_VAR = "SHINYCHAT_IMAGE_QUALITY"
+THUMBNAIL_EDGE_ENV_VAR = "SHINYCHAT_THUMBNAIL_EDGE"
+
+pillow_is_installed = importlib.util.find_spec("PIL") is not None
+
+#: Memory budget (bytes) for cached pipeline output.
+IMAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_FORMATS = {"image/png": "PNG", "image/jpeg": "JPEG", "image/webp": "WEBP"}
+
+
+class ImageSettings(NamedTuple):
+    max_edge: int
+    quality: int
+    thumbnail_edge: int
+
+
+def _int_env(name: str, default: int, *, lo: int, hi: int) -> int:
+    env = os.environ.get(name)
+    if env is None or not env.strip():
+        return default
+    try:
+        val = int(env)
+    except ValueError:
+        raise ValueError(f"{name}={env!r} is not a valid integer.") from None
+    if not lo <= val <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}, got {val}.")
+    return val
+
+
+def resolve_image_settings() -> ImageSettings:
+    """Resolve the image pipeline settings from the environment.
+
+    ``SHINYCHAT_IMAGE_MAX_EDGE`` and ``SHINYCHAT_THUMBNAIL_EDGE`` are pixel
+    counts; ``SHINYCHAT_IMAGE_QUALITY`` is a JPEG/WebP quality from 1 to 95.
+    """
+    return ImageSettings(
+        max_edge=_int_env(
+            IMAGE_MAX_EDGE_ENV_VAR, DEFAULT_IMAGE_MAX_EDGE, lo=1, hi=65535
+        ),
+        quality=_int_env(
+            IMAGE_QUALITY_ENV_VAR, DEFAULT_IMAGE_QUALITY, lo=1, hi=95
+        ),
+        thumbnail_edge=_int_env(
+            THUMBNAIL_EDGE_ENV_VAR, DEFAULT_THUMBNAIL_EDGE, lo=1, hi=65535
+        ),
+    )
+
+
+# A re-encoded image and its MIME type, or None when the input is used as-is
+_Output = Optional[tuple[bytes, str]]
+
+
+def _nbytes(value: _Output) -> int:
+    return len(value[0]) if value is not None else 0
+
+
+IMAGE_CACHE: ByteLRU[_Output] = ByteLRU(IMAGE_CACHE_MAX_BYTES, _nbytes)
+
+
+def _resize(
+    data: bytes, max_edge: int, quality: int, out_mime: Optional[str] = None
+) -> _Output:
+    """Downscale ``data`` to fit ``max_edge``, encoded as ``out_mime`` (default:
+    the input's format).
+
+    Returns ``None`` when the image already fits, without Pillow, and for input
+    Pillow can't decode.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            mime = Image.MIME.get(opened.format or "", "")
+            if max(opened.size) <= max_edge:
+                return None
+            # Phone photos store their rotation in EXIF; apply it, since the
+            # re-encoded image drops the tag
+            img = ImageOps.exif_transpose(opened)
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            # GIFs become (still) PNGs, matching the browser's canvas pipeline
+            out_mime = out_mime or (mime if mime in _FORMATS else "image/png")
+            fmt = _FORMATS[out_mime]
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA")
+            buf = io.BytesIO()
+            if fmt == "PNG":
+                img.save(buf, fmt, optimize=True)
+            else:
+                img.save(buf, fmt, quality=quality)
+    except (OSError, ValueError, KeyError, Image.DecompressionBombError):
+        return None
+    return buf.getvalue(), out_mime
+
+
+def model_image(data: bytes, mime: str) -> tuple[bytes, str]:
+    """The payload (and its MIME type) to send the model for an image.
+
+    Images larger than the configured max edge are downscaled; the rest are
+    returned as-is, as is any re-encode that would come out larger.
+    """
+    settings = resolve_image_settings()
+    key = ("model", hashlib.sha256(data).digest(), settings[:2])
+    hit, resized = IMAGE_CACHE.get(key)
+    if not hit:
+        resized = _resize(data, settings.max_edge, settings.quality)
+        if resized is not None and len(resized[0]) >= len(data):
+            resized = None
+        IMAGE_CACHE.put(key, resized)
+    return resized if resized is not None else (data, mime)
+
+
+def thumbnail_data_url(data: bytes) -> Optional[str]:
+    """A small WebP data URL previewing the image, or ``None`` without Pillow
+    (or when the image is already thumbnail-sized)."""
+    settings = resolve_image_settings()
+    key = (
+        "thumbnail",
+        hashlib.sha256(data).digest(),
+        settings.thumbnail_edge,
+        settings.quality,
+    )
+    hit, thumb = IMAGE_CACHE.get(key)
+    if not hit:
+        thumb = _resize(
+            data,
+            settings.thumbnail_edge,
+            settings.quality,
+            out_mime="image/webp",
+        )
+        IMAGE_CACHE.put(key, thumb)
+    if thumb is None:
+        return None
+    return f"data:{thumb[1]};base64,{base64.b64encode(thumb[0]).decode()}"
+
+
+def needs_thumbnail(att: Attachment) -> bool:
+    """Whether ``with_thumbnail()`` could make ``att`` a thumbnail."""
+    return (
+        pillow_is_installed
+        and att.thumbnail_url is None
+        and att.mime.startswith("image/")
+        and (att.path is not None or att.data_url.startswith("data:"))
+    )
+
+
+def with_thumbnail(att: Attachment) -> Attachment:
+    """Return ``att`` with a UI thumbnail, making one if it is a large image.
+
+    Blocks while the image is read, hashed and resized; on the event loop, use
+    :func:`with_thumbnails` instead.
+    """
+    if not needs_thumbnail(att):
+        return att
+    try:
+        thumb = thumbnail_data_url(att.read_bytes())
+    except (OSError, ValueError):
+        return att
+    if thumb is None:
+        return att
+    return att.model_copy(update={"thumbnail_url": thumb})
+
+
+async def with_thumbnails(attachments: list[Attachment]) -> list[Attachment]:
+    """Apply :func:`with_thumbnail` to each attachment, on a worker thread.
+
+    Returns ``attachments`` itself when none of them needs a thumbnail.
+    """
+    if not any(needs_thumbnail(a) for a in attachments):
+        return attachments
+    return await run_in_thread(lambda: [with_thumbnail(a) for a in attachments])
@@ -0,0 +1,358 @@
+"""HTTP upload path for chat attachments.
+
+Without it, the browser base64-encodes each attachment into the
+``shinychat.userInput`` value, so a large PDF occupies the session's websocket
+(and server memory, several times over) until it has been received and parsed.
+
+With it, the browser uploads large attachments over HTTP first and submits only
+a reference to each one:
+
+1. ``shinychat_upload_init`` (a session message handler) validates the declared
+   name, MIME type, and size, and opens an upload on the session's file-upload
+   endpoint -- the same chunked ``POST`` route that ``ui.input_file()`` uses.
+   Shiny has no public API for this, so see :func:`shiny_upload_manager` for
+   the private API it relies on.
+2. The browser ``POST``s the file. Each chunk is checked as it is spooled to a
+   temporary file: the leading bytes must match the declared MIME type and the
+   running size must stay within the attachment size limit. Once a chunk fails,
+   the rest of the body is discarded rather than written.
+3. ``shinychat_upload_end`` reports the outcome. On success it returns the
+   upload's id and a session-scoped URL (a dynamic route) the browser uses to
+   display it.
+
+The submitted input then carries ``{"upload_id": ...}`` in place of a data URL,
+and :func:`parse_attachments` resolves it into an :class:`Attachment` backed by
+the spooled file. Spooled files live in the session's upload directory, which
+Shiny removes when the session ends, so attachments are only sent to the
+browser by reference: serialized anywhere else (history, bookmarks), they
+carry their payload inline.
+
+This is a private module: module-level functions are intentionally not
+underscore-prefixed.
+"""
+
+from __future__ import annotations
+
+import os
+import warnings
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from shiny.session import Session
+from shiny.types import SafeException
+
+from ._attachments import (
+    SUPPORTED_ATTACHMENT_TYPES,
+    Attachment,
+    is_text_type,
+    resolve_max_attachment_size,
+)
+
+if TYPE_CHECKING:
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+UPLOAD_INIT_HANDLER = "shinychat_upload_init"
+UPLOAD_END_HANDLER = "shinychat_upload_end"
+UPLOAD_ROUTE = "shinychat_upload"
+
+#: The shiny versions whose (private) upload internals this module supports;
+#: keep in sync with the dependency in pyproject.toml
+SUPPORTED_SHINY = ">=1.4.0,<2"
+
+# Leading bytes each binary attachment type must start with. WebP is a RIFF
+# container, so its tag is checked separately at offset 8.
+_SIGNATURES: dict[str, tuple[bytes, ...]] = {
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "image/webp": (b"RIFF",),
+    "application/pdf": (b"%PDF-",),
+}
+
+_SNIFF_BYTES = 12
+
+
+class AttachmentUploadError(SafeException):
+    """An attachment upload was rejected.
+
+    A ``SafeException`` so the reason reaches the browser even when the app
+    sanitizes errors.
+    """
+
+
+class SpooledUpload:
+    """One attachment being (or having been) spooled to disk."""
+
+    def __init__(
+        self, *, name: str, mime: str, expected_size: int, limit: int
+    ) -> None:
+        self.name = name
+        self.mime = mime
+        self.expected_size = expected_size
+        self.limit = limit
+        self.size = 0
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self._head = b""
+
+    def accept(self, chunk: bytes) -> bool:
+        """Check the next chunk; return whether it should be written."""
+        if self.error is not None:
+            return False
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.error = (
+                f"Attachment {self.name!r} exceeds the maximum attachment "
+                f"size ({self.limit} bytes)."
+            )
+            return False
+        if len(self._head) < _SNIFF_BYTES:
+            self._head += chunk[: _SNIFF_BYTES - len(self._head)]
+            if len(self._head) == _SNIFF_BYTES:
+                self._check_signature()
+        if is_text_type(self.mime) and b"\x00" in chunk:
+            self.error = f"Attachment {self.name!r} is not a text file."
+        return self.error is None
+
+    def complete(self, path: str) -> None:
+        """Record the finished spool file."""
+        if self.error is None and len(self._head) < _SNIFF_BYTES:
+            self._check_signature()
+        if self.error is None and self.size != self.expected_size:
+            self.error = (
+                f"Attachment {self.name!r} was incomplete: received "
+                f"{self.size} of {self.expected_size} bytes."
+            )
+        self.path = path
+
+    def _check_signature(self) -> None:
+        signatures = _SIGNATURES.get(self.mime)
+        if signatures is None:
+            return
+        head = self._head
+        ok = head.startswith(signatures)
+        if self.mime == "image/webp":
+            ok = ok and head[8:12] == b"WEBP"
+        if not ok:
+            self.error = (
+                f"Attachment {self.name!r} is not a valid {self.mime} file."
+            )
+
+
+class AttachmentSpool:
+    """The attachment uploads of one session."""
+
+    def __init__(self, session: "Session", manager: Any) -> None:
+        self._session = session
+        self._manager = manager
+        self._pending: dict[str, SpooledUpload] = {}
+        self._uploads: dict[str, SpooledUpload] = {}
+        self.url = session.dynamic_route(UPLOAD_ROUTE, self.serve)
+
+    def init(self, info: dict[str, Any]) -> dict[str, str]:
+        """Validate an upload's declared metadata and open it for ``POST``."""
+        name = str(info.get("name") or "")
+        mime = str(info.get("type") or "")
+        size = info.get("size")
+        if mime not in SUPPORTED_ATTACHMENT_TYPES:
+            raise AttachmentUploadError(
+                f"Unsupported attachment MIME type: {mime!r}."
+            )
+        limit = resolve_max_attachment_size()
+        if not isinstance(size, int) or size < 0 or size > limit:
+            raise AttachmentUploadError(
+                f"Attachment {name!r} exceeds the maximum attachment size "
+                f"({limit} bytes)."
+            )
+
+        upload = SpooledUpload(
+            name=name, mime=mime, expected_size=size, limit=limit
+        )
+        job_id: str = self._manager.create_upload_operation(
+            [{"name": name, "size": size, "type": mime}]
+        )
+        watch_upload(self._manager.get_upload_operation(job_id), upload)
+        self._pending[job_id] = upload
+        return {
+            "jobId": job_id,
+            "uploadUrl": f"session/{self._session.id}/upload/{job_id}?w=",
+        }
+
+    def end(self, job_id: str) -> dict[str, Any]:
+        """Report an upload's outcome once its ``POST`` has finished."""
+        upload = self._pending.pop(job_id, None)
+        if upload is None or (upload.path is None and upload.error is None):
+            raise AttachmentUploadError("Unknown or unfinished upload.")
+        if upload.error is not None:
+            raise AttachmentUploadError(upload.error)
+        self._uploads[job_id] = upload
+        return {
+            "id": job_id,
+            "url": self.upload_url(job_id),
+            "size": upload.size,
+        }
+
+    def upload_url(self, upload_id: str) -> str:
+        return f"{self.url}&id={upload_id}"
+
+    def attachment(
+        self, upload_id: str, thumbnail_url: Optional[str] = None
+    ) -> Optional[Attachment]:
+        """The file-backed attachment for a finished upload, if there is one.
+
+        ``thumbnail_url`` is the browser's thumbnail, if it made one; otherwise
+        the chat makes one (off the event loop) when the attachment enters it.
+        """
+        upload = self._uploads.get(upload_id)
+        if upload is None or upload.path is None:
+            return None
+        return Attachment._from_upload(
+            upload_id,
+            upload.path,
+            mime=upload.mime,
+            name=upload.name,
+            size=upload.size,
+            data_url=self.upload_url(upload_id),
+            thumbnail_url=thumbnail_url,
+        )
+
+    def serve(self, request: "Request") -> "Response":
+        """Serve a finished upload back to the browser for display."""
+        from starlette.responses import FileResponse, PlainTextResponse
+
+        upload = self._uploads.get(request.query_params.get("id", ""))
+        if upload is None or upload.path is None:
+            return PlainTextResponse("Not Found", 404)
+        return FileResponse(
+            upload.path,
+            media_type=upload.mime,
+            headers={"Cache-Control": "private, max-age=86400"},
+        )
+
+
+def watch_upload(operation: Any, upload: SpooledUpload) -> None:
+    """Route a Shiny file-upload operation's chunks through ``upload``.
+
+    Shiny writes each ``POST``ed chunk with ``write_chunk()`` and closes the
+    file with ``file_end()``; wrapping both validates the body as it streams in
+    and records (or, once rejected, deletes) the spooled file.
+    """
+    write_chunk: Callable[[bytes], None] = operation.write_chunk
+    file_end: Callable[[], None] = operation.file_end
+
+    def checked_write_chunk(chunk: bytes) -> None:
+        if upload.accept(chunk):
+            write_chunk(chunk)
+
+    def finish_file() -> None:
+        file_end()
+        path: str = operation.finish()[0]["datapath"]
+        upload.complete(path)
+        if upload.error is not None:
+            os.remove(path)
+
+    operation.write_chunk = checked_write_chunk
+    operation.file_end = finish_file
+
+
+SPOOLS: dict[str, AttachmentSpool] = {}
+
+
+def shiny_upload_manager(root: Any) -> Any:
+    """Return ``root``'s Shiny file-upload manager, or ``None``.
+
+    Shiny has no public API for receiving a ``POST`` body, so uploads ride on
+    the endpoint ``ui.input_file()`` uses. That relies on private Shiny API:
+    the session's ``_file_upload_manager``, its ``create_upload_operation()``
+    and ``get_upload_operation()``, and each operation's ``write_chunk()``,
+    ``file_end()`` and ``finish()``. They are checked here, and against
+    Shiny's request handler in the tests, so a Shiny release that changes
+    them turns uploads off instead of breaking them.
+    """
+    manager = getattr(root, "_file_upload_manager", None)
+    if not all(
+        callable(getattr(manager, name, None))
+        for name in ("create_upload_operation", "get_upload_operation")
+    ):
+        return None
+    try:
+        from shiny._fileupload import FileUploadOperation
+    except ImportError:
+        return None
+    if not all(
+        callable(getattr(FileUploadOperation, name, None))
+        for name in ("write_chunk", "file_end", "finish")
+    ):
+        return None
+    return manager
+
+
+def enable_attachment_uploads(session: "Session") -> bool:
+    """Register the upload handlers for ``session``'s root session.
+
+    Idempotent across the chats of a session. Returns ``False`` when the
+    session has no file-upload endpoint (e.g. a test or stub session), in
+    which case attachments keep arriving inline. A live session whose Shiny
+    version lacks the upload internals warns and falls back the same way.
+    """
+    root_scope = getattr(session, "root_scope", None)
+    root = root_scope() if root_scope is not None else None
+    if root is None:
+        return False
+    if root.id in SPOOLS:
+        return True
+    manager = shiny_upload_manager(root)
+    if manager is None:
+        # Only a live app session serves file uploads (stub and mock
+        # sessions don't), so only it is expected to have them
+        if isinstance(root, Session) and not root.is_stub_session():
+            warnings.warn(
+                "shinychat can't use this version of shiny's file-upload "
+                "endpoint, so attachments are sent inline over the "
+                f"websocket instead. Supported: shiny{SUPPORTED_SHINY}.",
+                stacklevel=2,
+            )
+        return False
+
+    spool = AttachmentSpool(root, manager)
+    SPOOLS[root.id] = spool
+    root.set_message_handler(UPLOAD_INIT_HANDLER, spool.init)
+    root.set_message_handler(UPLOAD_END_HANDLER, spool.end)
+    root.on_ended(lambda: SPOOLS.pop(root.id, None))
+    return True
+
+
+def parse_attachments(
+    values: Any, session: "Session | None" = None
+) -> list[Attachment]:
+    """Parse submitted attachments, resolving upload references.
+
+    Inline attachments are validated as-is; ``{"upload_id": ...}`` references
+    become file-backed attachments using the metadata recorded at upload time
+    (never the client's claim). A reference to an unknown upload falls back to
+    its inline ``data_url``. Callers still run ``validate_attachments()``.
+    """
+    attachments: list[Attachment] = []
+    for value in values or []:
+        upload_id = value.get("upload_id") if isinstance(value, dict) else None
+        if upload_id is None:
+            attachments.append(Attachment.model_validate(value))
+            continue
+        att = None
+        spool = None
+        if session is not None:
+            spool = SPOOLS.get(session.root_scope().id)
+        if spool is not None:
+            thumbnail_url = value.get("thumbnail_url")
+            att = spool.attachment(
+                str(upload_id),
+                str(thumbnail_url) if thumbnail_url is not None else None,
+            )
+        if att is None:
+            # An upload from another (e.g. ended) session, as in a restored
+            # message: use the inline payload it carries, if any
+            if not str(value.get("data_url", "")).startswith("data:"):
+                raise ValueError(f"Unknown attachment upload: {upload_id!r}.")
+            att = Attachment.model_validate(value)
+        attachments.append(att)
+    return attachments
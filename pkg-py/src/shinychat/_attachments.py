@@ -11,10 +11,16 @@ import json
 import mimetypes
 import os
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 from htmltools import html_escape
-from pydantic import BaseModel
+from pydantic import (
+    BaseModel,
+    PrivateAttr,
+    SerializationInfo,
+    SerializerFunctionWrapHandler,
+    model_serializer,
+)
 from typing_extensions import TypedDict
 
 from ._utils_types import MISSING_TYPE
@@ -59,11 +65,76 @@ class Attachment(BaseModel):
     name: str
     size: int = 0
     data_url: str
+    thumbnail_url: Optional[str] = None
+    """
+    A small image data URL the UI shows in place of a large image. Made by the
+    browser when the image is attached, or once on the server (with Pillow)
+    when the attachment enters the chat.
+    """
+
+    # Set only by the upload spool, never from (client-supplied) input
+    _path: Optional[str] = PrivateAttr(default=None)
+    _upload_id: Optional[str] = PrivateAttr(default=None)
 
     def __str__(self) -> str:
         label = "image" if self.mime.startswith("image/") else "file"
         return f"[{label}: {self.name or 'attachment'}]"
 
+    @property
+    def path(self) -> Optional[str]:
+        """
+        Local file holding the payload, for attachments the browser uploaded
+        over HTTP. ``data_url`` is then a session-scoped URL, and the payload
+        is only read when the attachment is converted for the model or
+        serialized (e.g. into history).
+        """
+        return self._path
+
+    @property
+    def upload_id(self) -> Optional[str]:
+        """The upload this attachment was resolved from, if any."""
+        return self._upload_id
+
+    @classmethod
+    def _from_upload(
+        cls, upload_id: str, path: str, **fields: Any
+    ) -> "Attachment":
+        att = cls(**fields)
+        att._path = path
+        att._upload_id = upload_id
+        return att
+
+    @model_serializer(mode="wrap")
+    def _serialize(
+        self, handler: SerializerFunctionWrapHandler, info: SerializationInfo
+    ) -> Any:
+        data = handler(self)
+        if self._path is None or "data_url" not in data:
+            return data
+        # An upload's data_url only resolves while its session lasts. The
+        # browser gets a reference it can resubmit (e.g. when editing a
+        # message); everything else, like history and bookmarks, gets the
+        # payload itself.
+        if isinstance(info.context, dict) and info.context.get("by_reference"):
+            data["upload_id"] = self._upload_id
+        else:
+            raw = Path(self._path).read_bytes()
+            data["data_url"] = (
+                f"data:{self.mime};base64,{base64.b64encode(raw).decode()}"
+            )
+        return data
+
+    def read_bytes(self) -> bytes:
+        """Return the attachment's payload.
+
+        Reads the uploaded file for file-backed attachments and decodes
+        ``data_url`` otherwise; remote URLs raise ``ValueError``.
+        """
+        if self.path is not None:
+            return Path(self.path).read_bytes()
+        _require_data_url(self)
+        return decode_data_url(self.data_url)
+
     @classmethod
     def from_path(
         cls,
@@ -141,6 +212,15 @@ class Attachment(BaseModel):
         )
 
 
+def attachment_client_payload(att: Attachment) -> dict[str, Any]:
+    """Serialize an attachment for the browser.
+
+    Uploaded files are sent by reference (their session-scoped URL and
+    ``upload_id``), so their payload never travels over the websocket.
+    """
+    return att.model_dump(exclude_none=True, context={"by_reference": True})
+
+
 #: Default total attachment-size cap (bytes) when the environment variable is
 #: not set. Keep in sync with js DEFAULT_MAX_ATTACHMENT_SIZE.
 DEFAULT_MAX_ATTACHMENT_SIZE = 30 * 1024 * 1024
@@ -244,10 +324,43 @@ def validate_attachment_data_urls(attachments: list[Attachment]) -> None:
             )
 
 
+#: Largest accepted thumbnail payload (bytes). Thumbnails don't count toward
+#: the attachment size limit.
+MAX_THUMBNAIL_SIZE = 256 * 1024
+
+THUMBNAIL_TYPES = ("image/png", "image/jpeg", "image/webp")
+
+
+def validate_attachment_thumbnails(attachments: list[Attachment]) -> None:
+    """Validate thumbnails: small base64 image data URLs on images only."""
+    for att in attachments:
+        thumb = att.thumbnail_url
+        if thumb is None:
+            continue
+        if not att.mime.startswith("image/"):
+            raise ValueError(
+                f"Only image attachments may have a thumbnail, got {att.mime}."
+            )
+        if not any(
+            thumb.startswith(f"data:{t};base64,") for t in THUMBNAIL_TYPES
+        ):
+            raise ValueError(
+                f"Attachment thumbnail must be a base64 data URL of type "
+                f"{list(THUMBNAIL_TYPES)}."
+            )
+        size = data_url_payload_size(thumb)
+        if size > MAX_THUMBNAIL_SIZE:
+            raise ValueError(
+                f"Attachment thumbnail ({size} bytes) exceeds the maximum "
+                f"thumbnail size ({MAX_THUMBNAIL_SIZE} bytes)."
+            )
+
+
 def validate_attachments(attachments: list[Attachment]) -> None:
     """Validate incoming attachments accepted from the user input payload."""
     validate_attachment_types(attachments)
     validate_attachment_data_urls(attachments)
+    validate_attachment_thumbnails(attachments)
     validate_attachment_payload_size(attachments)
 
 
@@ -291,22 +404,40 @@ def attachment_to_content(att: Attachment) -> "Content":
     """Convert an attachment into a chatlas content object.
 
     chatlas is an optional dependency (only needed for the ``client=`` auto
-    path), so it is imported lazily here.
+    path), so it is imported lazily here. Conversions are cached across the
+    worker's sessions, keyed by the attachment's payload. A conversion reads
+    (and may resize) the whole payload, so async code should run it on a
+    worker thread.
     """
+    from ._attachment_cache import cached_content
+
+    return cached_content(att, _attachment_to_content)
+
+
+def _attachment_to_content(att: Attachment) -> "Content":
     from chatlas import content_image_url
     from chatlas.types import ContentPDF
 
     if att.mime.startswith("image/"):
-        return content_image_url(att.data_url)
+        from ._attachment_images import model_image
+
+        if att.path is None and not att.data_url.startswith("data:"):
+            return content_image_url(att.data_url)
+        raw = att.read_bytes()
+        data, mime = model_image(raw, att.mime)
+        if data is raw and att.path is None:
+            return content_image_url(att.data_url)
+        return content_image_url(
+            f"data:{mime};base64,{base64.b64encode(data).decode()}"
+        )
     if att.mime == "application/pdf":
-        _require_data_url(att)
-        data = decode_data_url(att.data_url)
-        return ContentPDF(data=data, filename=att.name or "document.pdf")
+        return ContentPDF(
+            data=att.read_bytes(), filename=att.name or "document.pdf"
+        )
     if is_text_type(att.mime):
         from chatlas.types import ContentText
 
-        _require_data_url(att)
-        text = decode_data_url(att.data_url).decode("utf-8", errors="replace")
+        text = att.read_bytes().decode("utf-8", errors="replace")
         name = att.name or "file"
         return ContentText(
             text=(
@@ -320,8 +451,8 @@ def attachment_to_content(att: Attachment) -> "Content":
 def _require_data_url(att: Attachment) -> None:
     if not att.data_url.startswith("data:"):
         raise ValueError(
-            f"attachment_to_content() requires a base64 data URL for "
-            f"{att.mime} attachments, but got a remote URL. "
+            f"Reading a {att.mime} attachment's payload requires a base64 "
+            f"data URL, but got a remote URL. "
             f"Use Attachment.from_path() or Attachment.from_data() instead."
         )
 
@@ -4,9 +4,11 @@ import inspect
 import json
 import os
 import re
+import time
 import warnings
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -35,9 +37,12 @@ from htmltools import (
 )
 from pydantic import ValidationError
 
-from . import _utils
+from . import _metrics, _utils
+from ._attachment_images import with_thumbnails
+from ._attachment_upload import enable_attachment_uploads
 from ._attachments import (
     Attachment,
+    attachment_client_payload,
     attachment_to_content,
     resolve_attachment_attrs,
     resolve_max_attachment_size,
@@ -66,16 +71,23 @@ from ._chat_types import (
     ChatGreeting,
     ChatMessage,
     ChatMessageDict,
+    ChunkAction,
+    ChunkEndAction,
+    ChunkStartAction,
     ClearAction,
     ContentSegment,
     GreetingOptions,
     MessagePayload,
+    Role,
     SerializedDep,
     SlashCommandDef,
     StoredMessage,
+    StoredSegment,
+    TruncateAfterAction,
     chat_greeting,
 )
 from ._history import ChatHistory, HistoryOptions
+from ._history_bookmark import BookmarkDebouncer
 from ._html_deps_py_shiny import shinychat_dependency
 from ._utils_types import DEPRECATED, DEPRECATED_TYPE, MISSING, MISSING_TYPE
 
@@ -151,6 +163,7 @@ class SlashCommandRegistration:
     handler: UserSubmitFunction | None
     takes_args: bool
     definition: SlashCommandDef
+    threaded: bool | None = None
 
 
 class UserInput(NamedTuple):
@@ -168,6 +181,89 @@ PendingMessage = Tuple[
 ]
 
 
+@dataclass
+class StreamBuffer:
+    """Accumulated state of one open message stream."""
+
+    # Segments streamed so far, and the checkpoint `.replace()` resets to
+    segments: list[ContentSegment] = field(default_factory=list)
+    checkpoint: list[ContentSegment] = field(default_factory=list)
+    # Concurrent streams don't block (or get blocked by) other streams and
+    # are tagged with their `stream_id` on the wire
+    concurrent: bool = False
+    # Wire bytes sent for this stream (only tallied while a metrics sink is set)
+    bytes_sent: int = 0
+    # Role of the streamed message, from its `chunk_start`
+    role: Role = "assistant"
+
+
+class ShadowTranscript:
+    """Server-side copy of the messages the client is rendering.
+
+    Built from the actions `Chat` sends (`message`, `chunk_start` ...
+    `chunk_end`) and the user submissions it receives, so a response can be
+    saved as soon as its stream ends -- without waiting for the browser to
+    render it and report its snapshot back (see `Chat._settled_messages()`).
+    A stream holds its place from `chunk_start` on, but only counts once it
+    ends, like the client's settled-message snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._entries: list[StoredMessage | None] = []
+        # Open stream id -> index of its placeholder in `_entries`
+        self._open: dict[str, int] = {}
+
+    def append(self, message: StoredMessage) -> None:
+        self._entries.append(message)
+
+    def open(self, stream_id: str) -> None:
+        self._open[stream_id] = len(self._entries)
+        self._entries.append(None)
+
+    def close(self, stream_id: str, message: StoredMessage | None) -> None:
+        """Settle (or, with `None`, drop) an open stream's message."""
+        idx = self._open.pop(stream_id, None)
+        if idx is None:
+            return
+        if message is not None:
+            self._entries[idx] = message
+            return
+        del self._entries[idx]
+        for sid, i in self._open.items():
+            if i > idx:
+                self._open[sid] = i - 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._open.clear()
+
+    def truncate(self, count: int) -> None:
+        """Keep only the first `count` settled messages (and the streams
+        opened before them)."""
+        settled = 0
+        for cut, message in enumerate(self._entries):
+            if message is None:
+                continue
+            if settled == count:
+                break
+            settled += 1
+        else:
+            return
+        del self._entries[cut:]
+        self._open = {s: i for s, i in self._open.items() if i < cut}
+
+    def settled(self) -> tuple[StoredMessage, ...]:
+        return tuple(m for m in self._entries if m is not None)
+
+
+# The stream that the running task is producing, if any. Lets a nested
+# `.message_stream_context()` join the stream of the task it's called from,
+# even while other (concurrent) streams are open on the same chat.
+ACTIVE_STREAM_ID: ContextVar[str | None] = ContextVar(
+    "shinychat_active_stream_id", default=None
+)
+
+
 class Chat:
     """
     Create a chat interface.
@@ -290,6 +386,17 @@ class Chat:
     tokenizer
         Removed. Raises ``TypeError`` if provided. Use your LLM provider
         (e.g., chatlas, LangChain) to manage token limits instead.
+    threaded_callbacks
+        Whether to run synchronous callbacks on a worker thread instead of on
+        the event loop. This covers ``@chat.on_user_submit`` and slash command
+        handlers (each can override it with ``threaded=``),
+        ``@chat.history.on_save`` callbacks, and a custom ``TitleFn``. A
+        blocking callback (e.g. a database lookup or RAG retrieval) then no
+        longer freezes every other session. Callbacks still run with the
+        current Shiny session. They share one thread pool per process, sized
+        by the ``SHINYCHAT_CALLBACK_THREADS`` environment variable (by
+        default, ``ThreadPoolExecutor``'s default). Async callbacks are
+        unaffected.
     """
 
     def __init__(
@@ -302,6 +409,7 @@ class Chat:
         messages: Sequence[Any] = (),
         on_error: Literal["auto", "actual", "sanitize", "unhandled"] = "auto",
         tokenizer: DEPRECATED_TYPE = DEPRECATED,
+        threaded_callbacks: bool = False,
     ):
         from shiny._deprecated import warn_deprecated
         from shiny.module import ResolvedId, resolve_id
@@ -325,6 +433,7 @@ class Chat:
         self.id = resolve_id(id)
         self.user_input_id = ResolvedId(f"{self.id}_user_input")
         self.messages_input_id = ResolvedId(f"{self.id}_messages")
+        self._client_features_id = ResolvedId(f"{self.id}_client_features")
         self._slash_command_id = ResolvedId(f"{self.id}_slash_command")
         self._transform_user: TransformUserInputAsync | None = None
         self._transform_assistant: (
@@ -343,14 +452,21 @@ class Chat:
                 on_error = "actual"
 
         self.on_error = on_error
+        self._threaded_callbacks = threaded_callbacks
 
-        # Chunked messages get accumulated (using this property) before changing state
-        self._current_stream_segments: list[ContentSegment] = []
+        # Chunked messages get accumulated (per stream id) before changing state
+        self._stream_buffers: dict[str, StreamBuffer] = {}
+        # The (non-concurrent) stream currently holding the chat. Chunks from
+        # any other non-concurrent stream are queued until it ends.
         self._current_stream_id: str | None = None
         self._pending_messages: list[PendingMessage] = []
-
-        # For tracking message stream state when entering/exiting nested streams
-        self._message_stream_segments_checkpoint: list[ContentSegment] = []
+        # What the client is rendering, as far as the server knows
+        self._transcript = ShadowTranscript()
+        # Wire features the client's bundle reported handling (see
+        # CLIENT_FEATURES in js/src/transport/types.ts). Until it reports
+        # them, e.g. with a stale cached bundle, only the original protocol
+        # is used.
+        self._client_features: set[str] = set()
 
         # Keep track of effects so we can destroy them when the chat is destroyed
         self._effects: list["Effect_"] = []
@@ -379,6 +495,10 @@ class Chat:
                 reactive.Value(None)
             )
 
+            # Bumped whenever an assistant message settles in the shadow
+            # transcript, so history can save without the client round trip
+            self._transcript_settled: reactive.Value[int] = reactive.Value(0)
+
             @reactive.extended_task
             async def _mock_task() -> str:
                 return ""
@@ -400,6 +520,22 @@ class Chat:
             self._append_init_messages = _append_init_messages
             self._init_chat = _init_chat
 
+            @reactive.effect
+            def _on_client_features() -> None:
+                # Waits (silently) until the client reports its features
+                features = self._session.input[self._client_features_id]()
+                self._client_features = set(features or [])
+
+            # Let the client upload large attachments over HTTP rather than
+            # inline in the input value (see _attachment_upload.py)
+            if enable_attachment_uploads(self._session):
+
+                @reactive.effect
+                async def _enable_http_upload() -> None:
+                    await self._send_action(
+                        {"type": "update_upload", "http_upload": True}
+                    )
+
             # Record the latest submission into `_latest_user_input`, which
             # backs the public `user_input()` method. priority=9999 ensures
             # this runs before `on_user_submit`/other effects so `user_input()`
@@ -412,9 +548,11 @@ class Chat:
                     msg = ChatMessage(
                         content=text,
                         role="user",
-                        attachments=attachments,
+                        attachments=await with_thumbnails(attachments),
                     )
-                    self._latest_user_input.set(self._as_stored_message(msg))
+                    stored = self._as_stored_message(msg)
+                    self._transcript.append(stored)
+                    self._latest_user_input.set(stored)
                 except Exception as e:
                     await self._raise_exception(e)
 
@@ -440,18 +578,23 @@ class Chat:
                 if echo:
                     full_text = f"/{command} {user_text}".rstrip()
                     msg = ChatMessage(content=full_text, role="user")
-                    self._latest_user_input.set(self._as_stored_message(msg))
+                    stored = self._as_stored_message(msg)
+                    self._transcript.append(stored)
+                    self._latest_user_input.set(stored)
                 cmds = self._slash_commands()
                 reg = cmds.get(command) if cmds else None
                 try:
                     if reg is not None and reg.handler is not None:
+                        threaded = self._resolve_threaded(reg.threaded)
                         if reg.takes_args:
                             await _utils.wrap_async(
-                                cast(UserSubmitFunction1, reg.handler)
+                                cast(UserSubmitFunction1, reg.handler),
+                                threaded=threaded,
                             )(user_text)
                         else:
                             await _utils.wrap_async(
-                                cast(UserSubmitFunction0, reg.handler)
+                                cast(UserSubmitFunction0, reg.handler),
+                                threaded=threaded,
                             )()
                 except Exception as e:
                     await self._raise_exception(e)
@@ -511,7 +654,10 @@ class Chat:
             async def _on_user_submit(
                 user_input: str, attachments: list[Attachment]
             ) -> None:
-                contents = [attachment_to_content(a) for a in attachments]
+                # Reading and resizing attachments would stall the event loop
+                contents = await _utils.run_in_thread(
+                    lambda: [attachment_to_content(a) for a in attachments]
+                )
                 response = await chat_client.value.stream_async(
                     user_input,
                     *contents,
@@ -566,15 +712,20 @@ class Chat:
                 self.history.enable()
 
     @overload
-    def on_user_submit(self, fn: UserSubmitFunction) -> Effect_: ...
+    def on_user_submit(
+        self, fn: UserSubmitFunction, *, threaded: bool | None = None
+    ) -> Effect_: ...
 
     @overload
     def on_user_submit(
-        self,
+        self, *, threaded: bool | None = None
     ) -> Callable[[UserSubmitFunction], Effect_]: ...
 
     def on_user_submit(
-        self, fn: UserSubmitFunction | None = None
+        self,
+        fn: UserSubmitFunction | None = None,
+        *,
+        threaded: bool | None = None,
     ) -> Effect_ | Callable[[UserSubmitFunction], Effect_]:
         """
         Define a function to invoke when user input is submitted.
@@ -599,6 +750,11 @@ class Chat:
         ----------
         fn
             A function to invoke when user input is submitted.
+        threaded
+            Whether to run a synchronous `fn` on a worker thread, so that
+            blocking work in it (e.g. a database lookup or RAG retrieval)
+            doesn't freeze other sessions. Defaults to the chat's
+            `threaded_callbacks` setting.
 
         Note
         ----
@@ -611,6 +767,7 @@ class Chat:
             from shiny import reactive
 
             fn_params = inspect.signature(fn).parameters
+            in_thread = self._resolve_threaded(threaded)
 
             @reactive.effect
             @reactive.event(self._user_input)
@@ -621,7 +778,9 @@ class Chat:
                             "An on_user_submit function should not take more than 2 arguments"
                         )
                     elif len(fn_params) == 2:
-                        afunc = _utils.wrap_async(cast(UserSubmitFunction2, fn))
+                        afunc = _utils.wrap_async(
+                            cast(UserSubmitFunction2, fn), threaded=in_thread
+                        )
                         user_input = self.user_input()
                         assert user_input is not None
                         await afunc(*user_input)
@@ -629,10 +788,14 @@ class Chat:
                         user_input = self.user_input()
                         assert user_input is not None
                         text, _ = user_input
-                        afunc = _utils.wrap_async(cast(UserSubmitFunction1, fn))
+                        afunc = _utils.wrap_async(
+                            cast(UserSubmitFunction1, fn), threaded=in_thread
+                        )
                         await afunc(text)
                     else:
-                        afunc = _utils.wrap_async(cast(UserSubmitFunction0, fn))
+                        afunc = _utils.wrap_async(
+                            cast(UserSubmitFunction0, fn), threaded=in_thread
+                        )
                         await afunc()
                 except Exception as e:
                     await self._raise_exception(e)
@@ -654,6 +817,7 @@ class Chat:
         *,
         echo: bool | None = None,
         force: bool = False,
+        threaded: bool | None = None,
     ) -> Callable[[UserSubmitFunction], UserSubmitFunction]: ...
 
     @overload
@@ -665,6 +829,7 @@ class Chat:
         *,
         echo: bool | None = None,
         force: bool = False,
+        threaded: bool | None = None,
     ) -> Callable[[], None]: ...
 
     def slash_command(
@@ -675,6 +840,7 @@ class Chat:
         *,
         echo: bool | None = None,
         force: bool = False,
+        threaded: bool | None = None,
     ) -> (
         Callable[[UserSubmitFunction], UserSubmitFunction] | Callable[[], None]
     ):
@@ -706,6 +872,9 @@ class Chat:
             runs purely for its side effects (e.g. opening a modal).
         force
             Whether to overwrite an existing command with the same name.
+        threaded
+            Whether to run a synchronous handler on a worker thread. Defaults
+            to the chat's `threaded_callbacks` setting.
 
         Returns
         -------
@@ -745,6 +914,7 @@ class Chat:
                 handler=handler,
                 takes_args=takes_args,
                 definition=cmd_def,
+                threaded=threaded,
             )
             self._slash_commands.set(cmds)
 
@@ -781,6 +951,9 @@ class Chat:
 
         return remove
 
+    def _resolve_threaded(self, threaded: bool | None) -> bool:
+        return self._threaded_callbacks if threaded is None else threaded
+
     async def _raise_exception(
         self,
         e: BaseException,
@@ -1030,7 +1203,7 @@ class Chat:
         )
 
     @asynccontextmanager
-    async def message_stream_context(self):
+    async def message_stream_context(self, *, concurrent: bool = False):
         """
         Message stream context manager.
 
@@ -1047,6 +1220,14 @@ class Chat:
             * Useful for inserting additional content from another context into the
               stream (e.g., see the note about tool calls below).
 
+        Parameters
+        ----------
+        concurrent
+            Whether to open a new, independent stream that runs concurrently with
+            any other stream on this chat (see `.append_message_stream()`). When
+            `False` (the default), the context joins the stream of the task it's
+            called from (or the chat's active stream), if any.
+
         Yields
         ------
         :
@@ -1098,34 +1279,59 @@ class Chat:
         `.message_stream_context()` before the mixed content if you need a clean
         checkpoint to replace back to.
         """
-        # Checkpoint the current stream state so operation="replace" can return to it
-        old_checkpoint = self._message_stream_segments_checkpoint
-        self._message_stream_segments_checkpoint = copy_segments(
-            self._current_stream_segments
-        )
-
-        # No stream currently exists, start one
-        stream_id = self._current_stream_id
+        concurrent = self._can_stream_concurrently(concurrent)
+        # No stream currently exists (or an independent one was requested), start one
+        stream_id = None if concurrent else self._enclosing_stream_id()
         is_root_stream = stream_id is None
-        if is_root_stream:
+        if stream_id is None:
             stream_id = _utils.private_random_id()
+            if concurrent:
+                self._stream_buffers[stream_id] = StreamBuffer(concurrent=True)
             await self._append_message_chunk(
                 "", chunk="start", stream_id=stream_id
             )
 
+        # Checkpoint the current stream state so operation="replace" can return to it.
+        # (A root stream whose start was queued behind another stream has no
+        # buffer yet, so there's nothing to checkpoint.)
+        buffer = self._stream_buffers.get(stream_id)
+        old_checkpoint: list[ContentSegment] = []
+        if buffer is not None:
+            old_checkpoint = buffer.checkpoint
+            buffer.checkpoint = copy_segments(buffer.segments)
+
+        token = ACTIVE_STREAM_ID.set(stream_id)
         try:
             yield MessageStream(self, stream_id)
         finally:
+            ACTIVE_STREAM_ID.reset(token)
+
             # Restore the checkpoint
-            self._message_stream_segments_checkpoint = old_checkpoint
+            if buffer is not None:
+                buffer.checkpoint = old_checkpoint
 
-            # If this was the root stream, end it
+            # If this was the root stream, end it (and release anything it held up)
             if is_root_stream:
                 await self._append_message_chunk(
                     "",
                     chunk="end",
                     stream_id=stream_id,
                 )
+                if not concurrent:
+                    await self._flush_pending_messages()
+
+    def _can_stream_concurrently(self, concurrent: bool) -> bool:
+        # Concurrent chunks are tagged with their stream id; a client that
+        # can't route them gets its streams one at a time instead
+        return concurrent and "stream_id" in self._client_features
+
+    def _enclosing_stream_id(self) -> str | None:
+        # Prefer the stream of the calling task, so nested contexts inside a
+        # concurrent stream land in that stream rather than the chat's active one
+        active = ACTIVE_STREAM_ID.get()
+        if active is not None and active in self._stream_buffers:
+            return active
+        return self._current_stream_id
 
     async def _append_message_chunk(
         self,
@@ -1136,23 +1342,31 @@ class Chat:
         operation: Literal["append", "replace"] = "append",
         icon: HTML | Tag | TagList | bool | None = None,
     ) -> None:
+        buffer = self._stream_buffers.get(stream_id)
+        concurrent = buffer is not None and buffer.concurrent
+
         # If currently we're in a *different* stream, queue the message chunk
-        if self._current_stream_id and self._current_stream_id != stream_id:
+        if (
+            not concurrent
+            and self._current_stream_id
+            and self._current_stream_id != stream_id
+        ):
             self._pending_messages.append(
                 (message, chunk, operation, stream_id)
             )
             return
 
-        self._current_stream_id = stream_id
+        if buffer is None:
+            buffer = self._stream_buffers[stream_id] = StreamBuffer()
+        if not concurrent:
+            self._current_stream_id = stream_id
 
         # Normalize various message types into a ChatMessage()
         msg = normalize_message_chunk(message)
         chunk_deps = msg.html_deps or []
 
         if operation == "replace":
-            if has_mixed_content_types(
-                self._message_stream_segments_checkpoint
-            ):
+            if has_mixed_content_types(buffer.checkpoint):
                 raise ValueError(
                     "Cannot `.replace()` a stream whose checkpoint spans multiple "
                     "content types (e.g. thinking followed by markdown). The replace "
@@ -1160,18 +1374,16 @@ class Chat:
                     "cannot be restored. Open a `.message_stream_context()` before the "
                     "mixed content to get a clean checkpoint, or use `.append()`."
                 )
-            self._current_stream_segments = copy_segments(
-                self._message_stream_segments_checkpoint
-            )
+            buffer.segments = copy_segments(buffer.checkpoint)
 
         append_to_segments(
-            self._current_stream_segments,
+            buffer.segments,
             msg.content,
             msg.content_type,
             chunk_deps or None,
         )
 
-        stream_content = segments_content(self._current_stream_segments)
+        stream_content = segments_content(buffer.segments)
 
         if operation == "replace":
             msg.content = stream_content
@@ -1190,31 +1402,54 @@ class Chat:
                 if msg is None:
                     return
                 if chunk == "end":
-                    stream_deps = segments_deps(self._current_stream_segments)
+                    stream_deps = segments_deps(buffer.segments)
                     serialized_deps = self._serialize_html_deps(stream_deps)
                     # _transform_message returns a single-segment StoredMessage, so all stream
                     # deps belong on segments[0].
                     if serialized_deps and msg.segments:
                         msg.segments[0].html_deps = serialized_deps
 
-            # Send the message to the client
-            await self._send_append_message(
-                message=msg,
-                chunk=chunk,
-                operation=operation,
-                icon=icon,
-            )
+            # Send the message to the client (attributing its bytes to this
+            # stream, whichever task is flushing it)
+            token = ACTIVE_STREAM_ID.set(stream_id)
+            try:
+                await self._send_append_message(
+                    message=msg,
+                    chunk=chunk,
+                    operation=operation,
+                    icon=icon,
+                    stream_id=stream_id if concurrent else None,
+                )
+            finally:
+                ACTIVE_STREAM_ID.reset(token)
+
+            if chunk == "start" and msg.role != "system":
+                buffer.role = msg.role
+                self._transcript.open(stream_id)
+            elif chunk == "end":
+                # A transformed stream ends on its full (replacement) content
+                final = (
+                    msg
+                    if isinstance(msg, StoredMessage)
+                    else self._stored_stream_message(buffer)
+                )
+                self._transcript.close(stream_id, final)
+                self._mark_settled(final.role)
         finally:
             if chunk == "end":
-                self._current_stream_id = None
-                self._current_stream_segments = []
-                self._message_stream_segments_checkpoint = []
+                # Drop the placeholder of a stream that never ended cleanly
+                self._transcript.close(stream_id, None)
+                self._stream_buffers.pop(stream_id, None)
+                if not concurrent:
+                    self._current_stream_id = None
 
     async def append_message_stream(
         self,
         message: Iterable[Any] | AsyncIterable[Any],
         *,
         icon: HTML | Tag | bool | None = None,
+        concurrent: bool = False,
+        threaded: bool = True,
     ):
         """
         Append a message as a stream of message chunks.
@@ -1245,6 +1480,24 @@ class Chat:
             assistant messages. The icon can be any HTML element (e.g., an
             :func:`~shiny.ui.img` tag) or a string of HTML. Pass ``False`` to remove
             the icon for this message, or ``True`` to use the default icon.
+        concurrent
+            Whether to stream this message independently of any other stream on
+            this chat. By default, only one stream runs at a time: chunks of a
+            second stream (and `.append_message()` calls) are queued until the
+            active stream ends. Concurrent streams are rendered as separate
+            messages that update side by side, each with its own content and
+            `.replace()` checkpoints, so independent producers (e.g., parallel
+            agents or tool progress reporters) don't block each other. A
+            concurrent stream doesn't replace `.latest_message_stream`. If the
+            browser's (e.g. cached) shinychat JavaScript predates concurrent
+            streams, they run one at a time instead.
+        threaded
+            Whether to advance a synchronous `message` iterable (e.g. a
+            generator over a sync LLM client's stream) on a worker thread, so
+            that waiting on it doesn't block other sessions. Pass `False` to
+            iterate on the event loop instead, e.g. for a cheap generator over
+            data already in memory. Lists, tuples, and other in-memory
+            collections, as well as async iterables, are never threaded.
 
         Note
         ----
@@ -1356,16 +1609,19 @@ class Chat:
         """
         from shiny import reactive
 
-        message = _utils.wrap_async_iterable(message)
+        message = _utils.wrap_async_iterable(message, threaded=threaded)
 
         # Run the stream in the background to get non-blocking behavior
         @reactive.extended_task
         async def _stream_task():
-            return await self._append_message_stream(message, icon=icon)
+            return await self._append_message_stream(
+                message, icon=icon, concurrent=concurrent
+            )
 
         _stream_task()
 
-        self._latest_stream.set(_stream_task)
+        if not concurrent:
+            self._latest_stream.set(_stream_task)
 
         # Since the task runs in the background (outside/beyond the current context,
         # if any), we need to manually raise any exceptions that occur
@@ -1411,23 +1667,75 @@ class Chat:
         self,
         message: AsyncIterable[Any],
         icon: HTML | Tag | bool | None = None,
+        concurrent: bool = False,
     ):
         id = _utils.private_random_id()
+        concurrent = self._can_stream_concurrently(concurrent)
+        if concurrent:
+            self._stream_buffers[id] = StreamBuffer(concurrent=True)
 
         empty = ChatMessageDict(content="", role="assistant")
         await self._append_message_chunk(
             empty, chunk="start", stream_id=id, icon=icon
         )
 
+        start = time.perf_counter()
+        first_chunk_at: float | None = None
+        n_chunks = 0
+        token = ACTIVE_STREAM_ID.set(id)
         try:
             async for msg in message:
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                n_chunks += 1
                 await self._append_message_chunk(msg, chunk=True, stream_id=id)
             # The string returned to the caller mirrors StoredMessage.content
             # (thinking wrapped in <thinking> tags), not segments_content's bare join.
-            return "".join(str(s) for s in self._current_stream_segments)
+            buffer = self._stream_buffers.get(id)
+            segments = buffer.segments if buffer is not None else []
+            return "".join(str(s) for s in segments)
         finally:
+            if isinstance(message, _utils.ThreadedIterable):
+                message.close()
+            ACTIVE_STREAM_ID.reset(token)
+            # Held onto, since ending the stream drops it
+            buffer = self._stream_buffers.get(id)
             await self._append_message_chunk(empty, chunk="end", stream_id=id)
-            await self._flush_pending_messages()
+            self._record_stream_metrics(
+                start,
+                first_chunk_at,
+                n_chunks,
+                buffer.bytes_sent if buffer is not None else 0,
+            )
+            if not concurrent:
+                await self._flush_pending_messages()
+
+    def _record_stream_metrics(
+        self,
+        start: float,
+        first_chunk_at: float | None,
+        n_chunks: int,
+        bytes_sent: int,
+    ) -> None:
+        if _metrics.get_metrics_sink() is None:
+            return
+        attrs = {"chat_id": self.id}
+        duration = time.perf_counter() - start
+        if first_chunk_at is not None:
+            _metrics.histogram(
+                "shinychat.stream.time_to_first_token",
+                first_chunk_at - start,
+                attrs,
+            )
+        _metrics.histogram("shinychat.stream.duration", duration, attrs)
+        _metrics.histogram("shinychat.stream.chunks", n_chunks, attrs)
+        if duration > 0:
+            _metrics.histogram(
+                "shinychat.stream.chunks_per_second",
+                n_chunks / duration,
+                attrs,
+            )
+        _metrics.histogram("shinychat.stream.bytes_sent", bytes_sent, attrs)
 
     async def _flush_pending_messages(self):
         pending = self._pending_messages
@@ -1450,12 +1758,20 @@ class Chat:
         chunk: ChunkOption = False,
         operation: Literal["append", "replace"] = "append",
         icon: HTML | Tag | TagList | bool | None = None,
+        stream_id: str | None = None,
     ):
         message = self._as_stored_message(message)
 
         if message.role == "system":
             return
 
+        if message.attachments:
+            attachments = await with_thumbnails(message.attachments)
+            if attachments is not message.attachments:
+                message = message.model_copy(
+                    update={"attachments": attachments}
+                )
+
         # Bare segment content (no <thinking> wrapping): on the wire, thinking
         # travels as raw text paired with content_type="thinking", and the
         # client builds the thinking block from that type. StoredMessage.content
@@ -1473,25 +1789,37 @@ class Chat:
         }
         if message.attachments:
             msg_payload["attachments"] = [
-                a.model_dump() for a in message.attachments
+                attachment_client_payload(a) for a in message.attachments
             ]
         icon_attr = _resolve_icon_attr(icon)
         if icon_attr is not None:
             msg_payload["icon"] = icon_attr
 
+        # Only concurrent streams are tagged; the client routes untagged chunks
+        # to its single active stream.
         if chunk == "start":
-            action: ChatAction = {"type": "chunk_start", "message": msg_payload}
-            await self._send_action(action, message.html_deps)
+            start_action: ChunkStartAction = {
+                "type": "chunk_start",
+                "message": msg_payload,
+            }
+            if stream_id is not None:
+                start_action["stream_id"] = stream_id
+            await self._send_action(start_action, message.html_deps)
         elif chunk == "end":
             if content:
-                chunk_action: ChatAction = {
+                chunk_action: ChunkAction = {
                     "type": "chunk",
                     "content": content,
                     "operation": operation,
                     "content_type": content_type,
                 }
+                if stream_id is not None:
+                    chunk_action["stream_id"] = stream_id
                 await self._send_action(chunk_action, message.html_deps)
-            await self._send_action({"type": "chunk_end"})
+            end_action: ChunkEndAction = {"type": "chunk_end"}
+            if stream_id is not None:
+                end_action["stream_id"] = stream_id
+            await self._send_action(end_action)
         elif chunk is True:
             chunk_action = {
                 "type": "chunk",
@@ -1499,16 +1827,55 @@ class Chat:
                 "operation": operation,
                 "content_type": content_type,
             }
+            if stream_id is not None:
+                chunk_action["stream_id"] = stream_id
             await self._send_action(chunk_action, message.html_deps)
         else:
             action = {"type": "message", "message": msg_payload}
             await self._send_action(action, message.html_deps)
+            self._transcript.append(message)
+            self._mark_settled(message.role)
+
+    def _stored_stream_message(self, buffer: StreamBuffer) -> StoredMessage:
+        return StoredMessage(
+            role=buffer.role,
+            segments=[
+                StoredSegment(
+                    content=s.content,
+                    content_type=s.content_type,
+                    html_deps=self._serialize_html_deps(s.html_deps),
+                )
+                for s in buffer.segments
+            ],
+        )
+
+    def _mark_settled(self, role: Role) -> None:
+        from shiny import reactive
+
+        if role == "assistant":
+            with reactive.isolate():
+                self._transcript_settled.set(self._transcript_settled() + 1)
+
+    def _settled_messages(self) -> tuple[StoredMessage, ...]:
+        """The settled transcript: the server's shadow copy, reconciled against
+        the client-reported snapshot.
+
+        The shadow copy is current as soon as a message is sent, so it wins --
+        unless the client reports more messages than the server has seen
+        (e.g. a conversation rendered before this `Chat` started tracking
+        it).
+        """
+        shadow = self._transcript.settled()
+        reported = self._reported_messages()
+        if len(reported) > len(shadow):
+            return reported
+        return shadow
 
     def _messages_for_bookmark(self) -> list[dict[str, Any]]:
         from shiny import reactive
 
         with reactive.isolate():
-            messages = self._reported_messages()
+            messages = self._settled_messages()
 
         dumps: list[dict[str, Any]] = []
         for m in messages:
@@ -1588,7 +1955,7 @@ class Chat:
                     ],
                     fn,
                 )
-                fn = _utils.wrap_async(fn)
+                fn = _utils.wrap_async(fn, threaded=self._threaded_callbacks)
 
                 async def _transform_wrapper(
                     content: str, chunk: str, done: bool
@@ -1605,7 +1972,9 @@ class Chat:
                     ],
                     fn,
                 )
-                self._transform_assistant = _utils.wrap_async(fn)
+                self._transform_assistant = _utils.wrap_async(
+                    fn, threaded=self._threaded_callbacks
+                )
             else:
                 raise Exception(
                     "A @transform_assistant_response function must take 1 or 3 arguments"
@@ -1628,11 +1997,14 @@ class Chat:
             message.role == "assistant"
             and self._transform_assistant is not None
         ):
-            content = await self._transform_assistant(
-                message.content,
-                chunk_content,
-                chunk == "end" or chunk is False,
-            )
+            with _metrics.timed(
+                "shinychat.transform.duration", {"chat_id": self.id}
+            ):
+                content = await self._transform_assistant(
+                    message.content,
+                    chunk_content,
+                    chunk == "end" or chunk is False,
+                )
         else:
             return res
 
@@ -1767,13 +2139,7 @@ class Chat:
             action["focus"] = focus
         if attachments is not None:
             action["attachments"] = [
-                {
-                    "mime": a.mime,
-                    "data_url": a.data_url,
-                    "name": a.name,
-                    "size": a.size,
-                }
-                for a in attachments
+                attachment_client_payload(a) for a in attachments
             ]
             if attachment_mode != "append":
                 action["attachment_mode"] = attachment_mode
@@ -1812,6 +2178,14 @@ class Chat:
             self._greeting_content = None
             action["greeting"] = True
         await self._send_action(action)
+        self._transcript.clear()
+
+    async def _truncate_messages(self, count: int) -> None:
+        """Remove every message after the first `count`, on the client and
+        in the shadow transcript."""
+        action: TruncateAfterAction = {"type": "truncate_after", "index": count}
+        await self._send_action(action)
+        self._transcript.truncate(count)
 
     def get_greeting(self) -> str | None:
         """
@@ -2025,14 +2399,30 @@ class Chat:
         }
         if html_deps:
             envelope["html_deps"] = html_deps
+        if _metrics.get_metrics_sink() is not None:
+            self._record_bytes_sent(action, envelope)
         await self._session.send_custom_message("shinyChatMessage", envelope)
 
+    def _record_bytes_sent(
+        self, action: ChatAction, envelope: dict[str, object]
+    ) -> None:
+        n_bytes = len(json.dumps(envelope, default=str).encode("utf-8"))
+        _metrics.counter(
+            "shinychat.chat.bytes_sent", n_bytes, {"action": action["type"]}
+        )
+        stream_id = ACTIVE_STREAM_ID.get()
+        buffer = self._stream_buffers.get(stream_id) if stream_id else None
+        if buffer is not None:
+            buffer.bytes_sent += n_bytes
+
     def enable_bookmarking(
         self,
         client: "ClientWithState | chatlas.Chat[Any, Any]",
         /,
         *,
         bookmark_on: Optional[Literal["response"]] = "response",
+        bookmark_state: Literal["full", "reference"] = "full",
+        bookmark_debounce: float = 0,
     ) -> CancelCallback:
         """
         Enable bookmarking for the chat instance.
@@ -2057,12 +2447,24 @@ class Chat:
             - `None`: no bookmark is triggered
 
             When this method triggers a bookmark, it also updates the URL query string to reflect the bookmarked state.
+        bookmark_state
+            What each bookmark stores. Supported values include:
+
+            - `"full"` (the default): the `client=`'s state and the chat's messages.
+            - `"reference"`: only the ids of the active history conversation and of the branch being viewed. Restoring the bookmark reopens that branch from the history store, so a bookmark costs the same however long the conversation grows. Requires chat history (see `Chat(history=)`), and only users who can see the conversation in their history can restore it.
+        bookmark_debounce
+            Seconds to wait after a response before triggering its bookmark
+            (with `bookmark_on="response"`). Responses that arrive within the
+            wait share one bookmark. With `bookmark_state="reference"`, no
+            new bookmark is triggered while the bookmarked branch is
+            unchanged.
 
 
         Raises
         ------
         ValueError
-            If the Shiny App does have bookmarking enabled.
+            If the Shiny App does have bookmarking enabled, or if
+            `bookmark_state="reference"` is used without chat history.
 
         Returns
         -------
@@ -2076,6 +2478,15 @@ class Chat:
         if session is None or session.is_stub_session():
             return BookmarkCancelCallback(lambda: None)
 
+        # In "reference" mode the history conversation (turns, messages and
+        # branch) stands in for the client and UI state of "full" bookmarks
+        by_reference = bookmark_state == "reference"
+        if by_reference and self.history._controller is None:
+            raise ValueError(
+                "`bookmark_state='reference'` requires chat history. Pass a "
+                "`client=` to `Chat()` and leave `history=` enabled."
+            )
+
         resolved_bookmark_id_str = str(self.id)
         resolved_bookmark_id_msgs_str = resolved_bookmark_id_str + "--msgs"
         get_state: Callable[[], Awaitable[Jsonifiable]]
@@ -2111,6 +2522,7 @@ class Chat:
             "_slash_command",
             "_greeting_requested",
             "_greeting_dismissed",
+            "_client_features",
         ):
             root_session.bookmark.exclude.append(self.id + suffix)
 
@@ -2127,6 +2539,7 @@ class Chat:
                 _update_query_string_on_bookmarked
             )
 
+        debouncer = BookmarkDebouncer(bookmark_debounce)
         effect_auto_bookmark = None
         if bookmark_on == "response":
 
@@ -2141,7 +2554,15 @@ class Chat:
                 last_message = messages[-1]
 
                 if last_message.get("role") == "assistant":
-                    await session.bookmark()
+                    # History saves the response in its own `self.messages`
+                    # effect, created (and so run) before this one: the
+                    # reference already points at the new leaf
+                    key = (
+                        self.history.bookmark_reference()
+                        if by_reference
+                        else None
+                    )
+                    await debouncer.request(session.bookmark, key)
 
             effect_auto_bookmark = _auto_bookmark
 
@@ -2150,6 +2571,9 @@ class Chat:
 
         @root_session.bookmark.on_bookmark
         async def _on_bookmark_client(state: BookmarkState):
+            if by_reference:
+                self.history.stamp_bookmark(state.values)
+                return
             if resolved_bookmark_id_str in state.values:
                 raise ValueError(
                     f'Bookmark value with id (`"{resolved_bookmark_id_str}"`) already exists.'
@@ -2172,6 +2596,8 @@ class Chat:
 
         @root_session.bookmark.on_bookmark
         def _on_bookmark_ui(state: BookmarkState):
+            if by_reference:
+                return
             if resolved_bookmark_id_msgs_str in state.values:
                 raise ValueError(
                     f'Bookmark value with id (`"{resolved_bookmark_id_msgs_str}"`) already exists.'
@@ -2195,7 +2621,9 @@ class Chat:
                 }
 
         # Attempt to stop the initialization of the `ui.Chat(messages=)` messages
-        self._init_chat.destroy()
+        # (history restores its conversation on top of them by reference)
+        if not by_reference:
+            self._init_chat.destroy()
 
         @root_session.bookmark.on_restore
         async def _on_restore_ui(state: RestoreState):
@@ -2207,6 +2635,9 @@ class Chat:
             # and `self.messages()` are never initialized due to
             # calling `self._init_chat.destroy()` above
 
+            if by_reference:
+                return
+
             if resolved_bookmark_id_msgs_str not in state.values:
                 # If no messages to restore, display the `__init__(messages=)` messages
                 await self._append_init_messages()
@@ -2234,6 +2665,7 @@ class Chat:
                 cancel_on_bookmarked()
             if effect_auto_bookmark is not None:
                 effect_auto_bookmark.destroy()
+            debouncer.cancel()
             _on_bookmark_client()
             _on_bookmark_ui()
             _on_bookmark_greeting()
@@ -2393,6 +2825,8 @@ class ChatExpress(Chat):
         *,
         bookmark_store: "Optional[BookmarkStore]" = None,
         bookmark_on: Optional[Literal["response"]] = "response",
+        bookmark_state: Literal["full", "reference"] = "full",
+        bookmark_debounce: float = 0,
     ) -> CancelCallback:
         """
         Enable bookmarking for the chat instance.
@@ -2419,11 +2853,23 @@ class ChatExpress(Chat):
             - `None`: no bookmark is triggered
 
             When this method triggers a bookmark, it also updates the URL query string to reflect the bookmarked state.
+        bookmark_state
+            What each bookmark stores. Supported values include:
+
+            - `"full"` (the default): the `client=`'s state and the chat's messages.
+            - `"reference"`: only the ids of the active history conversation and of the branch being viewed. Restoring the bookmark reopens that branch from the history store, so a bookmark costs the same however long the conversation grows. Requires chat history (see `Chat(history=)`), and only users who can see the conversation in their history can restore it.
+        bookmark_debounce
+            Seconds to wait after a response before triggering its bookmark
+            (with `bookmark_on="response"`). Responses that arrive within the
+            wait share one bookmark. With `bookmark_state="reference"`, no
+            new bookmark is triggered while the bookmarked branch is
+            unchanged.
 
         Raises
         ------
         ValueError
-            If the Shiny App does have bookmarking enabled.
+            If the Shiny App does have bookmarking enabled, or if
+            `bookmark_state="reference"` is used without chat history.
 
         Returns
         -------
@@ -2436,7 +2882,12 @@ class ChatExpress(Chat):
 
             app_opts(bookmark_store=bookmark_store)
 
-        return super().enable_bookmarking(client, bookmark_on=bookmark_on)
+        return super().enable_bookmarking(
+            client,
+            bookmark_on=bookmark_on,
+            bookmark_state=bookmark_state,
+            bookmark_debounce=bookmark_debounce,
+        )
 
 
 def _resolve_icon_attr(
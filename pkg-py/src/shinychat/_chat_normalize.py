@@ -3,7 +3,16 @@ from __future__ import annotations
 import json
 import sys
 from functools import singledispatch
-from typing import TYPE_CHECKING, Any, TypeGuard
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Callable,
+    Iterable,
+    TypeGuard,
+    get_args,
+    get_origin,
+)
 
 from htmltools import HTML, HTMLDependency, Tag, Tagifiable, TagList
 
@@ -100,6 +109,8 @@ def message_content(message):
             role=message.get("role", "assistant"),
             attachments=message.get("attachments"),
         )
+    if _register_provider_handlers(type(message)):
+        return message_content(message)
     raise ValueError(
         f"Don't know how to extract content for message type {type(message)}: {message}. "
         "Consider registering a function to handle this type via `@message_content.register`"
@@ -191,6 +202,8 @@ def message_content_chunk(chunk):
             role=chunk.get("role", "assistant"),
             attachments=chunk.get("attachments"),
         )
+    if _register_provider_handlers(type(chunk)):
+        return message_content_chunk(chunk)
     raise ValueError(
         f"Don't know how to extract content for message chunk type {type(chunk)}: {chunk}. "
         "Consider registering a function to handle this type via `@message_content_chunk.register`"
@@ -204,18 +217,24 @@ def message_content_chunk(chunk):
 
 @message_content.register
 def _(message: Tagifiable):
+    # Some provider types (e.g. chatlas tool content) are Tagifiable, so they
+    # land here until their provider's own, more specific handlers exist
+    if _register_provider_handlers(type(message)):
+        return message_content(message)
     return ChatMessage(content=message)
 
 
 @message_content_chunk.register
 def _(chunk: Tagifiable):
+    if _register_provider_handlers(type(chunk)):
+        return message_content_chunk(chunk)
     return ChatMessage(content=chunk)
 
 
 # -----------------------------------------------------------------
 # chatlas tool call display
 # -----------------------------------------------------------------
-try:
+def _register_chatlas() -> None:
     from chatlas import ContentToolRequest, ContentToolResult, Turn
     from chatlas.types import Content, ContentText
 
@@ -228,15 +247,15 @@ try:
         tool_result_message,
     )
 
-    @message_content.register
+    @message_content.register(Content)
     def _(message: Content):
         return ChatMessage(content=str(message))
 
-    @message_content_chunk.register
+    @message_content_chunk.register(Content)
     def _(chunk: Content):
         return message_content(chunk)
 
-    @message_content.register
+    @message_content.register(ContentText)
     def _(message: ContentText):
         text = message.text
         # chatlas' expand_tool_result() inserts <tool-content> XML wrapper
@@ -248,51 +267,51 @@ try:
             return ChatMessage(content="")
         return ChatMessage(content=text)
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentText)
     def _(chunk: ContentText):
         return message_content(chunk)
 
     from chatlas.types import ContentImageInline, ContentImageRemote, ContentPDF
 
-    @message_content.register
+    @message_content.register(ContentImageInline)
     def _(message: ContentImageInline):
         src = f"data:{message.image_content_type};base64,{message.data}"
         return ChatMessage(content=Tag("img", src=src))
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentImageInline)
     def _(chunk: ContentImageInline):
         return message_content(chunk)
 
-    @message_content.register
+    @message_content.register(ContentImageRemote)
     def _(message: ContentImageRemote):
         return ChatMessage(content=Tag("img", src=message.url))
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentImageRemote)
     def _(chunk: ContentImageRemote):
         return message_content(chunk)
 
-    @message_content.register
+    @message_content.register(ContentPDF)
     def _(message: ContentPDF):
         return ChatMessage(content=message.filename or "document.pdf")
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentPDF)
     def _(chunk: ContentPDF):
         return message_content(chunk)
 
-    @message_content.register
+    @message_content.register(ContentToolRequest)
     def _(chunk: ContentToolRequest):
         return ChatMessage(content=tool_request_contents(chunk))
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentToolRequest)
     def _(chunk: ContentToolRequest):
         return message_content(chunk)
 
-    @message_content.register
+    @message_content.register(ContentToolResult)
     def _(chunk: ContentToolResult):
         result = tool_result_contents(chunk)
         return tool_result_message(result)
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ContentToolResult)
     def _(chunk: ContentToolResult):
         return message_content(chunk)
 
@@ -306,7 +325,7 @@ try:
             WebSource,
         )
 
-        @message_content.register
+        @message_content.register(ContentToolRequestSearch)
         def _(message: ContentToolRequestSearch):
             if tool_display_override() == "none":
                 return ChatMessage(content="")
@@ -318,11 +337,11 @@ try:
                 )
             )
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentToolRequestSearch)
         def _(chunk: ContentToolRequestSearch):
             return message_content(chunk)
 
-        @message_content.register
+        @message_content.register(ContentToolResponseSearch)
         def _(message: ContentToolResponseSearch):
             if tool_display_override() == "none":
                 return ChatMessage(content="")
@@ -341,19 +360,19 @@ try:
                 )
             )
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentToolResponseSearch)
         def _(chunk: ContentToolResponseSearch):
             return message_content(chunk)
 
-        @message_content.register
+        @message_content.register(ContentToolRequestFetch)
         def _(message: ContentToolRequestFetch):
             return ChatMessage(content="")
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentToolRequestFetch)
         def _(chunk: ContentToolRequestFetch):
             return message_content(chunk)
 
-        @message_content.register
+        @message_content.register(ContentToolResponseFetch)
         def _(message: ContentToolResponseFetch):
             if tool_display_override() == "none":
                 return ChatMessage(content="")
@@ -366,11 +385,11 @@ try:
                 )
             )
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentToolResponseFetch)
         def _(chunk: ContentToolResponseFetch):
             return message_content(chunk)
 
-        @message_content.register
+        @message_content.register(ContentCitation)
         def _(message: ContentCitation):
             if tool_display_override() == "none" or not isinstance(
                 message.source, WebSource
@@ -386,7 +405,7 @@ try:
                 content_type="markdown",
             )
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentCitation)
         def _(chunk: ContentCitation):
             return message_content(chunk)
 
@@ -398,25 +417,25 @@ try:
     try:
         from chatlas.types import ContentThinking, ContentThinkingDelta
 
-        @message_content.register
+        @message_content.register(ContentThinking)
         def _(chunk: ContentThinking):
             return ChatMessage(content=chunk.thinking, content_type="thinking")
 
-        @message_content.register
+        @message_content.register(ContentThinkingDelta)
         def _(chunk: ContentThinkingDelta):
             return ChatMessage(content=chunk.thinking, content_type="thinking")
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentThinking)
         def _(chunk: ContentThinking):
             return ChatMessage(content=chunk.thinking, content_type="thinking")
 
-        @message_content_chunk.register
+        @message_content_chunk.register(ContentThinkingDelta)
         def _(chunk: ContentThinkingDelta):
             return ChatMessage(content=chunk.thinking, content_type="thinking")
     except ImportError:
         pass
 
-    @message_content.register
+    @message_content.register(Turn)
     def _(message: Turn):
         content = ""
         deps: list[HTMLDependency] = []
@@ -441,15 +460,13 @@ try:
         result.html_deps = deps + result.html_deps
         return result
 
-    @message_content_chunk.register
+    @message_content_chunk.register(Turn)
     def _(chunk: Turn):
         return message_content(chunk)
 
     # N.B., unlike R, Python Chat stores UI state and so can replay
     # it with additional workarounds. That's why R currently has a
     # shinychat_contents() method for Chat, but Python doesn't.
-except ImportError:
-    pass
 
 
 def normalize_message(message: Any) -> ChatMessage:
@@ -463,6 +480,10 @@ def normalize_message_chunk(chunk: Any) -> ChatMessage:
 
 
 def _is_tool_result(value: object) -> TypeGuard["ContentToolResult"]:
+    # Nothing can be a chatlas object until chatlas has been imported, and
+    # checking first keeps us from importing it just to find that out
+    if "chatlas" not in sys.modules:
+        return False
     try:
         from chatlas.types import ContentToolResult
 
@@ -532,10 +553,11 @@ def _wrap_custom_tool_result(message: Any, msg: ChatMessage) -> ChatMessage:
 # LangChain content extractor
 # ------------------------------------------------------------------
 
-try:
+
+def _register_langchain() -> None:
     from langchain_core.messages import BaseMessage, BaseMessageChunk
 
-    @message_content.register
+    @message_content.register(BaseMessage)
     def _(message: BaseMessage):
         if isinstance(message.content, list):
             raise ValueError(
@@ -547,7 +569,7 @@ try:
             role="assistant",
         )
 
-    @message_content_chunk.register
+    @message_content_chunk.register(BaseMessageChunk)
     def _(chunk: BaseMessageChunk):
         if isinstance(chunk.content, list):
             raise ValueError(
@@ -558,44 +580,42 @@ try:
             content=chunk.content,
             role="assistant",
         )
-except ImportError:
-    pass
 
 
 # ------------------------------------------------------------------
 # OpenAI content extractor
 # ------------------------------------------------------------------
 
-try:
+
+def _register_openai() -> None:
     from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
-    @message_content.register
+    @message_content.register(ChatCompletion)
     def _(message: ChatCompletion):
         return ChatMessage(
             content=message.choices[0].message.content,
             role="assistant",
         )
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ChatCompletionChunk)
     def _(chunk: ChatCompletionChunk):
         return ChatMessage(
             content=chunk.choices[0].delta.content,
             role="assistant",
         )
-except ImportError:
-    pass
 
 
 # ------------------------------------------------------------------
 # Anthropic content extractor
 # ------------------------------------------------------------------
 
-try:
+
+def _register_anthropic() -> None:
     from anthropic.types import (  # pyright: ignore[reportMissingImports]
         Message as AnthropicMessage,
     )
 
-    @message_content.register
+    @message_content.register(AnthropicMessage)
     def _(message: AnthropicMessage):
         content = message.content[0]
         if content.type != "text":
@@ -611,7 +631,14 @@ try:
             RawMessageStreamEvent,
         )
 
-        @message_content_chunk.register
+        # An Annotated[Union[...], ...]; register() wants the bare union
+        stream_event = (
+            get_args(RawMessageStreamEvent)[0]
+            if get_origin(RawMessageStreamEvent) is Annotated
+            else RawMessageStreamEvent
+        )
+
+        @message_content_chunk.register(stream_event)
         def _(chunk: RawMessageStreamEvent):
             content = ""
             if chunk.type == "content_block_delta":
@@ -623,29 +650,28 @@ try:
                 content = chunk.delta.text
 
             return ChatMessage(content=content)
-except ImportError:
-    pass
 
 
 # ------------------------------------------------------------------
 # Google content extractor
 # ------------------------------------------------------------------
 
-try:
+
+def _register_google() -> None:
     from google.genai.types import (
         Content,
         GenerateContentResponse,
     )
 
-    @message_content.register
+    @message_content.register(GenerateContentResponse)
     def _(message: GenerateContentResponse):
         return ChatMessage(content=message.text)
 
-    @message_content_chunk.register
+    @message_content_chunk.register(GenerateContentResponse)
     def _(chunk: GenerateContentResponse):
         return ChatMessage(content=chunk.text)
 
-    @message_content.register
+    @message_content.register(Content)
     def _(message: Content):
         content = ""
         parts = message.parts  # pyright: ignore[reportAttributeAccessIssue]
@@ -661,31 +687,95 @@ try:
             role = "assistant"
         return ChatMessage(content=content, role=role)
 
-    @message_content_chunk.register
+    @message_content_chunk.register(Content)
     def _(chunk: Content):
         # reuse the message logic
         return message_content(chunk)
 
-except ImportError:
-    pass
-
 
 # ------------------------------------------------------------------
 # Ollama content extractor
 # ------------------------------------------------------------------
 
-try:
+
+def _register_ollama() -> None:
     from ollama import ChatResponse
 
-    @message_content.register
+    @message_content.register(ChatResponse)
     def _(message: ChatResponse):
         msg = message.message
         return ChatMessage(msg.content)
 
-    @message_content_chunk.register
+    @message_content_chunk.register(ChatResponse)
     def _(chunk: ChatResponse):
         msg = chunk.message
         return ChatMessage(msg.content)
 
-except ImportError:
-    pass
+
+# ------------------------------------------------------------------
+# Deferred provider registration
+# ------------------------------------------------------------------
+
+# Importing provider SDKs can take seconds, so their handlers aren't
+# registered at import time. Instead, the first object from a provider's
+# package that reaches a fallback handler above triggers that provider's
+# registrations, and dispatch is retried. Keys are package module prefixes.
+PROVIDER_REGISTRATIONS: dict[str, Callable[[], None]] = {
+    "chatlas": _register_chatlas,
+    "langchain_core": _register_langchain,
+    "openai": _register_openai,
+    "anthropic": _register_anthropic,
+    "google.genai": _register_google,
+    "ollama": _register_ollama,
+}
+
+# Types already checked against PROVIDER_REGISTRATIONS
+_PROVIDER_CHECKED: set[type] = set()
+
+
+def register_provider_handlers(prefixes: Iterable[str] | None = None) -> None:
+    """
+    Run pending provider registrations now, rather than on first use: all of
+    them, or only those for the given package `prefixes`.
+    """
+    for prefix in list(PROVIDER_REGISTRATIONS):
+        if prefixes is None or prefix in prefixes:
+            _run_provider_registration(prefix)
+
+
+def _register_provider_handlers(cls: type) -> bool:
+    """
+    Run the pending registrations for the provider package that `cls` (or
+    one of its bases) comes from. Returns True if any ran, in which case the
+    caller should dispatch again.
+    """
+    if not PROVIDER_REGISTRATIONS or cls in _PROVIDER_CHECKED:
+        return False
+    _PROVIDER_CHECKED.add(cls)
+    registered = False
+    for klass in cls.__mro__:
+        module = klass.__module__
+        for prefix in list(PROVIDER_REGISTRATIONS):
+            if module == prefix or module.startswith(prefix + "."):
+                registered = _run_provider_registration(prefix) or registered
+    return registered
+
+
+def _run_provider_registration(prefix: str) -> bool:
+    register = PROVIDER_REGISTRATIONS.pop(prefix, None)
+    if register is None:
+        return False
+    # Handlers registered before this (e.g. by app authors) must keep
+    # winning, as they did when providers were registered at import time
+    dispatchers = (message_content, message_content_chunk)
+    before = [dict(fn.registry) for fn in dispatchers]
+    try:
+        register()
+    except ImportError:
+        return False
+    finally:
+        for fn, prev in zip(dispatchers, before):
+            for cls, impl in prev.items():
+                if fn.registry[cls] is not impl:
+                    fn.register(cls, impl)
+    return True
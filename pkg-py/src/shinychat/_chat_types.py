@@ -43,6 +43,8 @@ class MessageAction(TypedDict):
 class ChunkStartAction(TypedDict):
     type: Literal["chunk_start"]
     message: MessagePayload
+    # Only set for concurrent streams, which the client renders separately
+    stream_id: NotRequired[str]
 
 
 class ChunkAction(TypedDict):
@@ -50,10 +52,12 @@ class ChunkAction(TypedDict):
     content: str
     operation: Literal["append", "replace"]
     content_type: NotRequired[ContentType]
+    stream_id: NotRequired[str]
 
 
 class ChunkEndAction(TypedDict):
     type: Literal["chunk_end"]
+    stream_id: NotRequired[str]
 
 
 class ClearAction(TypedDict):
@@ -61,6 +65,12 @@ class ClearAction(TypedDict):
     greeting: NotRequired[bool]
 
 
+class TruncateAfterAction(TypedDict):
+    # Keep only the first `index` messages
+    type: Literal["truncate_after"]
+    index: int
+
+
 class UpdateInputAction(TypedDict):
     type: Literal["update_input"]
     value: NotRequired[str]
@@ -82,7 +92,10 @@ class UpdateCancelAction(TypedDict):
 
 class UpdateUploadAction(TypedDict):
     type: Literal["update_upload"]
-    enable_upload: bool
+    enable_upload: NotRequired[bool]
+    # Whether large attachments may be uploaded over HTTP (see
+    # _attachment_upload.py) instead of inline in the input value
+    http_upload: NotRequired[bool]
 
 
 class GreetingOptions(TypedDict):
@@ -154,6 +167,7 @@ ChatAction = Union[
     ChunkAction,
     ChunkEndAction,
     ClearAction,
+    TruncateAfterAction,
     UpdateInputAction,
     RemoveLoadingAction,
     UpdateCancelAction,
@@ -5,14 +5,29 @@ import dataclasses
 import warnings
 from typing import TYPE_CHECKING, Any, Awaitable, Callable, Literal
 
-from ._attachments import Attachment, validate_attachments
+from . import _metrics
+from ._attachment_upload import parse_attachments
+from ._attachments import attachment_client_payload, validate_attachments
 from ._chat_types import (
     HistoryNavigateAction,
     HistoryUpdateAction,
     UpdateInputAction,
     UpdateSiblingsAction,
 )
-from ._history_bookmark import delete_bookmark_state, extract_state_id
+from ._history_bookmark import (
+    BookmarkDebouncer,
+    bookmark_reference_keys,
+    delete_bookmark_state,
+    extract_state_id,
+)
+from ._history_cache import (
+    cache_record,
+    caches_records,
+    discard_records,
+    is_cached,
+    resolve_prefetch_count,
+    take_record,
+)
 from ._history_client import (
     TurnsAdapter,
     as_turns_adapter,
@@ -30,10 +45,12 @@ from ._history_title import (
     generate_title,
 )
 from ._history_types import (
+    ConversationConflictError,
     ConversationRecord,
     check_schema_version,
     new_conversation_record,
 )
+from ._utils import wrap_async
 
 if TYPE_CHECKING:
     from htmltools import HTML, Tag, TagList
@@ -42,6 +59,9 @@ if TYPE_CHECKING:
     from ._chat import Chat
     from ._chat_types import ChatGreeting
 
+#: Compare-and-swap attempts per save before a write conflict is raised.
+MAX_PUT_ATTEMPTS = 3
+
 
 @dataclasses.dataclass(frozen=True)
 class HistoryInputIds:
@@ -54,6 +74,7 @@ class HistoryInputIds:
     new: ResolvedId
     rename: ResolvedId
     delete: ResolvedId
+    open: ResolvedId
     message_edit: ResolvedId
     message_navigate: ResolvedId
 
@@ -69,6 +90,7 @@ class HistoryInputIds:
             new=RID(f"{chat_id}_history_new"),
             rename=RID(f"{chat_id}_history_rename"),
             delete=RID(f"{chat_id}_history_delete"),
+            open=RID(f"{chat_id}_history_open"),
             message_edit=RID(f"{chat_id}_message_edit"),
             message_navigate=RID(f"{chat_id}_message_navigate"),
         )
@@ -115,10 +137,17 @@ class HistoryOptions:
         auxiliary UI state alongside the conversation. Values captured by
         ``@chat.history.on_save`` are persisted in the conversation record in
         this mode, but are never passed to ``on_restore``.
+
+        Whenever the app uses Shiny bookmarks, each bookmark records a
+        reference to the active conversation and the branch being viewed,
+        and restoring the bookmark reopens that branch.
     store
         Where conversations are persisted. ``"auto"`` (the default) picks
         ``FileConversationStore`` in most environments and defers to the
-        platform on Posit Connect. ``"memory"`` keeps conversations in
+        platform on Posit Connect; when the ``SHINYCHAT_HISTORY_URL``
+        environment variable holds an fsspec URL (e.g.
+        ``s3://bucket/prefix``), it picks ``FsspecConversationStore`` there
+        instead. ``"memory"`` keeps conversations in
         process only (useful for testing). ``"file"`` always uses the file
         system. Pass a fully-constructed ``ConversationStore`` instance for
         custom back-ends.
@@ -137,6 +166,15 @@ class HistoryOptions:
         ``TitleFn`` callable to use custom logic instead. Pass ``None`` to
         skip LLM titling entirely — the conversation keeps its initial
         timestamp-based name.
+    max_store_mb
+        Storage budget for a scope's conversations, in megabytes. The oldest
+        conversations are evicted once it is exceeded. ``None`` disables
+        eviction.
+    bookmark_debounce
+        For ``restore_mode="bookmark"``: seconds to wait after a response
+        before minting its server bookmark. Responses that arrive within the
+        wait share one bookmark. ``0`` (the default) mints a bookmark as soon
+        as each response is saved.
     """
 
     def __init__(
@@ -146,6 +184,7 @@ class HistoryOptions:
         scope: "str | Callable[..., str] | None" = None,
         title: "TitleFn | Literal['auto'] | None" = "auto",
         max_store_mb: float | None = 100.0,
+        bookmark_debounce: float = 0,
     ) -> None:
         self.restore_mode: "Literal['browser', 'url', 'none', 'bookmark']" = (
             restore_mode
@@ -156,6 +195,34 @@ class HistoryOptions:
         self.scope: "str | Callable[..., str] | None" = scope
         self.title: "TitleFn | Literal['auto'] | None" = title
         self.max_store_mb: float | None = max_store_mb
+        self.bookmark_debounce: float = bookmark_debounce
+
+
+def snapshot_record(record: ConversationRecord) -> ConversationRecord:
+    """
+    Copy `record` so that later in-place updates (new nodes, UI messages,
+    navigation, `on_save` values) don't reach it. Turn dicts, which are never
+    modified once stored, are shared, and lazily loaded nodes that haven't
+    been read stay unread.
+    """
+    nodes = {
+        nid: node.model_copy(
+            update={
+                "children": list(node.children),
+                "ui": list(node.ui) if node.ui is not None else None,
+            }
+            if node.is_loaded()
+            else {"children": list(node.children)}
+        )
+        for nid, node in record.nodes.items()
+    }
+    return record.model_copy(
+        update={
+            "nodes": nodes,
+            "client_info": dict(record.client_info),
+            "values": dict(record.values),
+        }
+    )
 
 
 def extend_record_linear(
@@ -216,6 +283,7 @@ class HistoryController:
         save_callbacks: "list[Callable[[dict[str, Any]], None]] | None" = None,
         restore_callbacks: "list[Callable[[dict[str, Any]], None]] | None" = None,
         max_store_bytes: int | None = None,
+        threaded_callbacks: bool = False,
     ):
         self.chat = chat
         self.adapter = adapter
@@ -232,6 +300,8 @@ class HistoryController:
         self._restore_callbacks: list[Callable[[dict[str, Any]], None]] = (
             restore_callbacks if restore_callbacks is not None else []
         )
+        # Run sync on_save callbacks and title_fn on the callback thread pool
+        self.threaded_callbacks = threaded_callbacks
 
         self.partition: ConversationPartition | None = None
         self.record: ConversationRecord | None = None  # None => unsaved draft
@@ -261,33 +331,145 @@ class HistoryController:
         self.on_settled: Callable[[bool], Awaitable[None]] | None = None
         self.max_store_bytes: int | None = max_store_bytes
         self._title_task: asyncio.Task[None] | None = None
+        self._prefetch_task: asyncio.Task[None] | None = None
+        # (id, current_leaf) of the active record as last saved or loaded,
+        # so save_current() can skip re-saving an unchanged conversation
+        self._saved_leaf: tuple[str, str | None] | None = None
         self._over_budget_warned: bool = False
+        # conversation id -> its most recently queued background save
+        self._pending_saves: dict[str, asyncio.Task[None]] = {}
+        # Set at session end: queued saves still finish, without the client
+        self._session_ended = False
 
     async def _get_record(
         self, partition: ConversationPartition, conv_id: str
     ) -> ConversationRecord | None:
-        record = await self.store.get(partition, conv_id)
+        with _metrics.span("shinychat.history.get", self._store_attrs()):
+            record = await self.store.get(partition, conv_id)
         if record is not None:
             check_schema_version(record.schema_version)
         return record
 
+    async def _load_record(
+        self, partition: ConversationPartition, conv_id: str
+    ) -> ConversationRecord | None:
+        """Like `_get_record()`, but takes the record out of the worker's
+        record cache (see `_history_cache`) when the copy there is current.
+
+        The record becomes the caller's to modify.
+        """
+        if caches_records(self.store):
+            metas = await self.store.list(partition)
+            meta = next((m for m in metas if m.id == conv_id), None)
+            if meta is not None:
+                record = take_record(
+                    self.store, partition, conv_id, meta.revision
+                )
+                _metrics.counter(
+                    "shinychat.history.record_cache",
+                    1,
+                    {**self._store_attrs(), "hit": record is not None},
+                )
+                if record is not None:
+                    return record
+        return await self._get_record(partition, conv_id)
+
+    async def _release_record(self, record: ConversationRecord) -> None:
+        """Hand a record this session no longer uses to the record cache."""
+        if self.partition is None or not caches_records(self.store):
+            return
+        metas = await self.store.list(self.partition)
+        meta = next((m for m in metas if m.id == record.id), None)
+        if meta is not None and meta.revision == record.revision:
+            cache_record(self.store, self.partition, record, meta.size_bytes)
+
     async def _put_record(
-        self, partition: ConversationPartition, record: ConversationRecord
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        *,
+        live: ConversationRecord | None = None,
     ) -> None:
+        """Write `record`, a copy of `live` (the in-session record) if given.
+
+        With a `compare_and_swap` store, a write that lost a race with
+        another writer -- another tab or worker, say -- is merged with the
+        stored copy and retried, rather than overwriting it. The merge lands
+        in `live`, so the session keeps the other writer's edits too.
+        """
         check_schema_version(record.schema_version)
-        await self.store.put(partition, record)
+        if live is None:
+            live = record
+        if not self.store.compare_and_swap:
+            with _metrics.span("shinychat.history.put", self._store_attrs()):
+                await self.store.put(partition, record)
+            self._note_saved(partition, record, live)
+            return
+        for attempt in range(MAX_PUT_ATTEMPTS):
+            try:
+                with _metrics.span(
+                    "shinychat.history.put", self._store_attrs()
+                ):
+                    await self.store.put(
+                        partition, record, expected_revision=record.revision
+                    )
+            except ConversationConflictError:
+                if attempt == MAX_PUT_ATTEMPTS - 1:
+                    raise
+                _metrics.counter(
+                    "shinychat.history.put_conflicts", 1, self._store_attrs()
+                )
+                stored = await self._get_record(partition, record.id)
+                if stored is None:
+                    live.revision = 0  # deleted meanwhile: recreate it
+                else:
+                    live.merge(stored)
+                if record is not live:
+                    record = snapshot_record(live)
+                continue
+            live.revision = record.revision
+            self._note_saved(partition, record, live)
+            return
+
+    def _note_saved(
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        live: ConversationRecord,
+    ) -> None:
+        # Any cached copy (e.g. one another session switched away from) is
+        # now out of date
+        discard_records(self.store, partition, [record.id])
+        if live is self.record:
+            self._saved_leaf = (record.id, record.current_leaf)
+
+    def _store_attrs(self) -> dict[str, str]:
+        return {"store": type(self.store).__name__}
 
     # -- save -----------------------------------------------------------
 
     async def on_response(self) -> None:
         """Save trigger: a completed assistant response.
 
-        Reads ``self.ui_offset`` near the top and writes it near the bottom,
-        with awaits (``store.put``, eviction, bookmark mint) in between. This
-        is safe without an explicit lock because Shiny serializes reactive
-        flushes behind a single process-wide ``reactive.lock()`` for the
-        full duration of effect execution, so two invocations of this effect
-        can never overlap.
+        Like ``schedule_response()``, but waits for the save to finish and
+        raises its errors.
+        """
+        task = await self.schedule_response()
+        if task is not None:
+            await task
+
+    async def schedule_response(
+        self, on_error: Callable[[Exception], Awaitable[None]] | None = None
+    ) -> asyncio.Task[None] | None:
+        """Fold a completed response into the record and queue its save.
+
+        The record (and ``self.ui_offset``) is updated right away, while the
+        caller's reactive effect still holds Shiny's process-wide
+        ``reactive.lock()``. The store write, eviction, bookmark mint and
+        client updates then run in a background task (see ``_enqueue_save``),
+        so slow storage never blocks reactive flushes for other sessions.
+        Returns that task, or ``None`` when there is nothing new to save.
+        Errors are passed to ``on_error`` when given, else raised by the task.
         """
         if self.partition is None:
             raise RuntimeError("HistoryController not initialized")
@@ -312,7 +494,7 @@ class HistoryController:
             if len(turn_groups) <= len(record.path_node_ids()) and len(
                 messages
             ) <= len(stored_ui):
-                return
+                return None
 
         if first_save:
             turns_flat = self.adapter.get_turns_json()
@@ -328,37 +510,117 @@ class HistoryController:
             record, turn_groups, messages, ui_offset=self.ui_offset
         )
         record.response_count += 1
-        self._capture_app_state(record)
-        await self._put_record(self.partition, record)
-        await self._evict_if_needed()
-        if self.on_response_saved is not None:
-            await self.on_response_saved(record)
+        await self._capture_app_state(record)
         self.ui_offset = len(messages)
-        await self.send_history_update()
-        await self._send_sibling_metadata()
-
-        if first_save and self.on_active_id_change is not None:
-            await self.on_active_id_change(record.id)
 
         # Wait for the second response before titling: gives the LLM/custom
         # title_fn more context than a single exchange, and avoids spending
         # a call on conversations abandoned after one message. response_count
         # (not turn/node counts) drives this, since a single response's
         # turn-group count isn't fixed across client types.
+        title_turns = None
         if (
             self.title_enabled
             and record.title_source is None
             and record.response_count == 2
         ):
-            turns_flat = self.adapter.get_turns_json()
-            self._title_task = asyncio.create_task(self.retitle(turns_flat))
-            self._title_task.add_done_callback(title_task_done)
+            title_turns = self.adapter.get_turns_json()
+
+        partition = self.partition
+        snapshot = snapshot_record(record)
+
+        async def persist() -> None:
+            await self._put_record(partition, snapshot, live=record)
+            await self._evict_if_needed()
+            if self._session_ended:
+                return  # stored; there's no client left to update
+            if self.on_response_saved is not None:
+                await self.on_response_saved(snapshot)
+            await self.send_history_update()
+            await self._send_sibling_metadata()
+
+            if first_save and self.on_active_id_change is not None:
+                await self.on_active_id_change(record.id)
+
+            if title_turns is not None:
+                self._title_task = asyncio.create_task(
+                    self.retitle(title_turns)
+                )
+                self._title_task.add_done_callback(title_task_done)
+
+        return self._enqueue_save(record.id, persist, on_error)
+
+    def _enqueue_save(
+        self,
+        conv_id: str,
+        job: Callable[[], Awaitable[None]],
+        on_error: Callable[[Exception], Awaitable[None]] | None = None,
+    ) -> asyncio.Task[None]:
+        """Run ``job`` in the background after the conversation's earlier saves.
+
+        Saves of one conversation run one at a time, in the order they were
+        queued; saves of different conversations may overlap.
+        """
+        prev = self._pending_saves.get(conv_id)
+
+        async def run() -> None:
+            if prev is not None:
+                # Its errors were reported to its own caller
+                await asyncio.wait([prev])
+            try:
+                await job()
+            except Exception as e:
+                if self._session_ended:
+                    # The session is gone, so there's nobody to notify
+                    warnings.warn(f"Background save failed: {e}", stacklevel=1)
+                    return
+                if on_error is None:
+                    raise
+                await on_error(e)
+
+        task = asyncio.create_task(run())
+        self._pending_saves[conv_id] = task
+
+        def done(t: asyncio.Task[None]) -> None:
+            if self._pending_saves.get(conv_id) is t:
+                del self._pending_saves[conv_id]
+
+        task.add_done_callback(done)
+        return task
+
+    def _enqueue_put(self, record: ConversationRecord) -> asyncio.Task[None]:
+        """Queue a write of `record`, the in-session record, after the
+        conversation's earlier saves, so an older snapshot can't land last.
+        """
+        partition = self.partition
+        if partition is None:
+            raise RuntimeError("HistoryController not initialized")
+
+        async def persist() -> None:
+            # Snapshot when the job runs, so it includes the earlier saves
+            await self._put_record(
+                partition, snapshot_record(record), live=record
+            )
+
+        return self._enqueue_save(record.id, persist)
+
+    async def flush_saves(self) -> None:
+        """Wait for every queued save to finish."""
+        pending = list(self._pending_saves.values())
+        if pending:
+            await asyncio.wait(pending)
 
     async def retitle(self, turns: list[dict[str, Any]]) -> None:
         target = self.record  # capture before the slow LLM call
         if target is None or target.title_source == "user":
             return
-        title = await generate_title(self.title_fn, self.client, turns)
+        with _metrics.span("shinychat.history.title", self._store_attrs()):
+            title = await generate_title(
+                self.title_fn,
+                self.client,
+                turns,
+                threaded=self.threaded_callbacks,
+            )
         if (
             title is None
             or self.record is not target
@@ -369,13 +631,59 @@ class HistoryController:
         target.title_source = "llm"
         if self.partition is None:
             raise RuntimeError("HistoryController not initialized")
+        await self.flush_saves()
         await self._put_record(self.partition, target)
         await self.send_history_update()
 
     def cancel_pending(self) -> None:
-        """Cancel in-flight background work (e.g. titling) at teardown."""
-        if self._title_task is not None and not self._title_task.done():
-            self._title_task.cancel()
+        """Cancel in-flight background work (e.g. titling) at teardown.
+
+        Queued saves are left to finish writing to the store, but skip their
+        client updates.
+        """
+        self._session_ended = True
+        for task in (self._title_task, self._prefetch_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    def schedule_prefetch(self) -> None:
+        """Prefetch in the background (see `prefetch()`), unless a prefetch
+        is already running."""
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            return
+        self._prefetch_task = asyncio.create_task(self.prefetch())
+        self._prefetch_task.add_done_callback(prefetch_task_done)
+
+    async def prefetch(self, count: int | None = None) -> None:
+        """Load the most recent conversations into the worker's record cache,
+        so switching to one doesn't wait on the store.
+
+        `count` defaults to ``SHINYCHAT_HISTORY_PREFETCH``. The active
+        conversation and those already cached are skipped.
+        """
+        if self.partition is None or not caches_records(self.store):
+            return
+        if count is None:
+            count = resolve_prefetch_count()
+        if count <= 0:
+            return
+        partition = self.partition
+        active = self.record.id if self.record is not None else None
+        metas = [
+            m for m in (await self.store.list(partition)) if m.id != active
+        ][:count]
+        metas = [m for m in metas if not is_cached(self.store, partition, m.id)]
+        if not metas:
+            return
+        with _metrics.span("shinychat.history.prefetch", self._store_attrs()):
+            records = await self.store.get_many(
+                partition, [m.id for m in metas]
+            )
+        for meta in metas:
+            record = records.get(meta.id)
+            if record is not None:
+                check_schema_version(record.schema_version)
+                cache_record(self.store, partition, record, meta.size_bytes)
 
     async def notify_settled(self, restored: bool) -> None:
         """Called whenever it's known whether the active conversation is a restore."""
@@ -383,10 +691,20 @@ class HistoryController:
             await self.on_settled(restored)
 
     async def _evict_one(self, conv_id: str) -> None:
+        await self._evict([conv_id])
+
+    async def _evict(self, conv_ids: list[str]) -> None:
         assert self.partition is not None
+        if not conv_ids:
+            return
         if self.on_evict is not None:
-            await self.on_evict(conv_id)
-        await self.store.delete(self.partition, conv_id)
+            for conv_id in conv_ids:
+                await self.on_evict(conv_id)
+        await self.store.delete_many(self.partition, conv_ids)
+        discard_records(self.store, self.partition, conv_ids)
+        _metrics.counter(
+            "shinychat.history.evictions", len(conv_ids), self._store_attrs()
+        )
 
     async def _evict_if_needed(self) -> None:
         if self.max_store_bytes is None or self.partition is None:
@@ -395,13 +713,15 @@ class HistoryController:
         total = sum(m.size_bytes for m in metas)
         if total <= self.max_store_bytes:
             return
+        victims: list[str] = []
         for meta in reversed(metas):  # oldest first
             if self.record is not None and meta.id == self.record.id:
                 continue
             total -= meta.size_bytes
-            await self._evict_one(meta.id)
+            victims.append(meta.id)
             if total <= self.max_store_bytes:
                 break
+        await self._evict(victims)
         if total > self.max_store_bytes and not self._over_budget_warned:
             self._over_budget_warned = True
             warnings.warn(
@@ -413,22 +733,37 @@ class HistoryController:
             )
 
     async def save_current(self) -> None:
-        """Persist the active conversation if it has ever been saved."""
+        """Persist the active conversation if it has ever been saved.
+
+        Skips the write when nothing changed since it was last saved or
+        loaded: no new turns or messages, the same branch, and the same
+        `on_save` values.
+        """
         if self.record is None or self.partition is None:
             return
+        await self.flush_saves()
+        record = self.record
         turn_groups = self.adapter.get_turns_grouped()
         messages = self.chat._messages_for_bookmark()
+        unchanged = (
+            len(turn_groups) <= len(record.path_node_ids())
+            and len(messages) <= self.ui_offset
+            and self._saved_leaf == (record.id, record.current_leaf)
+        )
+        values = record.values
         extend_record_linear(
-            self.record, turn_groups, messages, ui_offset=self.ui_offset
+            record, turn_groups, messages, ui_offset=self.ui_offset
         )
-        self._capture_app_state(self.record)
-        await self._put_record(self.partition, self.record)
+        await self._capture_app_state(record)
+        if unchanged and record.values == values:
+            return
+        await self._put_record(self.partition, record)
         self.ui_offset = len(messages)
 
-    def _capture_app_state(self, record: ConversationRecord) -> None:
+    async def _capture_app_state(self, record: ConversationRecord) -> None:
         values: dict[str, Any] = {}
         for cb in self._save_callbacks:
-            cb(values)
+            await wrap_async(cb, threaded=self.threaded_callbacks)(values)
         record.values = values
 
     def _restore_app_state(self, values: dict[str, Any]) -> None:
@@ -444,7 +779,7 @@ class HistoryController:
             return
         # Load BEFORE mutating anything: a failed load must leave the
         # current conversation untouched.
-        target = await self._get_record(self.partition, conv_id)
+        target = await self._load_record(self.partition, conv_id)
         if target is None:
             raise RuntimeError(f"Conversation {conv_id!r} no longer exists.")
 
@@ -452,11 +787,15 @@ class HistoryController:
         if self.on_pre_switch is not None:
             skip = await self.on_pre_switch(target)
             if skip:
+                await self._release_record(target)
                 return
         self.adapter.set_turns_json(target.path_turns())
         await self.replay_ui(target)
         self._restore_app_state(target.values or {})
-        self.record = target
+        outgoing, self.record = self.record, target
+        self._saved_leaf = (target.id, target.current_leaf)
+        if outgoing is not None:
+            await self._release_record(outgoing)
         await self._send_sibling_metadata()
         if self.on_active_id_change is not None:
             await self.on_active_id_change(target.id)
@@ -467,7 +806,9 @@ class HistoryController:
         self.adapter.set_turns_json([])
         await self.chat.clear_messages()
         self.ui_offset = 0
-        self.record = None
+        outgoing, self.record = self.record, None
+        if outgoing is not None:
+            await self._release_record(outgoing)
         if self.on_active_id_change is not None:
             await self.on_active_id_change(None)
         # A fresh chat is never a restore: resolve the greeting the same way
@@ -481,8 +822,42 @@ class HistoryController:
         # A restored conversation is never a "new chat" — the app's
         # greeting doesn't belong here, regardless of `persistent`.
         await self.chat.set_greeting(None)
+        restored_count = await self._send_path_ui(
+            record, record.path_node_ids()
+        )
+        # ui_offset must reflect the messages the client will report for the
+        # restored conversation. `_messages_for_bookmark()` reads the async
+        # client-reported input, which still holds the PREVIOUS conversation's
+        # snapshot at this synchronous point — so count what we actually restored.
+        self.ui_offset = restored_count
+
+    async def replay_ui_from(
+        self, record: ConversationRecord, fork: int
+    ) -> None:
+        """Re-render the active path from its `fork`-th node on.
+
+        For a change confined to the end of the path -- switching to a
+        sibling, or truncating for an edit -- the first `fork` nodes are the
+        same as on screen. The client keeps their messages (a
+        ``truncate_after`` action drops the rest) and only the divergent
+        suffix is sent, so the cost follows the changed branch rather than
+        the whole conversation.
+        """
+        path = record.path_node_ids()
+        kept = sum(record.nodes[nid].ui_message_count() for nid in path[:fork])
+        # A client that can't truncate gets the whole path re-sent
+        if kept == 0 or "truncate_after" not in self.chat._client_features:
+            await self.replay_ui(record)
+            return
+        await self.chat._truncate_messages(kept)
+        self.ui_offset = kept + await self._send_path_ui(record, path[fork:])
+
+    async def _send_path_ui(
+        self, record: ConversationRecord, node_ids: list[str]
+    ) -> int:
+        """Send the UI messages of `node_ids`; returns how many were sent."""
         restored_count = 0
-        for node_id in record.path_node_ids():
+        for node_id in node_ids:
             node = record.nodes[node_id]
             stored = node.ui or [
                 {
@@ -498,11 +873,7 @@ class HistoryController:
             for message_dict in stored:
                 await self.chat._restore_bookmark_message(message_dict)
                 restored_count += 1
-        # ui_offset must reflect the messages the client will report for the
-        # restored conversation. `_messages_for_bookmark()` reads the async
-        # client-reported input, which still holds the PREVIOUS conversation's
-        # snapshot at this synchronous point — so count what we actually restored.
-        self.ui_offset = restored_count
+        return restored_count
 
     # -- list mutations ----------------------------------------------------
 
@@ -521,15 +892,18 @@ class HistoryController:
             return
         record.title = title
         record.title_source = "user"
+        await self.flush_saves()
         await self._put_record(self.partition, record)
         await self.send_history_update()
 
     async def delete(self, conv_id: str) -> None:
         if self.partition is None:
             raise RuntimeError("HistoryController not initialized")
+        await self.flush_saves()
         if self.on_evict is not None:
             await self.on_evict(conv_id)
         await self.store.delete(self.partition, conv_id)
+        discard_records(self.store, self.partition, [conv_id])
         if self.record is not None and self.record.id == conv_id:
             self.record = None
             self.adapter.set_turns_json([])
@@ -573,7 +947,7 @@ class HistoryController:
             return
         if self.record is None:
             return
-        node_id, _ = self.record.node_id_for_message_index(message_index)
+        node_id, fork = self.record.node_id_for_message_index(message_index)
         siblings = self.record.siblings_of(node_id)
         current_pos = siblings.index(node_id)
 
@@ -589,10 +963,12 @@ class HistoryController:
         leaf = self.record.subtree_leaf(target)
         self.record.set_current_leaf(leaf)
         self.adapter.set_turns_json(self.record.path_turns())
-        await self.replay_ui(self.record)
+        # Siblings share the path up to `node_id`
+        await self.replay_ui_from(self.record, fork)
         await self._send_sibling_metadata()
         if self.partition is None:
             raise RuntimeError("HistoryController not initialized")
+        await self.flush_saves()
         await self._put_record(self.partition, self.record)
         await self.send_history_update()
 
@@ -605,7 +981,7 @@ class HistoryController:
         if self.record is None:
             return
 
-        node_id, _ = self.record.node_id_for_message_index(message_index)
+        node_id, fork = self.record.node_id_for_message_index(message_index)
         fork_parent = self.record.nodes[node_id].parent
 
         # Branching happens implicitly: truncating current_leaf here means the next
@@ -614,7 +990,7 @@ class HistoryController:
         # because there's no new turn content yet — that arrives via on_response.
         self.record.set_current_leaf(fork_parent)
         self.adapter.set_turns_json(self.record.path_turns())
-        await self.replay_ui(self.record)
+        await self.replay_ui_from(self.record, fork)
         await self._send_sibling_metadata()
         action: UpdateInputAction = {
             "type": "update_input",
@@ -625,16 +1001,13 @@ class HistoryController:
             # Same normalize-then-validate pattern as the regular (non-edit)
             # send path in _input_handler.py and Chat.update_user_input —
             # never trust client-side attachment validation alone.
-            parsed = [Attachment.model_validate(a) for a in attachments]
+            from shiny.session import get_current_session
+
+            parsed = parse_attachments(attachments, get_current_session())
             validate_attachments(parsed)
+            # Uploaded files are resubmitted by reference, not re-sent
             action["attachments"] = [
-                {
-                    "mime": a.mime,
-                    "data_url": a.data_url,
-                    "name": a.name,
-                    "size": a.size,
-                }
-                for a in parsed
+                attachment_client_payload(a) for a in parsed
             ]
             # Edits always replace the attachment set — the client's staged
             # tray is a single source of truth, never a delta to append.
@@ -680,6 +1053,14 @@ def title_task_done(task: asyncio.Task[None]) -> None:
         warnings.warn(f"Background retitle failed: {exc}", stacklevel=1)
 
 
+def prefetch_task_done(task: asyncio.Task[None]) -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        warnings.warn(f"Background prefetch failed: {exc}", stacklevel=1)
+
+
 async def do_bookmark_with_cleanup(
     bookmark: Any, on_bookmarked: Callable[[str], Awaitable[None]]
 ) -> None:
@@ -711,6 +1092,7 @@ class ChatHistory:
             cfg.restore_mode
         )
         self._max_store_mb: float | None = cfg.max_store_mb
+        self._bookmark_debounce: float = cfg.bookmark_debounce
 
     def enable(self) -> None:
         """Enable chat history for the current session. No-op if already started."""
@@ -768,6 +1150,26 @@ class ChatHistory:
         self._restore_callbacks.append(fn)
         return fn
 
+    def bookmark_reference(self) -> tuple[str, str | None] | None:
+        """
+        The active conversation's id and leaf node id, or `None` before the
+        conversation's first save.
+        """
+        controller = self._controller
+        if controller is None or controller.record is None:
+            return None
+        return controller.record.id, controller.record.current_leaf
+
+    def stamp_bookmark(self, values: dict[str, Any]) -> None:
+        """Record a reference to the active conversation in bookmark `values`."""
+        ref = self.bookmark_reference()
+        if ref is None:
+            return
+        conv_key, leaf_key = bookmark_reference_keys(self._chat.id)
+        values[conv_key] = ref[0]
+        if ref[1] is not None:
+            values[leaf_key] = ref[1]
+
     def setup_greeting(
         self,
         greeting: "str | HTML | Tag | TagList | ChatGreeting | Callable[..., Any]",
@@ -835,6 +1237,7 @@ class ChatHistory:
             save_callbacks=self._save_callbacks,
             restore_callbacks=self._restore_callbacks,
             max_store_bytes=max_store_bytes,
+            threaded_callbacks=chat._threaded_callbacks,
         )
         self._controller = controller
 
@@ -850,6 +1253,7 @@ class ChatHistory:
 
             controller.on_active_id_change = _update_url
 
+        debouncer = BookmarkDebouncer(self._bookmark_debounce)
         if restore_mode == "bookmark":
             if root_session.bookmark.store != "server":
                 raise ValueError(
@@ -857,23 +1261,33 @@ class ChatHistory:
                 )
 
             async def _on_response_saved(record: ConversationRecord) -> None:
+                await debouncer.request(
+                    lambda: _mint_bookmark(record),
+                    (record.id, record.current_leaf),
+                )
+
+            async def _mint_bookmark(record: ConversationRecord) -> None:
+                if (
+                    controller.record is None
+                    or controller.record.id != record.id
+                ):
+                    return  # switched away before a debounced mint
                 captured_id = record.id
 
                 async def _on_bookmarked(url: str) -> None:
                     new_state_id = extract_state_id(url)
                     if new_state_id is None:
                         return
-                    if (
-                        controller.record is None
-                        or controller.record.id != captured_id
-                    ):
+                    live = controller.record
+                    if live is None or live.id != captured_id:
                         return  # switched away
-                    old_state_id = record.bookmark_state_id
-                    record.bookmark_state_id = new_state_id
+                    # `record` is the saved snapshot; stamp the live record
+                    old_state_id = live.bookmark_state_id
+                    live.bookmark_state_id = new_state_id
                     if old_state_id is not None:
                         await delete_bookmark_state(old_state_id)
                     if controller.partition is not None:
-                        await controller._put_record(controller.partition, record)
+                        await controller._enqueue_put(live)
                     await controller.send_navigate(
                         f"?_state_id_={new_state_id}", captured_id
                     )
@@ -923,17 +1337,17 @@ class ChatHistory:
 
             controller.on_active_id_change = _update_url_bookmark
 
-        # Stamp the active conversation ID into any Shiny server bookmark so
-        # that reloading from a bookmark URL reopens the right conversation.
-        # This runs regardless of restore_mode whenever server bookmarks are
-        # configured — the history system participates automatically.
-        stamp_key = f"{chat.id}_history_conversation_id"
+        # Stamp the active conversation ID (and the branch being viewed) into
+        # any Shiny server bookmark so that reloading from a bookmark URL
+        # reopens the right conversation. This runs regardless of restore_mode
+        # whenever server bookmarks are configured — the history system
+        # participates automatically.
+        stamp_key, leaf_key = bookmark_reference_keys(chat.id)
         stamp_cancel: Callable[[], None] | None = None
         if root_session.bookmark.store == "server":
 
             def stamp_conversation(state: Any) -> None:
-                if controller.record is not None:
-                    state.values[stamp_key] = controller.record.id
+                self.stamp_bookmark(state.values)
 
             stamp_cancel = root_session.bookmark.on_bookmark(stamp_conversation)
 
@@ -993,19 +1407,27 @@ class ChatHistory:
             # Priority 1: restore from a Shiny bookmark context (any mode).
             restore_ctx = root_session.bookmark._restore_context
             restored_conv_id: str | None = None
+            restored_leaf: Any = None
             if restore_ctx is not None and restore_ctx.active:
                 raw_id = restore_ctx.values.get(stamp_key)
                 restored_conv_id = str(raw_id) if raw_id else None
+                restored_leaf = restore_ctx.values.get(leaf_key)
 
             if restored_conv_id is not None:
                 try:
-                    target = await controller._get_record(
+                    target = await controller._load_record(
                         controller.partition, restored_conv_id
                     )
                 except Exception as e:
                     await notify_error("Could not load conversation", e)
                     target = None
                 if target is not None:
+                    # Reopen the bookmarked branch; an unknown leaf (or none)
+                    # keeps the record's own
+                    if isinstance(restored_leaf, str) and (
+                        restored_leaf in target.nodes
+                    ):
+                        target.set_current_leaf(restored_leaf)
                     adapter.set_turns_json(target.path_turns())
                     await controller.replay_ui(target)
                     if restore_mode != "bookmark":
@@ -1035,7 +1457,7 @@ class ChatHistory:
 
             if current_id:
                 try:
-                    pointed = await controller._get_record(
+                    pointed = await controller._load_record(
                         controller.partition, current_id
                     )
                 except Exception as e:
@@ -1051,17 +1473,28 @@ class ChatHistory:
             initialized = True
             await controller.notify_settled(controller.record is not None)
 
+        # Save when a response settles in the server's shadow transcript (at
+        # stream end), and again on the client's snapshot report -- which
+        # only reconciles, since an unchanged conversation is a no-op save
         @reactive.effect
-        @reactive.event(chat.messages, ignore_init=True)
+        @reactive.event(
+            chat._transcript_settled, chat.messages, ignore_init=True
+        )
         async def _save_on_response():
             if controller.partition is None:
                 return
-            messages = chat.messages()
-            if messages and messages[-1].get("role") == "assistant":
+            messages = chat._settled_messages()
+            if messages and messages[-1].role == "assistant":
+
+                async def on_error(e: Exception) -> None:
+                    await notify_error("Could not save conversation", e)
+
+                # Only the in-memory update happens here; the I/O finishes
+                # in the background, outside the reactive flush
                 try:
-                    await controller.on_response()
+                    await controller.schedule_response(on_error)
                 except Exception as e:
-                    await notify_error("Could not save conversation", e)
+                    await on_error(e)
 
         @reactive.effect
         @reactive.event(chat._session.input[ids.select])
@@ -1084,6 +1517,13 @@ class ChatHistory:
             except Exception as e:
                 await notify_error("Could not start a new chat", e)
 
+        @reactive.effect
+        @reactive.event(chat._session.input[ids.open])
+        def _on_open():
+            # Warm the record cache with what the user is about to pick from
+            if controller.partition is not None:
+                controller.schedule_prefetch()
+
         @reactive.effect
         @reactive.event(chat._session.input[ids.rename])
         async def _on_rename():
@@ -1139,6 +1579,7 @@ class ChatHistory:
         def _on_session_end() -> None:
             if stamp_cancel is not None:
                 stamp_cancel()
+            debouncer.cancel()
             controller.cancel_pending()
 
         session.on_ended(_on_session_end)
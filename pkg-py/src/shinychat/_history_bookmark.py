@@ -5,7 +5,7 @@ import logging
 import re
 import shutil
 from pathlib import Path
-from typing import Awaitable, Callable
+from typing import Any, Awaitable, Callable, Hashable
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,62 @@ def extract_state_id(url: str) -> str | None:
     return m.group(1) if m else None
 
 
+def bookmark_reference_keys(chat_id: str) -> tuple[str, str]:
+    """Bookmark value keys for a chat's conversation id and leaf node id."""
+    return (
+        f"{chat_id}_history_conversation_id",
+        f"{chat_id}_history_leaf",
+    )
+
+
+class BookmarkDebouncer:
+    """
+    Coalesces bookmark requests.
+
+    With a positive `delay`, minting waits that many seconds and a newer
+    request replaces a pending one, so a burst of responses (or branch
+    switches) mints a single bookmark. With `delay=0` bookmarks are minted
+    inline. Either way a request whose `key` equals that of the last minted
+    bookmark is skipped: that bookmark still describes the same state.
+    """
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self._task: asyncio.Task[None] | None = None
+        self._minted: Hashable = None
+
+    async def request(
+        self, mint: Callable[[], Awaitable[Any]], key: Hashable = None
+    ) -> None:
+        if key is not None and key == self._minted:
+            return
+        self.cancel()
+        if self.delay <= 0:
+            await self._mint(mint, key)
+            return
+        self._task = asyncio.create_task(self._mint_later(mint, key))
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _mint(
+        self, mint: Callable[[], Awaitable[Any]], key: Hashable
+    ) -> None:
+        await mint()
+        self._minted = key
+
+    async def _mint_later(
+        self, mint: Callable[[], Awaitable[Any]], key: Hashable
+    ) -> None:
+        await asyncio.sleep(self.delay)
+        try:
+            await self._mint(mint, key)
+        except Exception:
+            logger.warning("Failed to mint a debounced bookmark", exc_info=True)
+
+
 def global_save_dir_fn() -> BookmarkDirFn | None:
     """
     Shiny's currently configured global bookmark save-dir function, if any.
@@ -0,0 +1,143 @@
+"""Worker-wide cache of recently used conversation records.
+
+Switching conversations used to read the target record from the store every
+time, so flipping between a few recent conversations paid the full load
+latency on each switch. Instead, the record a session switches away from is
+kept in an LRU bounded by the records' stored size (``ConversationMeta.
+size_bytes``) and shared by all sessions in the worker, and opening the
+history drawer prefetches the most recent conversations into it.
+
+A session *takes* a record out of the cache when it switches to it (the
+record then becomes that session's live, mutable copy), so two sessions never
+share one. Entries are dropped when their conversation is saved or deleted,
+and a hit is only used if its revision still matches the store's
+``list()``, which also catches writes from other workers. Only stores that
+track revisions (``ConversationStore.compare_and_swap``) are cached.
+
+``SHINYCHAT_HISTORY_CACHE_SIZE`` sets the memory budget in bytes; ``0``
+disables the cache. ``SHINYCHAT_HISTORY_PREFETCH`` sets how many
+conversations are prefetched; ``0`` disables prefetching.
+
+This is a private module: module-level functions are intentionally not
+underscore-prefixed.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Hashable
+
+from ._attachment_cache import ByteLRU
+from ._history_store import ConversationPartition, ConversationStore
+from ._history_types import ConversationRecord
+
+#: Default memory budget (bytes) for cached conversation records.
+DEFAULT_RECORD_CACHE_SIZE = 64 * 1024 * 1024
+
+#: Default number of conversations prefetched when the drawer opens.
+DEFAULT_PREFETCH_COUNT = 3
+
+RECORD_CACHE_SIZE_ENV_VAR = "SHINYCHAT_HISTORY_CACHE_SIZE"
+PREFETCH_COUNT_ENV_VAR = "SHINYCHAT_HISTORY_PREFETCH"
+
+# A cached record and its stored size
+_Entry = tuple[ConversationRecord, int]
+
+
+def _non_negative_int_env(name: str, default: int) -> int:
+    env = os.environ.get(name)
+    if env is None or not env.strip():
+        return default
+    try:
+        val = int(env)
+    except ValueError:
+        raise ValueError(f"{name}={env!r} is not a valid integer.") from None
+    if val < 0:
+        raise ValueError(f"{name} must be non-negative, got {val}.")
+    return val
+
+
+def resolve_record_cache_size() -> int:
+    """Resolve the record cache's memory budget (bytes) from the environment."""
+    return _non_negative_int_env(
+        RECORD_CACHE_SIZE_ENV_VAR, DEFAULT_RECORD_CACHE_SIZE
+    )
+
+
+def resolve_prefetch_count() -> int:
+    """Resolve how many conversations to prefetch from the environment."""
+    return _non_negative_int_env(PREFETCH_COUNT_ENV_VAR, DEFAULT_PREFETCH_COUNT)
+
+
+_RECORD_CACHE: ByteLRU[_Entry] | None = None
+
+
+def record_cache() -> ByteLRU[_Entry]:
+    """The worker's record cache, (re)created when its budget changes."""
+    global _RECORD_CACHE  # noqa: PLW0603
+    max_bytes = resolve_record_cache_size()
+    cache = _RECORD_CACHE
+    if cache is None or cache.max_bytes != max_bytes:
+        cache = _RECORD_CACHE = ByteLRU(max_bytes, lambda e: e[1])
+    return cache
+
+
+def record_cache_key(
+    store: ConversationStore, partition: ConversationPartition, conv_id: str
+) -> Hashable:
+    # Keyed by the store object: two stores may hold the same ids
+    return (store, partition, conv_id)
+
+
+def caches_records(store: ConversationStore) -> bool:
+    """Whether records from `store` are cached."""
+    return store.compare_and_swap and record_cache().max_bytes > 0
+
+
+def cache_record(
+    store: ConversationStore,
+    partition: ConversationPartition,
+    record: ConversationRecord,
+    size_bytes: int,
+) -> None:
+    """Keep `record`, which the caller hands over and must not modify again."""
+    if caches_records(store):
+        key = record_cache_key(store, partition, record.id)
+        record_cache().put(key, (record, size_bytes))
+
+
+def take_record(
+    store: ConversationStore,
+    partition: ConversationPartition,
+    conv_id: str,
+    revision: int,
+) -> ConversationRecord | None:
+    """Remove and return the cached record for `conv_id`, if it is at
+    `revision` (the stored revision)."""
+    if not caches_records(store):
+        return None
+    _, entry = record_cache().pop(record_cache_key(store, partition, conv_id))
+    if entry is None or entry[0].revision != revision:
+        return None
+    return entry[0]
+
+
+def is_cached(
+    store: ConversationStore, partition: ConversationPartition, conv_id: str
+) -> bool:
+    key = record_cache_key(store, partition, conv_id)
+    return record_cache().get(key)[0]
+
+
+def discard_records(
+    store: ConversationStore,
+    partition: ConversationPartition,
+    conv_ids: list[str],
+) -> None:
+    """Drop any cached copies of `conv_ids` (e.g. once they are saved or
+    deleted)."""
+    if not store.compare_and_swap:
+        return
+    cache = record_cache()
+    for conv_id in conv_ids:
+        cache.pop(record_cache_key(store, partition, conv_id))
@@ -0,0 +1,375 @@
+"""Streaming export and import of chat history partitions.
+
+An export is NDJSON: a header line naming the format and the partition it was
+taken from, then one line per conversation holding the full
+:class:`~shinychat.types.ConversationRecord`. Records are read from (and
+written to) the store in batches of ``batch_size``, and file I/O runs in a
+worker thread, so moving a partition of any size between stores -- e.g. from
+a :class:`~shinychat.types.FileConversationStore` to a custom database store
+-- holds only one batch in memory.
+
+Also runnable as a command (``shinychat-history export|import``; see
+:func:`main`) for backups and migrations outside of an app.
+
+This is a private module: module-level functions are intentionally not
+underscore-prefixed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import sys
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Literal,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from ._history_store import (
+    ConversationPartition,
+    ConversationStore,
+    FileConversationStore,
+    FsspecConversationStore,
+)
+from ._history_types import ConversationRecord
+
+__all__ = ("export_partition", "import_partition")
+
+EXPORT_FORMAT = "shinychat-history"
+EXPORT_VERSION = 1
+
+#: Records read from or written to the store at a time.
+DEFAULT_BATCH_SIZE = 100
+
+# A path, or an open binary file
+ExportFile = Union[str, "os.PathLike[str]", IO[bytes]]
+
+Compression = Literal["infer", "gzip"]
+
+# Called after each batch with the number of records done so far and the
+# total (None when it isn't known up front, as on import)
+ProgressFn = Callable[[int, Optional[int]], object]
+
+
+def open_export(
+    file: ExportFile, mode: Literal["rb", "wb"], compression: Compression | None
+) -> tuple[IO[bytes], bool]:
+    """Open `file` for `mode`, returning the stream and whether the caller
+    owns (must close) it.
+
+    ``"infer"`` compresses paths ending in ``.gz``; when reading, gzip input
+    is also recognized by its magic bytes.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        path = Path(file)
+        if compression == "infer":
+            compression = "gzip" if path.suffix == ".gz" else None
+        if mode == "rb" and compression is None:
+            with path.open("rb") as fh:
+                if fh.read(2) == b"\x1f\x8b":
+                    compression = "gzip"
+        if compression == "gzip":
+            return gzip.open(path, mode), True  # type: ignore[return-value]
+        return path.open(mode), True
+    if compression == "gzip":
+        stream = gzip.GzipFile(fileobj=file, mode=mode)
+        return stream, True  # type: ignore[return-value]
+    return file, False
+
+
+def export_header(partition: ConversationPartition) -> dict[str, Any]:
+    return {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "chat_id": partition.chat_id,
+        "scope": partition.scope,
+    }
+
+
+def check_header(line: bytes) -> ConversationPartition:
+    """Validate an export's header line, returning its partition."""
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != EXPORT_FORMAT:
+        raise ValueError("Not a shinychat history export.")
+    if header.get("version") != EXPORT_VERSION:
+        raise ValueError(
+            f"Unsupported history export version: {header.get('version')!r} "
+            f"(supported: {EXPORT_VERSION})"
+        )
+    return ConversationPartition(
+        chat_id=header["chat_id"], scope=header["scope"]
+    )
+
+
+async def iter_records(
+    store: ConversationStore,
+    partition: ConversationPartition,
+    ids: Sequence[str],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> AsyncIterator[ConversationRecord]:
+    """Yield the records for `ids`, in order, fetching `batch_size` at a
+    time with `store.get_many()`."""
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start : start + batch_size]
+        records = await store.get_many(partition, batch)
+        for conv_id in batch:
+            # Conversations deleted since list() are skipped
+            if conv_id in records:
+                yield records.pop(conv_id)
+
+
+async def export_partition(
+    store: ConversationStore,
+    partition: ConversationPartition,
+    file: ExportFile,
+    *,
+    compression: Compression | None = "infer",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: ProgressFn | None = None,
+) -> int:
+    """
+    Write every conversation in a history partition to an NDJSON file.
+
+    Records are fetched from `store` and written `batch_size` at a time, so
+    memory use doesn't grow with the size of the partition. Lazily loaded
+    records (`FileConversationStore(lazy=True)`) are read in full.
+
+    Parameters
+    ----------
+    store
+        The store to export from.
+    partition
+        The partition to export.
+    file
+        A path, or a binary file opened for writing.
+    compression
+        ``"gzip"`` to compress the output. The default, ``"infer"``,
+        compresses paths ending in ``.gz``.
+    batch_size
+        The number of records held in memory at a time.
+    on_progress
+        Called after each batch with the number of records exported so far
+        and the total.
+
+    Returns
+    -------
+    :
+        The number of records exported.
+    """
+    ids = [m.id for m in await store.list(partition)]
+    stream, owned = await asyncio.to_thread(
+        open_export, file, "wb", compression
+    )
+    count = 0
+    try:
+        header = json.dumps(export_header(partition)) + "\n"
+        await asyncio.to_thread(stream.write, header.encode("utf-8"))
+        records = iter_records(store, partition, ids, batch_size=batch_size)
+        while True:
+            lines: list[bytes] = []
+            async for record in records:
+                lines.append(record.model_dump_json().encode("utf-8") + b"\n")
+                if len(lines) >= batch_size:
+                    break
+            if not lines:
+                break
+            await asyncio.to_thread(stream.writelines, lines)
+            count += len(lines)
+            if on_progress is not None:
+                on_progress(count, len(ids))
+    finally:
+        if owned:
+            await asyncio.to_thread(stream.close)
+        else:
+            await asyncio.to_thread(stream.flush)
+    return count
+
+
+def read_batch(lines: Iterator[bytes], size: int) -> list[bytes]:
+    return [line for line in itertools.islice(lines, size) if line.strip()]
+
+
+async def import_partition(
+    store: ConversationStore,
+    file: ExportFile,
+    partition: ConversationPartition | None = None,
+    *,
+    compression: Compression | None = "infer",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: ProgressFn | None = None,
+) -> int:
+    """
+    Load an export written by `export_partition()` into a store.
+
+    The file is read and written to `store` `batch_size` records at a time
+    (with `store.put_many()`), so memory use doesn't grow with the size of
+    the export. Records replace any stored conversation with the same id.
+
+    Parameters
+    ----------
+    store
+        The store to import into.
+    file
+        A path, or a binary file opened for reading.
+    partition
+        The partition to import into. Defaults to the one the export was
+        taken from.
+    compression
+        ``"gzip"`` if the input is compressed. The default, ``"infer"``,
+        detects gzip input when `file` is a path.
+    batch_size
+        The number of records held in memory at a time.
+    on_progress
+        Called after each batch with the number of records imported so far.
+
+    Returns
+    -------
+    :
+        The number of records imported.
+    """
+    stream, owned = await asyncio.to_thread(
+        open_export, file, "rb", compression
+    )
+    count = 0
+    try:
+        lines = iter(stream)
+        header = await asyncio.to_thread(next, lines, b"")
+        source = check_header(header)
+        partition = partition or source
+        while True:
+            batch = await asyncio.to_thread(read_batch, lines, batch_size)
+            if not batch:
+                break
+            records = [
+                ConversationRecord.model_validate_json(line) for line in batch
+            ]
+            await store.put_many(partition, records)
+            count += len(records)
+            if on_progress is not None:
+                on_progress(count, None)
+    finally:
+        if owned:
+            await asyncio.to_thread(stream.close)
+    return count
+
+
+def open_store(spec: str) -> ConversationStore:
+    """A store for a command-line `--store`: an fsspec URL, or a directory
+    for `FileConversationStore`."""
+    if "://" in spec:
+        return FsspecConversationStore(spec)
+    return FileConversationStore(dir=spec)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Export or import a chat history partition from the command line.
+
+    ``shinychat-history export --store DIR_OR_URL --chat-id ID --scope SCOPE
+    [-o FILE]`` writes the partition to ``FILE`` (default: stdout);
+    ``shinychat-history import --store DIR_OR_URL [-i FILE]`` loads an export
+    (default: stdin), into its original partition unless ``--chat-id`` and
+    ``--scope`` say otherwise. Use a ``.gz`` file name (or ``--gzip``) for
+    compressed output. Progress is reported on stderr.
+    """
+    parser = argparse.ArgumentParser(
+        prog="shinychat-history",
+        description="Export or import shinychat conversation history.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, summary in (
+        ("export", "write a partition to an NDJSON export"),
+        ("import", "load an NDJSON export into a store"),
+    ):
+        cmd = commands.add_parser(name, help=summary)
+        cmd.add_argument(
+            "--store",
+            default=str(Path(".shinychat") / "conversations"),
+            help="history directory or fsspec URL "
+            "(default: .shinychat/conversations)",
+        )
+        cmd.add_argument(
+            "--chat-id", required=name == "export", help="the chat's id"
+        )
+        cmd.add_argument(
+            "--scope", required=name == "export", help="the owner scope"
+        )
+        cmd.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, metavar="N"
+        )
+        cmd.add_argument(
+            "--gzip", action="store_true", help="(de)compress with gzip"
+        )
+        cmd.add_argument("--quiet", action="store_true", help="no progress")
+    commands.choices["export"].add_argument(
+        "-o", "--output", default="-", help="output file (default: stdout)"
+    )
+    commands.choices["import"].add_argument(
+        "-i", "--input", default="-", help="input file (default: stdin)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if (args.chat_id is None) != (args.scope is None):
+        parser.error("--chat-id and --scope must be given together")
+    partition = None
+    if args.chat_id is not None:
+        partition = ConversationPartition(
+            chat_id=args.chat_id, scope=args.scope
+        )
+
+    def progress(done: int, total: int | None) -> None:
+        if not args.quiet:
+            of = f"/{total}" if total is not None else ""
+            print(f"{args.command}ed {done}{of}", file=sys.stderr)
+
+    store = open_store(args.store)
+    compression: Compression | None = "gzip" if args.gzip else "infer"
+    if args.command == "export":
+        assert partition is not None
+        out = sys.stdout.buffer if args.output == "-" else args.output
+        coro = export_partition(
+            store,
+            partition,
+            out,
+            compression=compression,
+            batch_size=args.batch_size,
+            on_progress=progress,
+        )
+    else:
+        src = sys.stdin.buffer if args.input == "-" else args.input
+        coro = import_partition(
+            store,
+            src,
+            partition,
+            compression=compression,
+            batch_size=args.batch_size,
+            on_progress=progress,
+        )
+    try:
+        asyncio.run(coro)
+    except (OSError, ValueError) as e:
+        print(f"shinychat-history: error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
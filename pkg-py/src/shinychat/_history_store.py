@@ -1,28 +1,54 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import dataclasses
+import functools
 import hashlib
 import json
 import logging
+import mmap
 import os
 import re
 import shutil
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Literal
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Literal,
+    Sequence,
+    TypeVar,
+)
 
+from . import _metrics
 from ._history_bookmark import global_save_dir_fn
 from ._history_types import (
+    ConversationConflictError,
     ConversationMeta,
     ConversationNode,
     ConversationRecord,
+    LazyConversationNode,
     check_schema_version,
 )
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
 logger = logging.getLogger(__name__)
 
 HISTORY_BOOKMARK_ID = "shinychat-conversations"
 
+#: fsspec URL (e.g. ``s3://bucket/prefix``) that ``store="auto"`` keeps
+#: history at, via :class:`FsspecConversationStore`.
+HISTORY_URL_ENV_VAR = "SHINYCHAT_HISTORY_URL"
+
+T = TypeVar("T")
+
 
 @dataclasses.dataclass(frozen=True)
 class ConversationPartition:
@@ -42,8 +68,18 @@ class ConversationStore(ABC):
 
     Conversations are partitioned by `ConversationPartition`. Implement the
     four abstract methods to plug any backend into `Chat.enable_history()`.
+
+    A store that sets `compare_and_swap` to `True` supports optimistic
+    concurrency: `put(..., expected_revision=)` only writes if the stored
+    conversation is still at that revision, and raises
+    `ConversationConflictError` otherwise. History then merges concurrent
+    saves of one conversation (e.g. from two browser tabs) with
+    `ConversationRecord.merge()` instead of letting the last write win.
     """
 
+    #: Whether `put()` supports `expected_revision`.
+    compare_and_swap: ClassVar[bool] = False
+
     @abstractmethod
     async def list(
         self, partition: ConversationPartition
@@ -58,9 +94,19 @@ class ConversationStore(ABC):
 
     @abstractmethod
     async def put(
-        self, partition: ConversationPartition, record: ConversationRecord
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        *,
+        expected_revision: int | None = None,
     ) -> None:
-        """Upsert. Rename = mutate record.title and put()."""
+        """Upsert. Rename = mutate record.title and put().
+
+        Stores that support `compare_and_swap` set `record.revision` to the
+        new stored revision, and with `expected_revision` raise
+        `ConversationConflictError` unless the stored conversation is at
+        that revision (0 when it doesn't exist).
+        """
 
     @abstractmethod
     async def delete(
@@ -68,6 +114,44 @@ class ConversationStore(ABC):
     ) -> None:
         """Remove a conversation. Missing ids are a no-op."""
 
+    async def get_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> dict[str, ConversationRecord]:
+        """Full records for `conv_ids`, by id. Missing ids are left out.
+
+        Loops over `get()`; backends that can batch reads should override it.
+        """
+        records: dict[str, ConversationRecord] = {}
+        for conv_id in conv_ids:
+            record = await self.get(partition, conv_id)
+            if record is not None:
+                records[conv_id] = record
+        return records
+
+    async def put_many(
+        self,
+        partition: ConversationPartition,
+        records: Sequence[ConversationRecord],
+    ) -> None:
+        """Upsert several records (unconditionally, like `put()` without
+        `expected_revision`).
+
+        Loops over `put()`; backends that can batch writes should override it.
+        """
+        for record in records:
+            await self.put(partition, record)
+
+    async def delete_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> None:
+        """Remove several conversations. Missing ids are a no-op.
+
+        Loops over `delete()`; backends that can batch deletes should
+        override it.
+        """
+        for conv_id in conv_ids:
+            await self.delete(partition, conv_id)
+
     async def search(
         self, partition: ConversationPartition, query: str
     ) -> list[ConversationMeta]:
@@ -85,6 +169,168 @@ class ConversationStore(ABC):
         return sum(m.size_bytes for m in await self.list(partition))
 
 
+def record_to_json(
+    record: ConversationRecord, nodes: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """The ``record.json`` object for `record`, with pre-split `nodes`."""
+    return {
+        "schema_version": record.schema_version,
+        "id": record.id,
+        "title": record.title,
+        "title_source": record.title_source,
+        "response_count": record.response_count,
+        "created_at": record.created_at.isoformat(),
+        "updated_at": record.updated_at.isoformat(),
+        "client_info": record.client_info,
+        "next_node_seq": record.next_node_seq,
+        "current_leaf": record.current_leaf,
+        "nodes": nodes,
+        "values": record.values,
+        "bookmark_state_id": record.bookmark_state_id,
+        "revision": record.revision,
+    }
+
+
+def record_from_json(
+    raw: dict[str, Any],
+    schema_version: int,
+    nodes: dict[str, ConversationNode],
+) -> ConversationRecord:
+    """Rebuild a record from its ``record.json`` object and merged `nodes`."""
+    return ConversationRecord(
+        schema_version=schema_version,
+        id=raw["id"],
+        title=raw["title"],
+        title_source=raw.get("title_source"),
+        response_count=raw.get("response_count", 0),
+        created_at=raw["created_at"],
+        updated_at=raw["updated_at"],
+        client_info=raw.get("client_info", {}),
+        nodes=nodes,
+        next_node_seq=raw.get("next_node_seq", 1),
+        current_leaf=raw.get("current_leaf"),
+        values=raw.get("values", {}),
+        bookmark_state_id=raw.get("bookmark_state_id"),
+        revision=raw.get("revision", 0),
+    )
+
+
+def merge_nodes(
+    raw: dict[str, Any],
+    turns_map: dict[Any, Any],
+    ui_map: dict[Any, Any],
+) -> dict[str, ConversationNode]:
+    """Rebuild full nodes from ``record.json``'s split nodes, the turns by
+    sequence number, and the UI messages by node id."""
+    nodes: dict[str, ConversationNode] = {}
+    for nid, node_data in raw.get("nodes", {}).items():
+        turn_ids = node_data.get("turn_ids", [])
+        turns = [turns_map[tid] for tid in turn_ids if tid in turns_map]
+        nodes[nid] = ConversationNode(
+            parent=node_data.get("parent"),
+            children=node_data.get("children", []),
+            turns=turns,
+            ui=ui_map.get(nid),
+            selected_child=node_data.get("selected_child"),
+        )
+    return nodes
+
+
+def parse_jsonl(text: str, key: str) -> dict[Any, Any]:
+    """Map each line's `key` to its ``data``; later lines win, bad lines are
+    skipped."""
+    out: dict[Any, Any] = {}
+    for line in text.strip().splitlines():
+        try:
+            entry = json.loads(line)
+            out[entry[key]] = entry["data"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            continue
+    return out
+
+
+# The leading key FileConversationStore writes on each JSONL line, so entries
+# can be indexed without decoding them
+_JSONL_KEY_PATTERNS = {
+    "seq": re.compile(rb'\{"seq": (\d+), '),
+    "node_id": re.compile(rb'\{"node_id": ("(?:[^"\\]|\\.)*"), '),
+}
+
+
+class JsonlIndex:
+    """
+    A memory-mapped JSONL file with the byte range of each entry, keyed like
+    `parse_jsonl()` (later lines win). Entries are decoded only when read.
+    """
+
+    def __init__(self, path: Path, key: str):
+        self._key = key
+        self._mm: mmap.mmap | None = None
+        self.offsets: dict[Any, tuple[int, int]] = {}
+        if not path.is_file():
+            return
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return  # empty file
+        mm = self._mm
+        pattern = _JSONL_KEY_PATTERNS[key]
+        pos, size = 0, len(mm)
+        while pos < size:
+            end = mm.find(b"\n", pos)
+            if end == -1:
+                end = size
+            m = pattern.match(mm, pos, end)
+            if m is not None:
+                self.offsets[json.loads(m.group(1))] = (pos, end)
+            elif end > pos:
+                # Not in the shape we write: fall back to decoding the line
+                try:
+                    entry = json.loads(mm[pos:end])
+                    self.offsets[entry[key]] = (pos, end)
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    pass
+            pos = end + 1
+
+    def __contains__(self, k: Any) -> bool:
+        return k in self.offsets
+
+    def get(self, k: Any) -> Any:
+        """The ``data`` of entry `k`, or ``None`` if it is missing or bad."""
+        span = self.offsets.get(k)
+        if span is None or self._mm is None:
+            return None
+        try:
+            return json.loads(self._mm[span[0] : span[1]])["data"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return None
+
+
+def lazy_nodes(
+    raw: dict[str, Any], turns: JsonlIndex, ui: JsonlIndex
+) -> dict[str, ConversationNode]:
+    """Like `merge_nodes()`, but each node's turns and UI are decoded from
+    the indexes only when first accessed."""
+
+    def loader(nid: str, turn_ids: list[int]):
+        def load():
+            node_turns = [turns.get(t) for t in turn_ids if t in turns]
+            return node_turns, ui.get(nid)
+
+        return load
+
+    nodes: dict[str, ConversationNode] = {}
+    for nid, node_data in raw.get("nodes", {}).items():
+        nodes[nid] = LazyConversationNode.deferred(
+            loader(nid, node_data.get("turn_ids", [])),
+            parent=node_data.get("parent"),
+            children=node_data.get("children", []),
+            selected_child=node_data.get("selected_child"),
+        )
+    return nodes
+
+
 @dataclasses.dataclass
 class _WriteState:
     turn_seq_map: dict[str, list[int]] = dataclasses.field(default_factory=dict)
@@ -95,6 +341,91 @@ class _WriteState:
     # is always what's returned.
     ui_node_len: dict[str, int] = dataclasses.field(default_factory=dict)
     next_turn_seq: int = 0
+    # The `write_id` of the record.json this state was read from or last
+    # wrote. A different id on disk means another worker saved since.
+    write_id: str | None = None
+
+
+#: Append-only file in each partition directory that grows by one byte on
+#: every write. Its (inode, size) is the partition's generation.
+GENERATION_FILE = ".generation"
+
+# (inode, size) of a partition's generation file, or None before any write
+Generation = tuple[int, int] | None
+
+
+#: Lock file serializing writes to a partition across processes.
+LOCK_FILE = ".lock"
+
+#: Longest pause (seconds) between attempts to take a held partition lock.
+LOCK_RETRY_MAX_DELAY = 0.05
+
+
+@contextlib.asynccontextmanager
+async def partition_lock(partition_dir: Path) -> AsyncIterator[None]:
+    """Hold the partition's write lock (across processes on POSIX; elsewhere
+    only ``put()``'s own atomicity within one process applies).
+
+    While another worker (or another save in this one) holds the lock, this
+    polls with a non-blocking ``flock()`` rather than waiting in it, so a
+    slow writer never blocks the event loop.
+    """
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    with open(partition_dir / LOCK_FILE, "ab") as f:
+        if fcntl is None:
+            yield
+            return
+        delay = 0.001
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOCK_RETRY_MAX_DELAY)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def read_generation(partition_dir: Path) -> Generation:
+    try:
+        st = os.stat(partition_dir / GENERATION_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size)
+
+
+def bump_generation(partition_dir: Path) -> Generation:
+    """Advance the partition's generation; returns the new one."""
+    with open(partition_dir / GENERATION_FILE, "ab") as f:
+        f.write(b"\n")
+        f.flush()
+        st = os.fstat(f.fileno())
+    return (st.st_ino, st.st_size)
+
+
+def generation_follows(before: Generation, after: Generation) -> bool:
+    """Whether ``after`` is exactly one write past ``before`` (i.e. no other
+    worker wrote in between)."""
+    if after is None:
+        return False
+    if before is None:
+        return after[1] == 1
+    return after == (before[0], before[1] + 1)
+
+
+# (inode, mtime, size) of a record.json
+RecordStamp = tuple[int, int, int]
+
+
+def record_stamp(record_file: Path) -> RecordStamp | None:
+    try:
+        st = os.stat(record_file)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
 
 
 class FileConversationStore(ConversationStore):
@@ -110,13 +441,40 @@ class FileConversationStore(ConversationStore):
     On ``get()``, the three files are read and merged into a full
     ``ConversationRecord`` with inline turns and UI on each node. Callers
     never see the split.
+
+    With ``lazy=True``, ``get()`` instead memory-maps ``turns.jsonl`` and
+    ``ui.jsonl``, indexes the byte offset of each entry, and decodes a node's
+    turns and UI only when they are first accessed. Opening a heavily
+    branched conversation then costs memory in proportion to the branch being
+    viewed. (On Windows, a mapped file can't be deleted while a record still
+    has unread nodes.)
+
+    Several worker processes can share one directory (e.g. behind a load
+    balancer). Every write advances a per-partition generation file, which
+    ``list()`` checks with a single ``stat()``: when another worker has
+    written since, only the conversations whose ``record.json`` changed are
+    re-read. Likewise ``put()`` re-reads its append positions when another
+    worker saved the conversation since, so turn sequence numbers never
+    collide. Writes to a partition hold a lock file (on POSIX, across
+    processes too), and ``put()`` supports ``expected_revision``, so
+    simultaneous saves of the *same* conversation are detected rather than
+    the last one silently winning.
     """
 
-    def __init__(self, dir: str | Path | None = None):
+    compare_and_swap = True
+
+    def __init__(self, dir: str | Path | None = None, *, lazy: bool = False):
         self._dir: Path | None = Path(dir) if dir is not None else None
+        self._lazy = lazy
         self._meta_cache: dict[
             ConversationPartition, list[ConversationMeta]
         ] = {}
+        # The generation `_meta_cache` is current as of, and the record.json
+        # stamp each cached meta was read from
+        self._generation: dict[ConversationPartition, Generation] = {}
+        self._meta_stamps: dict[
+            ConversationPartition, dict[str, RecordStamp]
+        ] = {}
         self._write_state: dict[
             tuple[ConversationPartition, str], _WriteState
         ] = {}
@@ -127,24 +485,41 @@ class FileConversationStore(ConversationStore):
         return (partition, conv_id)
 
     def _get_or_init_write_state(
-        self, partition: ConversationPartition, conv_id: str, conv_dir: Path
+        self,
+        partition: ConversationPartition,
+        conv_id: str,
+        conv_dir: Path,
+        raw: dict[str, Any] | None = None,
     ) -> _WriteState:
+        """The append positions for a conversation, given its record.json
+        as currently on disk (``raw``, ``None`` if there is none)."""
         key = self._ws_key(partition, conv_id)
-        if key in self._write_state:
-            return self._write_state[key]
-        ws = _WriteState()
+        ws = self._write_state.get(key)
+        if ws is not None and ws.write_id == (raw or {}).get("write_id"):
+            return ws
+        ws = _WriteState(write_id=(raw or {}).get("write_id"))
+        raw = raw or {}
+        for nid, node_data in raw.get("nodes", {}).items():
+            turn_ids = node_data.get("turn_ids", [])
+            if turn_ids:
+                ws.turn_seq_map[nid] = turn_ids
+        # Newer record.json files carry the write state, so the JSONL files
+        # needn't be read (and decoded) in full
+        nodes_raw: dict[str, Any] = raw.get("nodes", {})
+        if "next_turn_seq" in raw and all(
+            "ui_len" in nd for nd in nodes_raw.values()
+        ):
+            ws.next_turn_seq = raw["next_turn_seq"]
+            for nid, node_data in nodes_raw.items():
+                if node_data["ui_len"] is not None:
+                    ws.ui_node_len[nid] = node_data["ui_len"]
+            self._write_state[key] = ws
+            return ws
+
         turns_file = conv_dir / "turns.jsonl"
         if turns_file.is_file():
             lines = turns_file.read_text(encoding="utf-8").strip().splitlines()
             ws.next_turn_seq = len(lines)
-
-        record_file = conv_dir / "record.json"
-        if record_file.is_file():
-            raw = json.loads(record_file.read_text(encoding="utf-8"))
-            for nid, node_data in raw.get("nodes", {}).items():
-                turn_ids = node_data.get("turn_ids", [])
-                if turn_ids:
-                    ws.turn_seq_map[nid] = turn_ids
         ui_file = conv_dir / "ui.jsonl"
         if ui_file.is_file():
             for line in (
@@ -161,14 +536,36 @@ class FileConversationStore(ConversationStore):
     async def list(
         self, partition: ConversationPartition
     ) -> list[ConversationMeta]:
-        if partition in self._meta_cache:
-            return list(self._meta_cache[partition])
         partition_dir = await self._partition_dir(partition)
+        # Read before scanning, so a write during the scan shows up next time
+        generation = read_generation(partition_dir)
+        cached = (
+            partition in self._meta_cache
+            and partition in self._generation
+            and self._generation[partition] == generation
+        )
+        _metrics.counter(
+            "shinychat.store.list_cache",
+            1,
+            {"store": type(self).__name__, "hit": cached},
+        )
+        if cached:
+            return list(self._meta_cache[partition])
+        # Revalidate: reuse the metas of conversations whose record.json is
+        # unchanged since it was read
+        old_metas = {m.id: m for m in self._meta_cache.get(partition, [])}
+        old_stamps = self._meta_stamps.get(partition, {})
+        stamps: dict[str, RecordStamp] = {}
         metas: list[ConversationMeta] = []
         if partition_dir.is_dir():
             for d in partition_dir.iterdir():
                 record_file = d / "record.json"
-                if not d.is_dir() or not record_file.is_file():
+                stamp = record_stamp(record_file) if d.is_dir() else None
+                if stamp is None:
+                    continue
+                if old_stamps.get(d.name) == stamp and d.name in old_metas:
+                    stamps[d.name] = stamp
+                    metas.append(old_metas[d.name])
                     continue
                 try:
                     raw = json.loads(record_file.read_text(encoding="utf-8"))
@@ -196,108 +593,189 @@ class FileConversationStore(ConversationStore):
                         current_leaf=raw.get("current_leaf"),
                         values=raw.get("values", {}),
                         bookmark_state_id=raw.get("bookmark_state_id"),
+                        revision=raw.get("revision", 0),
                     )
                     size_bytes = sum(
                         f.stat().st_size for f in d.iterdir() if f.is_file()
                     )
                     metas.append(rec.meta(size_bytes=size_bytes))
+                    stamps[d.name] = stamp
                 except Exception as e:
                     logger.warning("Unreadable conversation %s: %s", d.name, e)
                     continue
             metas.sort(key=lambda m: m.updated_at, reverse=True)
         self._meta_cache[partition] = metas
+        self._meta_stamps[partition] = stamps
+        self._generation[partition] = generation
         return list(metas)
 
+    def _advance_generation(
+        self, partition: ConversationPartition, partition_dir: Path
+    ) -> bool:
+        """Record a write to the partition. Returns whether the meta cache
+        (if any) is still current apart from that write; if not, it is left
+        for the next ``list()`` to revalidate."""
+        before = read_generation(partition_dir)
+        after = bump_generation(partition_dir)
+        current = (
+            partition in self._generation
+            and self._generation[partition] == before
+            and generation_follows(before, after)
+        )
+        if current:
+            self._generation[partition] = after
+        else:
+            self._generation.pop(partition, None)
+        return current
+
     async def get(
         self, partition: ConversationPartition, conv_id: str
     ) -> ConversationRecord | None:
-        conv_dir = safe_conv_path(await self._partition_dir(partition), conv_id)
+        partition_dir = await self._partition_dir(partition)
+        record = self._read_record(partition_dir, conv_id)
+        if record is None:
+            self._note_missing(partition)
+        return record
+
+    async def get_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> dict[str, ConversationRecord]:
+        partition_dir = await self._partition_dir(partition)
+
+        def read_all() -> dict[str, ConversationRecord]:
+            records: dict[str, ConversationRecord] = {}
+            for conv_id in conv_ids:
+                record = self._read_record(partition_dir, conv_id)
+                if record is not None:
+                    records[conv_id] = record
+            return records
+
+        # One worker-thread hop for the whole batch, off the event loop. The
+        # thread only reads files; the store's caches are updated back here.
+        records = await asyncio.to_thread(read_all)
+        if len(records) < len(set(conv_ids)):
+            self._note_missing(partition)
+        return records
+
+    def _note_missing(self, partition: ConversationPartition) -> None:
+        # The meta cache may be stale (e.g. another worker deleted a
+        # conversation) -- make the next list() revalidate it.
+        self._generation.pop(partition, None)
+
+    def _read_record(
+        self, partition_dir: Path, conv_id: str
+    ) -> ConversationRecord | None:
+        """Read a conversation from disk. Touches no store state, so it can
+        run in a worker thread."""
+        conv_dir = safe_conv_path(partition_dir, conv_id)
         record_file = conv_dir / "record.json"
         if not record_file.is_file():
-            # Cache may be stale (e.g. another worker deleted this
-            # conversation) — drop it so the next list() re-reads disk.
-            self._meta_cache.pop(partition, None)
             return None
 
         raw = json.loads(record_file.read_text(encoding="utf-8"))
         schema_version = check_schema_version(raw.get("schema_version"))
 
-        turns_map: dict[int, dict[str, Any]] = {}
         turns_file = conv_dir / "turns.jsonl"
-        if turns_file.is_file():
-            for line in (
-                turns_file.read_text(encoding="utf-8").strip().splitlines()
-            ):
-                try:
-                    entry = json.loads(line)
-                    turns_map[entry["seq"]] = entry["data"]
-                except (json.JSONDecodeError, KeyError):
-                    continue
-
-        ui_map: dict[str, list[dict[str, Any]]] = {}
         ui_file = conv_dir / "ui.jsonl"
-        if ui_file.is_file():
-            for line in (
-                ui_file.read_text(encoding="utf-8").strip().splitlines()
-            ):
-                try:
-                    entry = json.loads(line)
-                    ui_map[entry["node_id"]] = entry["data"]
-                except (json.JSONDecodeError, KeyError):
-                    continue
-
-        nodes: dict[str, ConversationNode] = {}
-        for nid, node_data in raw.get("nodes", {}).items():
-            turn_ids = node_data.get("turn_ids", [])
-            turns = [turns_map[tid] for tid in turn_ids if tid in turns_map]
-            nodes[nid] = ConversationNode(
-                parent=node_data.get("parent"),
-                children=node_data.get("children", []),
-                turns=turns,
-                ui=ui_map.get(nid),
-                selected_child=node_data.get("selected_child"),
+        if self._lazy:
+            nodes = lazy_nodes(
+                raw,
+                JsonlIndex(turns_file, "seq"),
+                JsonlIndex(ui_file, "node_id"),
             )
+            return record_from_json(raw, schema_version, nodes)
 
-        return ConversationRecord(
-            schema_version=schema_version,
-            id=raw["id"],
-            title=raw["title"],
-            title_source=raw.get("title_source"),
-            response_count=raw.get("response_count", 0),
-            created_at=raw["created_at"],
-            updated_at=raw["updated_at"],
-            client_info=raw.get("client_info", {}),
-            nodes=nodes,
-            next_node_seq=raw.get("next_node_seq", 1),
-            current_leaf=raw.get("current_leaf"),
-            values=raw.get("values", {}),
-            bookmark_state_id=raw.get("bookmark_state_id"),
+        turns_map = (
+            parse_jsonl(turns_file.read_text(encoding="utf-8"), "seq")
+            if turns_file.is_file()
+            else {}
+        )
+        ui_map = (
+            parse_jsonl(ui_file.read_text(encoding="utf-8"), "node_id")
+            if ui_file.is_file()
+            else {}
+        )
+        return record_from_json(
+            raw, schema_version, merge_nodes(raw, turns_map, ui_map)
         )
 
     async def put(
-        self, partition: ConversationPartition, record: ConversationRecord
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        *,
+        expected_revision: int | None = None,
     ) -> None:
         check_schema_version(record.schema_version)
 
         partition_dir = await self._partition_dir(partition)
+        async with partition_lock(partition_dir):
+            self._write_record(
+                partition, partition_dir, record, expected_revision
+            )
+            self._note_written(partition, partition_dir, [record])
+
+    async def put_many(
+        self,
+        partition: ConversationPartition,
+        records: Sequence[ConversationRecord],
+    ) -> None:
+        for record in records:
+            check_schema_version(record.schema_version)
+
+        # One lock, one generation bump and one cache update for the batch
+        partition_dir = await self._partition_dir(partition)
+        async with partition_lock(partition_dir):
+            written: list[ConversationRecord] = []
+            try:
+                for record in records:
+                    self._write_record(partition, partition_dir, record, None)
+                    written.append(record)
+            finally:
+                if written:
+                    self._note_written(partition, partition_dir, written)
+
+    def _write_record(
+        self,
+        partition: ConversationPartition,
+        partition_dir: Path,
+        record: ConversationRecord,
+        expected_revision: int | None,
+    ) -> None:
         conv_dir = safe_conv_path(partition_dir, record.id)
         # Validate the on-disk schema version before creating/modifying
         # anything, so an unsupported existing record is rejected fail-closed
         # rather than partially overwritten.
         record_file = conv_dir / "record.json"
+        raw: dict[str, Any] | None = None
         if record_file.is_file():
             raw = json.loads(record_file.read_text(encoding="utf-8"))
             check_schema_version(raw.get("schema_version"))
+        revision = raw.get("revision", 0) if raw is not None else 0
+        if expected_revision is not None and expected_revision != revision:
+            raise ConversationConflictError(
+                record.id, expected_revision, revision
+            )
 
         conv_dir.mkdir(parents=True, exist_ok=True)
 
-        ws = self._get_or_init_write_state(partition, record.id, conv_dir)
+        ws = self._get_or_init_write_state(partition, record.id, conv_dir, raw)
 
         new_turns_lines: list[str] = []
         new_ui_lines: list[str] = []
         record_nodes: dict[str, dict[str, Any]] = {}
 
         for nid, node in record.nodes.items():
+            if not node.is_loaded() and nid in ws.turn_seq_map:
+                # Never read since get(), so nothing changed: don't load it
+                record_nodes[nid] = {
+                    "parent": node.parent,
+                    "children": node.children,
+                    "turn_ids": ws.turn_seq_map[nid],
+                    "selected_child": node.selected_child,
+                    "ui_len": ws.ui_node_len.get(nid),
+                }
+                continue
             if nid not in ws.turn_seq_map:
                 turn_ids: list[int] = []
                 for turn_data in node.turns:
@@ -324,67 +802,96 @@ class FileConversationStore(ConversationStore):
                 "children": node.children,
                 "turn_ids": ws.turn_seq_map.get(nid, []),
                 "selected_child": node.selected_child,
+                "ui_len": ws.ui_node_len.get(nid),
             }
 
+        n_written = 0
         turns_file = conv_dir / "turns.jsonl"
         if new_turns_lines:
             with open(turns_file, "a", encoding="utf-8") as f:
-                f.write("\n".join(new_turns_lines) + "\n")
+                n_written += f.write("\n".join(new_turns_lines) + "\n")
         elif not turns_file.exists():
             turns_file.touch()
 
         ui_file = conv_dir / "ui.jsonl"
         if new_ui_lines:
             with open(ui_file, "a", encoding="utf-8") as f:
-                f.write("\n".join(new_ui_lines) + "\n")
+                n_written += f.write("\n".join(new_ui_lines) + "\n")
         elif not ui_file.exists():
             ui_file.touch()
 
-        record_data = {
-            "schema_version": record.schema_version,
-            "id": record.id,
-            "title": record.title,
-            "title_source": record.title_source,
-            "response_count": record.response_count,
-            "created_at": record.created_at.isoformat(),
-            "updated_at": record.updated_at.isoformat(),
-            "client_info": record.client_info,
-            "next_node_seq": record.next_node_seq,
-            "current_leaf": record.current_leaf,
-            "nodes": record_nodes,
-            "values": record.values,
-            "bookmark_state_id": record.bookmark_state_id,
-        }
+        record_data = record_to_json(record, record_nodes)
+        record_data["next_turn_seq"] = ws.next_turn_seq
+        record_data["revision"] = revision + 1
+        ws.write_id = record_data["write_id"] = os.urandom(8).hex()
         tmp = conv_dir / ".record.json.tmp"
-        tmp.write_text(
+        n_written += tmp.write_text(
             json.dumps(record_data, ensure_ascii=False),
             encoding="utf-8",
         )
-        os.replace(tmp, conv_dir / "record.json")
+        os.replace(tmp, record_file)
+        record.revision = revision + 1
+        # Characters, not bytes: close enough for a write-volume signal and
+        # avoids re-encoding everything just to measure it.
+        _metrics.counter(
+            "shinychat.store.bytes_written",
+            n_written,
+            {"store": type(self).__name__},
+        )
 
-        if partition in self._meta_cache:
+    def _note_written(
+        self,
+        partition: ConversationPartition,
+        partition_dir: Path,
+        records: Sequence[ConversationRecord],
+    ) -> None:
+        """Advance the generation past a batch of writes, updating a
+        current meta cache in place."""
+        if not self._advance_generation(partition, partition_dir):
+            return
+        latest = {record.id: record for record in records}
+        updated = [m for m in self._meta_cache[partition] if m.id not in latest]
+        stamps = self._meta_stamps[partition]
+        for record in latest.values():
+            conv_dir = safe_conv_path(partition_dir, record.id)
+            stamp = record_stamp(conv_dir / "record.json")
+            if stamp is None:
+                stamps.pop(record.id, None)
+                continue
             size_bytes = sum(
                 f.stat().st_size for f in conv_dir.iterdir() if f.is_file()
             )
-            updated = [
-                m for m in self._meta_cache[partition] if m.id != record.id
-            ]
             updated.append(record.meta(size_bytes=size_bytes))
-            updated.sort(key=lambda m: m.updated_at, reverse=True)
-            self._meta_cache[partition] = updated
+            stamps[record.id] = stamp
+        updated.sort(key=lambda m: m.updated_at, reverse=True)
+        self._meta_cache[partition] = updated
 
     async def delete(
         self, partition: ConversationPartition, conv_id: str
     ) -> None:
-        conv_dir = safe_conv_path(await self._partition_dir(partition), conv_id)
-        if conv_dir.is_dir():
-            shutil.rmtree(conv_dir)
-        key = self._ws_key(partition, conv_id)
-        self._write_state.pop(key, None)
-        if partition in self._meta_cache:
+        await self.delete_many(partition, [conv_id])
+
+    async def delete_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> None:
+        partition_dir = await self._partition_dir(partition)
+        conv_dirs = [safe_conv_path(partition_dir, c) for c in conv_ids]
+        for conv_id in conv_ids:
+            self._write_state.pop(self._ws_key(partition, conv_id), None)
+        if not conv_ids or not partition_dir.is_dir():
+            return
+        async with partition_lock(partition_dir):
+            for conv_dir in conv_dirs:
+                if conv_dir.is_dir():
+                    shutil.rmtree(conv_dir)
+            current = self._advance_generation(partition, partition_dir)
+        if current:
+            ids = set(conv_ids)
             self._meta_cache[partition] = [
-                m for m in self._meta_cache[partition] if m.id != conv_id
+                m for m in self._meta_cache[partition] if m.id not in ids
             ]
+            for conv_id in ids:
+                self._meta_stamps[partition].pop(conv_id, None)
 
     async def _partition_dir(self, partition: ConversationPartition) -> Path:
         if self._dir is None:
@@ -404,10 +911,14 @@ class InMemoryConversationStore(ConversationStore):
     and apps where per-session history is sufficient.
     """
 
+    compare_and_swap = True
+
     def __init__(self) -> None:
         self._data: dict[
             ConversationPartition, dict[str, ConversationRecord]
         ] = {}
+        # Tracked apart from the records, which callers share and mutate
+        self._revisions: dict[tuple[ConversationPartition, str], int] = {}
         self._meta_cache: dict[
             ConversationPartition, list[ConversationMeta]
         ] = {}
@@ -415,7 +926,13 @@ class InMemoryConversationStore(ConversationStore):
     async def list(
         self, partition: ConversationPartition
     ) -> list[ConversationMeta]:
-        if partition in self._meta_cache:
+        cached = partition in self._meta_cache
+        _metrics.counter(
+            "shinychat.store.list_cache",
+            1,
+            {"store": type(self).__name__, "hit": cached},
+        )
+        if cached:
             return list(self._meta_cache[partition])
         metas = [
             r.meta(size_bytes=len(r.model_dump_json().encode("utf-8")))
@@ -430,35 +947,478 @@ class InMemoryConversationStore(ConversationStore):
     ) -> ConversationRecord | None:
         return self._data.get(partition, {}).get(conv_id)
 
+    async def get_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> dict[str, ConversationRecord]:
+        records = self._data.get(partition, {})
+        return {c: records[c] for c in conv_ids if c in records}
+
     async def put(
-        self, partition: ConversationPartition, record: ConversationRecord
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        *,
+        expected_revision: int | None = None,
     ) -> None:
         check_schema_version(record.schema_version)
 
-        if partition not in self._data:
-            self._data[partition] = {}
-        self._data[partition][record.id] = record
+        key = (partition, record.id)
+        revision = self._revisions.get(key, 0)
+        if expected_revision is not None and expected_revision != revision:
+            raise ConversationConflictError(
+                record.id, expected_revision, revision
+            )
+        self._store(partition, [record])
+
+    async def put_many(
+        self,
+        partition: ConversationPartition,
+        records: Sequence[ConversationRecord],
+    ) -> None:
+        for record in records:
+            check_schema_version(record.schema_version)
+        self._store(partition, records)
+
+    def _store(
+        self,
+        partition: ConversationPartition,
+        records: Sequence[ConversationRecord],
+    ) -> None:
+        data = self._data.setdefault(partition, {})
+        for record in records:
+            key = (partition, record.id)
+            data[record.id] = record
+            record.revision = self._revisions[key] = (
+                self._revisions.get(key, 0) + 1
+            )
 
         # Only touched-record work — mirrors FileConversationStore.put(), so
         # a warm cache stays warm without resumming/reserializing everything
         # in partition (the cost _evict_if_needed would otherwise pay every turn).
         if partition in self._meta_cache:
-            size_bytes = len(record.model_dump_json().encode("utf-8"))
+            latest = {record.id: record for record in records}
             updated = [
-                m for m in self._meta_cache[partition] if m.id != record.id
+                m for m in self._meta_cache[partition] if m.id not in latest
             ]
-            updated.append(record.meta(size_bytes=size_bytes))
+            for record in latest.values():
+                size_bytes = len(record.model_dump_json().encode("utf-8"))
+                updated.append(record.meta(size_bytes=size_bytes))
             updated.sort(key=lambda m: m.updated_at, reverse=True)
             self._meta_cache[partition] = updated
 
     async def delete(
         self, partition: ConversationPartition, conv_id: str
     ) -> None:
-        self._data.get(partition, {}).pop(conv_id, None)
+        await self.delete_many(partition, [conv_id])
+
+    async def delete_many(
+        self, partition: ConversationPartition, conv_ids: Sequence[str]
+    ) -> None:
+        records = self._data.get(partition, {})
+        for conv_id in conv_ids:
+            records.pop(conv_id, None)
+            self._revisions.pop((partition, conv_id), None)
         if partition in self._meta_cache:
+            ids = set(conv_ids)
             self._meta_cache[partition] = [
-                m for m in self._meta_cache[partition] if m.id != conv_id
+                m for m in self._meta_cache[partition] if m.id not in ids
+            ]
+
+
+#: A conversation's turn and UI segments are merged into one of each once it
+#: has this many, bounding the objects `get()` reads.
+FSSPEC_COMPACT_SEGMENTS = 32
+
+#: How many times `get()` re-reads a record whose segments were merged away
+#: (by another worker's save) while it was reading them.
+FSSPEC_READ_ATTEMPTS = 3
+
+INDEX_OBJECT = "index.json"
+
+
+@dataclasses.dataclass
+class _ObjectWriteState(_WriteState):
+    # Segment objects (relative to the conversation prefix) in write order
+    turn_segments: list[str] = dataclasses.field(default_factory=list)
+    ui_segments: list[str] = dataclasses.field(default_factory=list)
+    next_segment: int = 0
+    segment_bytes: int = 0
+
+
+class FsspecConversationStore(ConversationStore):
+    """
+    Store conversations in any `fsspec <https://filesystem-spec.readthedocs.io/>`_
+    filesystem, such as S3, GCS or Azure Blob Storage, so history survives
+    ephemeral containers.
+
+    Uses the same split as :class:`FileConversationStore`, adapted to object
+    storage, which can't append to an object. Under
+    ``<url>/<chat_id>/<scope>/``, each conversation's ``<id>/record.json``
+    holds its tree and metadata, and each save adds (at most) one
+    ``turns/<n>.jsonl`` and one ``ui/<n>.jsonl`` segment holding only what
+    changed. Segments are written in one batch, then ``record.json``, which
+    lists them, so a failed save never leaves a record pointing at missing
+    data. Once a conversation has many segments they are merged. An
+    ``index.json`` per partition holds the conversation summaries, so
+    `list()` reads a single object; it is rebuilt from the records if
+    missing.
+
+    Several workers (e.g. replicas of an app) can share one store. `list()`
+    reads the index on every call, and each save updates it from its current
+    contents, so conversations other workers saved or deleted stay as they
+    left them. Each save first reads the conversation's ``record.json``. If
+    another worker has saved the conversation since, the save picks up from
+    there. Segment names are unique to each save, so saves never overwrite
+    each other's segments. Object stores have no portable locks, though, so
+    simultaneous saves of the *same* conversation (or index) still race and
+    the last one wins.
+
+    Requires ``fsspec`` and the filesystem's own package (e.g. ``s3fs``).
+    Storage calls run in a worker thread.
+
+    Parameters
+    ----------
+    url
+        Root of the store, e.g. ``"s3://bucket/shinychat"`` or
+        ``"memory://shinychat"``.
+    storage_options
+        Options for the filesystem (credentials, endpoint, ...), passed to
+        ``fsspec.core.url_to_fs()``.
+    """
+
+    def __init__(
+        self, url: str, *, storage_options: dict[str, Any] | None = None
+    ) -> None:
+        try:
+            from fsspec.core import strip_protocol, url_to_fs
+        except ImportError:
+            raise ImportError(
+                "FsspecConversationStore requires the 'fsspec' package. "
+                "Install it with `pip install fsspec` (plus the filesystem's "
+                "own package, e.g. `s3fs`)."
+            ) from None
+        self._fs, root = url_to_fs(url, **(storage_options or {}))
+        self._strip_protocol = strip_protocol
+        self._root = root.rstrip("/")
+        self._write_state: dict[
+            tuple[ConversationPartition, str], _ObjectWriteState
+        ] = {}
+        # Serializes each partition's index read-modify-write, so snapshots
+        # reach storage in the order they were taken
+        self._index_locks: dict[ConversationPartition, asyncio.Lock] = {}
+
+    async def _io(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(fn, *args)
+        )
+
+    def _partition_prefix(self, partition: ConversationPartition) -> str:
+        return (
+            f"{self._root}/{sanitize_scope(partition.chat_id)}"
+            f"/{sanitize_scope(partition.scope)}"
+        )
+
+    def _conv_prefix(
+        self, partition: ConversationPartition, conv_id: str
+    ) -> str:
+        if not CONV_ID_RE.fullmatch(conv_id):
+            raise ValueError(f"Invalid conversation id: {conv_id!r}")
+        return f"{self._partition_prefix(partition)}/{conv_id}"
+
+    async def _read_json(self, path: str) -> Any | None:
+        try:
+            data = await self._io(self._fs.cat_file, path)
+        except FileNotFoundError:
+            return None
+        return json.loads(data)
+
+    async def _read_objects(
+        self, paths: list[str], *, missing_ok: bool = False
+    ) -> list[bytes]:
+        """Read ``paths`` in one batch, in order.
+
+        A missing object raises ``FileNotFoundError``, or with
+        ``missing_ok=True`` reads as empty.
+        """
+        if not paths:
+            return []
+        out: dict[str, bytes] = await self._io(
+            self._fs.cat, paths, False, "omit"
+        )
+        data: list[bytes] = []
+        for p in paths:
+            # Filesystems may key the result by their canonical form of the path
+            chunk = out.get(p)
+            if chunk is None:
+                chunk = out.get(
+                    self._strip_protocol(self._fs.unstrip_protocol(p))
+                )
+            if chunk is None:
+                if not missing_ok:
+                    raise FileNotFoundError(p)
+                chunk = b""
+            data.append(chunk)
+        return data
+
+    async def list(
+        self, partition: ConversationPartition
+    ) -> list[ConversationMeta]:
+        # Not cached: another worker may have changed the index since
+        prefix = self._partition_prefix(partition)
+        index = await self._read_json(f"{prefix}/{INDEX_OBJECT}")
+        if isinstance(index, dict):
+            metas = [
+                ConversationMeta.model_validate(m)
+                for m in index.get("conversations", [])
             ]
+        else:
+            metas = await self._rebuild_index(partition)
+        metas.sort(key=lambda m: m.updated_at, reverse=True)
+        return metas
+
+    async def _rebuild_index(
+        self, partition: ConversationPartition
+    ) -> list[ConversationMeta]:
+        prefix = self._partition_prefix(partition)
+        paths: list[str] = await self._io(
+            self._fs.glob, f"{prefix}/*/record.json"
+        )
+        metas: list[ConversationMeta] = []
+        # A record deleted since the glob is skipped (as unreadable)
+        objects = await self._read_objects(paths, missing_ok=True)
+        for path, data in zip(paths, objects):
+            try:
+                raw = json.loads(data)
+                schema_version = check_schema_version(raw.get("schema_version"))
+                rec = record_from_json(raw, schema_version, {})
+                metas.append(rec.meta(size_bytes=raw.get("size_bytes", 0)))
+            except Exception as e:
+                logger.warning("Unreadable conversation %s: %s", path, e)
+        if metas:
+            await self._write_index(partition, metas)
+        return metas
+
+    async def _write_index(
+        self,
+        partition: ConversationPartition,
+        metas: list[ConversationMeta],
+    ) -> None:
+        data = json.dumps(
+            {"conversations": [m.model_dump(mode="json") for m in metas]},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        path = f"{self._partition_prefix(partition)}/{INDEX_OBJECT}"
+        await self._io(self._fs.pipe_file, path, data)
+
+    async def _update_index(
+        self,
+        partition: ConversationPartition,
+        conv_id: str,
+        meta: ConversationMeta | None,
+    ) -> None:
+        lock = self._index_locks.setdefault(partition, asyncio.Lock())
+        async with lock:
+            # Re-read, so other workers' entries survive this write
+            metas = [m for m in await self.list(partition) if m.id != conv_id]
+            if meta is not None:
+                metas.append(meta)
+                metas.sort(key=lambda m: m.updated_at, reverse=True)
+            await self._write_index(partition, metas)
+
+    async def get(
+        self, partition: ConversationPartition, conv_id: str
+    ) -> ConversationRecord | None:
+        prefix = self._conv_prefix(partition, conv_id)
+        attempts = 0
+        while True:
+            raw = await self._read_json(f"{prefix}/record.json")
+            if raw is None:
+                return None
+            schema_version = check_schema_version(raw.get("schema_version"))
+
+            segments = raw.get("segments", {})
+            turn_segments: list[str] = segments.get("turns", [])
+            ui_segments: list[str] = segments.get("ui", [])
+            try:
+                data = await self._read_objects(
+                    [
+                        f"{prefix}/{name}"
+                        for name in [*turn_segments, *ui_segments]
+                    ]
+                )
+            except FileNotFoundError:
+                # A save merged the segments after we read the record; the
+                # record it wrote first lists the merged ones
+                attempts += 1
+                if attempts == FSSPEC_READ_ATTEMPTS:
+                    raise
+                continue
+            break
+        turns_map: dict[Any, Any] = {}
+        ui_map: dict[Any, Any] = {}
+        for i, chunk in enumerate(data):
+            text = chunk.decode("utf-8")
+            if i < len(turn_segments):
+                turns_map.update(parse_jsonl(text, "seq"))
+            else:
+                ui_map.update(parse_jsonl(text, "node_id"))
+        return record_from_json(
+            raw, schema_version, merge_nodes(raw, turns_map, ui_map)
+        )
+
+    def _get_or_init_write_state(
+        self,
+        partition: ConversationPartition,
+        conv_id: str,
+        raw: dict[str, Any] | None,
+    ) -> _ObjectWriteState:
+        """The write state for a conversation, given its record.json as
+        currently stored (``raw``, ``None`` if there is none)."""
+        key = (partition, conv_id)
+        ws = self._write_state.get(key)
+        if ws is not None and ws.write_id == (raw or {}).get("write_id"):
+            return ws
+        ws = _ObjectWriteState()
+        if raw is not None:
+            # Reject an unsupported stored record before overwriting it
+            check_schema_version(raw.get("schema_version"))
+            for nid, node_data in raw.get("nodes", {}).items():
+                if node_data.get("turn_ids"):
+                    ws.turn_seq_map[nid] = node_data["turn_ids"]
+                if node_data.get("ui_len") is not None:
+                    ws.ui_node_len[nid] = node_data["ui_len"]
+            segments = raw.get("segments", {})
+            ws.turn_segments = list(segments.get("turns", []))
+            ws.ui_segments = list(segments.get("ui", []))
+            ws.next_turn_seq = raw.get("next_turn_seq", 0)
+            ws.next_segment = raw.get("next_segment", 0)
+            ws.segment_bytes = raw.get("segment_bytes", 0)
+            ws.write_id = raw.get("write_id")
+        self._write_state[key] = ws
+        return ws
+
+    async def put(
+        self,
+        partition: ConversationPartition,
+        record: ConversationRecord,
+        *,
+        expected_revision: int | None = None,
+    ) -> None:
+        if expected_revision is not None:
+            raise NotImplementedError(
+                "FsspecConversationStore doesn't support compare-and-swap "
+                "puts (object stores have no portable conditional write)."
+            )
+        check_schema_version(record.schema_version)
+        prefix = self._conv_prefix(partition, record.id)
+        key = (partition, record.id)
+        # Read on every save: another worker may have saved since
+        raw = await self._read_json(f"{prefix}/record.json")
+        ws = self._get_or_init_write_state(partition, record.id, raw)
+        write_id = os.urandom(8).hex()
+
+        n_segments = len(ws.turn_segments) + len(ws.ui_segments)
+        compact = n_segments >= FSSPEC_COMPACT_SEGMENTS
+        stale = [*ws.turn_segments, *ws.ui_segments] if compact else []
+        if compact:
+            ws.turn_segments, ws.ui_segments = [], []
+            ws.ui_node_len, ws.segment_bytes = {}, 0
+
+        new_turns_lines: list[str] = []
+        new_ui_lines: list[str] = []
+        record_nodes: dict[str, dict[str, Any]] = {}
+        for nid, node in record.nodes.items():
+            is_new = nid not in ws.turn_seq_map
+            if is_new:
+                start = ws.next_turn_seq
+                ws.next_turn_seq += len(node.turns)
+                ws.turn_seq_map[nid] = list(range(start, ws.next_turn_seq))
+            if is_new or compact:
+                new_turns_lines.extend(
+                    json.dumps({"seq": seq, "data": data}, ensure_ascii=False)
+                    for seq, data in zip(ws.turn_seq_map[nid], node.turns)
+                )
+            if node.ui is not None and len(node.ui) != ws.ui_node_len.get(nid):
+                new_ui_lines.append(
+                    json.dumps(
+                        {"node_id": nid, "data": node.ui}, ensure_ascii=False
+                    )
+                )
+                ws.ui_node_len[nid] = len(node.ui)
+            record_nodes[nid] = {
+                "parent": node.parent,
+                "children": node.children,
+                "turn_ids": ws.turn_seq_map.get(nid, []),
+                "selected_child": node.selected_child,
+                "ui_len": ws.ui_node_len.get(nid),
+            }
+
+        objects: dict[str, bytes] = {}
+        for lines, segments, kind in (
+            (new_turns_lines, ws.turn_segments, "turns"),
+            (new_ui_lines, ws.ui_segments, "ui"),
+        ):
+            if not lines:
+                continue
+            name = f"{kind}/{ws.next_segment:08d}-{write_id}.jsonl"
+            ws.next_segment += 1
+            segments.append(name)
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            objects[f"{prefix}/{name}"] = data
+            ws.segment_bytes += len(data)
+
+        record_data = record_to_json(record, record_nodes)
+        record_data.update(
+            segments={"turns": ws.turn_segments, "ui": ws.ui_segments},
+            next_turn_seq=ws.next_turn_seq,
+            next_segment=ws.next_segment,
+            segment_bytes=ws.segment_bytes,
+            write_id=write_id,
+        )
+        record_bytes = json.dumps(record_data, ensure_ascii=False).encode(
+            "utf-8"
+        )
+        size_bytes = ws.segment_bytes + len(record_bytes)
+        record_data["size_bytes"] = size_bytes
+        record_bytes = json.dumps(record_data, ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+        try:
+            if objects:
+                await self._io(self._fs.pipe, objects)
+            await self._io(
+                self._fs.pipe_file, f"{prefix}/record.json", record_bytes
+            )
+        except Exception:
+            # What was written is unknown; re-read it on the next save
+            self._write_state.pop(key, None)
+            raise
+        ws.write_id = write_id
+        _metrics.counter(
+            "shinychat.store.bytes_written",
+            len(record_bytes) + sum(len(d) for d in objects.values()),
+            {"store": type(self).__name__},
+        )
+        if stale:
+            try:
+                await self._io(self._fs.rm, [f"{prefix}/{n}" for n in stale])
+            except Exception as e:
+                logger.warning("Could not remove merged segments: %s", e)
+
+        await self._update_index(
+            partition, record.id, record.meta(size_bytes=size_bytes)
+        )
+
+    async def delete(
+        self, partition: ConversationPartition, conv_id: str
+    ) -> None:
+        prefix = self._conv_prefix(partition, conv_id)
+        exists = await self._io(self._fs.exists, f"{prefix}/record.json")
+        if exists:
+            await self._io(self._fs.rm, prefix, True)
+        self._write_state.pop((partition, conv_id), None)
+        await self._update_index(partition, conv_id, None)
 
 
 AUTO_DEV_MEMORY_STORE: dict[str, InMemoryConversationStore] = {}
@@ -481,7 +1441,12 @@ def resolve_store(
         return InMemoryConversationStore()
     if store == "file":
         return FileConversationStore()
-    # "auto": use in-memory for dev, file-based for production
+    # "auto": an explicitly configured object store, else in-memory for dev
+    # and file-based for production
+    url = os.environ.get(HISTORY_URL_ENV_VAR)
+    if url:
+        logger.info("Chat history: using fsspec storage at %s.", url)
+        return FsspecConversationStore(url)
     if os.getenv("SHINY_DEV_MODE") == "1":
         logger.info(
             "Chat history: using in-memory storage (dev mode). "
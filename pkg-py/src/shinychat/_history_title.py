@@ -25,15 +25,18 @@ async def generate_title(
     title_fn: TitleFn | None,
     client: Any,
     turns: list[dict[str, Any]],
+    *,
+    threaded: bool = False,
 ) -> str | None:
     """
     Returns a generated title, or None on any failure (caller keeps the
     fallback title). `title_fn` wins when provided; otherwise a one-shot LLM
-    call on a copy of `client` (chatlas only).
+    call on a copy of `client` (chatlas only). With `threaded=True`, a sync
+    `title_fn` runs on the callback thread pool.
     """
     try:
         if title_fn is not None:
-            title = await wrap_async(title_fn)(turns)
+            title = await wrap_async(title_fn, threaded=threaded)(turns)
         else:
             title = await chatlas_one_shot_title(client, turns)
         if title is None:
@@ -3,9 +3,15 @@ from __future__ import annotations
 import secrets
 import time
 from datetime import datetime, timezone
-from typing import Any, Literal
+from typing import Any, Callable, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import (
+    BaseModel,
+    Field,
+    PrivateAttr,
+    SerializerFunctionWrapHandler,
+    model_serializer,
+)
 
 TitleSource = Literal["llm", "user"]
 
@@ -29,6 +35,9 @@ class ConversationMeta(BaseModel):
     # dump size) — required so ConversationStore.total_size() can be derived
     # by summing list() results instead of a separate per-backend sweep.
     size_bytes: int
+    # The record's revision (see ConversationRecord.revision); lets a cached
+    # copy be checked for staleness without reading the record.
+    revision: int = 0
 
 
 class ConversationNode(BaseModel):
@@ -54,6 +63,79 @@ class ConversationNode(BaseModel):
         # _send_sibling_metadata) stays aligned with what the client reports.
         return len(self.ui) if self.ui else 1
 
+    def is_loaded(self) -> bool:
+        """Whether `turns` and `ui` are in memory (false only for a
+        `LazyConversationNode` that hasn't been read yet)."""
+        return True
+
+    def load(self) -> None:
+        """Read `turns` and `ui` into memory, if they aren't already."""
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler: SerializerFunctionWrapHandler) -> Any:
+        # Dumping a lazy node must include its payload, not silently drop it
+        self.load()
+        return handler(self)
+
+
+# Reads a lazy node's (turns, ui) from storage
+NodeLoader = Callable[
+    [], "tuple[list[dict[str, Any]], list[dict[str, Any]] | None]"
+]
+
+
+class LazyConversationNode(ConversationNode):
+    """
+    A node whose `turns` and `ui` are read from storage on first access.
+
+    Stores use these to open a record without decoding every branch: only the
+    nodes a caller actually touches (typically the active path) are loaded.
+    Otherwise it behaves exactly like a `ConversationNode`.
+    """
+
+    _loader: NodeLoader | None = PrivateAttr(default=None)
+
+    @classmethod
+    def deferred(
+        cls,
+        loader: NodeLoader,
+        *,
+        parent: str | None,
+        children: list[str],
+        selected_child: str | None,
+    ) -> LazyConversationNode:
+        node = cls.model_construct(
+            parent=parent, children=children, selected_child=selected_child
+        )
+        # model_construct() fills in the `ui` default; leave it unread instead
+        del node.__dict__["ui"]
+        node._loader = loader
+        return node
+
+    def is_loaded(self) -> bool:
+        return "turns" in self.__dict__
+
+    def load(self) -> None:
+        if self.is_loaded() or self._loader is None:
+            return
+        turns, ui = self._loader()
+        self.__dict__["turns"] = turns
+        self.__dict__["ui"] = ui
+        # Drop the loader (and the storage it references) once it's done
+        self._loader = None
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("turns", "ui") and not self.is_loaded():
+            self.load()
+            return self.__dict__[name]
+        return super().__getattr__(name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Assigning one half of the payload must not leave the other unloaded
+        if name in ("turns", "ui"):
+            self.load()
+        super().__setattr__(name, value)
+
 
 MIN_SCHEMA_VERSION = 1
 MAX_SCHEMA_VERSION = 1
@@ -67,6 +149,20 @@ class UnsupportedSchemaVersionError(ValueError):
         )
 
 
+class ConversationConflictError(RuntimeError):
+    """Raised by a compare-and-swap `ConversationStore.put()` when the stored
+    conversation has changed since the record being written was read."""
+
+    def __init__(self, conv_id: str, expected: int, actual: int) -> None:
+        super().__init__(
+            f"Conversation {conv_id!r} is at revision {actual}, "
+            f"expected {expected}"
+        )
+        self.conv_id = conv_id
+        self.expected = expected
+        self.actual = actual
+
+
 def check_schema_version(version: object) -> int:
     # None means the record predates schema_version entirely; treat as 1.
     version = 1 if version is None else version
@@ -99,6 +195,10 @@ class ConversationRecord(BaseModel):
     current_leaf: str | None = None
     values: dict[str, Any] = Field(default_factory=dict)
     bookmark_state_id: str | None = None
+    # Number of times the conversation has been stored, as of the copy this
+    # record was read from (0 = never). Stores set it on every put(); a
+    # compare-and-swap put() passes it as `expected_revision`.
+    revision: int = 0
 
     def meta(self, *, size_bytes: int) -> ConversationMeta:
         """Lightweight summary for `ConversationStore.list()`.
@@ -111,6 +211,7 @@ class ConversationRecord(BaseModel):
             created_at=self.created_at,
             updated_at=self.updated_at,
             size_bytes=size_bytes,
+            revision=self.revision,
         )
 
     def path_node_ids(self) -> list[str]:
@@ -192,6 +293,62 @@ class ConversationRecord(BaseModel):
             cumulative += n_ui
         raise IndexError(f"Message index {index} out of range")
 
+    def merge(self, stored: ConversationRecord) -> None:
+        """Fold `stored` -- a newer copy of this conversation, saved by
+        another writer -- into this record, so it can be put() again.
+
+        Edits that don't overlap merge cleanly. Nodes added on either side are
+        all kept; when the other writer already used the id of one of this
+        record's new nodes, this record's node is renumbered. The title with
+        the strongest source (``"user"``, then ``"llm"``) wins, this record's
+        on a tie. The current branch, app `values` and the rest keep this
+        record's value. The result takes `stored`'s revision.
+        """
+        seq = max(self.next_node_seq, stored.next_node_seq)
+        renamed: dict[str, str] = {}
+
+        def rn(nid: str | None) -> str | None:
+            return renamed.get(nid, nid) if nid is not None else None
+
+        # Nodes are kept in creation order, so parents are seen first
+        for nid, node in self.nodes.items():
+            other = stored.nodes.get(nid)
+            if other is None:
+                continue
+            if rn(node.parent) != other.parent or node.turns != other.turns:
+                renamed[nid] = f"n_{seq:04d}"
+                seq += 1
+
+        nodes: dict[str, ConversationNode] = {}
+        for nid, node in self.nodes.items():
+            if renamed:
+                node.parent = rn(node.parent)
+                node.children = [renamed.get(c, c) for c in node.children]
+                node.selected_child = rn(node.selected_child)
+            nodes[renamed.get(nid, nid)] = node
+        for nid, other in stored.nodes.items():
+            node = nodes.get(nid)
+            if node is None:
+                nodes[nid] = other
+                continue
+            # Shared node: the other writer's children first
+            extra = [c for c in node.children if c not in other.children]
+            node.children = [*other.children, *extra]
+
+        rank = {"user": 2, "llm": 1, None: 0}
+        if rank[stored.title_source] > rank[self.title_source]:
+            self.title = stored.title
+            self.title_source = stored.title_source
+        self.nodes = nodes
+        self.current_leaf = rn(self.current_leaf)
+        self.next_node_seq = seq
+        self.response_count = max(self.response_count, stored.response_count)
+        self.created_at = min(self.created_at, stored.created_at)
+        self.updated_at = max(self.updated_at, stored.updated_at)
+        if self.bookmark_state_id is None:
+            self.bookmark_state_id = stored.bookmark_state_id
+        self.revision = stored.revision
+
     def append_linear(
         self,
         turns: list[dict[str, Any]],
@@ -24,4 +24,6 @@ def shinychat_dependency() -> HTMLDependency:
         },
         script={"src": "shinychat.js", "type": "module"},
         stylesheet={"href": "shinychat.css"},
+        # Lazily imported chunks and precompressed (.gz/.br) siblings
+        all_files=True,
     )
@@ -11,6 +11,10 @@ further coercion.
 The client also co-sends a full UI message snapshot tagged
 ``:shinychat.messages`` alongside the user input, so the ``shinychat.messages``
 handler deserializes that snapshot into ``StoredMessage`` objects.
+
+Attachments the browser uploaded over HTTP arrive as ``upload_id`` references
+and are resolved into file-backed ``Attachment`` objects here (see
+``_attachment_upload.py``).
 """
 
 from __future__ import annotations
@@ -19,6 +23,7 @@ from typing import TYPE_CHECKING, Any
 
 from shiny.input_handler import input_handlers
 
+from ._attachment_upload import parse_attachments
 from ._attachments import (
     Attachment,
     validate_attachments,
@@ -37,23 +42,23 @@ class UserInputValue(TypedDict):
 
 
 @input_handlers.add("shinychat.userInput")
-def _(value: Any, _name: "ResolvedId", _session: "Session") -> UserInputValue:
+def _(value: Any, _name: "ResolvedId", session: "Session") -> UserInputValue:
     if isinstance(value, str):
         return UserInputValue(text=value, attachments=[])
     if not isinstance(value, dict):
         raise TypeError(
             f"Expected str or dict from shinychat.userInput, got {type(value)!r}"
         )
-    attachments = [
-        Attachment.model_validate(a) for a in (value.get("attachments") or [])
-    ]
+    attachments = parse_attachments(value.get("attachments"), session)
     validate_attachments(attachments)
     return UserInputValue(
         text=str(value.get("text", "")), attachments=attachments
     )
 
 
-def messages_input_value(value: Any) -> list[StoredMessage]:
+def messages_input_value(
+    value: Any, session: "Session | None" = None
+) -> list[StoredMessage]:
     # Shiny's websocket JSON decoding converts every JSON array to a Python
     # tuple (see shiny._utils.lists_to_tuples), so a JSON array arrives here
     # as a tuple, not a list.
@@ -78,9 +83,7 @@ def messages_input_value(value: Any) -> list[StoredMessage]:
             )
             for i, s in enumerate(m.get("segments", []))
         ]
-        attachments = [
-            Attachment.model_validate(a) for a in (m.get("attachments") or [])
-        ]
+        attachments = parse_attachments(m.get("attachments"), session)
         validate_attachments(attachments)
         messages.append(
             StoredMessage(
@@ -92,6 +95,6 @@ def messages_input_value(value: Any) -> list[StoredMessage]:
 
 @input_handlers.add("shinychat.messages")
 def _(
-    value: Any, _name: "ResolvedId", _session: "Session"
+    value: Any, _name: "ResolvedId", session: "Session"
 ) -> list[StoredMessage]:
-    return messages_input_value(value)
+    return messages_input_value(value, session)
@@ -1,5 +1,15 @@
+import asyncio
 from contextlib import asynccontextmanager
-from typing import TYPE_CHECKING, AsyncIterable, Iterable, Literal, Union
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Iterable,
+    Literal,
+    Optional,
+    Union,
+)
 
 from htmltools import RenderedHTML, Tag, TagChild, TagList, css
 
@@ -9,6 +19,7 @@ from ._typing_extensions import TypedDict
 
 if TYPE_CHECKING:
     from shiny import reactive
+    from shiny.session._utils import RenderedDeps
     from shiny.ui.css import CssUnit
 
 __all__ = (
@@ -36,6 +47,177 @@ class isStreamingMessage(TypedDict):
     isStreaming: bool
 
 
+async def _pump(
+    content: AsyncIterable[TagChild], chunks: "_ChunkCoalescer"
+) -> None:
+    """
+    Feed `content` into `chunks` and send what's left once it ends. If
+    `content` fails (or is cancelled), whatever arrived before that is still
+    sent, then the error is re-raised.
+    """
+    try:
+        async for x in content:
+            if isinstance(x, str):
+                # x is most likely a string, so avoid overhead in that case
+                await chunks.add(x, [])
+            else:
+                await chunks.add_ui(split_html_islands(x))
+    except BaseException:
+        try:
+            await chunks.close()
+        except Exception:
+            # Don't let a failing flush mask the stream's own error
+            chunks.discard()
+        raise
+    await chunks.close()
+
+
+class _ChunkCoalescer:
+    """
+    Batches rendered stream chunks into as few content messages as possible.
+
+    Chunks are buffered and sent as one message once `interval` seconds have
+    passed since the first buffered chunk, or as soon as `max_size`
+    characters are pending. Non-string chunks (`add_ui()`) are also buffered
+    unrendered, and each run of them is rendered with a single `render` call
+    when it's flushed. Each HTML dependency is sent at most once per stream.
+    With `replace=True` the first message replaces the existing content; it
+    goes out after at most one interval even if nothing has arrived, so the
+    UI is never cleared more often than that.
+    """
+
+    def __init__(
+        self,
+        send: Callable[
+            [str, Literal["append", "replace"], list[dict[str, str]]],
+            Awaitable[None],
+        ],
+        *,
+        interval: float,
+        max_size: int,
+        replace: bool,
+        render: Optional[Callable[[TagChild], "RenderedDeps"]] = None,
+    ):
+        self._send = send
+        self._render = render
+        self._interval = interval
+        self._max_size = max_size
+        self._operation: Literal["append", "replace"] = (
+            "replace" if replace else "append"
+        )
+        self._parts: list[str] = []
+        self._ui: list[TagChild] = []
+        self._size = 0
+        # All HTML of the stream, in order
+        self.html: list[str] = []
+        self._deps: list[dict[str, str]] = []
+        self._seen_deps: set[tuple[str, str]] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pending: set[asyncio.Task[None]] = set()
+        self._error: Optional[BaseException] = None
+        # Flushes swap out the buffer synchronously before waiting on the
+        # lock, and asyncio locks are FIFO, so messages go out in order.
+        self._lock = asyncio.Lock()
+        if replace:
+            self._schedule()
+
+    async def add(self, html: str, deps: list[dict[str, str]]) -> None:
+        if self._error is not None:
+            raise self._error
+        self._render_ui()
+        self._buffer(html, deps)
+        await self._added()
+
+    async def add_ui(self, ui: list[TagChild]) -> None:
+        """Buffer (already split) UI, to be rendered when it's flushed."""
+        if self._error is not None:
+            raise self._error
+        self._ui.extend(ui)
+        await self._added()
+
+    async def _added(self) -> None:
+        if self._interval <= 0 or self._size >= self._max_size:
+            await self.flush()
+        elif self._parts or self._deps or self._ui:
+            self._schedule()
+
+    def _buffer(self, html: str, deps: list[dict[str, str]]) -> None:
+        for dep in deps:
+            key = (dep.get("name", ""), dep.get("version", ""))
+            if key not in self._seen_deps:
+                self._seen_deps.add(key)
+                self._deps.append(dep)
+        self.html.append(html)
+        if html:
+            self._parts.append(html)
+            self._size += len(html)
+
+    def _render_ui(self) -> None:
+        if not self._ui:
+            return
+        if self._render is None:
+            raise RuntimeError("Non-string chunks need a `render` function.")
+        ui = self._ui
+        self._ui = []
+        rendered = self._render(TagList(*ui))
+        self._buffer(rendered["html"], rendered["deps"])
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._render_ui()
+        if not (self._parts or self._deps or self._operation == "replace"):
+            return
+        content = "".join(self._parts)
+        deps = self._deps
+        operation = self._operation
+        self._parts = []
+        self._size = 0
+        self._deps = []
+        self._operation = "append"
+        async with self._lock:
+            await self._send(content, operation, deps)
+
+    async def close(self) -> None:
+        """Send whatever is still buffered and surface any timer-flush error."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._error is not None:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            raise self._error
+        await self.flush()
+
+    def discard(self) -> None:
+        """Drop whatever is still buffered, e.g. once the stream has failed."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._parts = []
+        self._ui = []
+        self._size = 0
+        self._deps = []
+
+    def _schedule(self) -> None:
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self._interval, self._flush_later)
+
+    def _flush_later(self) -> None:
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._pending.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: "asyncio.Task[None]") -> None:
+        self._pending.discard(task)
+        if task.cancelled() or self._error is not None:
+            return
+        self._error = task.exception()
+
+
 class MarkdownStream:
     """
     A component for streaming markdown or HTML content.
@@ -56,6 +238,12 @@ class MarkdownStream:
         * `"actual"`: Display the actual error message to the user.
         * `"sanitize"`: Sanitize the error message before displaying it to the user.
         * `"unhandled"`: Do not display any error message to the user.
+    flush_interval
+        How long (in seconds) to collect streamed chunks before sending them to
+        the UI as a single message. Set to `0` to send every chunk as soon as
+        it arrives.
+    flush_size
+        Send collected chunks early once they add up to this many characters.
 
     Note
     ----
@@ -68,6 +256,8 @@ class MarkdownStream:
         id: str,
         *,
         on_error: Literal["auto", "actual", "sanitize", "unhandled"] = "auto",
+        flush_interval: float = 0.05,
+        flush_size: int = 16384,
     ):
         from shiny.module import resolve_id
         from shiny.session import require_active_session
@@ -85,6 +275,8 @@ class MarkdownStream:
                 on_error = "actual"
 
         self.on_error = on_error
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
 
         from shiny import reactive
         from shiny.session import session_context
@@ -103,6 +295,7 @@ class MarkdownStream:
         self,
         content: Union[Iterable[TagChild], AsyncIterable[TagChild]],
         clear: bool = True,
+        threaded: bool = True,
     ):
         """
         Send a stream of content to the UI.
@@ -117,6 +310,12 @@ class MarkdownStream:
             a useful way to stream content in as it arrives (e.g. from a LLM).
         clear
             Whether to clear the existing content before streaming the new content.
+        threaded
+            Whether to advance a synchronous `content` iterable on a worker
+            thread, so that waiting on it (e.g. a sync LLM client's stream)
+            doesn't block other sessions. Pass `False` to iterate on the event
+            loop instead, e.g. for a cheap generator over data already in
+            memory. Lists, tuples, and async iterables are never threaded.
 
         Note
         ----
@@ -130,32 +329,29 @@ class MarkdownStream:
             of the task can be called in a reactive context to get the final state of the
             stream.
         """
-        from shiny import _utils, reactive
-        from shiny.session._utils import RenderedDeps
+        from shiny import reactive
 
-        content = _utils.wrap_async_iterable(content)
+        from ._utils import ThreadedIterable, wrap_async_iterable
+
+        content = wrap_async_iterable(content, threaded=threaded)
 
         @reactive.extended_task
         async def _task():
-            if clear:
-                await self._send_content_message("", "replace", [])
-
-            result = ""
             async with self._streaming_dot():
-                async for x in content:
-                    if isinstance(x, str):
-                        # x is most likely a string, so avoid overhead in that case
-                        ui: RenderedDeps = {"html": x, "deps": []}
-                    else:
-                        split = split_html_islands(x)
-                        ui = self._session._process_ui(TagList(*split))
-
-                    result += ui["html"]
-                    await self._send_content_message(
-                        ui["html"], "append", ui["deps"]
-                    )
-
-            return result
+                chunks = _ChunkCoalescer(
+                    self._send_content_message,
+                    interval=self.flush_interval,
+                    max_size=self.flush_size,
+                    replace=clear,
+                    render=self._session._process_ui,
+                )
+                try:
+                    await _pump(content, chunks)
+                finally:
+                    if isinstance(content, ThreadedIterable):
+                        content.close()
+
+            return "".join(chunks.html)
 
         _task()
 
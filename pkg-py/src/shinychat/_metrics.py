@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Literal, Mapping, Union
+
+logger = logging.getLogger(__name__)
+
+AttributeValue = Union[str, bool, int, float]
+Attributes = Mapping[str, AttributeValue]
+
+__all__ = (
+    "MetricsSink",
+    "MetricPoint",
+    "InMemoryMetricsSink",
+    "OpenTelemetryMetricsSink",
+    "set_metrics_sink",
+    "get_metrics_sink",
+)
+
+
+class MetricsSink(ABC):
+    """
+    Destination for the metrics and traces shinychat emits.
+
+    Register a sink process-wide with :func:`~shinychat.set_metrics_sink`.
+    Implement `counter()` and `histogram()` to forward measurements to any
+    backend; override `span()` to also produce traces. Durations are reported
+    in seconds and sizes in bytes.
+
+    Emitted metrics:
+
+    * ``shinychat.stream.time_to_first_token``, ``shinychat.stream.duration``,
+      ``shinychat.stream.chunks``, ``shinychat.stream.chunks_per_second`` and
+      ``shinychat.stream.bytes_sent`` (histograms, one point per stream).
+    * ``shinychat.chat.bytes_sent`` (counter, by ``action`` type).
+    * ``shinychat.transform.duration`` (histogram, per transformed message).
+    * ``shinychat.history.get.duration``, ``shinychat.history.put.duration``,
+      ``shinychat.history.prefetch.duration`` and
+      ``shinychat.history.title.duration`` (histograms, by ``store``).
+    * ``shinychat.history.evictions`` (counter).
+    * ``shinychat.history.put_conflicts`` (counter, by ``store``; saves that
+      lost a compare-and-swap race and were merged and retried).
+    * ``shinychat.store.bytes_written`` (counter, by ``store``; counts
+      characters written by :class:`~shinychat.types.FileConversationStore`
+      and bytes written by :class:`~shinychat.types.FsspecConversationStore`).
+    * ``shinychat.store.list_cache`` (counter, by ``store`` and ``hit``; not
+      emitted by :class:`~shinychat.types.FsspecConversationStore`, which
+      reads its index on every ``list()``).
+    * ``shinychat.history.record_cache`` (counter, by ``store`` and ``hit``;
+      conversation switches served from the worker's record cache).
+    * ``shinychat.attachments.content_cache`` (counter, by ``hit``).
+    """
+
+    @abstractmethod
+    def counter(
+        self,
+        name: str,
+        value: float = 1,
+        attributes: Attributes | None = None,
+    ) -> None:
+        """Add `value` to the monotonic counter `name`."""
+
+    @abstractmethod
+    def histogram(
+        self,
+        name: str,
+        value: float,
+        attributes: Attributes | None = None,
+    ) -> None:
+        """Record one observation of `name`."""
+
+    @contextmanager
+    def span(
+        self, name: str, attributes: Attributes | None = None
+    ) -> Iterator[None]:
+        """
+        Time the enclosed block, recording it as the ``<name>.duration``
+        histogram.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(
+                f"{name}.duration", time.perf_counter() - start, attributes
+            )
+
+
+@dataclass(frozen=True)
+class MetricPoint:
+    """A single measurement captured by :class:`InMemoryMetricsSink`."""
+
+    kind: Literal["counter", "histogram"]
+    name: str
+    value: float
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """
+    Sink that keeps every measurement in a list. Intended for tests and
+    for ad-hoc inspection during development.
+    """
+
+    def __init__(self) -> None:
+        self.points: list[MetricPoint] = []
+
+    def counter(
+        self,
+        name: str,
+        value: float = 1,
+        attributes: Attributes | None = None,
+    ) -> None:
+        self.points.append(
+            MetricPoint("counter", name, value, dict(attributes or {}))
+        )
+
+    def histogram(
+        self,
+        name: str,
+        value: float,
+        attributes: Attributes | None = None,
+    ) -> None:
+        self.points.append(
+            MetricPoint("histogram", name, value, dict(attributes or {}))
+        )
+
+    def values(self, name: str) -> list[float]:
+        """All recorded values for `name`, in emission order."""
+        return [p.value for p in self.points if p.name == name]
+
+    def total(self, name: str) -> float:
+        """Sum of all recorded values for `name`."""
+        return sum(self.values(name))
+
+    def clear(self) -> None:
+        self.points.clear()
+
+
+class OpenTelemetryMetricsSink(MetricsSink):
+    """
+    Forward metrics and spans to OpenTelemetry.
+
+    Requires the ``opentelemetry-api`` package. Uses the globally configured
+    meter and tracer providers unless a `meter` or `tracer` is given.
+    """
+
+    def __init__(self, meter: Any = None, tracer: Any = None) -> None:
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetryMetricsSink requires the 'opentelemetry-api' "
+                "package to be installed."
+            )
+        self._meter = meter or metrics.get_meter("shinychat")
+        self._tracer = tracer or trace.get_tracer("shinychat")
+        self._counters: dict[str, Any] = {}
+        self._histograms: dict[str, Any] = {}
+
+    def counter(
+        self,
+        name: str,
+        value: float = 1,
+        attributes: Attributes | None = None,
+    ) -> None:
+        instrument = self._counters.get(name)
+        if instrument is None:
+            instrument = self._meter.create_counter(name)
+            self._counters[name] = instrument
+        instrument.add(value, attributes=attributes)
+
+    def histogram(
+        self,
+        name: str,
+        value: float,
+        attributes: Attributes | None = None,
+    ) -> None:
+        instrument = self._histograms.get(name)
+        if instrument is None:
+            instrument = self._meter.create_histogram(name)
+            self._histograms[name] = instrument
+        instrument.record(value, attributes=attributes)
+
+    @contextmanager
+    def span(
+        self, name: str, attributes: Attributes | None = None
+    ) -> Iterator[None]:
+        with self._tracer.start_as_current_span(name, attributes=attributes):
+            with super().span(name, attributes):
+                yield
+
+
+_sink: MetricsSink | None = None
+
+
+def set_metrics_sink(sink: MetricsSink | None) -> None:
+    """
+    Register the process-wide metrics sink.
+
+    Parameters
+    ----------
+    sink
+        A :class:`~shinychat.types.MetricsSink`, or `None` (the default) to
+        stop emitting. While no sink is registered, instrumentation is a
+        no-op.
+    """
+    global _sink  # noqa: PLW0603
+    _sink = sink
+
+
+def get_metrics_sink() -> MetricsSink | None:
+    """The registered metrics sink, if any."""
+    return _sink
+
+
+# Emission helpers used at instrumentation sites. A misbehaving sink must
+# never break a chat, so sink errors are logged and swallowed.
+
+
+def counter(
+    name: str, value: float = 1, attributes: Attributes | None = None
+) -> None:
+    sink = get_metrics_sink()
+    if sink is None:
+        return
+    try:
+        sink.counter(name, value, attributes)
+    except Exception as e:
+        logger.warning("Metrics sink failed to record %s: %s", name, e)
+
+
+def histogram(
+    name: str, value: float, attributes: Attributes | None = None
+) -> None:
+    sink = get_metrics_sink()
+    if sink is None:
+        return
+    try:
+        sink.histogram(name, value, attributes)
+    except Exception as e:
+        logger.warning("Metrics sink failed to record %s: %s", name, e)
+
+
+@contextmanager
+def span(name: str, attributes: Attributes | None = None) -> Iterator[None]:
+    sink = get_metrics_sink()
+    if sink is None:
+        yield
+        return
+    try:
+        cm = sink.span(name, attributes)
+        cm.__enter__()
+    except Exception as e:
+        logger.warning("Metrics sink failed to open span %s: %s", name, e)
+        yield
+        return
+    try:
+        yield
+    except BaseException as e:
+        if not cm.__exit__(type(e), e, e.__traceback__):
+            raise
+    else:
+        try:
+            cm.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning("Metrics sink failed to close span %s: %s", name, e)
+
+
+@contextmanager
+def timed(name: str, attributes: Attributes | None = None) -> Iterator[None]:
+    """Record the enclosed block's duration as histogram `name` (no span)."""
+    if get_metrics_sink() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(name, time.perf_counter() - start, attributes)
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import contextvars
 import functools
 import inspect
+import os
 import random
 import secrets
+import threading
+from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Any,
     AsyncIterable,
@@ -92,10 +97,15 @@ P = ParamSpec("P")
 
 def wrap_async(
     fn: Callable[P, R] | Callable[P, Awaitable[R]],
+    *,
+    threaded: bool = False,
 ) -> Callable[P, Awaitable[R]]:
     """
     Given a synchronous function that returns R, return an async function that wraps the
     original function. If the input function is already async, then return it unchanged.
+
+    With `threaded=True`, the synchronous function runs on the shared callback
+    thread pool (see `run_in_thread()`) instead of on the event loop.
     """
 
     if is_async_callable(fn):
@@ -103,6 +113,14 @@ def wrap_async(
 
     fn = cast(Callable[P, R], fn)
 
+    if threaded:
+
+        @functools.wraps(fn)
+        async def fn_threaded(*args: P.args, **kwargs: P.kwargs) -> R:
+            return await run_in_thread(fn, *args, **kwargs)
+
+        return fn_threaded
+
     @functools.wraps(fn)
     async def fn_async(*args: P.args, **kwargs: P.kwargs) -> R:
         return fn(*args, **kwargs)
@@ -110,6 +128,60 @@ def wrap_async(
     return fn_async
 
 
+CALLBACK_THREADS_ENV_VAR = "SHINYCHAT_CALLBACK_THREADS"
+
+# Keyed by pool size, so a changed setting takes effect for new callbacks
+_CALLBACK_EXECUTORS: dict[int | None, ThreadPoolExecutor] = {}
+
+
+def resolve_callback_threads() -> int | None:
+    """
+    Size of the callback thread pool, from the `SHINYCHAT_CALLBACK_THREADS`
+    environment variable. `None` (unset) uses the `ThreadPoolExecutor` default.
+    """
+    env = os.environ.get(CALLBACK_THREADS_ENV_VAR)
+    if env is None or not env.strip():
+        return None
+    try:
+        val = int(env)
+    except ValueError:
+        raise ValueError(
+            f"{CALLBACK_THREADS_ENV_VAR}={env!r} is not a valid integer."
+        ) from None
+    if val < 1:
+        raise ValueError(
+            f"{CALLBACK_THREADS_ENV_VAR} must be positive, got {val}."
+        )
+    return val
+
+
+def callback_executor() -> ThreadPoolExecutor:
+    """The worker-wide thread pool that threaded callbacks run on."""
+    size = resolve_callback_threads()
+    executor = _CALLBACK_EXECUTORS.get(size)
+    if executor is None:
+        executor = _CALLBACK_EXECUTORS[size] = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="shinychat-callback"
+        )
+    return executor
+
+
+async def run_in_thread(
+    fn: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> R:
+    """
+    Run a synchronous function on the callback thread pool.
+
+    Like `asyncio.to_thread()`, the function runs in a copy of the caller's
+    context, so Shiny's current session (and reactive context) are still
+    available to it.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(callback_executor(), call)
+
+
 # This function should generally be used in this code base instead of
 # `iscoroutinefunction()`.
 def is_async_callable(
@@ -139,12 +211,19 @@ def is_async_callable(
 
 def wrap_async_iterable(
     x: Iterable[Any] | AsyncIterable[Any],
+    *,
+    threaded: bool = False,
 ) -> AsyncIterable[Any]:
     """
     Given any iterable, return an async iterable. The async iterable will yield the
     values of the original iterable, but will also yield control to the event loop
     after each value. This is useful when you want to interleave processing with other
     tasks, or when you want to simulate an async iterable from a regular iterable.
+
+    With `threaded=True`, a lazy iterable (e.g. a generator over a blocking
+    network stream) is advanced on a worker thread instead, so its `next()`
+    calls never block the event loop. In-memory collections are always
+    iterated directly.
     """
 
     if isinstance(x, AsyncIterable):
@@ -153,6 +232,9 @@ def wrap_async_iterable(
     if not isinstance(x, Iterable):
         raise TypeError("wrap_async_iterable requires an Iterable object.")
 
+    if threaded and not isinstance(x, Collection):
+        return ThreadedIterable(x)
+
     return MakeIterableAsync(x)
 
 
@@ -171,3 +253,114 @@ class MakeIterableAsync:
             return value
         except StopIteration:
             raise StopAsyncIteration
+
+
+# Max number of values a ThreadedIterable's worker may read ahead of the consumer
+THREADED_ITERABLE_BUFFER = 64
+
+_DONE = object()
+
+
+class ThreadedIterable:
+    """
+    Async iterable over a sync iterable that is advanced on a worker thread.
+
+    The worker hands values to the event loop through a queue holding at most
+    `buffer` values, so a slow consumer throttles the producer. Exceptions
+    raised by the iterable are re-raised to the consumer. Once the consumer
+    calls `.close()` (or is cancelled, or drops the iterable), the worker stops
+    after its current `next()` call returns and closes the iterator.
+    """
+
+    def __init__(
+        self, iterable: Iterable[Any], buffer: int = THREADED_ITERABLE_BUFFER
+    ):
+        self.iterable = iterable
+        self.buffer = buffer
+        self._stopped = threading.Event()
+        self._slots = threading.Semaphore(buffer)
+        self._queue: asyncio.Queue[tuple[Any, BaseException | None]] = (
+            asyncio.Queue()
+        )
+
+    def __aiter__(self):
+        # The worker doesn't reference `self`, so an abandoned iterable is
+        # still garbage collected (and its worker stopped)
+        thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(
+                _pump_iterable,
+                self.iterable,
+                asyncio.get_running_loop(),
+                self._queue,
+                self._slots,
+                self._stopped,
+            ),
+            name="shinychat-stream",
+            daemon=True,
+        )
+        thread.start()
+        return self
+
+    async def __anext__(self):
+        try:
+            value, error = await self._queue.get()
+        except BaseException:
+            self.close()
+            raise
+        self._slots.release()
+        if error is not None:
+            self.close()
+            raise error
+        if value is _DONE:
+            self.close()
+            raise StopAsyncIteration
+        return value
+
+    def close(self) -> None:
+        """Ask the worker thread to stop."""
+        if not self._stopped.is_set():
+            self._stopped.set()
+            # Wake the worker if it's waiting for buffer space
+            self._slots.release()
+
+    def __del__(self):
+        self.close()
+
+
+def _pump_iterable(
+    iterable: Iterable[Any],
+    loop: asyncio.AbstractEventLoop,
+    queue: asyncio.Queue[tuple[Any, BaseException | None]],
+    slots: threading.Semaphore,
+    stopped: threading.Event,
+) -> None:
+    def put(value: Any, error: BaseException | None = None) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (value, error))
+        except RuntimeError:
+            # The event loop has been closed
+            return False
+        return True
+
+    iterator = None
+    try:
+        iterator = iter(iterable)
+        while True:
+            slots.acquire()
+            if stopped.is_set():
+                return
+            try:
+                value = next(iterator)
+            except StopIteration:
+                put(_DONE)
+                return
+            if stopped.is_set() or not put(value):
+                return
+    except BaseException as e:
+        put(None, e)
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            with contextlib.suppress(Exception):
+                close()
@@ -7,8 +7,19 @@ from .._history_store import (
     ConversationPartition,
     ConversationStore,
     FileConversationStore,
+    FsspecConversationStore,
+)
+from .._history_types import (
+    ConversationConflictError,
+    ConversationMeta,
+    ConversationRecord,
+)
+from .._metrics import (
+    InMemoryMetricsSink,
+    MetricPoint,
+    MetricsSink,
+    OpenTelemetryMetricsSink,
 )
-from .._history_types import ConversationMeta, ConversationRecord
 
 try:
     from .._chat_normalize_chatlas import ToolResultDisplay
@@ -32,10 +43,16 @@ __all__ = [
     "HistoryOptions",
     "ChatMessage",
     "ChatMessageDict",
+    "ConversationConflictError",
     "ConversationMeta",
     "ConversationPartition",
     "ConversationRecord",
     "ConversationStore",
     "FileConversationStore",
+    "FsspecConversationStore",
+    "InMemoryMetricsSink",
+    "MetricPoint",
+    "MetricsSink",
+    "OpenTelemetryMetricsSink",
     "ToolResultDisplay",
 ]
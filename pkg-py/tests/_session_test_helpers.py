@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from shiny import Inputs
+from shiny.module import ResolvedId
+
+
+class MockSession:
+    """
+    Minimal stand-in for `shiny.Session`: just enough for `Chat` to construct
+    and stream. Shared by the tests and `pkg-py/benchmarks`, so benchmarks
+    exercise the same session the tests do.
+
+    Outgoing custom messages are counted (and, with `keep=True`, kept in
+    `sent`) instead of being written to a websocket. With
+    `measure_bytes=True` each message is JSON-encoded, as the real session
+    would, to tally bytes on the wire.
+    """
+
+    ns: ResolvedId = ResolvedId("")
+    app: object = None
+    input: Inputs
+
+    def __init__(
+        self,
+        id: str = "mock-session",
+        *,
+        keep: bool = False,
+        measure_bytes: bool = False,
+    ) -> None:
+        self.id = id
+        self.input = Inputs({}, ns=ResolvedId)
+        self.keep = keep
+        self.measure_bytes = measure_bytes
+        self.n_messages = 0
+        self.n_bytes = 0
+        self.sent: list[tuple[str, Any]] = []
+
+    def on_ended(self, callback: object) -> None:
+        pass
+
+    def on_destroy(self, callback: object) -> None:
+        pass
+
+    def _increment_busy_count(self) -> None:
+        pass
+
+    def is_stub_session(self) -> bool:
+        return True
+
+    async def send_custom_message(self, type: str, message: Any) -> None:
+        self.n_messages += 1
+        if self.measure_bytes:
+            self.n_bytes += len(json.dumps({type: message}, default=str))
+        if self.keep:
+            self.sent.append((type, message))
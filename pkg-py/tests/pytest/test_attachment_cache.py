@@ -0,0 +1,105 @@
+import base64
+import os
+
+import pytest
+from chatlas.types import ContentPDF, ContentText
+from shinychat import set_metrics_sink
+from shinychat._attachment_cache import (
+    ByteLRU,
+    content_cache,
+    content_cache_key,
+    resolve_content_cache_size,
+)
+from shinychat._attachments import Attachment, attachment_to_content
+from shinychat.types import InMemoryMetricsSink
+
+PDF = b"%PDF-1.7\n" + b"x" * 40
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    content_cache().clear()
+    yield
+    content_cache().clear()
+
+
+def test_byte_lru_evicts_least_recently_used_by_size():
+    cache: ByteLRU[bytes] = ByteLRU(10, len)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == (True, b"1234")  # touch "a"; "b" goes first
+    cache.put("c", b"1234")
+    assert cache.get("b") == (False, None)
+    assert len(cache) == 2 and cache.nbytes == 8
+
+    # Replacing an entry re-counts it; oversized values are never stored
+    cache.put("a", b"12")
+    assert cache.nbytes == 6
+    cache.put("a", b"x" * 11)
+    assert cache.get("a") == (False, None)
+    assert cache.nbytes == 4
+
+
+def test_resolve_content_cache_size(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_ATTACHMENT_CACHE_SIZE", "1024")
+    assert resolve_content_cache_size() == 1024
+    monkeypatch.setenv("SHINYCHAT_ATTACHMENT_CACHE_SIZE", "-1")
+    with pytest.raises(ValueError, match="non-negative"):
+        resolve_content_cache_size()
+
+
+def test_repeated_conversion_is_cached():
+    sink = InMemoryMetricsSink()
+    set_metrics_sink(sink)
+    try:
+        att = Attachment.from_data(PDF, "application/pdf", name="a.pdf")
+        first = attachment_to_content(att)
+        # An equal attachment (e.g. resubmitted by another session) hits
+        again = Attachment.model_validate(att.model_dump())
+        second = attachment_to_content(again)
+    finally:
+        set_metrics_sink(None)
+
+    assert isinstance(second, ContentPDF) and second.data == PDF
+    assert second is not first and second.data is first.data
+    assert sink.values("shinychat.attachments.content_cache") == [1, 1]
+    assert content_cache().nbytes == len(PDF)
+
+
+def test_key_covers_name_and_mime():
+    att = Attachment.from_data(b"hello", "text/plain", name="a.txt")
+    renamed = att.model_copy(update={"name": "b.txt"})
+    assert content_cache_key(att) != content_cache_key(renamed)
+
+    a = attachment_to_content(att)
+    b = attachment_to_content(renamed)
+    assert isinstance(a, ContentText) and 'name="a.txt"' in a.text
+    assert isinstance(b, ContentText) and 'name="b.txt"' in b.text
+
+
+def test_remote_urls_are_not_cached():
+    att = Attachment.from_url("https://example.com/a.png", mime="image/png")
+    assert content_cache_key(att) is None
+
+
+def test_file_backed_key_tracks_modification(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(PDF)
+    att = Attachment._from_upload(
+        "1", str(path), mime="application/pdf", name="doc.pdf", data_url="u"
+    )
+    key = content_cache_key(att)
+    assert key is not None and key == content_cache_key(att)
+
+    path.write_bytes(PDF + b"more")
+    os.utime(path, ns=(0, 0))
+    assert content_cache_key(att) != key
+    assert attachment_to_content(att).data == PDF + b"more"  # type: ignore[union-attr]
+
+
+def test_zero_budget_disables_cache(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_ATTACHMENT_CACHE_SIZE", "0")
+    data_url = "data:text/plain;base64," + base64.b64encode(b"hi").decode()
+    att = Attachment(mime="text/plain", name="a", data_url=data_url)
+    attachment_to_content(att)
+    assert len(content_cache()) == 0
@@ -0,0 +1,167 @@
+import base64
+import io
+import threading
+
+import pytest
+from shinychat._attachment_cache import ByteLRU
+from shinychat._attachment_images import (
+    DEFAULT_IMAGE_MAX_EDGE,
+    IMAGE_CACHE,
+    ImageSettings,
+    model_image,
+    resolve_image_settings,
+    thumbnail_data_url,
+    with_thumbnail,
+    with_thumbnails,
+)
+from shinychat._attachments import Attachment, validate_attachments
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    IMAGE_CACHE.clear()
+    yield
+    IMAGE_CACHE.clear()
+
+
+def png(width: int, height: int) -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_resolve_image_settings_defaults(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("SHINYCHAT_IMAGE_MAX_EDGE", raising=False)
+    monkeypatch.delenv("SHINYCHAT_IMAGE_QUALITY", raising=False)
+    monkeypatch.delenv("SHINYCHAT_THUMBNAIL_EDGE", raising=False)
+    assert resolve_image_settings() == ImageSettings(
+        DEFAULT_IMAGE_MAX_EDGE, 85, 320
+    )
+
+
+def test_resolve_image_settings_from_env(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_IMAGE_MAX_EDGE", "800")
+    monkeypatch.setenv("SHINYCHAT_IMAGE_QUALITY", "60")
+    monkeypatch.setenv("SHINYCHAT_THUMBNAIL_EDGE", "128")
+    assert resolve_image_settings() == ImageSettings(800, 60, 128)
+
+
+@pytest.mark.parametrize("value", ["big", "0", "96"])
+def test_resolve_image_settings_rejects_bad_quality(
+    monkeypatch: pytest.MonkeyPatch, value: str
+):
+    monkeypatch.setenv("SHINYCHAT_IMAGE_QUALITY", value)
+    with pytest.raises(ValueError, match="SHINYCHAT_IMAGE_QUALITY"):
+        resolve_image_settings()
+
+
+def test_image_cache_evicts_least_recently_used_by_bytes():
+    cache = ByteLRU(10, lambda v: len(v[0]) if v else 0)
+    cache.put(("a",), (b"1234", "image/png"))
+    cache.put(("b",), (b"1234", "image/png"))
+    assert cache.get(("a",))[0]  # touch "a" so "b" is evicted first
+    cache.put(("c",), (b"1234", "image/png"))
+    assert cache.get(("b",)) == (False, None)
+    assert cache.get(("a",))[0] and cache.get(("c",))[0]
+    assert cache.nbytes == 8
+
+    cache.put(("huge",), (b"x" * 11, "image/png"))
+    assert cache.get(("huge",)) == (False, None)
+
+
+def test_undecodable_image_passes_through():
+    data = b"not an image"
+    assert model_image(data, "image/png") == (data, "image/png")
+    assert thumbnail_data_url(data) is None
+
+
+def test_model_image_downscales_large_images(monkeypatch: pytest.MonkeyPatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setenv("SHINYCHAT_IMAGE_MAX_EDGE", "100")
+    data = png(400, 200)
+    out, mime = model_image(data, "image/png")
+    assert mime == "image/png"
+    with Image.open(io.BytesIO(out)) as img:
+        assert img.size == (100, 50)
+
+    small = png(50, 50)
+    assert model_image(small, "image/png") == (small, "image/png")
+
+
+def test_thumbnail_is_webp_and_cached(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_THUMBNAIL_EDGE", "32")
+    data = png(400, 200)
+    thumb = thumbnail_data_url(data)
+    assert thumb is not None and thumb.startswith("data:image/webp;base64,")
+    assert IMAGE_CACHE.nbytes > 0
+    assert thumbnail_data_url(data) == thumb
+
+
+def test_with_thumbnail_fills_in_large_images(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_THUMBNAIL_EDGE", "32")
+    att = Attachment.from_data(png(400, 200), "image/png", name="a.png")
+    assert with_thumbnail(att).thumbnail_url is not None
+
+    pdf = Attachment.from_data(b"%PDF-1.7", "application/pdf")
+    assert with_thumbnail(pdf) is pdf
+
+
+def _with_thumb(thumb: str, mime: str = "image/png") -> Attachment:
+    return Attachment(
+        mime=mime,
+        name="a",
+        data_url=f"data:{mime};base64,AAAA",
+        thumbnail_url=thumb,
+    )
+
+
+def test_validate_attachments_accepts_thumbnail():
+    validate_attachments([_with_thumb("data:image/webp;base64,AAAA")])
+
+
+def test_validate_attachments_rejects_bad_thumbnails():
+    with pytest.raises(ValueError, match="base64 data URL"):
+        validate_attachments([_with_thumb("https://example.com/t.png")])
+    with pytest.raises(ValueError, match="Only image attachments"):
+        validate_attachments(
+            [_with_thumb("data:image/png;base64,AAAA", "application/pdf")]
+        )
+    big = base64.b64encode(b"x" * (256 * 1024 + 3)).decode()
+    with pytest.raises(ValueError, match="maximum thumbnail size"):
+        validate_attachments([_with_thumb(f"data:image/png;base64,{big}")])
+
+
+@pytest.mark.anyio
+async def test_thumbnails_are_made_off_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from shinychat import _attachment_images
+    from shinychat._chat_types import ChatMessage
+
+    threads: list[int] = []
+
+    def fake_thumbnail(data: bytes) -> str:
+        threads.append(threading.get_ident())
+        return "data:image/webp;base64,AAAA"
+
+    monkeypatch.setattr(_attachment_images, "pillow_is_installed", True)
+    monkeypatch.setattr(
+        _attachment_images, "thumbnail_data_url", fake_thumbnail
+    )
+    att = Attachment.from_data(b"img", "image/png")
+
+    # Building a message doesn't make thumbnails...
+    msg = ChatMessage("hi", role="user", attachments=[att])
+    assert msg.attachments[0].thumbnail_url is None
+    assert threads == []
+
+    # ...with_thumbnails() does, on a worker thread
+    (thumbed,) = await with_thumbnails(msg.attachments)
+    assert thumbed.thumbnail_url == "data:image/webp;base64,AAAA"
+    assert threads and threads[0] != threading.get_ident()
+
+    # Nothing to do: no thread hop, and the same list back
+    done = [thumbed]
+    assert await with_thumbnails(done) is done
+    assert len(threads) == 1
@@ -0,0 +1,314 @@
+import inspect
+import os
+from typing import Any, Callable
+
+import pytest
+from chatlas.types import ContentPDF
+from shiny._fileupload import FileUploadManager
+from shinychat import _attachment_images
+from shinychat._attachment_images import with_thumbnails
+from shinychat._attachment_upload import (
+    SPOOLS,
+    UPLOAD_END_HANDLER,
+    UPLOAD_INIT_HANDLER,
+    AttachmentUploadError,
+    enable_attachment_uploads,
+    parse_attachments,
+    shiny_upload_manager,
+)
+from shinychat._attachments import (
+    Attachment,
+    attachment_client_payload,
+    attachment_to_content,
+)
+from shinychat._input_handler import messages_input_value
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 40
+PDF = b"%PDF-1.7\n" + b"x" * 40
+
+
+class _FakeSession:
+    def __init__(self) -> None:
+        self.id = "session-1"
+        self._file_upload_manager = FileUploadManager()
+        self.handlers: dict[str, Callable[..., Any]] = {}
+        self.routes: dict[str, Callable[..., Any]] = {}
+        self.ended: list[Callable[[], Any]] = []
+
+    def root_scope(self) -> "_FakeSession":
+        return self
+
+    def dynamic_route(self, name: str, handler: Callable[..., Any]) -> str:
+        self.routes[name] = handler
+        return f"session/{self.id}/dynamic_route/{name}?nonce=1"
+
+    def set_message_handler(
+        self, name: str, handler: Callable[..., Any]
+    ) -> str:
+        self.handlers[name] = handler
+        return name
+
+    def on_ended(self, fn: Callable[[], Any]) -> None:
+        self.ended.append(fn)
+
+
+@pytest.fixture
+def session():
+    s = _FakeSession()
+    assert enable_attachment_uploads(s)  # type: ignore[arg-type]
+    yield s
+    for fn in s.ended:
+        fn()
+    s._file_upload_manager.rm_upload_dir()
+
+
+def upload(
+    session: _FakeSession,
+    data: bytes,
+    *,
+    mime: str,
+    name: str = "file",
+    size: int | None = None,
+    chunk: int = 16,
+) -> dict[str, Any]:
+    """Run the init / POST / end protocol the browser follows."""
+    declared = len(data) if size is None else size
+    job = session.handlers[UPLOAD_INIT_HANDLER](
+        {"name": name, "type": mime, "size": declared}
+    )
+    op = session._file_upload_manager.get_upload_operation(job["jobId"])
+    assert op is not None
+    with op:
+        for i in range(0, len(data), chunk):
+            op.write_chunk(data[i : i + chunk])
+    return session.handlers[UPLOAD_END_HANDLER](job["jobId"])
+
+
+def test_enable_is_idempotent_per_session(session: _FakeSession):
+    assert enable_attachment_uploads(session)  # type: ignore[arg-type]
+    assert list(session.routes) == ["shinychat_upload"]
+    assert len(session.ended) == 1
+
+
+def test_sessions_without_upload_endpoint_are_skipped():
+    class _Mock:
+        pass
+
+    assert not enable_attachment_uploads(_Mock())  # type: ignore[arg-type]
+
+
+def test_shiny_upload_internals_are_available():
+    # Uploads hook into private shiny API; this fails when a shiny release
+    # changes it (see shiny_upload_manager)
+    from shiny.session._session import AppSession
+
+    assert shiny_upload_manager(_FakeSession()) is not None
+    assert "self._file_upload_manager" in inspect.getsource(AppSession)
+    handler = inspect.getsource(AppSession._handle_request_impl)
+    assert "_file_upload_manager.get_upload_operation(job_id)" in handler
+    assert "with upload_op:" in handler
+    assert "upload_op.write_chunk(chunk)" in handler
+
+
+def test_missing_upload_internals_disable_uploads():
+    class _NoManager(_FakeSession):
+        def __init__(self) -> None:
+            super().__init__()
+            del self._file_upload_manager
+
+    assert shiny_upload_manager(_NoManager()) is None
+    assert not enable_attachment_uploads(_NoManager())  # type: ignore[arg-type]
+
+
+def test_uploaded_attachment_is_file_backed(session: _FakeSession):
+    res = upload(session, PNG, mime="image/png", name="x.png")
+    assert res["size"] == len(PNG)
+
+    # The client's mime/size claims are ignored in favor of the spool's
+    (att,) = parse_attachments(
+        [{"upload_id": res["id"], "mime": "text/plain", "size": 1}],
+        session,  # type: ignore[arg-type]
+    )
+    assert att.mime == "image/png"
+    assert att.size == len(PNG)
+    assert att.data_url == res["url"]
+    assert att.path is not None and att.read_bytes() == PNG
+
+    # The browser gets a reference, never the payload or path
+    sent = attachment_client_payload(att)
+    assert "path" not in sent
+    assert sent["data_url"] == res["url"]
+    assert sent["upload_id"] == res["id"]
+
+    # Anything that outlives the session gets the payload itself
+    dumped = att.model_dump()
+    assert "path" not in dumped and "upload_id" not in dumped
+    assert dumped["data_url"] == Attachment.from_data(PNG, "image/png").data_url
+
+
+@pytest.mark.anyio
+async def test_upload_thumbnail_is_made_from_the_file(
+    monkeypatch: pytest.MonkeyPatch, session: _FakeSession
+):
+    calls: list[bytes] = []
+
+    def fake_thumbnail(data: bytes) -> str:
+        calls.append(data)
+        return "data:image/webp;base64,AAAA"
+
+    monkeypatch.setattr(_attachment_images, "pillow_is_installed", True)
+    monkeypatch.setattr(
+        _attachment_images, "thumbnail_data_url", fake_thumbnail
+    )
+    res = upload(session, PNG, mime="image/png", name="x.png")
+
+    # Resolving an upload doesn't read the file...
+    (att,) = parse_attachments([{"upload_id": res["id"]}], session)  # type: ignore[arg-type]
+    assert att.thumbnail_url is None and calls == []
+    # ...entering the chat does, off the event loop
+    (att,) = await with_thumbnails([att])
+    assert att.thumbnail_url == "data:image/webp;base64,AAAA"
+    assert att.path is not None and att.upload_id == res["id"]
+    assert calls == [PNG]
+
+    # The browser's own thumbnail wins, without decoding the file
+    (att,) = parse_attachments(
+        [{"upload_id": res["id"], "thumbnail_url": "data:image/png;base64,"}],
+        session,  # type: ignore[arg-type]
+    )
+    (att,) = await with_thumbnails([att])
+    assert att.thumbnail_url == "data:image/png;base64,"
+    assert len(calls) == 1
+
+
+def test_submitted_path_is_ignored(tmp_path: Any, session: _FakeSession):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("server-only")
+
+    (att,) = parse_attachments(
+        [
+            {
+                "mime": "text/plain",
+                "name": "x.txt",
+                "data_url": "data:text/plain;base64,aGk=",
+                "path": str(secret),
+            }
+        ],
+        session,  # type: ignore[arg-type]
+    )
+    assert att.path is None
+    assert att.read_bytes() == b"hi"
+    assert "server-only" not in att.model_dump_json()
+
+    # Nor can a client attach an upload id to an inline attachment
+    forged = Attachment.model_validate(
+        {"mime": "text/plain", "name": "x", "data_url": "x", "upload_id": "1"}
+    )
+    assert forged.upload_id is None
+
+
+def test_uploaded_pdf_converts_to_content(session: _FakeSession):
+    res = upload(session, PDF, mime="application/pdf", name="doc.pdf")
+    (att,) = parse_attachments([{"upload_id": res["id"]}], session)  # type: ignore[arg-type]
+    content = attachment_to_content(att)
+    assert isinstance(content, ContentPDF)
+    assert content.data == PDF
+
+
+def test_init_rejects_unsupported_type(session: _FakeSession):
+    with pytest.raises(AttachmentUploadError, match="Unsupported"):
+        session.handlers[UPLOAD_INIT_HANDLER](
+            {"name": "a.exe", "type": "application/x-msdownload", "size": 1}
+        )
+
+
+def test_init_rejects_declared_size_over_limit(
+    session: _FakeSession, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("SHINYCHAT_MAX_ATTACHMENT_SIZE", "10")
+    with pytest.raises(AttachmentUploadError, match="maximum attachment size"):
+        session.handlers[UPLOAD_INIT_HANDLER](
+            {"name": "x.png", "type": "image/png", "size": 11}
+        )
+
+
+def test_body_over_limit_is_rejected_while_streaming(
+    session: _FakeSession, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("SHINYCHAT_MAX_ATTACHMENT_SIZE", "32")
+    with pytest.raises(AttachmentUploadError, match="maximum attachment size"):
+        upload(session, PNG, mime="image/png", size=20)
+    for root, _, files in os.walk(session._file_upload_manager._basedir):
+        assert files == [], root
+
+
+def test_signature_mismatch_is_rejected(session: _FakeSession):
+    with pytest.raises(AttachmentUploadError, match="not a valid image/png"):
+        upload(session, PDF, mime="image/png")
+
+
+def test_binary_text_attachment_is_rejected(session: _FakeSession):
+    with pytest.raises(AttachmentUploadError, match="not a text file"):
+        upload(session, b"abc\x00def", mime="text/plain")
+
+
+def test_incomplete_upload_is_rejected(session: _FakeSession):
+    with pytest.raises(AttachmentUploadError, match="incomplete"):
+        upload(session, PDF[:20], mime="application/pdf", size=len(PDF))
+
+
+def test_unknown_upload_id_raises(session: _FakeSession):
+    with pytest.raises(ValueError, match="Unknown attachment upload"):
+        parse_attachments([{"upload_id": "nope"}], session)  # type: ignore[arg-type]
+    with pytest.raises(ValueError, match="Unknown attachment upload"):
+        parse_attachments([{"upload_id": "nope"}], None)
+
+
+def test_unknown_upload_id_falls_back_to_inline_payload(
+    session: _FakeSession,
+):
+    inline = Attachment.from_data(b"hi", "text/plain", name="x.txt")
+    (att,) = parse_attachments(
+        [{**inline.model_dump(), "upload_id": "gone"}],
+        session,  # type: ignore[arg-type]
+    )
+    assert att.upload_id is None and att.path is None
+    assert att.read_bytes() == b"hi"
+
+
+def test_restored_upload_parses_in_a_new_session():
+    first = _FakeSession()
+    enable_attachment_uploads(first)  # type: ignore[arg-type]
+    res = upload(first, PDF, mime="application/pdf", name="doc.pdf")
+    (att,) = parse_attachments([{"upload_id": res["id"]}], first)  # type: ignore[arg-type]
+    snapshot = [
+        {
+            "role": "user",
+            "segments": [{"content": "hi", "content_type": "markdown"}],
+            "attachments": [att.model_dump(exclude_none=True)],
+        }
+    ]
+    for fn in first.ended:
+        fn()
+    first._file_upload_manager.rm_upload_dir()
+
+    second = _FakeSession()
+    second.id = "session-2"
+    enable_attachment_uploads(second)  # type: ignore[arg-type]
+    try:
+        (message,) = messages_input_value(snapshot, second)  # type: ignore[arg-type]
+        assert message.attachments[0].read_bytes() == PDF
+    finally:
+        for fn in second.ended:
+            fn()
+        second._file_upload_manager.rm_upload_dir()
+
+
+def test_spool_is_dropped_when_session_ends():
+    s = _FakeSession()
+    enable_attachment_uploads(s)  # type: ignore[arg-type]
+    assert s.id in SPOOLS
+    for fn in s.ended:
+        fn()
+    assert s.id not in SPOOLS
+    s._file_upload_manager.rm_upload_dir()
@@ -8,9 +8,9 @@ from datetime import datetime
 from typing import Any, cast
 
 import pytest
+from _session_test_helpers import MockSession
 from htmltools import HTMLDependency, TagList, tags
 from shiny import Session, reactive
-from shiny.module import ResolvedId
 from shiny.session import session_context
 from shinychat import Chat
 from shinychat._chat_normalize import message_content, message_content_chunk
@@ -28,31 +28,7 @@ from shinychat._utils_types import MISSING
 # ----------------------------------------------------------------------
 
 
-class _MockSession:
-    ns: ResolvedId = ResolvedId("")
-    app: object = None
-    id: str = "mock-session"
-    input: Any
-
-    def __init__(self) -> None:
-        from shiny import Inputs
-
-        self.input = Inputs({}, ns=ResolvedId)
-
-    def on_ended(self, callback: object) -> None:
-        pass
-
-    def on_destroy(self, callback: object) -> None:
-        pass
-
-    def _increment_busy_count(self) -> None:
-        pass
-
-    async def send_custom_message(self, type: str, message: Any) -> None:
-        pass
-
-
-test_session = cast(Session, _MockSession())
+test_session = cast(Session, MockSession())
 
 
 def run_async(coro_fn: Any) -> None:
@@ -532,6 +508,18 @@ def test_slash_command_errors_on_duplicate_name():
             chat.slash_command("greet", "Say hi", fn=lambda: None)
 
 
+def test_slash_command_threaded_defaults_to_chat_setting():
+    with session_context(test_session):
+        chat = Chat(id="chat", threaded_callbacks=True)
+        chat.slash_command("a", "A", fn=lambda: None)
+        chat.slash_command("b", "B", fn=lambda: None, threaded=False)
+        with reactive.isolate():
+            cmds = chat._slash_commands()
+            assert cmds is not None
+        assert chat._resolve_threaded(cmds["a"].threaded) is True
+        assert chat._resolve_threaded(cmds["b"].threaded) is False
+
+
 def test_slash_command_allows_overwrite_with_force():
     with session_context(test_session):
         chat = Chat(id="chat")
@@ -812,7 +800,7 @@ def test_user_input_reads_latest_stored():
     from shiny import reactive
     from shinychat._chat import UserInput
 
-    session = cast(Session, _MockSession())
+    session = cast(Session, MockSession())
 
     with session_context(session):
         chat = Chat(id="chat")
@@ -1225,6 +1213,167 @@ def test_streaming_chunk_content_type_follows_segment():
         assert ("answer", "markdown") in chunk_types
 
 
+def test_concurrent_streams_interleave_with_own_buffers():
+    with session_context(test_session):
+        chat = Chat(id="chat")
+        chat._client_features = {"stream_id"}
+        sent: list[dict[str, Any]] = []
+
+        async def _capture(action: Any, deps: Any = None) -> None:
+            sent.append(action)
+
+        chat._send_action = _capture  # type: ignore[method-assign]
+
+        async def gen(label: str):
+            for i in range(3):
+                yield f"{label}{i}"
+                await asyncio.sleep(0)
+
+        results: list[str] = []
+
+        async def _exercise() -> None:
+            results.extend(
+                await asyncio.gather(
+                    chat._append_message_stream(gen("a"), concurrent=True),
+                    chat._append_message_stream(gen("b"), concurrent=True),
+                )
+            )
+
+        run_async(_exercise)
+
+        assert results == ["a0a1a2", "b0b1b2"]
+        chunks = [a for a in sent if a["type"] == "chunk"]
+        # Neither stream waited for the other to finish
+        contents = [c["content"] for c in chunks]
+        assert contents.index("b0") < contents.index("a2")
+        # Every streamed action is tagged so the client can demultiplex them
+        stream_ids = {a["stream_id"] for a in sent}
+        assert len(stream_ids) == 2
+        assert [a["type"] for a in sent].count("chunk_end") == 2
+        assert chat._stream_buffers == {}
+        assert chat._current_stream_id is None
+
+
+def test_concurrent_streams_run_in_turn_for_clients_without_stream_ids():
+    with session_context(test_session):
+        chat = Chat(id="chat")
+        sent: list[dict[str, Any]] = []
+
+        async def _capture(action: Any, deps: Any = None) -> None:
+            sent.append(action)
+
+        chat._send_action = _capture  # type: ignore[method-assign]
+
+        async def gen(label: str):
+            for i in range(3):
+                yield f"{label}{i}"
+                await asyncio.sleep(0)
+
+        async def _exercise() -> None:
+            await asyncio.gather(
+                chat._append_message_stream(gen("a"), concurrent=True),
+                chat._append_message_stream(gen("b"), concurrent=True),
+            )
+
+        run_async(_exercise)
+
+        # An older bundle routes untagged chunks to its one active stream
+        contents = [a["content"] for a in sent if a["type"] == "chunk"]
+        assert contents == ["a0", "a1", "a2", "b0", "b1", "b2"]
+        assert all("stream_id" not in a for a in sent)
+
+
+def test_concurrent_stream_does_not_queue_or_block_main_stream():
+    with session_context(test_session):
+        chat = Chat(id="chat")
+        chat._client_features = {"stream_id"}
+        sent: list[dict[str, Any]] = []
+
+        async def _capture(action: Any, deps: Any = None) -> None:
+            sent.append(action)
+
+        chat._send_action = _capture  # type: ignore[method-assign]
+
+        main_started = asyncio.Event()
+        side_done = asyncio.Event()
+
+        async def _side() -> None:
+            async with chat.message_stream_context(concurrent=True) as side:
+                await main_started.wait()
+                await side.append("side")
+                await chat.append_message("between")
+            side_done.set()
+
+        async def _main() -> None:
+            async with chat.message_stream_context() as main:
+                main_started.set()
+                await main.append("main")
+                # The main stream stays open while the concurrent one finishes
+                await side_done.wait()
+                await main.append(" end")
+
+        async def _exercise() -> None:
+            await asyncio.gather(_side(), _main())
+
+        run_async(_exercise)
+
+        assert chat._pending_messages == []
+        untagged = [a for a in sent if "stream_id" not in a]
+        tagged = [a for a in sent if "stream_id" in a]
+        assert [a["content"] for a in tagged if a["type"] == "chunk"] == [
+            "side"
+        ]
+        assert [a["type"] for a in tagged][-1] == "chunk_end"
+        assert [a.get("content") for a in untagged if a["type"] == "chunk"] == [
+            "main",
+            " end",
+        ]
+        # A plain message appended while the main stream is active is still
+        # queued until that stream ends, even from a concurrent producer
+        types = [a["type"] for a in untagged]
+        assert types.index("message") > types.index("chunk_end")
+
+
+def test_nested_context_joins_enclosing_concurrent_stream():
+    with session_context(test_session):
+        chat = Chat(id="chat")
+        chat._client_features = {"stream_id"}
+        sent: list[dict[str, Any]] = []
+
+        async def _capture(action: Any, deps: Any = None) -> None:
+            sent.append(action)
+
+        chat._send_action = _capture  # type: ignore[method-assign]
+
+        async def gen():
+            yield "Working"
+            # e.g. a tool reporting progress from inside the stream's task
+            async with chat.message_stream_context() as progress:
+                await progress.append(" 50%")
+                await progress.replace("")
+            yield " done"
+
+        results: list[str] = []
+
+        async def _exercise() -> None:
+            async with chat.message_stream_context() as main:
+                await main.append("main")
+                results.append(
+                    await chat._append_message_stream(gen(), concurrent=True)
+                )
+
+        run_async(_exercise)
+
+        assert results == ["Working done"]
+        tagged = [a for a in sent if "stream_id" in a and a["type"] == "chunk"]
+        assert [(a["content"], a["operation"]) for a in tagged] == [
+            ("Working", "append"),
+            (" 50%", "append"),
+            ("Working", "replace"),
+            (" done", "append"),
+        ]
+
+
 def test_stored_message_attachments_stored_separately():
     from shinychat._attachments import Attachment
     from shinychat._chat_types import StoredMessage, StoredSegment
@@ -1373,3 +1522,143 @@ def test_messages_surfaces_attachments():
 
         # Second message: plain text — no attachments key
         assert "attachments" not in msgs[1]
+
+
+def test_append_message_stream_emits_metrics():
+    from shinychat import set_metrics_sink
+    from shinychat.types import InMemoryMetricsSink
+
+    sink = InMemoryMetricsSink()
+    set_metrics_sink(sink)
+    try:
+        with session_context(test_session):
+            chat = Chat(id="chat")
+
+            with pytest.warns(Warning, match="deprecated"):
+
+                @chat.transform_assistant_response
+                def _upper(content: str) -> str:
+                    return content.upper()
+
+            async def gen():
+                yield "hello "
+                yield "world"
+
+            async def _exercise() -> None:
+                await chat._append_message_stream(gen())
+
+            run_async(_exercise)
+    finally:
+        set_metrics_sink(None)
+
+    assert len(sink.values("shinychat.stream.time_to_first_token")) == 1
+    assert sink.values("shinychat.stream.chunks") == [2]
+    assert len(sink.values("shinychat.stream.chunks_per_second")) == 1
+    (stream_bytes,) = sink.values("shinychat.stream.bytes_sent")
+    sent = [p for p in sink.points if p.name == "shinychat.chat.bytes_sent"]
+    assert {"chunk_start", "chunk", "chunk_end"} <= {
+        p.attributes["action"] for p in sent
+    }
+    # Every action of the stream counts, including its start and end
+    assert stream_bytes == sum(
+        p.value
+        for p in sent
+        if p.attributes["action"] in ("chunk_start", "chunk", "chunk_end")
+    )
+    assert len(sink.values("shinychat.transform.duration")) >= 2
+
+
+def test_shadow_transcript_tracks_sent_messages():
+    with session_context(test_session):
+        chat = Chat(id="shadow_chat")
+        sent: list[dict[str, Any]] = []
+
+        async def _capture(action: Any, deps: Any = None) -> None:
+            sent.append(action)
+
+        chat._send_action = _capture  # type: ignore[method-assign]
+
+        async def gen():
+            yield ChatMessage(
+                content="hmm", role="assistant", content_type="thinking"
+            )
+            yield "hello "
+            yield "world"
+
+        async def _exercise() -> None:
+            await chat.append_message(ChatMessage("hi", role="user"))
+            await chat._append_message_stream(gen())
+
+        run_async(_exercise)
+
+        # The client never reported a snapshot, yet the response is saved
+        with reactive.isolate():
+            saved = chat._messages_for_bookmark()
+            assert chat._transcript_settled() == 1
+        assert saved == [
+            {
+                "role": "user",
+                "segments": [{"content": "hi", "content_type": "markdown"}],
+            },
+            {
+                "role": "assistant",
+                "segments": [
+                    {"content": "hmm", "content_type": "thinking"},
+                    {"content": "hello world", "content_type": "markdown"},
+                ],
+            },
+        ]
+
+        run_async(chat.clear_messages)
+        with reactive.isolate():
+            assert chat._messages_for_bookmark() == []
+
+
+def test_shadow_transcript_keeps_stream_order():
+    from shinychat._chat import ShadowTranscript
+
+    def msg(text: str) -> StoredMessage:
+        return StoredMessage.from_chat_message(ChatMessage(text))
+
+    transcript = ShadowTranscript()
+    transcript.open("a")
+    transcript.open("b")
+    transcript.append(msg("c"))
+    assert [m.content for m in transcript.settled()] == ["c"]
+    transcript.close("b", msg("b"))
+    transcript.close("a", None)
+    transcript.open("d")
+    transcript.close("d", msg("d"))
+    assert [m.content for m in transcript.settled()] == ["b", "c", "d"]
+
+    transcript.truncate(5)
+    assert len(transcript.settled()) == 3
+    transcript.truncate(1)
+    assert [m.content for m in transcript.settled()] == ["b"]
+    transcript.truncate(0)
+    assert transcript.settled() == ()
+
+
+def test_settled_messages_reconciles_with_client_snapshot():
+    with session_context(test_session):
+        chat = Chat(id="shadow_reconcile")
+        chat._send_action = _noop_send_action  # type: ignore[method-assign]
+        run_async(lambda: chat.append_message(ChatMessage("server")))
+
+        # A shorter (stale) client snapshot defers to the shadow copy
+        test_session.input[chat.messages_input_id]._set(())
+        with reactive.isolate():
+            assert [m.content for m in chat._settled_messages()] == ["server"]
+
+        # A client that knows more wins
+        reported = tuple(
+            StoredMessage.from_chat_message(ChatMessage(text, role=role))
+            for text, role in (("restored", "user"), ("server", "assistant"))
+        )
+        test_session.input[chat.messages_input_id]._set(reported)
+        with reactive.isolate():
+            assert chat._settled_messages() == reported
+
+
+async def _noop_send_action(action: Any, deps: Any = None) -> None:
+    pass
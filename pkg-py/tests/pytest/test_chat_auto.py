@@ -5,9 +5,9 @@ import threading
 from typing import Any, cast
 
 import pytest
+from _session_test_helpers import MockSession
 from htmltools import HTML, tags
-from shiny import Inputs, Session
-from shiny.module import ResolvedId
+from shiny import Session
 from shiny.session import session_context
 from shiny.types import NotifyException
 from shinychat import Chat, chat_ui
@@ -19,29 +19,7 @@ from shinychat._chat_types import ChatMessageDict
 # ---------------------------------------------------------------------------
 
 
-class _MockSession:
-    ns: ResolvedId = ResolvedId("")
-    app: object = None
-    id: str = "mock-session"
-    input: Inputs
-
-    def __init__(self) -> None:
-        self.input = Inputs({}, ns=ResolvedId)
-
-    def on_ended(self, callback: object) -> None:
-        pass
-
-    def on_destroy(self, callback: object) -> None:
-        pass
-
-    def _increment_busy_count(self) -> None:
-        pass
-
-    def is_stub_session(self) -> bool:
-        return True
-
-
-test_session = cast(Session, _MockSession())
+test_session = cast(Session, MockSession())
 
 
 def _run_async(coro_fn: Any) -> None:
@@ -1,6 +1,8 @@
 import subprocess
 import sys
 
+import pytest
+
 
 def test_no_circular_import():
     result = subprocess.run(
@@ -10,3 +12,76 @@ def test_no_circular_import():
         check=False,
     )
     assert result.returncode == 0, result.stderr
+
+
+PROVIDER_MODULES = (
+    "chatlas",
+    "langchain_core",
+    "openai",
+    "anthropic",
+    "google.genai",
+    "ollama",
+)
+
+
+def _run_python(code: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+def test_import_does_not_import_provider_sdks():
+    result = _run_python(
+        "import sys, shinychat\n"
+        f"print([m for m in {PROVIDER_MODULES!r} if m in sys.modules])"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_provider_handlers_register_on_first_use():
+    pytest.importorskip("openai")
+    result = _run_python(
+        """
+import shinychat
+from openai.types.chat import ChatCompletionChunk
+import openai.types.chat.chat_completion_chunk as ccc
+from shinychat._chat_normalize import normalize_message_chunk
+
+chunk = ChatCompletionChunk(
+    id="x",
+    object="chat.completion.chunk",
+    model="m",
+    created=0,
+    choices=[ccc.Choice(index=0, delta=ccc.ChoiceDelta(content="Hi"))],
+)
+print(normalize_message_chunk(chunk).content)
+"""
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "Hi"
+
+
+def test_handlers_registered_before_provider_load_take_precedence():
+    pytest.importorskip("chatlas")
+    result = _run_python(
+        """
+from chatlas.types import ContentText
+from shinychat import message_content
+from shinychat._chat_normalize import register_provider_handlers
+from shinychat.types import ChatMessage
+
+@message_content.register
+def _(message: ContentText):
+    return ChatMessage(content="custom")
+
+# Stands in for any other chatlas object triggering chatlas registration
+register_provider_handlers()
+print(message_content(ContentText(text="original")).content)
+"""
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "custom"
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+from htmltools import tags
+from shinychat._markdown_stream import _ChunkCoalescer, _pump
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, str, list[Any]]] = []
+
+    async def __call__(
+        self, content: str, operation: str, deps: list[Any]
+    ) -> None:
+        self.sent.append((content, operation, deps))
+
+
+def dep(name: str, version: str = "1.0") -> dict[str, str]:
+    return {"name": name, "version": version}
+
+
+@pytest.mark.anyio
+async def test_chunks_within_interval_are_sent_together():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=60, max_size=1000, replace=False)
+    for token in ["a", "b", "c"]:
+        await chunks.add(token, [])
+    assert send.sent == []
+
+    await chunks.close()
+    assert send.sent == [("abc", "append", [])]
+
+
+@pytest.mark.anyio
+async def test_pending_chunks_flush_after_interval():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=0.01, max_size=1000, replace=False)
+    await chunks.add("a", [])
+    await chunks.add("b", [])
+    await asyncio.sleep(0.05)
+    assert send.sent == [("ab", "append", [])]
+
+    await chunks.add("c", [])
+    await chunks.close()
+    assert send.sent[-1] == ("c", "append", [])
+
+
+@pytest.mark.anyio
+async def test_size_window_flushes_early():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=60, max_size=4, replace=False)
+    await chunks.add("ab", [])
+    await chunks.add("cd", [])
+    await chunks.add("e", [])
+    assert send.sent == [("abcd", "append", [])]
+
+    await chunks.close()
+    assert send.sent[-1] == ("e", "append", [])
+
+
+@pytest.mark.anyio
+async def test_zero_interval_sends_every_chunk():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=0, max_size=1000, replace=False)
+    await chunks.add("a", [])
+    await chunks.add("b", [])
+    await chunks.close()
+    assert [c for c, _, _ in send.sent] == ["a", "b"]
+
+
+@pytest.mark.anyio
+async def test_dependencies_are_sent_once_per_stream():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=0, max_size=1000, replace=False)
+    await chunks.add("<x>", [dep("x")])
+    await chunks.add("<x>", [dep("x"), dep("y")])
+    await chunks.add("<x>", [dep("x", "2.0")])
+    await chunks.close()
+    assert [d for _, _, d in send.sent] == [
+        [dep("x")],
+        [dep("y")],
+        [dep("x", "2.0")],
+    ]
+
+
+@pytest.mark.anyio
+async def test_replace_is_merged_into_first_flush():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=60, max_size=1000, replace=True)
+    await chunks.add("a", [])
+    await chunks.close()
+    assert send.sent == [("a", "replace", [])]
+
+
+@pytest.mark.anyio
+async def test_replace_is_sent_after_one_interval_without_content():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=0.01, max_size=1000, replace=True)
+    await asyncio.sleep(0.05)
+    assert send.sent == [("", "replace", [])]
+
+    await chunks.close()
+    assert len(send.sent) == 1
+
+
+@pytest.mark.anyio
+async def test_empty_stream_still_clears():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=60, max_size=1000, replace=True)
+    await chunks.close()
+    assert send.sent == [("", "replace", [])]
+
+
+@pytest.mark.anyio
+async def test_timer_flush_error_is_raised():
+    async def send(content: str, operation: str, deps: list[Any]) -> None:
+        raise RuntimeError("socket closed")
+
+    chunks = _ChunkCoalescer(send, interval=0.01, max_size=1000, replace=False)
+    await chunks.add("a", [])
+    await asyncio.sleep(0.05)
+    with pytest.raises(RuntimeError, match="socket closed"):
+        await chunks.add("b", [])
+    with pytest.raises(RuntimeError, match="socket closed"):
+        await chunks.close()
+
+
+@pytest.mark.anyio
+async def test_ui_chunks_are_rendered_once_per_flush():
+    renders: list[str] = []
+
+    def render(ui: Any) -> dict[str, Any]:
+        html = str(ui)
+        renders.append(html)
+        return {"html": html, "deps": [dep("x")]}
+
+    send = _Recorder()
+    chunks = _ChunkCoalescer(
+        send, interval=60, max_size=1000, replace=False, render=render
+    )
+    await chunks.add_ui([tags.b("a")])
+    await chunks.add_ui([tags.i("b")])
+    await chunks.add("c", [])
+    await chunks.add_ui([tags.b("d")])
+    assert renders == ["<b>a</b><i>b</i>"]
+    await chunks.close()
+    assert renders[1:] == ["<b>d</b>"]
+    assert send.sent == [("<b>a</b><i>b</i>c<b>d</b>", "append", [dep("x")])]
+    assert "".join(chunks.html) == send.sent[0][0]
+
+
+@pytest.mark.anyio
+async def test_discard_drops_buffered_chunks():
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=0.01, max_size=1000, replace=True)
+    await chunks.add("a", [])
+    chunks.discard()
+    await asyncio.sleep(0.05)
+    assert send.sent == []
+
+
+@pytest.mark.anyio
+async def test_chunks_before_a_stream_error_are_sent():
+    async def fails():
+        yield "a"
+        yield "b"
+        raise RuntimeError("provider failed")
+
+    send = _Recorder()
+    chunks = _ChunkCoalescer(send, interval=60, max_size=1000, replace=True)
+    with pytest.raises(RuntimeError, match="provider failed"):
+        await _pump(fails(), chunks)
+    assert send.sent == [("ab", "replace", [])]
+
+
+@pytest.mark.anyio
+async def test_failing_flush_does_not_mask_the_stream_error():
+    async def fails():
+        yield "a"
+        raise RuntimeError("provider failed")
+
+    async def send(content: str, operation: str, deps: list[Any]) -> None:
+        raise ConnectionError("socket closed")
+
+    chunks = _ChunkCoalescer(send, interval=60, max_size=1000, replace=False)
+    with pytest.raises(RuntimeError, match="provider failed"):
+        await _pump(fails(), chunks)
@@ -20,6 +20,7 @@ from chatlas._tools import Tool
 from chatlas.types import ContentToolRequest, ContentToolResult, ToolInfo
 from htmltools import HTML, HTMLDependency, Tag, TagList
 from shinychat import chat_ui, message_content, message_content_chunk
+from shinychat._chat_normalize import register_provider_handlers
 from shinychat._chat_normalize_chatlas import (
     ShinyToolCardMessage,
     ToolRequestComponent,
@@ -366,6 +367,9 @@ def custom_display_handler():
     process-global, so a handler left registered here would leak into
     unrelated tests that happen to run later in the same process.
     """
+    # Provider handlers register lazily; do it now so they aren't mistaken
+    # for handlers added by the test and removed below.
+    register_provider_handlers(["chatlas"])
     registry = gc.get_referents(message_content_chunk.registry)[0]
     before = set(registry)
 
@@ -383,6 +387,9 @@ def custom_display_handler():
 @pytest.fixture
 def custom_message_handler():
     """Register a complete-message handler and undo it afterward."""
+    # Provider handlers register lazily; do it now so they aren't mistaken
+    # for handlers added by the test and removed below.
+    register_provider_handlers(["chatlas"])
     registry = gc.get_referents(message_content.registry)[0]
     before = set(registry)
 
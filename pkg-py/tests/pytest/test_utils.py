@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Iterator
+
+import pytest
+from shinychat._utils import (
+    MakeIterableAsync,
+    ThreadedIterable,
+    callback_executor,
+    resolve_callback_threads,
+    run_in_thread,
+    wrap_async,
+    wrap_async_iterable,
+)
+
+CURRENT = contextvars.ContextVar("CURRENT", default="unset")
+
+
+async def collect(it: Any) -> list[Any]:
+    return [x async for x in it]
+
+
+async def max_loop_lag(coro: Any, interval: float = 0.005) -> float:
+    """Await `coro` while measuring the event loop's worst scheduling lag."""
+    lag = 0.0
+
+    async def probe():
+        nonlocal lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(lag, time.perf_counter() - start - interval)
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    try:
+        await coro
+        # Let the probe observe a stall that ended with `coro`
+        await asyncio.sleep(interval * 2)
+    finally:
+        task.cancel()
+    return lag
+
+
+def blocking(seconds: float) -> str:
+    time.sleep(seconds)
+    return CURRENT.get()
+
+
+@pytest.mark.anyio
+async def test_threaded_wrap_async_does_not_block_the_event_loop():
+    inline_lag = await max_loop_lag(wrap_async(blocking)(0.2))
+    threaded_lag = await max_loop_lag(wrap_async(blocking, threaded=True)(0.2))
+    assert inline_lag >= 0.15
+    assert threaded_lag < 0.1
+
+
+@pytest.mark.anyio
+async def test_run_in_thread_preserves_context():
+    token = CURRENT.set("session-1")
+    try:
+        assert await run_in_thread(blocking, 0) == "session-1"
+        threads = await asyncio.gather(
+            run_in_thread(threading.current_thread),
+            wrap_async(threading.current_thread, threaded=True)(),
+        )
+        assert all(t is not threading.current_thread() for t in threads)
+    finally:
+        CURRENT.reset(token)
+
+
+@pytest.mark.anyio
+async def test_threaded_wrap_async_leaves_async_functions_alone():
+    async def fn() -> int:
+        return 1
+
+    assert wrap_async(fn, threaded=True) is fn
+
+
+def test_callback_pool_size_from_env(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("SHINYCHAT_CALLBACK_THREADS", raising=False)
+    assert resolve_callback_threads() is None
+    monkeypatch.setenv("SHINYCHAT_CALLBACK_THREADS", "3")
+    assert resolve_callback_threads() == 3
+    assert callback_executor()._max_workers == 3
+    assert callback_executor() is callback_executor()
+    for value in ("0", "many"):
+        monkeypatch.setenv("SHINYCHAT_CALLBACK_THREADS", value)
+        with pytest.raises(ValueError, match="SHINYCHAT_CALLBACK_THREADS"):
+            resolve_callback_threads()
+
+
+def test_wrap_async_iterable_threads_only_lazy_iterables():
+    def gen() -> Iterator[int]:
+        yield 1
+
+    assert isinstance(
+        wrap_async_iterable(gen(), threaded=True), ThreadedIterable
+    )
+    assert isinstance(wrap_async_iterable(gen()), MakeIterableAsync)
+    for x in ([1], (1,), "a"):
+        assert isinstance(
+            wrap_async_iterable(x, threaded=True), MakeIterableAsync
+        )
+    with pytest.raises(TypeError):
+        wrap_async_iterable(1)  # type: ignore[arg-type]
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_does_not_block_the_event_loop():
+    def slow() -> Iterator[str]:
+        for x in "abc":
+            time.sleep(0.05)
+            yield x
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    task = asyncio.create_task(ticker())
+    try:
+        assert await collect(ThreadedIterable(slow())) == ["a", "b", "c"]
+    finally:
+        task.cancel()
+    assert ticks > 5
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_runs_off_the_loop_thread():
+    threads: list[threading.Thread] = []
+
+    def gen() -> Iterator[int]:
+        threads.append(threading.current_thread())
+        yield 1
+
+    assert await collect(ThreadedIterable(gen())) == [1]
+    assert threads[0] is not threading.current_thread()
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_propagates_errors():
+    def boom() -> Iterator[int]:
+        yield 1
+        raise ValueError("boom")
+
+    it = ThreadedIterable(boom()).__aiter__()
+    assert await it.__anext__() == 1
+    with pytest.raises(ValueError, match="boom"):
+        await it.__anext__()
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_buffer_limits_read_ahead():
+    produced = 0
+
+    def counter() -> Iterator[int]:
+        nonlocal produced
+        while True:
+            produced += 1
+            yield produced
+
+    it = ThreadedIterable(counter(), buffer=3).__aiter__()
+    assert await it.__anext__() == 1
+    await asyncio.sleep(0.05)
+    assert produced <= 4
+    it.close()
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_closes_generator_when_consumer_stops():
+    closed = threading.Event()
+
+    def gen() -> Iterator[int]:
+        try:
+            while True:
+                yield 1
+        finally:
+            closed.set()
+
+    it = ThreadedIterable(gen(), buffer=1)
+    async for _ in it:
+        break
+    it.close()
+    assert await asyncio.to_thread(closed.wait, 1)
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_stops_when_consumer_is_cancelled():
+    closed = threading.Event()
+    release = threading.Event()
+
+    def gen() -> Iterator[int]:
+        try:
+            yield 1
+            release.wait()
+            yield 2
+            yield 3
+        finally:
+            closed.set()
+
+    it = ThreadedIterable(gen(), buffer=1).__aiter__()
+    assert await it.__anext__() == 1
+    task = asyncio.create_task(it.__anext__())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The worker stops once its blocking next() call returns
+    release.set()
+    assert await asyncio.to_thread(closed.wait, 1)
+
+
+@pytest.mark.anyio
+async def test_threaded_iterable_stops_when_dropped():
+    closed = threading.Event()
+
+    def gen() -> Iterator[int]:
+        try:
+            while True:
+                yield 1
+        finally:
+            closed.set()
+
+    it = ThreadedIterable(gen(), buffer=1).__aiter__()
+    await it.__anext__()
+    del it
+    assert await asyncio.to_thread(closed.wait, 1)
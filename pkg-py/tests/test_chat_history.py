@@ -4,7 +4,7 @@ from typing import Any, Awaitable, Callable, cast
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from shiny.module import ResolvedId
+from _session_test_helpers import MockSession
 from shiny.session import session_context
 from shinychat import Chat
 from shinychat._history import ChatHistory
@@ -15,32 +15,8 @@ from shinychat.types import HistoryOptions
 # ---------------------------------------------------------------------------
 
 
-class _MockSession:
-    ns: ResolvedId = ResolvedId("")
-    app: object = None
-    id: str = "mock-session-history"
-    input: Any
-
-    def __init__(self) -> None:
-        from shiny import Inputs
-
-        self.input = Inputs({}, ns=ResolvedId)
-
-    def on_ended(self, callback: object) -> None:
-        pass
-
-    def on_destroy(self, callback: object) -> None:
-        pass
-
-    def _increment_busy_count(self) -> None:
-        pass
-
-    def is_stub_session(self) -> bool:
-        return True
-
-
 def _make_chat(history: "bool | HistoryOptions" = True) -> Chat:
-    session = cast(Any, _MockSession())
+    session = cast(Any, MockSession("mock-session-history"))
     with session_context(session):
         chat = Chat("test_history", history=history)
     return chat
@@ -129,7 +105,7 @@ def _make_chat_with_client(
         start_calls.append(1)
         self._started = True
 
-    session = cast(Any, _MockSession())
+    session = cast(Any, MockSession("mock-session-history"))
     with (
         session_context(session),
         patch.object(ChatHistory, "_start", _fake_start),
@@ -199,3 +175,133 @@ async def test_setup_greeting_wires_on_settled():
         mock_resolve.reset_mock()
         await fake_controller.on_settled(True)
         mock_resolve.assert_not_awaited()
+
+
+# ---------------------------------------------------------------------------
+# Reference-based bookmarks
+# ---------------------------------------------------------------------------
+
+
+class _FakeRecord:
+    def __init__(self, id: str, current_leaf: "str | None") -> None:
+        self.id = id
+        self.current_leaf = current_leaf
+
+
+class _FakeRecordController:
+    def __init__(self, record: "_FakeRecord | None") -> None:
+        self.record = record
+
+
+def test_stamp_bookmark_records_conversation_and_leaf():
+    chat = _make_chat()
+    values: dict[str, Any] = {}
+    chat.history.stamp_bookmark(values)
+    assert values == {}  # history not started
+
+    chat.history._controller = cast(Any, _FakeRecordController(None))
+    chat.history.stamp_bookmark(values)
+    assert values == {}  # unsaved draft
+
+    record = _FakeRecord("conv-1", "n_0004")
+    chat.history._controller = cast(Any, _FakeRecordController(record))
+    assert chat.history.bookmark_reference() == ("conv-1", "n_0004")
+    chat.history.stamp_bookmark(values)
+    assert values == {
+        "test_history_history_conversation_id": "conv-1",
+        "test_history_history_leaf": "n_0004",
+    }
+
+
+class _RecordingBookmark:
+    def __init__(self) -> None:
+        self.exclude: list[str] = []
+        self.store = "url"
+        self.on_bookmark_fns: list[Callable[..., Any]] = []
+        self.on_restore_fns: list[Callable[..., Any]] = []
+
+    def on_bookmark(self, fn: Callable[..., Any]) -> Callable[[], None]:
+        self.on_bookmark_fns.append(fn)
+        return lambda: None
+
+    def on_restore(self, fn: Callable[..., Any]) -> Callable[[], None]:
+        self.on_restore_fns.append(fn)
+        return lambda: None
+
+    def on_bookmarked(self, fn: Callable[..., Any]) -> Callable[[], None]:
+        return lambda: None
+
+
+class _BookmarkingSession(MockSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.bookmark = _RecordingBookmark()
+
+    def is_stub_session(self) -> bool:
+        return False
+
+    def root_scope(self) -> "_BookmarkingSession":
+        return self
+
+    async def send_custom_message(self, type: str, message: object) -> None:
+        pass
+
+
+class _StateClient:
+    async def get_state(self) -> dict[str, Any]:
+        return {"turns": ["a long transcript"]}
+
+    async def set_state(self, state: object) -> None:
+        pass
+
+
+def _bookmark_values(session: _BookmarkingSession) -> dict[str, Any]:
+    import asyncio
+    import inspect
+
+    class _State:
+        values: dict[str, Any] = {}
+
+    state = _State()
+    state.values = {}
+    with session_context(cast(Any, session)):
+        for fn in session.bookmark.on_bookmark_fns:
+            res = fn(state)
+            if inspect.isawaitable(res):
+                asyncio.run(cast(Any, res))
+    return state.values
+
+
+def test_reference_bookmark_requires_history():
+    session = _BookmarkingSession()
+    with session_context(cast(Any, session)):
+        chat = Chat("test_history", history=False)
+        with pytest.raises(ValueError, match="requires chat history"):
+            chat.enable_bookmarking(
+                _StateClient(), bookmark_on=None, bookmark_state="reference"
+            )
+
+
+def test_reference_bookmark_stores_only_the_reference():
+    session = _BookmarkingSession()
+    with session_context(cast(Any, session)):
+        chat = Chat("test_history")
+        record = _FakeRecord("conv-1", "n_0002")
+        chat.history._controller = cast(Any, _FakeRecordController(record))
+        chat.enable_bookmarking(
+            _StateClient(), bookmark_on=None, bookmark_state="reference"
+        )
+    assert _bookmark_values(session) == {
+        "test_history_history_conversation_id": "conv-1",
+        "test_history_history_leaf": "n_0002",
+    }
+
+
+def test_full_bookmark_stores_client_state_and_messages():
+    session = _BookmarkingSession()
+    with session_context(cast(Any, session)):
+        chat = Chat("test_history", history=False)
+        chat.enable_bookmarking(_StateClient(), bookmark_on=None)
+    values = _bookmark_values(session)
+    assert values["test_history"] == {"turns": ["a long transcript"]}
+    assert values["test_history--msgs"] == []
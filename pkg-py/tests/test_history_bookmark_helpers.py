@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from pathlib import Path
 
 import pytest
 import shiny.bookmark._global as bookmark_global
-from shinychat._history_bookmark import delete_bookmark_state, extract_state_id
+from shinychat._history_bookmark import (
+    BookmarkDebouncer,
+    bookmark_reference_keys,
+    delete_bookmark_state,
+    extract_state_id,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -68,3 +74,74 @@ async def test_delete_bookmark_state_removes_directory(tmp_path: Path):
     await delete_bookmark_state("abc123")
 
     assert not target.exists()
+
+
+def test_bookmark_reference_keys():
+    assert bookmark_reference_keys("chat") == (
+        "chat_history_conversation_id",
+        "chat_history_leaf",
+    )
+
+
+class _Minter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self) -> None:
+        self.calls += 1
+
+
+@pytest.mark.anyio
+async def test_debouncer_without_delay_mints_inline_and_skips_unchanged():
+    mint = _Minter()
+    debouncer = BookmarkDebouncer()
+
+    await debouncer.request(mint, ("conv", "n_0002"))
+    assert mint.calls == 1
+    await debouncer.request(mint, ("conv", "n_0002"))
+    assert mint.calls == 1  # same branch: the last bookmark still applies
+    await debouncer.request(mint, ("conv", "n_0004"))
+    assert mint.calls == 2
+
+    # Requests without a key always mint
+    await debouncer.request(mint)
+    await debouncer.request(mint)
+    assert mint.calls == 4
+
+
+@pytest.mark.anyio
+async def test_debouncer_coalesces_requests_within_delay():
+    mint = _Minter()
+    debouncer = BookmarkDebouncer(0.01)
+
+    for leaf in ("n_0002", "n_0004", "n_0006"):
+        await debouncer.request(mint, ("conv", leaf))
+    assert mint.calls == 0
+    await asyncio.sleep(0.05)
+    assert mint.calls == 1
+
+    await debouncer.request(mint, ("conv", "n_0006"))
+    await asyncio.sleep(0.05)
+    assert mint.calls == 1  # already minted for this branch
+
+
+@pytest.mark.anyio
+async def test_debouncer_cancel_drops_pending_mint():
+    mint = _Minter()
+    debouncer = BookmarkDebouncer(0.01)
+    await debouncer.request(mint, "a")
+    debouncer.cancel()
+    await asyncio.sleep(0.03)
+    assert mint.calls == 0
+
+
+@pytest.mark.anyio
+async def test_debouncer_logs_failed_mint(caplog: pytest.LogCaptureFixture):
+    async def boom() -> None:
+        raise RuntimeError("boom")
+
+    debouncer = BookmarkDebouncer(0.001)
+    with caplog.at_level(logging.WARNING):
+        await debouncer.request(boom, "a")
+        await asyncio.sleep(0.02)
+    assert "debounced bookmark" in caplog.text
@@ -2,6 +2,7 @@
 # is covered by Playwright e2e tests (Task 13). This file tests the pure
 # helpers that HistoryController delegates to.
 
+import asyncio
 import warnings
 from datetime import timedelta
 from typing import Any, cast
@@ -14,6 +15,11 @@ from shinychat._history import (
     do_bookmark_with_cleanup,
     extend_record_linear,
 )
+from shinychat._history_cache import (
+    caches_records,
+    resolve_prefetch_count,
+    resolve_record_cache_size,
+)
 from shinychat._history_store import (
     ConversationPartition,
     ConversationStore,
@@ -191,6 +197,7 @@ def test_extend_with_no_new_ui_messages_leaves_ui_none():
 class _FakeChat:
     def __init__(self) -> None:
         self.set_greeting_calls: list[Any] = []
+        self._client_features = {"truncate_after"}
 
     def _messages_for_bookmark(self) -> list[Any]:
         return []
@@ -201,6 +208,9 @@ class _FakeChat:
     async def clear_messages(self) -> None:
         pass
 
+    async def _truncate_messages(self, count: int) -> None:
+        pass
+
     async def _restore_bookmark_message(self, message_dict: Any) -> None:
         pass
 
@@ -413,6 +423,202 @@ async def test_on_response_no_new_data_does_not_overwrite_saved_values():
     assert controller.record.values["accent"] == "info"
 
 
+class _GatedStore(_RecordingStore):
+    """Store whose puts wait until `gate` is set."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = asyncio.Event()
+        self.started: list[Any] = []
+
+    async def put(self, partition: ConversationPartition, record: Any) -> None:
+        self.started.append(record)
+        await self.gate.wait()
+        await super().put(partition, record)
+
+
+@pytest.mark.anyio
+async def test_schedule_response_updates_record_before_the_store_write():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+
+    task = await controller.schedule_response()
+
+    assert task is not None
+    assert controller.record is not None
+    assert controller.record.response_count == 1
+    assert controller.ui_offset == 2
+    assert store.put_calls == []
+
+    store.gate.set()
+    await task
+    assert len(store.put_calls) == 1
+    # The store receives a snapshot, not the live record
+    assert store.put_calls[0][1] is not controller.record
+
+
+@pytest.mark.anyio
+async def test_queued_saves_of_a_conversation_run_in_order():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+
+    chat.messages = [msg("user"), msg("assistant")]
+    first = await controller.schedule_response()
+    chat.messages += [msg("user"), msg("assistant")]
+    second = await controller.schedule_response()
+    assert first is not None and second is not None
+
+    await asyncio.sleep(0.01)
+    # The second save waits for the first, even while it is blocked
+    assert len(store.started) == 1
+
+    store.gate.set()
+    await controller.flush_saves()
+    counts = [r.response_count for _, r in store.put_calls]
+    assert counts == [1, 2]
+    assert controller._pending_saves == {}
+
+
+@pytest.mark.anyio
+async def test_queued_record_put_waits_for_pending_saves():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+
+    chat.messages = [msg("user"), msg("assistant")]
+    await controller.schedule_response()
+    record = controller.record
+    assert record is not None
+    # e.g. a bookmark minted while the response save is still in flight
+    record.bookmark_state_id = "state-1"
+    stamp = controller._enqueue_put(record)
+
+    await asyncio.sleep(0.01)
+    assert len(store.started) == 1
+
+    store.gate.set()
+    await stamp
+    assert [r.bookmark_state_id for _, r in store.put_calls] == [
+        None,
+        "state-1",
+    ]
+    assert store.put_calls[-1][1] is not record
+
+
+@pytest.mark.anyio
+async def test_background_save_errors_reach_on_error():
+    controller, _ = _make_controller(_FailingStore())
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    errors: list[Exception] = []
+
+    async def on_error(e: Exception) -> None:
+        errors.append(e)
+
+    task = await controller.schedule_response(on_error)
+    assert task is not None
+    await task
+    assert [str(e) for e in errors] == ["disk full"]
+
+    chat.messages += [msg("user"), msg("assistant")]
+    with pytest.raises(OSError, match="disk full"):
+        await controller.on_response()
+
+
+@pytest.mark.anyio
+async def test_delete_waits_for_queued_saves():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    await controller.schedule_response()
+    assert controller.record is not None
+
+    delete = asyncio.create_task(controller.delete(controller.record.id))
+    await asyncio.sleep(0.01)
+    assert not delete.done()
+
+    store.gate.set()
+    await delete
+    assert len(store.put_calls) == 1
+    assert controller.record is None
+
+
+@pytest.mark.anyio
+async def test_queued_saves_finish_without_the_client_after_session_end():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    client_calls: list[str] = []
+
+    async def on_response_saved(record: Any) -> None:
+        client_calls.append("on_response_saved")
+
+    async def send_history_update() -> None:
+        client_calls.append("send_history_update")
+
+    controller.on_response_saved = on_response_saved
+    controller.send_history_update = send_history_update  # type: ignore[method-assign]
+    await controller.schedule_response()
+
+    controller.cancel_pending()
+    store.gate.set()
+    await controller.flush_saves()
+    assert len(store.put_calls) == 1
+    assert client_calls == []
+
+
+@pytest.mark.anyio
+async def test_save_errors_after_session_end_are_only_warned():
+    controller, _ = _make_controller(_FailingStore())
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    errors: list[Exception] = []
+
+    async def on_error(e: Exception) -> None:
+        errors.append(e)
+
+    task = await controller.schedule_response(on_error)
+    assert task is not None
+    controller.cancel_pending()
+    with pytest.warns(UserWarning, match="Background save failed: disk full"):
+        await task
+    assert errors == []
+
+
+@pytest.mark.anyio
+async def test_on_response_saved_gets_the_saved_snapshot():
+    store = _GatedStore()
+    controller, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    controller.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    saved: list[Any] = []
+
+    async def hook(record: Any) -> None:
+        saved.append(record)
+
+    controller.on_response_saved = hook
+    await controller.schedule_response()
+    store.gate.set()
+    await controller.flush_saves()
+
+    ((_, written),) = store.put_calls
+    assert saved[0] is written
+    assert written is not controller.record
+
+
 class _ReplayFakeChat(_FakeChat):
     """Fake chat whose `_messages_for_bookmark()` reflects whatever
     `replay_ui` last restored, so `on_response` sees the same re-report a
@@ -432,6 +638,39 @@ class _ReplayFakeChat(_FakeChat):
         self.messages.append(message_dict)
 
 
+@pytest.mark.anyio
+async def test_concurrent_writers_merge_instead_of_overwriting(
+    tmp_path: Any,
+):
+    from shinychat._history_store import FileConversationStore
+
+    store = FileConversationStore(dir=tmp_path)
+    tab_a, _ = _make_controller(store)
+    chat = _ReplayFakeChat()
+    tab_a.chat = chat  # type: ignore[assignment]
+    chat.messages = [msg("user"), msg("assistant")]
+    await tab_a.on_response()
+    assert tab_a.record is not None
+    conv_id = tab_a.record.id
+
+    # A second tab renames the conversation meanwhile
+    tab_b, _ = _make_controller(store)
+    tab_b.record = await store.get(part(), conv_id)
+    await tab_b.rename(conv_id, "Renamed in tab B")
+
+    # Tab A's next save conflicts, merges in the new title, and retries
+    chat.messages += [msg("user"), msg("assistant")]
+    await tab_a.on_response()
+    assert tab_a.record.title == "Renamed in tab B"
+    assert tab_a.record.revision == 3
+
+    stored = await FileConversationStore(dir=tmp_path).get(part(), conv_id)
+    assert stored is not None
+    assert stored.title == "Renamed in tab B"
+    assert stored.response_count == 2
+    assert stored.revision == 3
+
+
 @pytest.mark.anyio
 async def test_replay_rereport_does_not_resave_or_truncate():
     # Simulates the real restore sequence: on_response() saves a
@@ -1123,6 +1362,37 @@ async def test_save_callback_fires_and_values_stored(tmp_path: Any) -> None:
     assert controller.record.values.get("x") == 42
 
 
+@pytest.mark.anyio
+async def test_threaded_save_callbacks_run_off_the_loop_in_order() -> None:
+    import threading
+
+    def first(values: dict[str, Any]) -> None:
+        values["thread"] = threading.current_thread().name
+        values["order"] = ["first"]
+
+    def second(values: dict[str, Any]) -> None:
+        values["order"].append("second")
+
+    controller = HistoryController(
+        chat=_make_fake_chat(),  # type: ignore[arg-type]
+        adapter=_FakeAdapter(),  # type: ignore[arg-type]
+        store=InMemoryConversationStore(),
+        title_fn=None,
+        title_enabled=False,
+        client=object(),
+        save_callbacks=[first, second],
+        threaded_callbacks=True,
+    )
+    controller.partition = part(scope="alice")
+
+    await controller.on_response()
+
+    assert controller.record is not None
+    values = controller.record.values
+    assert values["thread"].startswith("shinychat-callback")
+    assert values["order"] == ["first", "second"]
+
+
 @pytest.mark.anyio
 async def test_restore_callback_fires_on_switch(tmp_path: Any) -> None:
     """on_restore callback receives stored values on switch_to."""
@@ -1235,9 +1505,13 @@ async def test_evict_if_needed_removes_oldest_preserves_active():
     )
     controller.partition = part(scope="alice")
     controller.record = rec3  # newest is active
+    delete_spy = AsyncMock(wraps=store.delete_many)
+    store.delete_many = delete_spy  # type: ignore[method-assign]
 
     await controller._evict_if_needed()
 
+    # Victims are removed in one batch, oldest first
+    delete_spy.assert_awaited_once_with(part(scope="alice"), [rec1.id, rec2.id])
     remaining = {m.id for m in await store.list(part(scope="alice"))}
     assert rec1.id not in remaining
     assert rec2.id not in remaining
@@ -1483,7 +1757,9 @@ class _TrackingChat:
         self.messages_: list[dict[str, Any]] = []
         self.actions: list[dict[str, Any]] = []
         self.cleared: bool = False
+        self.truncated: list[int] = []
         self.set_greeting_calls: list[Any] = []
+        self._client_features = {"truncate_after"}
 
     def _messages_for_bookmark(self) -> list[dict[str, Any]]:
         return list(self.messages_)
@@ -1495,6 +1771,10 @@ class _TrackingChat:
         self.messages_ = []
         self.cleared = True
 
+    async def _truncate_messages(self, count: int) -> None:
+        self.messages_ = self.messages_[:count]
+        self.truncated.append(count)
+
     async def _restore_bookmark_message(self, message_dict: Any) -> None:
         self.messages_.append(message_dict)
 
@@ -1566,9 +1846,35 @@ def _make_branched_controller() -> tuple[
     return controller, chat, adapter, store
 
 
+@pytest.mark.anyio
+async def test_handle_navigate_replays_the_whole_path_without_truncate():
+    controller, chat, adapter, store = _make_branched_controller()
+    chat._client_features = set()
+    chat.messages_ = [
+        msg("user"),
+        msg("assistant"),
+        msg("user"),
+        msg("assistant"),
+    ]
+
+    await controller.handle_navigate(2, "prev")
+
+    # An older bundle doesn't understand truncate_after
+    assert chat.truncated == []
+    assert chat.cleared
+    assert len(chat.messages_) == 4
+    assert controller.ui_offset == 4
+
+
 @pytest.mark.anyio
 async def test_handle_navigate_switches_to_prev_sibling():
     controller, chat, adapter, store = _make_branched_controller()
+    chat.messages_ = [
+        msg("user"),
+        msg("assistant"),
+        msg("user"),
+        msg("assistant"),
+    ]
 
     # Message index 2 = n_0005 (the edited user message, sibling 2/2)
     # Navigate "prev" -> switch to n_0003's branch
@@ -1577,8 +1883,13 @@ async def test_handle_navigate_switches_to_prev_sibling():
     assert controller.record is not None
     assert controller.record.current_leaf == "n_0004"
     assert [t["content"] for t in adapter.turns] == ["q1", "a1", "q2", "a2"]
-    assert chat.cleared
+    # Only the divergent suffix is re-rendered
+    assert not chat.cleared
+    assert chat.truncated == [2]
+    rec = controller.record
+    assert chat.messages_[2:] == rec.nodes["n_0003"].ui + rec.nodes["n_0004"].ui
     assert len(chat.messages_) == 4
+    assert controller.ui_offset == 4
     assert len(store.put_calls) == 1
 
 
@@ -1746,7 +2057,8 @@ async def test_handle_edit_truncates_and_signals_resubmit():
     assert controller.record is not None
     assert controller.record.current_leaf == "n_0002"
     assert [t["content"] for t in adapter.turns] == ["q1", "a1"]
-    assert chat.cleared
+    assert not chat.cleared
+    assert chat.truncated == [2]
     assert len(chat.messages_) == 2
     update_actions = [
         a for a in chat.actions if a.get("type") == "update_input"
@@ -1771,6 +2083,9 @@ async def test_handle_edit_first_message_truncates_to_root():
     assert controller.record is not None
     assert controller.record.current_leaf is None
     assert adapter.turns == []
+    # Nothing is kept, so this is a full replay
+    assert chat.cleared
+    assert chat.truncated == []
     assert chat.messages_ == []
     update_actions = [
         a for a in chat.actions if a.get("type") == "update_input"
@@ -1841,7 +2156,7 @@ async def test_handle_edit_forks_from_a_multi_turn_tool_call_node():
         "tool_result",
         "sunny",
     ]
-    assert chat.cleared
+    assert chat.truncated == [2]
     assert len(chat.messages_) == 2  # n_0001's + n_0002's UI messages
     update_actions = [
         a for a in chat.actions if a.get("type") == "update_input"
@@ -1885,6 +2200,32 @@ async def test_handle_edit_with_attachments_forwards_them_with_set_mode():
     ]
 
 
+@pytest.mark.anyio
+async def test_handle_edit_ignores_a_submitted_attachment_path(tmp_path):
+    controller, chat, adapter, store = _make_branched_controller()
+    chat.messages_ = [
+        msg("user"),
+        msg("assistant"),
+        msg("user"),
+        msg("assistant"),
+    ]
+    secret = tmp_path / "secret.txt"
+    secret.write_text("server-only")
+    attachment = {
+        "mime": "text/plain",
+        "data_url": "data:text/plain;base64,aGk=",
+        "name": "x.txt",
+        "size": 2,
+    }
+
+    await controller.handle_edit(
+        2, "q2-re-edited", [{**attachment, "path": str(secret)}]
+    )
+
+    (action,) = [a for a in chat.actions if a.get("type") == "update_input"]
+    assert action["attachments"] == [attachment]
+
+
 @pytest.mark.anyio
 async def test_handle_edit_without_attachments_omits_attachment_fields():
     controller, chat, adapter, store = _make_branched_controller()
@@ -1985,3 +2326,111 @@ async def test_switch_to_resends_sibling_metadata_for_branched_conversation():
     assert len(sibling_actions) == 1
     # n_0005 (message index 2) is the active branch's fork point: 2nd of 2 siblings.
     assert sibling_actions[0]["data"] == {2: {"index": 1, "total": 2}}
+
+
+# ---------------------------------------------------------------------------
+# Record cache and prefetch
+# ---------------------------------------------------------------------------
+
+
+async def _two_turn_records(
+    store: ConversationStore, n: int
+) -> list[ConversationRecord]:
+    recs = []
+    for i in range(n):
+        rec = new_conversation_record(title=f"c{i}")
+        rec.append_linear([{"role": "user", "content": "hello"}])
+        rec.append_linear([{"role": "assistant", "content": "hi there"}])
+        await store.put(part(), rec)
+        recs.append(rec)
+    return recs
+
+
+@pytest.mark.anyio
+async def test_switching_back_takes_the_record_from_the_cache():
+    store = InMemoryConversationStore()
+    a, b = await _two_turn_records(store, 2)
+    controller, _ = _make_controller(store)
+    await controller.switch_to(a.id)
+    live_a = controller.record
+
+    get_spy = AsyncMock(wraps=store.get)
+    put_spy = AsyncMock(wraps=store.put)
+    store.get = get_spy  # type: ignore[method-assign]
+    store.put = put_spy  # type: ignore[method-assign]
+    await controller.switch_to(b.id)
+    get_spy.reset_mock()
+    await controller.switch_to(a.id)
+
+    assert controller.record is live_a
+    get_spy.assert_not_awaited()
+    # Neither unchanged conversation was re-saved on the way out
+    put_spy.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_cached_record_is_dropped_once_saved_elsewhere():
+    store = InMemoryConversationStore()
+    a, b = await _two_turn_records(store, 2)
+    controller, _ = _make_controller(store)
+    await controller.switch_to(a.id)
+    await controller.switch_to(b.id)  # caches `a`
+
+    # Another worker (or session) renames `a`
+    other = await store.get(part(), a.id)
+    assert other is not None
+    other = other.model_copy(update={"title": "renamed"})
+    await store.put(part(), other)
+
+    await controller.switch_to(a.id)
+    assert controller.record is not None
+    assert controller.record.title == "renamed"
+
+
+@pytest.mark.anyio
+async def test_prefetch_loads_recent_conversations_in_one_batch():
+    store = InMemoryConversationStore()
+    recs = await _two_turn_records(store, 4)
+    controller, _ = _make_controller(store)
+    get_many_spy = AsyncMock(wraps=store.get_many)
+    store.get_many = get_many_spy  # type: ignore[method-assign]
+
+    await controller.prefetch(2)
+    await controller.prefetch(2)  # already cached: no second read
+    get_many_spy.assert_awaited_once()
+    newest = [m.id for m in await store.list(part())][:2]
+    assert list(get_many_spy.await_args.args[1]) == newest
+
+    get_spy = AsyncMock(wraps=store.get)
+    store.get = get_spy  # type: ignore[method-assign]
+    await controller.switch_to(newest[0])
+    get_spy.assert_not_awaited()
+    assert {r.id for r in recs} >= set(newest)
+
+
+@pytest.mark.anyio
+async def test_save_current_still_saves_changed_app_state():
+    store = InMemoryConversationStore()
+    (a,) = await _two_turn_records(store, 1)
+    controller, _ = _make_controller(store)
+    await controller.switch_to(a.id)
+    put_spy = AsyncMock(wraps=store.put)
+    store.put = put_spy  # type: ignore[method-assign]
+
+    await controller.save_current()
+    put_spy.assert_not_awaited()
+    controller._save_callbacks.append(lambda values: values.update(tab="b"))
+    await controller.save_current()
+    put_spy.assert_awaited_once()
+
+
+def test_record_cache_settings_from_env(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_HISTORY_CACHE_SIZE", "0")
+    assert not caches_records(InMemoryConversationStore())
+    monkeypatch.setenv("SHINYCHAT_HISTORY_PREFETCH", "5")
+    assert resolve_prefetch_count() == 5
+    for name in ("SHINYCHAT_HISTORY_CACHE_SIZE", "SHINYCHAT_HISTORY_PREFETCH"):
+        monkeypatch.setenv(name, "-1")
+        with pytest.raises(ValueError, match=name):
+            (resolve_record_cache_size(), resolve_prefetch_count())
+        monkeypatch.delenv(name)
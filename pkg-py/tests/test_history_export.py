@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from shinychat import export_partition, import_partition
+from shinychat._history_export import main
+from shinychat._history_store import (
+    ConversationPartition,
+    FileConversationStore,
+    InMemoryConversationStore,
+)
+from shinychat._history_types import new_conversation_record
+
+
+def part(chat_id: str = "chat", scope: str = "alice") -> ConversationPartition:
+    return ConversationPartition(chat_id=chat_id, scope=scope)
+
+
+async def _fill(store: Any, n: int) -> list[str]:
+    ids = []
+    for i in range(n):
+        rec = new_conversation_record(title=f"c{i}")
+        rec.append_linear(
+            [
+                {"role": "user", "content": f"q{i}"},
+                {"role": "assistant", "content": f"a{i}"},
+            ]
+        )
+        await store.put(part(), rec)
+        ids.append(rec.id)
+    return ids
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("name", ["out.ndjson", "out.ndjson.gz"])
+async def test_export_import_round_trip(tmp_path: Path, name: str):
+    src = FileConversationStore(dir=tmp_path / "src", lazy=True)
+    ids = await _fill(src, 5)
+    progress: list[tuple[int, Any]] = []
+    out = tmp_path / name
+    n = await export_partition(
+        src,
+        part(),
+        out,
+        batch_size=2,
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    assert n == 5
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    if name.endswith(".gz"):
+        assert out.read_bytes()[:2] == b"\x1f\x8b"
+        lines = gzip.decompress(out.read_bytes()).splitlines()
+    else:
+        lines = out.read_bytes().splitlines()
+    assert json.loads(lines[0])["scope"] == "alice"
+    assert len(lines) == 6
+
+    dest = InMemoryConversationStore()
+    assert await import_partition(dest, out, batch_size=2) == 5
+    for conv_id in ids:
+        original = await src.get(part(), conv_id)
+        copy = await dest.get(part(), conv_id)
+        assert original is not None and copy is not None
+        assert copy.title == original.title
+        assert copy.path_turns() == original.path_turns()
+
+
+@pytest.mark.anyio
+async def test_import_into_another_partition_and_file_objects():
+    src = InMemoryConversationStore()
+    await _fill(src, 3)
+    buf = io.BytesIO()
+    assert await export_partition(src, part(), buf, compression="gzip") == 3
+
+    dest = InMemoryConversationStore()
+    buf.seek(0)
+    n = await import_partition(dest, buf, part(scope="bob"), compression="gzip")
+    assert n == 3
+    assert len(await dest.list(part(scope="bob"))) == 3
+    assert await dest.list(part()) == []
+
+
+@pytest.mark.anyio
+async def test_import_rejects_other_files(tmp_path: Path):
+    bad = tmp_path / "bad.ndjson"
+    bad.write_text('{"id": "x"}\n')
+    with pytest.raises(ValueError, match="Not a shinychat history export"):
+        await import_partition(InMemoryConversationStore(), bad)
+    bad.write_text('{"format": "shinychat-history", "version": 99}\n')
+    with pytest.raises(ValueError, match="version"):
+        await import_partition(InMemoryConversationStore(), bad)
+
+
+def test_cli_moves_a_partition_between_directories(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    src = FileConversationStore(dir=tmp_path / "a")
+    ids = asyncio.run(_fill(src, 2))
+    out = tmp_path / "backup.ndjson.gz"
+    args = ["--store", str(tmp_path / "a"), "--chat-id", "chat"]
+    assert main(["export", *args, "--scope", "alice", "-o", str(out)]) == 0
+    assert "exported 2/2" in capsys.readouterr().err
+
+    assert main(["import", "--store", str(tmp_path / "b"), "-i", str(out)]) == 0
+    dest = FileConversationStore(dir=tmp_path / "b")
+    metas = asyncio.run(dest.list(part()))
+    assert {m.id for m in metas} == set(ids)
+
+    assert main(["import", "--store", str(tmp_path / "b"), "-i", "nope"]) == 1
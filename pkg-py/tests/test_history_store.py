@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import shutil
+import threading
 from datetime import timedelta
 from pathlib import Path
 from typing import Any
@@ -11,7 +13,9 @@ import pytest
 from htmltools import HTMLDependency, tags
 from shinychat._history_client import as_turns_adapter
 from shinychat._history_store import (
+    LOCK_FILE,
     ConversationPartition,
+    ConversationStore,
     FileConversationStore,
     InMemoryConversationStore,
     resolve_store,
@@ -20,6 +24,7 @@ from shinychat._history_store import (
 )
 from shinychat._history_types import (
     MAX_SCHEMA_VERSION,
+    ConversationConflictError,
     ConversationRecord,
     UnsupportedSchemaVersionError,
     new_conversation_record,
@@ -424,6 +429,29 @@ async def test_put_is_atomic_no_partial_files(
     assert files == {"record.json", "turns.jsonl", "ui.jsonl"}
 
 
+@pytest.mark.anyio
+async def test_put_waits_for_a_held_lock_without_blocking_the_loop(
+    store: FileConversationStore, tmp_path: Path
+):
+    fcntl = pytest.importorskip("fcntl")
+    await store.put(part(), new_conversation_record(title="first"))
+    (lock_file,) = tmp_path.glob(f"*/*/{LOCK_FILE}")
+
+    # Another worker holds the partition's lock
+    with open(lock_file, "ab") as held:
+        fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+        put = asyncio.create_task(
+            store.put(part(), new_conversation_record(title="second"))
+        )
+        await asyncio.sleep(0.05)
+        # The loop kept running (we got here) and the write is still waiting
+        assert not put.done()
+        fcntl.flock(held.fileno(), fcntl.LOCK_UN)
+    await put
+    titles = {m.title for m in await store.list(part())}
+    assert titles == {"first", "second"}
+
+
 def test_safe_conv_path_rejects_traversal(tmp_path: Path):
     with pytest.raises(ValueError, match="Invalid conversation id"):
         safe_conv_path(tmp_path, "../escape")
@@ -504,12 +532,41 @@ async def test_get_missing_after_cached_list_invalidates_cache(
 
     got = await store.get(part(scope="alice"), rec.id)
     assert got is None
-    assert part(scope="alice") not in store._meta_cache
+    assert part(scope="alice") not in store._generation
 
     metas = await store.list(part(scope="alice"))
     assert metas == []
 
 
+@pytest.mark.anyio
+async def test_get_many_missing_invalidates_cache_on_the_loop(
+    store: FileConversationStore, tmp_path: Path
+):
+    kept = new_conversation_record(title="kept")
+    gone = new_conversation_record(title="gone")
+    await store.put_many(part(scope="alice"), [kept, gone])
+    await store.list(part(scope="alice"))  # warms cache
+
+    # Another worker deletes one of them directly on disk
+    scope_dir = tmp_path / sanitize_scope("chat") / sanitize_scope("alice")
+    shutil.rmtree(scope_dir / gone.id)
+
+    threads: list[int] = []
+    note_missing = store._note_missing
+
+    def spy(partition: Any) -> None:
+        threads.append(threading.get_ident())
+        note_missing(partition)
+
+    store._note_missing = spy  # type: ignore[method-assign]
+    got = await store.get_many(part(scope="alice"), [kept.id, gone.id])
+    assert list(got) == [kept.id]
+    # Cache state is only touched on the event loop's thread
+    assert threads == [threading.get_ident()]
+    assert part(scope="alice") not in store._generation
+    assert [m.id for m in await store.list(part(scope="alice"))] == [kept.id]
+
+
 @pytest.mark.anyio
 async def test_put_updates_warm_cache(store: FileConversationStore):
     a = new_conversation_record(title="first")
@@ -950,3 +1007,280 @@ async def test_memory_total_size_shrinks_with_delete(
     total = await mem_store.total_size(part(scope="alice"))
     await mem_store.delete(part(scope="alice"), rec1.id)
     assert await mem_store.total_size(part(scope="alice")) < total
+
+
+def _ui(text: str) -> list[dict[str, Any]]:
+    return [
+        {
+            "role": "assistant",
+            "segments": [{"content": text, "content_type": "markdown"}],
+        }
+    ]
+
+
+async def _branched_record(store: FileConversationStore) -> ConversationRecord:
+    from _history_test_helpers import branch_from
+
+    rec = new_conversation_record(title="branches")
+    root = rec.append_linear([{"role": "user", "content": "q"}])
+    rec.append_linear([{"role": "assistant", "content": "a1"}], ui=_ui("a1"))
+    branch_from(
+        rec, root, [{"role": "assistant", "content": "a2"}], ui=_ui("a2")
+    )
+    await store.put(part(), rec)
+    return rec
+
+
+@pytest.mark.anyio
+async def test_lazy_get_matches_eager_get(tmp_path: Path):
+    rec = await _branched_record(FileConversationStore(dir=tmp_path))
+    eager = await FileConversationStore(dir=tmp_path).get(part(), rec.id)
+    lazy = await FileConversationStore(dir=tmp_path, lazy=True).get(
+        part(), rec.id
+    )
+    assert eager is not None and lazy is not None
+    assert lazy.model_dump() == eager.model_dump() == rec.model_dump()
+
+
+@pytest.mark.anyio
+async def test_lazy_get_decodes_only_the_nodes_it_reads(tmp_path: Path):
+    rec = await _branched_record(FileConversationStore(dir=tmp_path))
+    got = await FileConversationStore(dir=tmp_path, lazy=True).get(
+        part(), rec.id
+    )
+    assert got is not None
+    assert not any(node.is_loaded() for node in got.nodes.values())
+
+    assert got.path_turns() == rec.path_turns()
+    path = set(got.path_node_ids())
+    for nid, node in got.nodes.items():
+        assert node.is_loaded() == (nid in path)
+
+    # Navigating to the other branch loads it on demand
+    (other,) = set(got.nodes) - path
+    assert got.nodes[other].ui == rec.nodes[other].ui
+
+
+@pytest.mark.anyio
+async def test_put_of_lazy_record_keeps_unread_nodes(tmp_path: Path):
+    rec = await _branched_record(FileConversationStore(dir=tmp_path))
+    lazy_store = FileConversationStore(dir=tmp_path, lazy=True)
+    got = await lazy_store.get(part(), rec.id)
+    assert got is not None
+
+    got.append_linear([{"role": "user", "content": "q2"}], ui=_ui("q2"))
+    await lazy_store.put(part(), got)
+    unread = [nid for nid, n in got.nodes.items() if not n.is_loaded()]
+    assert unread
+
+    again = await FileConversationStore(dir=tmp_path).get(part(), rec.id)
+    assert again is not None
+    for nid in rec.nodes:
+        assert again.nodes[nid].turns == rec.nodes[nid].turns
+        assert again.nodes[nid].ui == rec.nodes[nid].ui
+    assert again.path_turns()[-1] == {"role": "user", "content": "q2"}
+
+
+@pytest.mark.anyio
+async def test_write_state_is_restored_from_record_json(tmp_path: Path):
+    rec = await _branched_record(FileConversationStore(dir=tmp_path))
+    conv_dir = tmp_path / sanitize_scope("chat") / sanitize_scope("alice")
+    conv_dir = conv_dir / rec.id
+    raw = json.loads((conv_dir / "record.json").read_text())
+    assert raw["next_turn_seq"] == 3
+    assert {nd["ui_len"] for nd in raw["nodes"].values()} == {None, 1}
+
+    # A cold store continues the sequence without re-reading the JSONL files
+    rec.append_linear([{"role": "user", "content": "q2"}])
+    await FileConversationStore(dir=tmp_path).put(part(), rec)
+    lines = (conv_dir / "turns.jsonl").read_text().splitlines()
+    assert [json.loads(line)["seq"] for line in lines] == [0, 1, 2, 3]
+    assert len((conv_dir / "ui.jsonl").read_text().splitlines()) == 2
+
+
+@pytest.mark.anyio
+async def test_list_sees_other_workers_writes(tmp_path: Path):
+    a = FileConversationStore(dir=tmp_path)
+    b = FileConversationStore(dir=tmp_path)
+    first = new_conversation_record(title="first")
+    await a.put(part(), first)
+    assert [m.title for m in await a.list(part())] == ["first"]
+    assert [m.title for m in await b.list(part())] == ["first"]
+
+    second = new_conversation_record(title="second")
+    await b.put(part(), second)
+    first.title = "renamed"
+    await b.put(part(), first)
+    assert {m.title for m in await a.list(part())} == {"renamed", "second"}
+
+    await b.delete(part(), second.id)
+    assert [m.title for m in await a.list(part())] == ["renamed"]
+
+
+@pytest.mark.anyio
+async def test_list_revalidates_only_changed_records(tmp_path: Path):
+    a = FileConversationStore(dir=tmp_path)
+    b = FileConversationStore(dir=tmp_path)
+    recs = [new_conversation_record(title=f"c{i}") for i in range(3)]
+    for rec in recs:
+        await a.put(part(), rec)
+    await a.list(part())
+
+    recs[0].title = "changed"
+    await b.put(part(), recs[0])
+    read: list[str] = []
+    original = Path.read_text
+
+    def spy(self: Path, *args: Any, **kwargs: Any) -> str:
+        read.append(self.parent.name)
+        return original(self, *args, **kwargs)
+
+    Path.read_text = spy  # type: ignore[method-assign]
+    try:
+        metas = await a.list(part())
+        assert await a.list(part()) == metas  # cached again
+    finally:
+        Path.read_text = original  # type: ignore[method-assign]
+    assert read == [recs[0].id]
+    assert {m.title for m in metas} == {"changed", "c1", "c2"}
+
+
+@pytest.mark.anyio
+async def test_own_writes_keep_the_list_cache_warm(
+    store: FileConversationStore,
+):
+    await store.list(part())
+    rec = new_conversation_record(title="t")
+    await store.put(part(), rec)
+    await store.put(part(), rec)
+    assert part() in store._generation
+    assert [m.title for m in await store.list(part())] == ["t"]
+
+
+@pytest.mark.anyio
+async def test_put_continues_sequence_after_other_workers_put(tmp_path: Path):
+    a = FileConversationStore(dir=tmp_path)
+    b = FileConversationStore(dir=tmp_path)
+    rec = new_conversation_record(title="t")
+    rec.append_linear([{"role": "user", "content": "q"}])
+    await a.put(part(), rec)
+
+    from_b = await b.get(part(), rec.id)
+    assert from_b is not None
+    from_b.append_linear([{"role": "assistant", "content": "from b"}])
+    await b.put(part(), from_b)
+
+    # `a`'s cached write state is stale; it must not reuse seq 1
+    from_a = await a.get(part(), rec.id)
+    assert from_a is not None
+    from_a.append_linear([{"role": "user", "content": "from a"}])
+    await a.put(part(), from_a)
+
+    scope_dir = tmp_path / sanitize_scope("chat") / sanitize_scope("alice")
+    conv_dir = safe_conv_path(scope_dir, rec.id)
+    lines = (conv_dir / "turns.jsonl").read_text().splitlines()
+    assert [json.loads(line)["seq"] for line in lines] == [0, 1, 2]
+    got = await FileConversationStore(dir=tmp_path).get(part(), rec.id)
+    assert got is not None
+    assert [t["content"] for t in got.path_turns()] == ["q", "from b", "from a"]
+
+
+@pytest.fixture(params=["file", "memory"])
+def cas_store(request: pytest.FixtureRequest, tmp_path: Path) -> Any:
+    if request.param == "file":
+        return FileConversationStore(dir=tmp_path)
+    return InMemoryConversationStore()
+
+
+@pytest.mark.anyio
+async def test_put_bumps_revision(cas_store: Any):
+    assert cas_store.compare_and_swap
+    rec = new_conversation_record(title="t")
+    await cas_store.put(part(), rec)
+    assert rec.revision == 1
+    await cas_store.put(part(), rec, expected_revision=1)
+    assert rec.revision == 2
+    got = await cas_store.get(part(), rec.id)
+    assert got is not None and got.revision == 2
+
+
+@pytest.mark.anyio
+async def test_put_with_stale_revision_conflicts(cas_store: Any):
+    rec = new_conversation_record(title="t")
+    with pytest.raises(ConversationConflictError):
+        await cas_store.put(part(), rec, expected_revision=1)
+    await cas_store.put(part(), rec, expected_revision=0)
+
+    stale = rec.model_copy(deep=True)
+    rec.title = "first writer"
+    await cas_store.put(part(), rec, expected_revision=1)
+    stale.title = "second writer"
+    with pytest.raises(ConversationConflictError) as info:
+        await cas_store.put(part(), stale, expected_revision=stale.revision)
+    assert (info.value.expected, info.value.actual) == (1, 2)
+    got = await cas_store.get(part(), rec.id)
+    assert got is not None and got.title == "first writer"
+
+    # Deleting resets the revision
+    await cas_store.delete(part(), rec.id)
+    await cas_store.put(part(), stale, expected_revision=0)
+
+
+@pytest.mark.anyio
+async def test_batch_put_get_delete(cas_store: Any):
+    recs = [new_conversation_record(title=f"c{i}") for i in range(3)]
+    await cas_store.list(part())  # warm the meta cache
+    await cas_store.put_many(part(), recs)
+    assert [r.revision for r in recs] == [1, 1, 1]
+    assert {m.title for m in await cas_store.list(part())} == {"c0", "c1", "c2"}
+
+    got = await cas_store.get_many(part(), [recs[2].id, "missing", recs[0].id])
+    assert list(got) == [recs[2].id, recs[0].id]
+    assert got[recs[0].id].title == "c0"
+
+    await cas_store.delete_many(part(), [recs[0].id, recs[1].id, "missing"])
+    assert [m.title for m in await cas_store.list(part())] == ["c2"]
+    assert await cas_store.get_many(part(), [recs[0].id]) == {}
+
+
+@pytest.mark.anyio
+async def test_file_batch_writes_bump_the_generation_once(
+    store: FileConversationStore, tmp_path: Path
+):
+    recs = [new_conversation_record(title=f"c{i}") for i in range(3)]
+    scope_dir = tmp_path / sanitize_scope("chat") / sanitize_scope("alice")
+    await store.put_many(part(), recs)
+    generation = scope_dir / ".generation"
+    assert generation.stat().st_size == 1
+    await store.delete_many(part(), [r.id for r in recs])
+    assert generation.stat().st_size == 2
+    assert await store.list(part()) == []
+
+
+@pytest.mark.anyio
+async def test_default_batch_methods_loop_over_single_calls():
+    calls: list[str] = []
+
+    class Store(InMemoryConversationStore):
+        async def get(self, partition: Any, conv_id: str) -> Any:
+            calls.append("get")
+            return await super().get(partition, conv_id)
+
+        async def put(self, partition: Any, record: Any, **kwargs: Any):
+            calls.append("put")
+            await super().put(partition, record, **kwargs)
+
+        async def delete(self, partition: Any, conv_id: str) -> None:
+            calls.append("delete")
+            await super().delete(partition, conv_id)
+
+    # Exercise the ConversationStore defaults, not the in-memory overrides
+    base = ConversationStore
+    store = Store()
+    recs = [new_conversation_record(title=f"c{i}") for i in range(2)]
+    await base.put_many(store, part(), recs)
+    got = await base.get_many(store, part(), [r.id for r in recs])
+    assert list(got) == [r.id for r in recs]
+    await base.delete_many(store, part(), [r.id for r in recs])
+    assert calls == ["put"] * 2 + ["get"] * 2 + ["delete"] * 2
+    assert await store.get(part(), recs[0].id) is None
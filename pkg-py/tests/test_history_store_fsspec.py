@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import itertools
+import json
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from shinychat._history_store import (
+    FSSPEC_COMPACT_SEGMENTS,
+    ConversationPartition,
+    FsspecConversationStore,
+    resolve_store,
+)
+from shinychat._history_types import (
+    MAX_SCHEMA_VERSION,
+    ConversationRecord,
+    UnsupportedSchemaVersionError,
+    new_conversation_record,
+)
+
+pytest.importorskip("fsspec")
+
+_roots = itertools.count()
+
+
+@pytest.fixture
+def url() -> str:
+    # The memory filesystem is process-global; give each test its own root
+    return f"memory://shinychat-test-{next(_roots)}"
+
+
+@pytest.fixture
+def store(url: str) -> FsspecConversationStore:
+    return FsspecConversationStore(url)
+
+
+def part(chat_id: str = "chat", scope: str = "alice") -> ConversationPartition:
+    return ConversationPartition(chat_id=chat_id, scope=scope)
+
+
+def ui(role: str, text: str) -> dict[str, Any]:
+    return {
+        "role": role,
+        "segments": [{"content": text, "content_type": "markdown"}],
+    }
+
+
+def exchange(rec: ConversationRecord, n: int) -> None:
+    rec.append_linear(
+        [{"role": "user", "content": f"q{n}"}], ui=[ui("user", f"q{n}")]
+    )
+    rec.append_linear(
+        [{"role": "assistant", "content": f"a{n}"}],
+        ui=[ui("assistant", f"a{n}")],
+    )
+
+
+def objects(store: FsspecConversationStore) -> list[str]:
+    return sorted(store._fs.find(store._root))
+
+
+@pytest.mark.anyio
+async def test_put_get_round_trip(store: FsspecConversationStore):
+    rec = new_conversation_record(title="penguins")
+    exchange(rec, 1)
+    await store.put(part(), rec)
+    exchange(rec, 2)
+    rec.values = {"tab": "b"}
+    await store.put(part(), rec)
+
+    got = await store.get(part(), rec.id)
+    assert got == rec
+    fresh = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    assert await fresh.get(part(), rec.id) == rec
+
+
+@pytest.mark.anyio
+async def test_each_save_writes_only_new_segments(
+    store: FsspecConversationStore,
+):
+    rec = new_conversation_record(title="t")
+    exchange(rec, 1)
+    await store.put(part(), rec)
+    first = objects(store)
+    exchange(rec, 2)
+    await store.put(part(), rec)
+    added = sorted(set(objects(store)) - set(first))
+    assert [p.rsplit("/", 2)[-2] for p in added] == ["turns", "ui"]
+
+    # Unchanged saves (e.g. a rename) only rewrite record.json and the index
+    rec.title = "renamed"
+    before = objects(store)
+    await store.put(part(), rec)
+    assert objects(store) == before
+
+    lines = store._fs.cat_file(added[0]).decode().splitlines()
+    assert [json.loads(line)["data"]["content"] for line in lines] == [
+        "q2",
+        "a2",
+    ]
+
+
+@pytest.mark.anyio
+async def test_segments_are_merged(store: FsspecConversationStore):
+    rec = new_conversation_record(title="t")
+    for n in range(FSSPEC_COMPACT_SEGMENTS // 2 + 2):
+        exchange(rec, n)
+        await store.put(part(), rec)
+    segments = [p for p in objects(store) if p.endswith(".jsonl")]
+    assert len(segments) < FSSPEC_COMPACT_SEGMENTS
+    assert await store.get(part(), rec.id) == rec
+
+    # A fresh store (another worker, or after a restart) keeps appending
+    other = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    exchange(rec, 99)
+    await other.put(part(), rec)
+    assert await store.get(part(), rec.id) == rec
+
+
+@pytest.mark.anyio
+async def test_get_retries_when_segments_are_merged_mid_read(
+    store: FsspecConversationStore,
+):
+    writer = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    rec = new_conversation_record(title="t")
+    for n in range(FSSPEC_COMPACT_SEGMENTS // 2):
+        exchange(rec, n)
+        await writer.put(part(), rec)
+
+    read_objects = store._read_objects
+    reads = 0
+
+    async def racing_read(paths: list[str], **kwargs: Any) -> list[bytes]:
+        nonlocal reads
+        reads += 1
+        if reads == 1:
+            # Another worker's save merges (and removes) the listed segments
+            exchange(rec, 99)
+            await writer.put(part(), rec)
+        return await read_objects(paths, **kwargs)
+
+    store._read_objects = racing_read  # type: ignore[method-assign]
+    assert await store.get(part(), rec.id) == rec
+    assert reads == 2
+
+
+@pytest.mark.anyio
+async def test_get_raises_on_a_missing_segment(store: FsspecConversationStore):
+    rec = new_conversation_record(title="t")
+    exchange(rec, 1)
+    await store.put(part(), rec)
+    segment = next(p for p in objects(store) if p.endswith(".jsonl"))
+    store._fs.rm(segment)
+
+    with pytest.raises(FileNotFoundError):
+        await store.get(part(), rec.id)
+
+
+@pytest.mark.anyio
+async def test_list_reads_the_index(store: FsspecConversationStore):
+    old = new_conversation_record(title="old")
+    exchange(old, 1)
+    old.updated_at -= timedelta(minutes=1)
+    await store.put(part(), old)
+    new = new_conversation_record(title="new")
+    exchange(new, 1)
+    await store.put(part(), new)
+
+    fresh = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    metas = await fresh.list(part())
+    assert [m.id for m in metas] == [new.id, old.id]
+    assert all(m.size_bytes > 0 for m in metas)
+    assert await fresh.total_size(part()) == sum(m.size_bytes for m in metas)
+
+    index = [p for p in objects(store) if p.endswith("index.json")]
+    assert len(index) == 1
+    store._fs.rm(index[0])
+    rebuilt = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    assert {m.id for m in await rebuilt.list(part())} == {new.id, old.id}
+    assert store._fs.exists(index[0])
+
+
+@pytest.mark.anyio
+async def test_delete_removes_objects_and_index_entry(
+    store: FsspecConversationStore,
+):
+    keep = new_conversation_record(title="keep")
+    gone = new_conversation_record(title="gone")
+    for rec in (keep, gone):
+        exchange(rec, 1)
+        await store.put(part(), rec)
+
+    await store.delete(part(), gone.id)
+    await store.delete(part(), "c_missing")  # no-op
+    assert await store.get(part(), gone.id) is None
+    assert not [p for p in objects(store) if f"/{gone.id}/" in p]
+
+    fresh = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    assert [m.id for m in await fresh.list(part())] == [keep.id]
+
+
+@pytest.mark.anyio
+async def test_workers_see_each_others_saves_and_deletes(
+    store: FsspecConversationStore,
+):
+    other = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    assert await other.list(part()) == []
+
+    first = new_conversation_record(title="first")
+    exchange(first, 1)
+    await store.put(part(), first)
+    assert [m.id for m in await other.list(part())] == [first.id]
+
+    # Each worker's index update keeps the other's entries...
+    second = new_conversation_record(title="second")
+    exchange(second, 1)
+    await other.put(part(), second)
+    assert {m.id for m in await store.list(part())} == {first.id, second.id}
+
+    # ...and doesn't bring back the ones it deleted
+    await store.delete(part(), first.id)
+    second.title = "renamed"
+    await other.put(part(), second)
+    assert [m.title for m in await store.list(part())] == ["renamed"]
+
+
+@pytest.mark.anyio
+async def test_put_picks_up_another_workers_save(
+    store: FsspecConversationStore,
+):
+    other = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    rec = new_conversation_record(title="t")
+    exchange(rec, 1)
+    await store.put(part(), rec)
+    exchange(rec, 2)
+    await other.put(part(), rec)
+
+    # `store`'s write state is stale now. Reusing it would overwrite the
+    # segments `other` wrote, and write its turns again.
+    before = {p: store._fs.cat_file(p) for p in objects(store)}
+    exchange(rec, 3)
+    await store.put(part(), rec)
+    after = {p: store._fs.cat_file(p) for p in objects(store)}
+    changed = [p for p in after if before.get(p, after[p]) != after[p]]
+    assert sorted(p.rsplit("/", 1)[-1] for p in changed) == [
+        "index.json",
+        "record.json",
+    ]
+    (turns,) = [p for p in after if p not in before and "/turns/" in p]
+    lines = store._fs.cat_file(turns).decode().splitlines()
+    assert [json.loads(line)["data"]["content"] for line in lines] == [
+        "q3",
+        "a3",
+    ]
+    assert await other.get(part(), rec.id) == rec
+
+
+@pytest.mark.anyio
+async def test_partitions_are_isolated(store: FsspecConversationStore):
+    rec = new_conversation_record(title="t")
+    await store.put(part(scope="alice"), rec)
+    assert await store.get(part(scope="bob"), rec.id) is None
+    assert await store.list(part(scope="bob")) == []
+    assert await store.list(part(chat_id="other", scope="alice")) == []
+
+
+@pytest.mark.anyio
+async def test_rejects_invalid_ids(store: FsspecConversationStore):
+    with pytest.raises(ValueError, match="Invalid conversation id"):
+        await store.get(part(), "../x")
+    with pytest.raises(ValueError, match="Invalid conversation id"):
+        await store.delete(part(), "a/b")
+
+
+@pytest.mark.anyio
+async def test_put_rejects_unsupported_stored_record(
+    store: FsspecConversationStore,
+):
+    rec = new_conversation_record(title="t")
+    await store.put(part(), rec)
+    (path,) = [p for p in objects(store) if p.endswith("record.json")]
+    raw = json.loads(store._fs.cat_file(path))
+    raw["schema_version"] = MAX_SCHEMA_VERSION + 1
+    store._fs.pipe_file(path, json.dumps(raw).encode())
+
+    fresh = FsspecConversationStore(store._fs.unstrip_protocol(store._root))
+    with pytest.raises(UnsupportedSchemaVersionError):
+        await fresh.get(part(), rec.id)
+    with pytest.raises(UnsupportedSchemaVersionError):
+        await fresh.put(part(), rec)
+
+
+def test_auto_store_uses_history_url(url: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SHINYCHAT_HISTORY_URL", url)
+    assert isinstance(resolve_store("auto"), FsspecConversationStore)
+    monkeypatch.delenv("SHINYCHAT_HISTORY_URL")
+    assert not isinstance(resolve_store("auto"), FsspecConversationStore)
@@ -50,6 +50,17 @@ async def test_generate_title_supports_sync_callable():
     assert await generate_title(titler, None, []) == "Sync Title"
 
 
+@pytest.mark.anyio
+async def test_generate_title_can_run_sync_callable_in_thread():
+    import threading
+
+    def titler(turns):
+        return threading.current_thread().name
+
+    title = await generate_title(titler, None, [], threaded=True)
+    assert title is not None and title.startswith("shinychat-callback")
+
+
 @pytest.mark.anyio
 async def test_generate_title_failure_returns_none():
     async def titler(turns):
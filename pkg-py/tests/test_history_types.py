@@ -360,3 +360,49 @@ def test_path_sibling_metadata_multiple_branches():
     # Active path is [n1, n2, n5, n6]; n5 has siblings [n3, n5] -> (1, 2)
     meta = rec.path_sibling_metadata()
     assert meta == {n5: (1, 2)}
+
+
+def _two_writers() -> tuple[ConversationRecord, ConversationRecord]:
+    base = new_conversation_record(title="base")
+    base.append_linear(turn("user", "q"))
+    base.append_linear(turn("assistant", "a"))
+    base.revision = 1
+    return base.model_copy(deep=True), base.model_copy(deep=True)
+
+
+def test_merge_keeps_title_and_new_nodes_from_both_writers():
+    ours, theirs = _two_writers()
+    theirs.title, theirs.title_source = "renamed", "user"
+    theirs.revision = 2
+    ours.append_linear(turn("user", "q2"))
+
+    ours.merge(theirs)
+    assert ours.title == "renamed" and ours.title_source == "user"
+    assert ours.revision == 2
+    assert [t["content"] for t in ours.path_turns()] == ["q", "a", "q2"]
+
+
+def test_merge_renumbers_our_nodes_that_collide_with_theirs():
+    ours, theirs = _two_writers()
+    theirs.append_linear(turn("user", "from theirs"))
+    theirs.revision = 2
+    ours.append_linear(turn("user", "from ours"))
+    ours.append_linear(turn("assistant", "reply"))
+    ours.title_source = "llm"
+
+    ours.merge(theirs)
+    assert ours.title == "base" and ours.title_source == "llm"
+    assert ours.nodes["n_0003"].turns == turn("user", "from theirs")
+    # Only the colliding node moves; its child keeps its (free) id
+    assert ours.current_leaf == "n_0004"
+    assert ours.nodes["n_0004"].parent == "n_0005"
+    assert [t["content"] for t in ours.path_turns()] == [
+        "q",
+        "a",
+        "from ours",
+        "reply",
+    ]
+    # Both replies to "a" are kept as siblings, theirs first
+    assert ours.nodes["n_0002"].children == ["n_0003", "n_0005"]
+    assert ours.nodes["n_0005"].children == ["n_0004"]
+    assert ours.next_node_seq == 6
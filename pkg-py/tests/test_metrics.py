@@ -0,0 +1,185 @@
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from shinychat import _metrics, set_metrics_sink
+from shinychat._history import HistoryController
+from shinychat._history_store import (
+    ConversationPartition,
+    FileConversationStore,
+    InMemoryConversationStore,
+)
+from shinychat._history_types import new_conversation_record
+from shinychat.types import (
+    InMemoryMetricsSink,
+    MetricsSink,
+    OpenTelemetryMetricsSink,
+)
+
+
+@pytest.fixture
+def sink() -> Iterator[InMemoryMetricsSink]:
+    sink = InMemoryMetricsSink()
+    set_metrics_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_metrics_sink(None)
+
+
+def part() -> ConversationPartition:
+    return ConversationPartition(chat_id="chat", scope="test-scope")
+
+
+def _make_controller(store: Any, **kwargs: Any) -> HistoryController:
+    controller = HistoryController(
+        chat=None,  # type: ignore[arg-type]
+        adapter=None,  # type: ignore[arg-type]
+        store=store,
+        title_fn=None,
+        title_enabled=False,
+        client=None,
+        **kwargs,
+    )
+    controller.partition = part()
+    return controller
+
+
+def test_helpers_are_noops_without_sink():
+    assert _metrics.get_metrics_sink() is None
+    _metrics.counter("x")
+    _metrics.histogram("x", 1.0)
+    with _metrics.span("x"):
+        pass
+    with _metrics.timed("x"):
+        pass
+
+
+def test_span_records_duration_histogram(sink: InMemoryMetricsSink):
+    with _metrics.span("op", {"k": "v"}):
+        pass
+    (point,) = sink.points
+    assert point.kind == "histogram"
+    assert point.name == "op.duration"
+    assert point.value >= 0
+    assert point.attributes == {"k": "v"}
+
+
+def test_span_propagates_errors_from_block(sink: InMemoryMetricsSink):
+    with pytest.raises(ValueError):
+        with _metrics.span("op"):
+            raise ValueError("boom")
+    assert sink.values("op.duration")
+
+
+def test_failing_sink_does_not_raise(caplog: pytest.LogCaptureFixture):
+    class _BrokenSink(MetricsSink):
+        def counter(self, name, value=1, attributes=None):
+            raise RuntimeError("sink down")
+
+        def histogram(self, name, value, attributes=None):
+            raise RuntimeError("sink down")
+
+    set_metrics_sink(_BrokenSink())
+    try:
+        _metrics.counter("x")
+        with _metrics.span("y"):
+            pass
+    finally:
+        set_metrics_sink(None)
+    assert "sink down" in caplog.text
+
+
+def test_opentelemetry_sink_forwards_to_meter():
+    pytest.importorskip("opentelemetry")
+
+    class _Instrument:
+        def __init__(self) -> None:
+            self.calls: list[tuple[float, Any]] = []
+
+        def add(self, value: float, attributes: Any = None) -> None:
+            self.calls.append((value, attributes))
+
+        record = add
+
+    class _Meter:
+        def __init__(self) -> None:
+            self.instruments: dict[str, _Instrument] = {}
+
+        def create_counter(self, name: str) -> _Instrument:
+            return self.instruments.setdefault(name, _Instrument())
+
+        create_histogram = create_counter
+
+    meter = _Meter()
+    otel = OpenTelemetryMetricsSink(meter=meter)
+    otel.counter("c", 2, {"a": 1})
+    otel.counter("c", 3)
+    with otel.span("s"):
+        pass
+    assert meter.instruments["c"].calls == [(2, {"a": 1}), (3, None)]
+    assert len(meter.instruments["s.duration"].calls) == 1
+
+
+@pytest.mark.anyio
+async def test_controller_emits_put_and_get_latency(
+    sink: InMemoryMetricsSink,
+):
+    controller = _make_controller(InMemoryConversationStore())
+    record = new_conversation_record(title="t")
+    await controller._put_record(part(), record)
+    assert await controller._get_record(part(), record.id) is not None
+
+    for name in (
+        "shinychat.history.put.duration",
+        "shinychat.history.get.duration",
+    ):
+        (point,) = [p for p in sink.points if p.name == name]
+        assert point.attributes == {"store": "InMemoryConversationStore"}
+
+
+@pytest.mark.anyio
+async def test_controller_counts_evictions(sink: InMemoryMetricsSink):
+    store = InMemoryConversationStore()
+    for _ in range(3):
+        await store.put(part(), new_conversation_record(title="t"))
+    controller = _make_controller(store, max_store_bytes=1)
+
+    await controller._evict_if_needed()
+
+    assert sink.total("shinychat.history.evictions") == 3
+
+
+@pytest.mark.anyio
+async def test_controller_times_title_generation(sink: InMemoryMetricsSink):
+    controller = _make_controller(InMemoryConversationStore())
+    controller.title_fn = lambda turns: "A title"
+    controller.record = new_conversation_record(title="t")
+    controller.send_history_update = _noop  # type: ignore[method-assign]
+
+    await controller.retitle([{"role": "user", "content": "hi"}])
+
+    assert controller.record.title == "A title"
+    assert len(sink.values("shinychat.history.title.duration")) == 1
+
+
+async def _noop() -> None:
+    pass
+
+
+@pytest.mark.anyio
+async def test_file_store_emits_bytes_written_and_list_cache(
+    sink: InMemoryMetricsSink, tmp_path
+):
+    store = FileConversationStore(tmp_path)
+    await store.list(part())
+    await store.list(part())
+    await store.put(part(), new_conversation_record(title="t"))
+
+    hits = [
+        p.attributes["hit"]
+        for p in sink.points
+        if p.name == "shinychat.store.list_cache"
+    ]
+    assert hits == [False, True]
+    assert sink.total("shinychat.store.bytes_written") > 0